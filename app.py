@@ -28,6 +28,7 @@ from router.dhan_router import dhan_router
 from router.upstox_router import upstox_router
 from router.fyers_router import fyers_router
 from router.market_data_router import market_data_router
+from router.market_quotes_router import market_quotes_router
 from services import stop_loss_router
 from services.auto_trade_execution import auto_execute_trades
 from services.dynamic_stop_loss import calculate_dynamic_stop_loss
@@ -35,6 +36,8 @@ from services.trailing_stop_loss import update_trailing_stop_loss
 from ws_router.upstox_ltp_ws import ws_upstox_router
 from router.market_ws import router as market_ws_router
 from router.backtest_router import backtesting_router
+from services.backtester.jobs import backtest_jobs
+from services.upstox.feed_auth import close_http_client
 from router.stock_router import router
 
 # Load environment variables
@@ -62,6 +65,8 @@ async def lifespan(app: FastAPI):
 
     yield
     logger.info("Shutting down application...")
+    backtest_jobs.shutdown()
+    await close_http_client()
 
 
 # Initialize FastAPI App
@@ -106,6 +111,7 @@ app.include_router(fyers_router, prefix="/api/broker/fyers", tags=["Fyers API"])
 app.add_middleware(TokenRefreshMiddleware)
 app.include_router(dhan_router, prefix="/api/dhan", tags=["Dhan API"])
 app.include_router(market_data_router)
+app.include_router(market_quotes_router)
 app.include_router(analytics_router.router)
 app.include_router(order_router.router)
 app.include_router(stop_loss_router.router)
@@ -4,6 +4,8 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 from typing import Dict, List, Tuple
 
+from strategies import indicators
+
 class SectoralMLModel:
     def __init__(self):
         self.model = RandomForestClassifier(
@@ -38,27 +40,17 @@ class SectoralMLModel:
 
     def calculate_rsi(self, prices: pd.Series, period: int = 14) -> pd.Series:
         """Calculate RSI technical indicator"""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        return 100 - (100 / (1 + rs))
+        return pd.Series(indicators.rsi(prices.to_numpy(), period), index=prices.index)
 
     def calculate_macd(self, prices: pd.Series) -> Tuple[pd.Series, pd.Series]:
         """Calculate MACD indicator"""
-        exp1 = prices.ewm(span=12, adjust=False).mean()
-        exp2 = prices.ewm(span=26, adjust=False).mean()
-        macd = exp1 - exp2
-        signal = macd.ewm(span=9, adjust=False).mean()
-        return macd, signal
+        macd, signal = indicators.macd(prices.to_numpy())
+        return pd.Series(macd, index=prices.index), pd.Series(signal, index=prices.index)
 
     def calculate_bollinger_position(self, prices: pd.Series, window: int = 20) -> pd.Series:
         """Calculate position within Bollinger Bands"""
-        sma = prices.rolling(window=window).mean()
-        std = prices.rolling(window=window).std()
-        upper = sma + (std * 2)
-        lower = sma - (std * 2)
-        return (prices - lower) / (upper - lower)
+        position = indicators.bollinger_position(prices.to_numpy(), window)
+        return pd.Series(position, index=prices.index)
 
     def analyze_stock(self, data: pd.DataFrame) -> Dict:
         """Analyze a single stock and return predictions with confidence"""
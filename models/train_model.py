@@ -16,6 +16,7 @@ from services.broker_service import UpstoxBroker
 from dotenv import load_dotenv
 
 from models.training_report import TrainingReport
+from strategies import indicators
 
 logger = logging.getLogger(__name__)
 
@@ -95,12 +96,13 @@ class ModelTrainer:
         df = data.copy()
         
         # Technical indicators
-        df['SMA20'] = df['Close'].rolling(window=20).mean()
-        df['SMA50'] = df['Close'].rolling(window=50).mean()
+        close = df['Close'].to_numpy()
+        df['SMA20'] = indicators.sma(close, 20)
+        df['SMA50'] = indicators.sma(close, 50)
         df['RSI'] = self._calculate_rsi(df['Close'])
-        df['Returns'] = df['Close'].pct_change()
-        df['Volatility'] = df['Returns'].rolling(window=20).std()
-        df['Volume_Ratio'] = df['Volume'] / df['Volume'].rolling(window=20).mean()
+        df['Returns'] = indicators.pct_change(close)
+        df['Volatility'] = indicators.volatility(close, 20)
+        df['Volume_Ratio'] = df['Volume'] / indicators.sma(df['Volume'].to_numpy(), 20)
         
         # Target: Price direction (1 for up, 0 for down)
         df['Target'] = (df['Close'].shift(-1) > df['Close']).astype(int)
@@ -112,11 +114,7 @@ class ModelTrainer:
 
     def _calculate_rsi(self, prices: pd.Series, period: int = 14) -> pd.Series:
         """Calculate RSI indicator"""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        return 100 - (100 / (1 + rs))
+        return pd.Series(indicators.rsi(prices.to_numpy(), period), index=prices.index)
 
 def calculate_loss(action_probs, value, rewards, actions_taken, beta=0.01):
     """
@@ -1,38 +1,253 @@
 # routers/backtesting_router.py
 
-from fastapi import APIRouter, Depends, Query, HTTPException
+import asyncio
+from datetime import datetime, time, timedelta
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel
 import httpx
 from database.connection import get_db
 from sqlalchemy.orm import Session
-from database.models import BrokerConfig
+from database.models import BrokerConfig, User
 from services.auth_service import get_current_user
+from services.backtester.jobs import KINDS, backtest_jobs
+from services.backtester.portfolio import PORTFOLIO_ROOTS
+from services.market_data.bar_builder import BAR_HISTORY, bar_builder
+from services.market_data.candle_cache import (
+    UPSTOX_INTERVALS,
+    candle_cache,
+    columns_to_candles,
+    fetch_upstox_candles,
+)
+from services.market_data.tick_archive import (
+    FIELDS,
+    IST,
+    SESSION_OPEN,
+    covers_session,
+    tick_archive,
+    ticks_to_candles,
+)
 
 backtesting_router = APIRouter()
 
+INTERVAL_MINUTES = {"1minute": 1, "30minute": 30}
+INTERVAL_TIMEFRAMES = {"1minute": "1m", "30minute": "30m"}
+
+
+def live_candles(instrument_key: str, interval: str):
+    """Today's candles from the in-process bar builder, if it saw the whole
+    session so far; a late start or a gap (the feed stopped while nobody
+    watched) leaves it to the cache and Upstox."""
+    timeframe = INTERVAL_TIMEFRAMES.get(interval)
+    if not timeframe:
+        return None
+    bars = bar_builder.bars(instrument_key, timeframe, n=BAR_HISTORY, include_open=True)
+    if bars is None or not len(bars["start"]):
+        return None
+    now = datetime.now(IST)
+    minutes = INTERVAL_MINUTES[interval]
+    if not covers_session(bars["start"], now.date(), minutes, now):
+        return None
+    # From the bar holding the open (30 minute bars start at 9:00)
+    step = minutes * 60_000
+    first_start = datetime.combine(now.date(), SESSION_OPEN, IST).timestamp() * 1000 // step * step
+    candles = [
+        [
+            datetime.fromtimestamp(start / 1000, IST).isoformat(),
+            float(o), float(h), float(l), float(c), int(v), 0,
+        ]
+        for start, o, h, l, c, v in zip(
+            bars["start"], bars["open"], bars["high"], bars["low"], bars["close"], bars["volume"]
+        )
+        if start >= first_start
+    ]
+    candles.reverse()
+    return {"candles": candles}
+
+
+def recorded_candles(instrument_key: str, interval: str, day: str):
+    """Candles from our own tick archive/journal, or None unless it recorded the
+    whole session: from the open through the close (or now), without gaps."""
+    minutes = INTERVAL_MINUTES.get(interval)
+    if not minutes:
+        return None
+    start = datetime.combine(datetime.fromisoformat(day).date(), time(0), IST)
+    ticks = tick_archive.get_ticks(
+        instrument_key, start, start + timedelta(days=1), fields=("ltp", "ltq", "vtt", "oi")
+    )
+    # Only trust a recording of the whole session (so far, for today)
+    now = datetime.now(IST)
+    if not covers_session(ticks["ts"], start.date(), minutes, now if start.date() == now.date() else None):
+        return None
+    return {"candles": ticks_to_candles(ticks, minutes)}
+
+
 @backtesting_router.get("/intraday-candles", tags=["Backtesting"])
 async def get_intraday_candles(
     instrument_key: str = Query(...),
-    interval: str = Query("1minute"),  # allowed: 1minute, 30minute
+    interval: str = Query("1minute"),  # allowed: 1minute, 30minute, day, week, month
+    date: Optional[str] = Query(None),  # YYYY-MM-DD, defaults to today
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
-    # 1. Get Upstox token from DB
-    broker_config = db.query(BrokerConfig).filter_by(user_id=current_user["id"], broker="upstox").first()
-    if not broker_config or not broker_config.access_token:
-        raise HTTPException(status_code=400, detail="Upstox not configured for user.")
+    # The interval names a cache directory, so only Upstox's own are accepted
+    if interval not in UPSTOX_INTERVALS:
+        raise HTTPException(status_code=400, detail=f"Unknown interval. Allowed: {list(UPSTOX_INTERVALS)}")
 
-    headers = {
-        "Accept": "application/json",
-        "Authorization": f"Bearer {broker_config.access_token}",
-    }
+    if date is not None:
+        try:
+            date = datetime.fromisoformat(date).date().isoformat()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD")
 
-    upstox_url = f"https://api.upstox.com/v2/historical-candle/intraday/{instrument_key}/{interval}"
+    # 0. Serve from the live bars or recorded ticks when we have the whole session
+    today = datetime.now(IST).date().isoformat()
+    if date in (None, today):
+        live = live_candles(instrument_key, interval)
+        if live is not None:
+            return live
+    recorded = await asyncio.to_thread(recorded_candles, instrument_key, interval, date or today)
+    if recorded is not None:
+        return recorded
 
-    async with httpx.AsyncClient() as client:
-        res = await client.get(upstox_url, headers=headers)
+    # 1. Otherwise Upstox, through the candle cache: a past day is fetched once
+    async def fetch(first, last):
+        broker_config = (
+            db.query(BrokerConfig)
+            .filter(BrokerConfig.user_id == current_user.id, BrokerConfig.broker_name.ilike("upstox"))
+            .first()
+        )
+        if not broker_config or not broker_config.access_token:
+            raise HTTPException(status_code=400, detail="Upstox not configured for user.")
+        return await fetch_upstox_candles(instrument_key, interval, first, last, broker_config.access_token)
 
-    if res.status_code != 200:
+    day = date or today
+    try:
+        columns = await candle_cache.aget(instrument_key, interval, day, day, fetch)
+    except httpx.HTTPError:
         raise HTTPException(status_code=500, detail="Failed to fetch candles from Upstox")
+    return {"candles": columns_to_candles(columns)}
+
+
+@backtesting_router.get("/historical-ticks", tags=["Backtesting"])
+async def get_historical_ticks(
+    instrument_key: str = Query(...),
+    start: str = Query(...),  # ISO datetime, IST if no offset
+    end: str = Query(...),
+    fields: str = Query("ltp,ltq,vtt"),
+    current_user: dict = Depends(get_current_user)
+):
+    field_list = [f.strip() for f in fields.split(",") if f.strip()]
+    try:
+        ticks = await asyncio.to_thread(
+            tick_archive.get_ticks, instrument_key, start, end, field_list
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e}. Available: {list(FIELDS)}")
+    return {field: values.tolist() for field, values in ticks.items()}
+
+
+# --- backtest jobs ---
+
+PORTFOLIO_OPTIONS = ("initial_capital", "max_positions", "max_per_sector", "position_pct", "fee_pct", "cooldown")
+
+
+class BacktestJobRequest(BaseModel):
+    kind: str = "backtest"  # backtest, sweep, walk_forward, portfolio
+    strategy: str
+    strategy_id: Optional[int] = None
+    sector: Optional[str] = None  # a sector folder; all of data/processed by default
+    params: Optional[dict] = None
+    grid: Optional[dict] = None
+    random: Optional[dict] = None
+    param_sets: Optional[list] = None
+    sort_by: Optional[str] = None
+    start: Optional[str] = None  # walk_forward
+    end: Optional[str] = None
+    train_days: Optional[int] = None
+    test_days: Optional[int] = None
+    min_trades: Optional[int] = None
+    options: Optional[dict] = None  # portfolio limits
+
+
+def sector_files(sector: str):
+    """Price CSV glob of a known sector folder (client input never becomes a path otherwise)."""
+    for root in PORTFOLIO_ROOTS:
+        if sector in {p.name for p in Path(root).iterdir() if p.is_dir()}:
+            return str(Path(root) / sector / "*.csv")
+    raise HTTPException(status_code=400, detail=f"Unknown sector: {sector}")
+
+
+@backtesting_router.post("/jobs", status_code=202, tags=["Backtesting"])
+async def submit_backtest_job(request: BacktestJobRequest, current_user=Depends(get_current_user)):
+    if request.kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind. Available: {list(KINDS)}")
+    spec = request.model_dump(exclude_none=True, exclude={"kind", "sector", "options"})
+    if request.sector:
+        spec["files"] = sector_files(request.sector)
+    if request.options:
+        spec["options"] = {k: v for k, v in request.options.items() if k in PORTFOLIO_OPTIONS}
+    try:
+        job = backtest_jobs.submit(request.kind, spec, user_id=current_user.id)
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.as_dict()
+
+
+@backtesting_router.get("/jobs", tags=["Backtesting"])
+async def list_backtest_jobs(current_user=Depends(get_current_user)):
+    return [job.as_dict() for job in backtest_jobs.list(current_user.id)]
+
+
+@backtesting_router.get("/jobs/{job_id}", tags=["Backtesting"])
+async def get_backtest_job(job_id: str, current_user=Depends(get_current_user)):
+    job = backtest_jobs.get(job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.as_dict(result=True)
+
+
+@backtesting_router.delete("/jobs/{job_id}", tags=["Backtesting"])
+async def cancel_backtest_job(job_id: str, current_user=Depends(get_current_user)):
+    job = backtest_jobs.get(job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not backtest_jobs.cancel(job_id, current_user.id):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return job.as_dict()
+
+
+@backtesting_router.websocket("/jobs/{job_id}/ws")
+async def backtest_job_websocket(websocket: WebSocket, job_id: str):
+    """Streams the job's status, progress and partial metrics until it finishes."""
+    await websocket.accept()
+    db = next(get_db())
+    try:
+        user = get_current_user(token=websocket.query_params.get("token", ""), db=db)
+    except Exception:
+        await websocket.send_json({"type": "error", "reason": "token_invalid"})
+        await websocket.close()
+        return
+    finally:
+        db.close()
+
+    job = backtest_jobs.get(job_id, user.id)
+    if job is None:
+        await websocket.send_json({"type": "error", "reason": "job_not_found"})
+        await websocket.close()
+        return
 
-    data = res.json()
-    return data["data"]
+    queue = backtest_jobs.subscribe(job)
+    try:
+        while True:
+            event = await queue.get()
+            await websocket.send_json(event)
+            if event["job"]["status"] in ("completed", "failed", "cancelled"):
+                break
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        backtest_jobs.unsubscribe(job, queue)
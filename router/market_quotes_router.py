@@ -0,0 +1,55 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+
+from database.models import User
+from services.auth_service import get_current_user
+from services.market_data.tick_store import tick_store
+
+market_quotes_router = APIRouter(prefix="/api/market", tags=["Market Data"])
+
+MAX_KEYS_PER_REQUEST = 5000
+
+
+class QuotesRequest(BaseModel):
+    instrument_keys: List[str]
+    fields: Optional[List[str]] = None
+    max_age: Optional[float] = None
+
+
+def _quotes(keys, fields, max_age):
+    if not keys:
+        raise HTTPException(status_code=400, detail="No instrument keys given.")
+    if len(keys) > MAX_KEYS_PER_REQUEST:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_KEYS_PER_REQUEST} instrument keys per request.",
+        )
+    try:
+        data = tick_store.quotes(keys, fields, max_age=max_age)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"count": len(keys), "data": data}
+
+
+@market_quotes_router.get("/quotes")
+def get_quotes(
+    keys: str = Query(..., description="Comma separated instrument keys or symbols"),
+    fields: Optional[str] = Query(None, description="Comma separated fields, default all"),
+    max_age: Optional[float] = Query(None, description="Treat quotes older than this many seconds as missing"),
+    current_user: User = Depends(get_current_user),
+):
+    """Latest streamed quotes from the in-memory tick store (no broker call)."""
+    key_list = [k.strip() for k in keys.split(",") if k.strip()]
+    field_list = [f.strip() for f in fields.split(",")] if fields else None
+    return _quotes(key_list, field_list, max_age)
+
+
+@market_quotes_router.post("/quotes")
+def post_quotes(
+    request: QuotesRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """Bulk variant for large key lists that don't fit in a query string."""
+    return _quotes(request.instrument_keys, request.fields, request.max_age)
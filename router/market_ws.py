@@ -1,25 +1,33 @@
 import asyncio
+import itertools
 import json
 import logging
 from datetime import datetime
 from pathlib import Path
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
 from jwt.exceptions import ExpiredSignatureError, DecodeError
 from services.auth_service import get_current_user
-from services.upstox.ws_client import UpstoxWebSocketClient
+from services.upstox.feed_hub import acquire_feed_hub, hubs, release_feed_hub
+from services.upstox.send_queue import ClientSendQueue
+from services.upstox.downstream_codec import (
+    ENCODING_MSGPACK,
+    DownstreamEncoder,
+    negotiate_encoding,
+)
+from services.upstox.tick_decoder import parse_live_feed
 from database.connection import get_db
-from database.models import BrokerConfig
+from database.models import BrokerConfig, User
 
 logger = logging.getLogger("market_ws")
 router = APIRouter()
 
 clients = {}
-ws_clients = {}
+send_queues = {}
+encoders = {}
 market_status = {}
 received_ltp_flag = {}
-
-MAX_CHUNKS = 2
-CHUNK_SIZE = 1500
+# Opaque per-connection ids for /ws/market/stats; the token is the viewer's JWT
+connection_ids = itertools.count(1)
 
 
 @router.websocket("/ws/market")
@@ -75,30 +83,33 @@ async def market_data_websocket(websocket: WebSocket):
         # Cleanup any stale state
         await cleanup_connection(token)
         clients[token] = websocket
-        ws_clients[token] = []
 
         logger.info(f"✅ WebSocket accepted: {token}")
 
-        # Split into two 1500-key chunks max
-        chunks = [
-            instrument_keys[i : i + CHUNK_SIZE]
-            for i in range(
-                0, min(len(instrument_keys), MAX_CHUNKS * CHUNK_SIZE), CHUNK_SIZE
-            )
-        ]
-
-        for chunk in chunks:
-            client = UpstoxWebSocketClient(
-                access_token=broker.access_token,
-                instrument_keys=chunk,
-                callback=lambda data: asyncio.create_task(broadcast(token, data)),
-                stop_callback=lambda: logger.info("🛑 One WS stream stopped."),
-                on_auth_error=lambda: asyncio.create_task(
-                    handle_auth_failure_and_close(token)
-                ),
-            )
-            ws_clients[token].append(client)
-            asyncio.create_task(client.connect_and_stream())
+        # Opt-in compact protocol: ?encoding=msgpack. JSON stays the default.
+        encoding = negotiate_encoding(websocket.query_params.get("encoding"))
+        if encoding == ENCODING_MSGPACK:
+            encoder = DownstreamEncoder(instrument_keys, encoding)
+            encoders[token] = encoder
+            await websocket.send_json(encoder.handshake())
+
+        # One bounded, conflating outbound queue per browser
+        queue = ClientSendQueue(
+            f"client-{next(connection_ids)}", lambda data: broadcast(token, data)
+        )
+        send_queues[token] = queue
+        queue.start()
+
+        # All viewers of the same instrument universe share one upstream set
+        acquire_feed_hub(
+            token,
+            instrument_keys,
+            access_token=broker.access_token,
+            callback=queue.offer,
+            on_auth_error=lambda: asyncio.create_task(
+                handle_auth_failure_and_close(token)
+            ),
+        )
 
         # Main receive loop
         while token in clients:
@@ -115,6 +126,17 @@ async def market_data_websocket(websocket: WebSocket):
         await cleanup_connection(token)
 
 
+@router.get("/ws/market/stats")
+async def market_ws_stats(current_user: User = Depends(get_current_user)):
+    """Per-client queue depth and lag, plus per-connection upstream rates. Admins only."""
+    if (current_user.role or "").lower() != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return {
+        "clients": [queue.stats() for queue in send_queues.values()],
+        "hubs": [hub.stats() for hub in hubs.values()],
+    }
+
+
 async def broadcast(token: str, data: dict):
     ws = clients.get(token)
     if not ws:
@@ -134,17 +156,24 @@ async def broadcast(token: str, data: dict):
 
         elif data.get("type") == "live_feed":
             payload = data["data"]
-            if not isinstance(payload, dict):
+            if not isinstance(payload, (dict, list)):
                 return
-            parsed = parse_live_feed(payload)
             received_ltp_flag[token] = True
-            await ws.send_json(
-                {
-                    "type": "live_feed",
-                    "data": parsed,
-                    "market_open": market_status.get(token) == "open",
-                }
-            )
+            market_open = market_status.get(token) == "open"
+
+            encoder = encoders.get(token)
+            if encoder:
+                if isinstance(payload, list):
+                    payload = {tick.instrument_key: tick for tick in payload}
+                await ws.send_bytes(encoder.encode_live_feed(payload, market_open))
+            else:
+                await ws.send_json(
+                    {
+                        "type": "live_feed",
+                        "data": parse_live_feed(payload),
+                        "market_open": market_open,
+                    }
+                )
 
             if market_status.get(token) in ["normal_close", "closing_end"]:
                 await asyncio.sleep(1)
@@ -181,39 +210,23 @@ async def cleanup_connection(token: str):
         except Exception:
             pass
 
-    for client in ws_clients.pop(token, []):
-        if client:
-            client.stop()
+    release_feed_hub(token)
+
+    queue = send_queues.pop(token, None)
+    if queue:
+        stats = queue.stats()
+        logger.info(
+            f"📊 Send queue for {token}: sent={stats['ticks_sent']} "
+            f"conflated={stats['conflated']} dropped={stats['dropped']} "
+            f"max_lag={stats['max_lag_ms']}ms"
+        )
+        queue.close()
 
+    encoders.pop(token, None)
     market_status.pop(token, None)
     received_ltp_flag.pop(token, None)
 
 
-def parse_live_feed(raw_data: dict):
-    parsed = {}
-    for instrument_key, details in raw_data.items():
-        try:
-            feed = details.get("fullFeed", {}).get("marketFF", {})
-            ltpc = feed.get("ltpc", {})
-            parsed[instrument_key] = {
-                "ltp": ltpc.get("ltp"),
-                "ltq": ltpc.get("ltq"),
-                "cp": ltpc.get("cp"),
-                "last_trade_time": ltpc.get("ltt"),
-                "bid_ask": feed.get("marketLevel", {}).get("bidAskQuote", []),
-                "greeks": feed.get("optionGreeks", {}),
-                "ohlc": feed.get("marketOHLC", {}).get("ohlc", []),
-                "atp": feed.get("atp"),
-                "oi": feed.get("oi"),
-                "iv": feed.get("iv"),
-                "tbq": feed.get("tbq"),
-                "tsq": feed.get("tsq"),
-            }
-        except Exception as e:
-            logger.warning(f"⚠️ Failed to parse tick for {instrument_key}: {e}")
-    return parsed
-
-
 def load_today_instrument_keys():
     file_path = Path("data/today_instrument_keys.json")
     if not file_path.exists():
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 import tensorflow as tf
+from numpy.lib.stride_tricks import sliding_window_view
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense
 from sklearn.preprocessing import MinMaxScaler
@@ -51,3 +52,17 @@ def predict_future_prices(model, scaler, recent_data):
     X_test = np.reshape(X_test, (X_test.shape[0], X_test.shape[1], 1))
     prediction = model.predict(X_test)
     return scaler.inverse_transform(prediction)[0][0]
+
+def predict_price_windows(model, scaler, prices, window=60, batch_size=1024):
+    """Batched predict_future_prices over every ``window``-long run of ``prices``.
+
+    Element k is the prediction after prices[k:k + window], i.e. for
+    prices[k + window]; the windows are strided views of the scaled series.
+    """
+    prices = np.asarray(prices, dtype=np.float64).reshape(-1, 1)
+    if len(prices) <= window:
+        return np.empty(0)
+    scaled = scaler.transform(prices)[:-1, 0]  # MinMaxScaler is element-wise
+    X_test = sliding_window_view(scaled, window)[..., np.newaxis]
+    prediction = model.predict(X_test, batch_size=batch_size, verbose=0)
+    return scaler.inverse_transform(prediction.reshape(-1, 1))[:, 0]
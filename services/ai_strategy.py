@@ -1,5 +1,4 @@
 import numpy as np
-import pandas as pd
 from sqlalchemy.orm import Session
 from database.models import HistoricalData
 from sklearn.preprocessing import MinMaxScaler
@@ -13,20 +12,16 @@ def detect_trend_reversal(user_id: int, symbol: str, db: Session):
 
     # Fetch last 100 price points
     historical_data = db.query(HistoricalData).filter(HistoricalData.symbol == symbol).order_by(HistoricalData.date.desc()).limit(100).all()
-    
+
     if len(historical_data) < 60:  # Minimum data needed
         return {"error": "Not enough historical data for AI analysis."}
 
-    df = pd.DataFrame([{
-        "date": entry.date, 
-        "close": entry.close
-    } for entry in historical_data])
-
-    df.set_index("date", inplace=True)
+    # Daily closes, as the model was trained on, oldest first (the query is newest first)
+    closes = np.array([entry.close for entry in reversed(historical_data)], dtype=float)
 
     # Normalize the data
     scaler = MinMaxScaler(feature_range=(0,1))
-    scaled_data = scaler.fit_transform(df["close"].values.reshape(-1,1))
+    scaled_data = scaler.fit_transform(closes.reshape(-1,1))
 
     X_test = np.array([scaled_data[-60:]])  # Last 60 price points
     X_test = np.reshape(X_test, (X_test.shape[0], X_test.shape[1], 1))
@@ -40,7 +35,7 @@ def detect_trend_reversal(user_id: int, symbol: str, db: Session):
     model.load_weights("models/trend_model.h5")
 
     predicted_price = scaler.inverse_transform(model.predict(X_test))[0][0]
-    actual_price = df["close"].iloc[-1]
+    actual_price = closes[-1]
 
     if predicted_price < actual_price * 0.98:  # 2% drop detected
         return {"status": "Trend Reversal Detected - EXIT TRADE"}
@@ -1,12 +1,15 @@
 import pandas as pd
 import numpy as np
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from database.models import HistoricalData, TradeHistory
-from services.ai_model import train_lstm_model, predict_future_prices
+from services.ai_model import train_lstm_model, predict_price_windows
+
+WINDOW = 60  # Days of closes the LSTM looks back on
 
 def backtest_ai_strategy(user_id: int, symbol: str, db: Session):
     """Run backtesting on historical data before live execution."""
-    
+
     # Fetch historical data
     historical_data = db.query(HistoricalData).filter(HistoricalData.symbol == symbol).all()
     if not historical_data:
@@ -14,7 +17,7 @@ def backtest_ai_strategy(user_id: int, symbol: str, db: Session):
 
     # Convert to DataFrame
     df = pd.DataFrame([{
-        "date": entry.date, 
+        "date": entry.date,
         "close": entry.close
     } for entry in historical_data])
 
@@ -22,38 +25,47 @@ def backtest_ai_strategy(user_id: int, symbol: str, db: Session):
 
     # Train AI Model
     model, scaler = train_lstm_model(user_id, symbol, db)
-    
-    trade_results = []
-    for i in range(60, len(df)):
-        recent_data = df.iloc[i-60:i]["close"].values.reshape(-1,1)
-        predicted_price = predict_future_prices(model, scaler, recent_data)
-        actual_price = df.iloc[i]["close"]
-
-        trade_type = "BUY" if predicted_price > recent_data[-1][0] else "SELL"
-        profit_loss = actual_price - recent_data[-1][0] if trade_type == "BUY" else recent_data[-1][0] - actual_price
-
-        trade_results.append({
-            "date": df.index[i],
+
+    # One batched prediction for every window: predicted[k] is for row k + WINDOW
+    closes = df["close"].to_numpy(dtype=np.float64)
+    predicted = predict_price_windows(model, scaler, closes, WINDOW)
+    entry_price = closes[WINDOW - 1:-1]
+    exit_price = closes[WINDOW:]
+
+    # A one-day trade per row, in the predicted direction
+    buy = predicted > entry_price
+    trade_type = np.where(buy, "BUY", "SELL")
+    profit_loss = np.where(buy, exit_price - entry_price, entry_price - exit_price)
+
+    trade_results = [
+        {
+            "date": date,
             "symbol": symbol,
-            "trade_type": trade_type,
-            "entry_price": recent_data[-1][0],
-            "exit_price": actual_price,
-            "profit_loss": profit_loss
-        })
-
-        # Save in DB for analysis
-        trade_entry = TradeHistory(
-            user_id=user_id,
-            symbol=symbol,
-            trade_type=trade_type,
-            quantity=1,
-            entry_price=recent_data[-1][0],
-            exit_price=actual_price,
-            profit_loss=profit_loss,
-            status="CLOSED"
+            "trade_type": side,
+            "entry_price": entry,
+            "exit_price": exit,
+            "profit_loss": pnl
+        }
+        for date, side, entry, exit, pnl in zip(
+            df.index[WINDOW:], trade_type.tolist(), entry_price.tolist(), exit_price.tolist(), profit_loss.tolist()
         )
-        db.add(trade_entry)
+    ]
 
+    # Save in DB for analysis, as one bulk insert
+    if trade_results:
+        db.execute(insert(TradeHistory), [
+            {
+                "user_id": user_id,
+                "symbol": symbol,
+                "trade_type": trade["trade_type"],
+                "quantity": 1,
+                "entry_price": trade["entry_price"],
+                "exit_price": trade["exit_price"],
+                "profit_loss": trade["profit_loss"],
+                "status": "CLOSED"
+            }
+            for trade in trade_results
+        ])
     db.commit()
-    
+
     return {"message": "✅ Backtesting completed successfully", "trade_results": trade_results}
@@ -0,0 +1,410 @@
+# services/backtester/event_driven.py
+#
+# Event-driven replay of recorded ticks (or bars) through the live trading
+# code: the same TradeManager, predictor interface and RiskManagement used
+# live, driven by a virtual clock and filled by a simulated broker.
+#
+# Ticks from the tick archive are merged across instruments in receive-time
+# order and fed one by one, as the feed would deliver them:
+#   * the broker's last price is updated and the tick goes through a
+#     private BarBuilder, so bars close exactly as they do live (on the
+#     exchange trade time, quiet instruments by the clock);
+#   * a closed bar of the chosen timeframe updates the instrument's
+#     streaming indicators (the market data the predictor sees) and asks
+#     TradeManager.consider_entry whether to open a trade;
+#   * every ``poll_interval`` virtual seconds TradeManager.check_trades runs,
+#     as monitor_trades does live, for stops, targets and trend reversals.
+#
+# Nothing waits on the wall clock, so a day replays as fast as the events
+# can be processed. The time from taking a tick to having handled
+# everything it triggered is recorded per event and reported as latency
+# percentiles, separately for the events that led to a decision.
+#
+#     python -m services.backtester.event_driven --key "NSE_EQ|INE467B01029" \
+#         --from 2025-01-02 --to 2025-01-03 --timeframe 1m
+
+import argparse
+import json
+import logging
+import math
+import time
+
+import numpy as np
+
+from services.market_data.bar_builder import CLOSE_DELAY_MS, TIMEFRAMES, BarBuilder
+from services.market_data.tick_archive import tick_archive
+from services.risk_management_service import RiskManagement
+from strategies.indicators import EMA, MACD, RSI, SMA
+from trading.trade_manager import POLL_SECONDS, TradeManager
+
+logger = logging.getLogger("event_driven")
+
+TICK_FIELDS = ("ltp", "ltq", "ltt", "vtt")
+
+
+class VirtualClock:
+    """Stands in for the ``time`` module: time() is the replay time, sleep() advances it."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def advance_to(self, now):
+        if now > self.now:
+            self.now = now
+
+
+class MarketState:
+    """Streaming indicators of one instrument, updated on every closed bar."""
+
+    __slots__ = ("close", "volume", "bars", "sma_50", "rsi", "macd", "ema_fast", "ema_slow")
+
+    def __init__(self):
+        self.close = math.nan
+        self.volume = 0
+        self.bars = 0
+        self.sma_50 = SMA(50)
+        self.rsi = RSI(14)
+        self.macd = MACD()
+        self.ema_fast = EMA(9, adjust=False)
+        self.ema_slow = EMA(21, adjust=False)
+
+    def on_bar(self, bar):
+        self.close, self.volume = bar.close, bar.volume
+        self.bars += 1
+        for indicator in (self.sma_50, self.rsi, self.macd, self.ema_fast, self.ema_slow):
+            indicator.update(bar.close)
+
+    def snapshot(self, symbol, price, now):
+        """The market data dict handed to ``predict_live_trade``; Close is the last price."""
+        return {
+            "symbol": symbol,
+            "time": now,
+            "Close": price,
+            "Volume": self.volume,
+            "RSI": self.rsi.value,
+            "MACD": self.macd.value,
+            "MACD_signal": self.macd.signal,
+            "SMA_50": self.sma_50.value,
+            "EMA_9": self.ema_fast.value,
+            "EMA_21": self.ema_slow.value,
+            "bars": self.bars,
+        }
+
+
+class SimulatedBroker:
+    """Fills TradeManager's market orders at the last replayed price.
+
+    Implements the broker calls TradeManager makes (place_order,
+    get_live_price, get_live_market_data). An order against an open position
+    closes it; otherwise it opens one of ``quantity`` shares, or as many as
+    ``capital_per_trade`` buys. Fills pay ``slippage_bps`` and
+    ``fee_per_order``. Orders for an instrument without a price are rejected.
+    """
+
+    def __init__(self, clock, quantity=1, capital_per_trade=None, slippage_bps=0.0, fee_per_order=0.0):
+        self.clock = clock
+        self.quantity = quantity
+        self.capital_per_trade = capital_per_trade
+        self.slippage = slippage_bps / 10_000
+        self.fee_per_order = fee_per_order
+        self.prices = {}
+        self.market = {}  # symbol -> MarketState
+        self.positions = {}  # symbol -> (signed quantity, fill price, time)
+        self.fills = []
+        self.trades = []
+        self.rejected = 0
+
+    def state(self, symbol):
+        state = self.market.get(symbol)
+        if state is None:
+            state = self.market[symbol] = MarketState()
+        return state
+
+    def get_live_price(self, symbol):
+        return self.prices.get(symbol)
+
+    def get_live_market_data(self, symbol):
+        return self.state(symbol).snapshot(symbol, self.prices.get(symbol, math.nan), self.clock.time())
+
+    def order_quantity(self, symbol, price, side=1):
+        """Shares a new position of ``symbol`` opened at ``price`` would get
+        (``side`` 1 buys, -1 sells)."""
+        if self.capital_per_trade:
+            return max(int(self.capital_per_trade // (price * (1 + side * self.slippage))), 1)
+        return self.quantity
+
+    def place_order(self, trade_type, price, symbol):
+        last = self.prices.get(symbol)
+        if last is None or trade_type not in ("BUY", "SELL"):
+            self.rejected += 1
+            return None
+        side = 1 if trade_type == "BUY" else -1
+        fill = last * (1 + side * self.slippage)
+        now = self.clock.time()
+        order_id = f"SIM-{len(self.fills) + 1}"
+
+        position = self.positions.get(symbol)
+        if position is not None and position[0] * side < 0:
+            quantity, entry, opened = position
+            del self.positions[symbol]
+            self.trades.append(
+                {
+                    "symbol": symbol,
+                    "side": "BUY" if quantity > 0 else "SELL",
+                    "quantity": abs(quantity),
+                    "entry_time": opened,
+                    "exit_time": now,
+                    "entry_price": entry,
+                    "exit_price": fill,
+                    "pnl": (fill - entry) * quantity - 2 * self.fee_per_order,
+                }
+            )
+            quantity = abs(quantity)
+        else:
+            quantity = self.order_quantity(symbol, last, side)
+            held = position[0] if position else 0
+            self.positions[symbol] = (held + side * quantity, fill, now)
+        self.fills.append((order_id, symbol, trade_type, quantity, fill, now))
+        return order_id
+
+    def summary(self):
+        pnl = np.array([t["pnl"] for t in self.trades])
+        open_pnl = sum(
+            (self.prices[symbol] - entry) * quantity for symbol, (quantity, entry, _) in self.positions.items()
+        )
+        wins = pnl[pnl > 0]
+        losses = pnl[pnl <= 0]
+        return {
+            "trades": len(pnl),
+            "win_rate": float(len(wins) / len(pnl)) if len(pnl) else 0.0,
+            "pnl": float(pnl.sum()),
+            "profit_factor": float(wins.sum() / -losses.sum()) if losses.sum() < 0 else math.inf,
+            "open_positions": len(self.positions),
+            "open_pnl": float(open_pnl),
+            "fills": len(self.fills),
+            "rejected": self.rejected,
+        }
+
+
+class _Tick:
+    """The fields of a feed tick the BarBuilder reads."""
+
+    __slots__ = ("instrument_key", "ltp", "ltq", "ltt", "vtt")
+
+
+def _percentiles(values_ns):
+    if not len(values_ns):
+        return {}
+    us = np.asarray(values_ns, dtype=np.float64) / 1000
+    p50, p90, p99 = np.percentile(us, [50, 90, 99])
+    return {"mean": us.mean(), "p50": p50, "p90": p90, "p99": p99, "max": us.max()}
+
+
+class Simulation:
+    """Replays ticks or bars through a TradeManager on a virtual clock.
+
+    ``predictor`` is anything with ``predict_live_trade(market_data)``
+    returning "BUY" / "SELL" / "HOLD", as used live. Entry decisions are taken
+    on closed ``timeframe`` bars, exits every ``poll_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        predictor,
+        timeframe="1m",
+        broker=None,
+        risk_manager=None,
+        poll_interval=POLL_SECONDS,
+    ):
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unknown timeframe: {timeframe}")
+        self.timeframe = timeframe
+        self.length_ms = TIMEFRAMES[timeframe]
+        self.clock = VirtualClock()
+        self.broker = broker or SimulatedBroker(self.clock)
+        self.broker.clock = self.clock
+        self.manager = TradeManager(self.broker, predictor, risk_manager, clock=self.clock)
+        self.builder = BarBuilder()
+        self.poll_ms = int(poll_interval * 1000)
+        self.latencies = []  # ns per event
+        self.decisions = []  # indexes of events that closed a bar or ran a poll
+        self.bars = 0
+        self.first_ms = self.last_ms = None
+        self.wall_seconds = 0.0
+
+    def _on_bar(self, event):
+        state = self.broker.state(event.instrument_key)
+        state.on_bar(event)
+        self.bars += 1
+        self.manager.consider_entry(event.instrument_key)
+
+    def replay_ticks(self, ticks: dict):
+        """Replay {instrument_key: {"ts", "ltp", "ltq", "ltt", "vtt"}} in receive-time order.
+
+        Can be called again with later ticks; the state carries over.
+        """
+        keys = [key for key, columns in ticks.items() if len(columns["ts"])]
+        if not keys:
+            return self
+        ts = np.concatenate([ticks[key]["ts"] for key in keys])
+        which = np.repeat(np.arange(len(keys)), [len(ticks[key]["ts"]) for key in keys])
+        order = np.argsort(ts, kind="stable")  # keeps each instrument's own order
+        columns = {name: np.concatenate([ticks[key][name] for key in keys])[order].tolist() for name in TICK_FIELDS}
+        ts, which = ts[order].tolist(), which[order].tolist()
+
+        builder, broker, manager, clock = self.builder, self.broker, self.manager, self.clock
+        prices, latencies, decisions = broker.prices, self.latencies, self.decisions
+        timeframe, length, poll_ms = self.timeframe, self.length_ms, self.poll_ms
+        if self.first_ms is None:
+            self.first_ms = ts[0]
+            self.next_poll = ts[0] - ts[0] % poll_ms + poll_ms
+            self.next_close = ts[0] - ts[0] % length + length + CLOSE_DELAY_MS
+        next_poll, next_close = self.next_poll, self.next_close
+        ltps, ltqs, ltts, vtts = (columns[name] for name in TICK_FIELDS)
+        tick, events = _Tick(), []
+        perf_counter_ns = time.perf_counter_ns
+
+        wall = time.perf_counter()
+        for i in range(len(ts)):
+            started = perf_counter_ns()
+            now, ltp = ts[i], ltps[i]
+            decided = False
+            while now >= next_poll:
+                # The monitor loop wakes up before this tick arrives
+                clock.advance_to(next_poll / 1000)
+                if manager.active_trades:
+                    manager.check_trades()
+                    decided = True
+                next_poll += poll_ms
+            clock.advance_to(now / 1000)
+            if ltp == ltp:  # NaN: no trade price in the tick
+                key = keys[which[i]]
+                prices[key] = ltp
+                tick.instrument_key, tick.ltp, tick.ltq, tick.vtt = key, ltp, ltqs[i], vtts[i] or None
+                tick.ltt = ltts[i] or now
+                builder.update(tick, events)
+            if now >= next_close:
+                events.extend(builder.close_due(now))
+                next_close = now - now % length + length + CLOSE_DELAY_MS
+            if events:
+                for event in events:
+                    if event.timeframe == timeframe and not event.amended:
+                        self._on_bar(event)
+                        decided = True
+                events.clear()
+            latencies.append(perf_counter_ns() - started)
+            if decided:
+                decisions.append(len(latencies) - 1)
+        self.wall_seconds += time.perf_counter() - wall
+        self.next_poll, self.next_close = next_poll, next_close
+        self.last_ms = ts[-1]
+        return self
+
+    def replay_bars(self, bars: dict):
+        """Replay {instrument_key: {"start", "open", "high", "low", "close", "volume"}}.
+
+        Bars must be of this simulation's timeframe (``start`` in epoch ms).
+        Each becomes four ticks inside its interval, open, low, high, close
+        (high before low on down bars), carrying a quarter of the volume.
+        """
+        ticks = {}
+        offsets = np.array([0, 1, 2, 3]) * (self.length_ms // 4)
+        offsets[-1] = self.length_ms - 1
+        for key, columns in bars.items():
+            start = np.asarray(columns["start"], dtype=np.int64)
+            o, h, l, c = (np.asarray(columns[name], dtype=np.float64) for name in ("open", "high", "low", "close"))
+            up = c >= o
+            path = np.stack([o, np.where(up, l, h), np.where(up, h, l), c], axis=1)
+            volume = np.asarray(columns.get("volume", np.zeros(len(start))), dtype=np.int64)
+            quarter = np.repeat(volume // 4, 4).reshape(-1, 4)
+            quarter[:, -1] += volume % 4
+            ts = (start[:, None] + offsets).reshape(-1)
+            ticks[key] = {
+                "ts": ts,
+                "ltp": path.reshape(-1),
+                "ltq": quarter.reshape(-1),
+                "ltt": ts,
+                "vtt": np.cumsum(quarter.reshape(-1)),
+            }
+        return self.replay_ticks(ticks)
+
+    def report(self):
+        """Throughput, per-event latency (µs) and the trading summary."""
+        events = len(self.latencies)
+        virtual = (self.last_ms - self.first_ms) / 1000 if events else 0.0
+        latencies = np.asarray(self.latencies, dtype=np.int64)
+        return {
+            "events": events,
+            "bars": self.bars,
+            "virtual_seconds": virtual,
+            "wall_seconds": self.wall_seconds,
+            "events_per_second": events / self.wall_seconds if self.wall_seconds else 0.0,
+            "speedup": virtual / self.wall_seconds if self.wall_seconds else 0.0,
+            "latency_us": _percentiles(latencies),
+            "decision_latency_us": _percentiles(latencies[self.decisions]),
+            "trading": self.broker.summary(),
+        }
+
+
+class EMACrossPredictor:
+    """Small stand-in for the model predictor: 9/21 EMA cross with an RSI filter."""
+
+    def __init__(self, min_bars=21, overbought=70):
+        self.min_bars = min_bars
+        self.overbought = overbought
+
+    def predict_live_trade(self, market_data, options_data=None):
+        if market_data["bars"] < self.min_bars:
+            return "HOLD"
+        if market_data["EMA_9"] > market_data["EMA_21"] and not market_data["RSI"] > self.overbought:
+            return "BUY"
+        if market_data["EMA_9"] < market_data["EMA_21"]:
+            return "SELL"
+        return "HOLD"
+
+
+def load_ticks(keys, start, end, archive=None) -> dict:
+    """Ticks of the instruments in [start, end) from the tick archive (or journal)."""
+    archive = archive or tick_archive
+    ticks = {}
+    for key in keys:
+        columns = archive.get_ticks(key, start, end, fields=TICK_FIELDS)
+        if len(columns["ts"]):
+            ticks[key] = columns
+        else:
+            logger.warning(f"⚠️ No ticks for {key}")
+    return ticks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded ticks through the live trading code")
+    parser.add_argument("--key", action="append", required=True, help="instrument key (repeatable)")
+    parser.add_argument("--from", dest="start", required=True)
+    parser.add_argument("--to", dest="end", required=True)
+    parser.add_argument("--timeframe", default="1m", choices=sorted(TIMEFRAMES))
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS, help="trade monitor interval, seconds")
+    parser.add_argument("--quantity", type=int, default=1)
+    parser.add_argument("--capital-per-trade", type=float)
+    parser.add_argument("--slippage-bps", type=float, default=0.0)
+    parser.add_argument("--no-risk", action="store_true", help="skip RiskManagement.validate_trade")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    ticks = load_ticks(args.key, args.start, args.end)
+    clock = VirtualClock()
+    broker = SimulatedBroker(clock, args.quantity, args.capital_per_trade, args.slippage_bps)
+    simulation = Simulation(
+        EMACrossPredictor(),
+        timeframe=args.timeframe,
+        broker=broker,
+        risk_manager=None if args.no_risk else RiskManagement(),
+        poll_interval=args.poll,
+    )
+    simulation.replay_ticks(ticks)
+    print(json.dumps(simulation.report(), indent=2, default=float))
@@ -0,0 +1,531 @@
+# services/backtester/jobs.py
+#
+# Backtest job service for the API: jobs are submitted, split into batches
+# and run in a process pool off the event loop, with their progress and
+# partial metrics published to subscribers (the WebSocket endpoint) after
+# every batch.
+#
+# Job kinds, all over the sweep strategies (see sweep.STRATEGIES):
+#   * backtest     - one parameter set over every price CSV of ``files``,
+#                    batches of files, pooled metrics so far as it goes;
+#   * sweep        - a grid, random search or list of parameter sets,
+#                    batches of sets, the leaders so far as it goes;
+#   * walk_forward - walk_forward.walk_forward, one task with its own pool;
+#   * portfolio    - portfolio.run_portfolio, one task.
+# Workers use the shared result cache, so repeated jobs come back quickly.
+#
+# Only a few batches of a job are in the pool at a time; cancelling drops
+# the rest (a batch already running finishes, its result is ignored).
+# Finished jobs are saved as a Backtest row and a BACKTEST
+# TradingPerformance row. Sweep and walk-forward results have no position
+# sizes: their profit/loss is the pooled return (a fraction) and their
+# drawdown is left empty; backtest P&L is per-symbol quantity-1 currency.
+
+import asyncio
+import glob
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from services.backtester.sweep import PRICE_FILES, STRATEGIES, RankedTable, grid, metrics, random_search
+
+logger = logging.getLogger("backtest_jobs")
+
+JOB_WORKERS = int(os.getenv("BACKTEST_JOB_WORKERS", str(max((os.cpu_count() or 2) - 1, 1))))
+JOB_START_METHOD = os.getenv("BACKTEST_JOB_START_METHOD") or None
+FILES_PER_BATCH = 8
+SETS_PER_BATCH = 16
+# Parameter sets are listed in the request handler: larger sweeps are refused
+MAX_PARAM_SETS = int(os.getenv("BACKTEST_JOB_MAX_PARAM_SETS", "5000"))
+MAX_JOBS_KEPT = 200
+
+KINDS = ("backtest", "sweep", "walk_forward", "portfolio")
+FINISHED = ("completed", "failed", "cancelled")
+
+
+# --- work done in the pool ----------------------------------------------------------
+
+_prices = {}  # files pattern -> load_prices(), per worker process
+
+
+def _load_prices(files):
+    from services.backtester.sweep import load_prices
+
+    prices = _prices.get(files)
+    if prices is None:
+        prices = _prices[files] = load_prices(files)
+    return prices
+
+
+def _date_range(prices):
+    dates = [columns["date"] for columns in prices.values() if len(columns["date"])]
+    if not dates:
+        return None, None
+    return str(min(d[0] for d in dates)), str(max(d[-1] for d in dates))
+
+
+def _backtest_batch(strategy, params, paths):
+    """Per file: symbol, trade returns, P&L, max drawdown and the date range."""
+    from services.backtester.result_cache import cached_backtest
+    from services.backtester.strategies import load_price_csv
+    from services.backtester.sweep import trade_returns
+
+    rows = []
+    for path in paths:
+        _, result = cached_backtest(path, strategy, params)
+        dates = load_price_csv(path).dropna().index
+        pnl = np.cumsum(result.pnl[result.closed])
+        drawdown = (pnl - np.maximum.accumulate(np.maximum(pnl, 0))).min() if len(pnl) else 0.0
+        rows.append({
+            "symbol": Path(path).stem.replace("_historical", ""),
+            "returns": trade_returns(result),
+            "pnl": float(pnl[-1]) if len(pnl) else 0.0,
+            "max_drawdown": float(drawdown),
+            "start": str(dates[0]) if len(dates) else None,
+            "end": str(dates[-1]) if len(dates) else None,
+        })
+    return rows
+
+
+def _sweep_batch(strategy, files, param_sets, sort_by):
+    from services.backtester.result_cache import result_cache
+    from services.backtester.sweep import run_sweep
+
+    prices = _load_prices(files)
+    table = run_sweep(strategy, param_sets, prices, processes=0, sort_by=sort_by, cache=result_cache)
+    return [(params, row) for _, _, params, row in table.rows], table.skipped, _date_range(prices)
+
+
+def _walk_forward_task(strategy, files, param_sets, start, end, train_days, test_days, min_trades):
+    from services.backtester.result_cache import result_cache
+    from services.backtester.walk_forward import DAY, make_windows, walk_forward
+
+    prices = _load_prices(files)
+    first, last = _date_range(prices)
+    if first is None:
+        raise ValueError("No price files match")
+    # As the CLI: the first test period has a full training window before it,
+    # and the end is exclusive
+    start = start or str(np.datetime64(first) + train_days * DAY)
+    end = end or str(np.datetime64(last) + DAY)
+    windows = make_windows(start, end, train_days, test_days)
+    # One task for the whole job, so it gets a pool of its own for the
+    # signals and the training runs
+    report = walk_forward(
+        strategy, param_sets, prices, windows, processes=JOB_WORKERS, min_trades=min_trades, cache=result_cache
+    )
+    return report, (start, end)
+
+
+def _portfolio_task(strategy, params, options):
+    from services.backtester.portfolio import PORTFOLIO_ROOTS, load_universe, run_portfolio
+
+    universe = load_universe(options.pop("roots", None) or PORTFOLIO_ROOTS)
+    result = run_portfolio(strategy, params, universe, processes=0, **options)
+    summary = result.summary()
+    summary["pnl"] = float(result.equity[-1] - result.initial_capital)
+    summary["start"], summary["end"] = str(universe.dates[0]), str(universe.dates[-1])
+    return summary
+
+
+# --- jobs ---------------------------------------------------------------------------
+
+
+class Job:
+    def __init__(self, kind, spec, user_id=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.spec = spec
+        self.user_id = user_id
+        self.status = "queued"
+        self.done = 0
+        self.total = 0
+        self.partial = None
+        self.result = None
+        self.summary = None  # the row persisted to TradingPerformance
+        self.error = None
+        self.backtest_id = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.subscribers = set()
+        self.task = None
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    def as_dict(self, result=False):
+        data = {
+            "id": self.id,
+            "kind": self.kind,
+            "strategy": self.spec.get("strategy"),
+            "status": self.status,
+            "progress": self.done / self.total if self.total else (1.0 if self.status == "completed" else 0.0),
+            "done": self.done,
+            "total": self.total,
+            "partial": self.partial,
+            "summary": self.summary,
+            "error": self.error,
+            "backtest_id": self.backtest_id,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if result:
+            data["spec"] = self.spec
+            data["result"] = self.result
+        return data
+
+
+def _clean(value):
+    """JSON-safe copy: numpy scalars to Python, inf/nan to None."""
+    if isinstance(value, dict):
+        return {str(k): _clean(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+def _summary(stats, pnl, max_drawdown, start, end):
+    return {
+        "total_trades": int(stats["trades"]),
+        "win_rate": stats.get("win_ratio", 0.0),
+        "total_profit_loss": pnl,
+        "max_drawdown": max_drawdown,
+        "profit_factor": stats.get("profit_factor"),
+        "sharpe_ratio": stats.get("sharpe"),
+        "start": start,
+        "end": end,
+    }
+
+
+def save_job(job):
+    """Persist a finished job as Backtest + TradingPerformance rows; returns the Backtest id."""
+    from database.connection import SessionLocal
+    from database.models import Backtest, TradingPerformance
+
+    s = _clean(job.summary)
+    db = SessionLocal()
+    try:
+        backtest = Backtest(
+            user_id=job.user_id,
+            strategy_id=job.spec.get("strategy_id"),
+            start_date=datetime.fromisoformat(s["start"]),
+            end_date=datetime.fromisoformat(s["end"]),
+            total_pnl=s["total_profit_loss"],
+            accuracy=s["win_rate"],
+        )
+        db.add(backtest)
+        db.add(TradingPerformance(
+            user_id=job.user_id,
+            total_trades=s["total_trades"],
+            win_rate=s["win_rate"],
+            total_profit_loss=s["total_profit_loss"],
+            max_drawdown=s["max_drawdown"],
+            profit_factor=s["profit_factor"],
+            sharpe_ratio=s["sharpe_ratio"],
+            performance_type="BACKTEST",
+        ))
+        db.commit()
+        return backtest.id
+    finally:
+        db.close()
+
+
+def _search_range(values):
+    """A random search dimension from JSON, which has no tuples: {"low": 10,
+    "high": 50} or "10:50" is a range (see sweep.random_search), a list the
+    choices."""
+    if isinstance(values, dict):
+        return (values["low"], values["high"])
+    if isinstance(values, str):
+        low, sep, high = values.partition(":")
+        if not sep:
+            raise ValueError(f"Not a low:high range: {values!r}")
+        return tuple(int(v) if v.strip().lstrip("-").isdigit() else float(v) for v in (low, high))
+    return values
+
+
+class JobManager:
+    """Runs backtest jobs on a process pool; one manager per API process.
+
+    ``save(job)`` persists a completed job (default :func:`save_job`,
+    called in a thread); pass None to keep results in memory only.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, save=save_job, start_method=JOB_START_METHOD):
+        self.workers = workers
+        self.save = save
+        self.start_method = start_method
+        self.jobs = {}
+        self.pool = None
+
+    def _pool(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context(self.start_method)
+            )
+        return self.pool
+
+    def shutdown(self, wait=False):
+        for job in self.jobs.values():
+            if not job.finished and job.task:
+                job.task.cancel()
+        if self.pool is not None:
+            self.pool.shutdown(wait=wait, cancel_futures=True)
+            self.pool = None
+
+    # -- submission --
+
+    def submit(self, kind, spec: dict, user_id=None) -> Job:
+        """Validate and start a job; must be called from the event loop."""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        strategy = spec.get("strategy")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}")
+        job = Job(kind, dict(spec), user_id)
+        tasks, reduce = getattr(self, f"_plan_{kind}")(job)
+        job.total = len(tasks)
+        self.jobs[job.id] = job
+        self._forget_old()
+        job.task = asyncio.get_running_loop().create_task(self._run(job, tasks, reduce))
+        logger.info(f"🧪 Backtest job {job.id} queued: {kind} {strategy} ({job.total} batches)")
+        return job
+
+    def get(self, job_id, user_id=None):
+        job = self.jobs.get(job_id)
+        if job is None or (user_id is not None and job.user_id != user_id):
+            return None
+        return job
+
+    def list(self, user_id=None):
+        return [job for job in self.jobs.values() if user_id is None or job.user_id == user_id]
+
+    def cancel(self, job_id, user_id=None) -> bool:
+        job = self.get(job_id, user_id)
+        if job is None or job.finished:
+            return False
+        if job.status == "queued":  # the task has not started: it won't see the cancel
+            job.status, job.finished_at = "cancelled", time.time()
+            self._publish(job, "status")
+        job.task.cancel()
+        return True
+
+    def _forget_old(self):
+        finished = [job for job in self.jobs.values() if job.finished]
+        for job in sorted(finished, key=lambda j: j.finished_at)[: max(len(self.jobs) - MAX_JOBS_KEPT, 0)]:
+            del self.jobs[job.id]
+
+    # -- progress --
+
+    def subscribe(self, job) -> asyncio.Queue:
+        """Queue of the job's events: a snapshot now, then one per update."""
+        queue = asyncio.Queue()
+        queue.put_nowait({"type": "status", "job": job.as_dict(result=job.finished)})
+        if not job.finished:
+            job.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, job, queue):
+        job.subscribers.discard(queue)
+
+    def _publish(self, job, event_type="progress"):
+        event = {"type": event_type, "job": job.as_dict(result=job.finished)}
+        for queue in job.subscribers:
+            queue.put_nowait(event)
+        if job.finished:
+            job.subscribers.clear()
+
+    # -- execution --
+
+    async def _run(self, job, tasks, reduce):
+        loop = asyncio.get_running_loop()
+        pending = {}
+        queue = iter(tasks)
+        pool = None
+        try:
+            job.status, job.started_at = "running", time.time()
+            self._publish(job, "status")
+            pool = self._pool()
+            for task in itertools.islice(queue, self.workers * 2):
+                pending[loop.run_in_executor(pool, *task)] = task
+            while pending:
+                finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in finished:
+                    del pending[future]
+                    job.partial = _clean(reduce(future.result()))
+                    job.done += 1
+                    task = next(queue, None)
+                    if task is not None:
+                        pending[loop.run_in_executor(pool, *task)] = task
+                self._publish(job)
+            job.result, job.summary = (_clean(part) for part in reduce(None))
+            if self.save is not None:
+                try:
+                    job.backtest_id = await asyncio.to_thread(self.save, job)
+                except Exception as e:
+                    logger.error(f"❌ Could not save backtest job {job.id}: {e}")
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            logger.info(f"🛑 Backtest job {job.id} cancelled after {job.done}/{job.total} batches")
+        except BrokenProcessPool as e:
+            job.status, job.error = "failed", f"A worker process died: {e}"
+            logger.error(f"❌ Backtest job {job.id} failed, a worker process died: {e}")
+            # A broken pool fails every later submit: start a fresh one next time
+            if pool is not None and self.pool is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = None
+        except Exception as e:
+            job.status, job.error = "failed", str(e)
+            logger.error(f"❌ Backtest job {job.id} failed: {e}")
+        finally:
+            for future in pending:
+                future.cancel()
+            job.finished_at = time.time()
+            self._publish(job, "status")
+
+    # Each plan returns the pool tasks, (function, *args), and a reducer:
+    # reduce(batch_result) folds one batch in and returns the partial
+    # metrics; reduce(None) returns (result, summary) at the end.
+
+    def _plan_backtest(self, job):
+        spec = job.spec
+        params = spec.get("params") or {}
+        paths = sorted(glob.glob(spec.get("files") or PRICE_FILES))
+        if not paths:
+            raise ValueError("No price files match")
+        tasks = [
+            (_backtest_batch, spec["strategy"], params, paths[i : i + FILES_PER_BATCH])
+            for i in range(0, len(paths), FILES_PER_BATCH)
+        ]
+        rows = []
+
+        def reduce(batch):
+            if batch is not None:
+                rows.extend(batch)
+                return metrics(np.concatenate([r["returns"] for r in rows]), len(rows))
+            pooled = metrics(np.concatenate([r["returns"] for r in rows]), len(rows))
+            starts = [r["start"] for r in rows if r["start"]]
+            ends = [r["end"] for r in rows if r["end"]]
+            symbols = [
+                {"symbol": r["symbol"], "trades": len(r["returns"]), "pnl": r["pnl"], "max_drawdown": r["max_drawdown"]}
+                for r in sorted(rows, key=lambda r: r["symbol"])
+            ]
+            pnl = sum(r["pnl"] for r in rows)
+            summary = _summary(pooled, pnl, None, min(starts, default=None), max(ends, default=None))
+            return {"metrics": pooled, "pnl": pnl, "symbols": symbols}, summary
+
+        return tasks, reduce
+
+    def _param_sets(self, spec):
+        if spec.get("param_sets"):
+            count = len(spec["param_sets"])
+        elif spec.get("random"):
+            count = int(spec["random"]["samples"])
+        elif spec.get("grid"):
+            count = math.prod(len(values) for values in spec["grid"].values())
+        else:
+            raise ValueError("A sweep needs param_sets, grid or random")
+        if count > MAX_PARAM_SETS:
+            raise ValueError(f"{count} parameter sets; at most {MAX_PARAM_SETS} per job")
+
+        if spec.get("param_sets"):
+            return [dict(p) for p in spec["param_sets"]]
+        if spec.get("random"):
+            search = spec["random"]
+            space = {name: _search_range(values) for name, values in search["space"].items()}
+            return list(random_search(space, count, search.get("seed")))
+        return list(grid(spec["grid"]))
+
+    def _plan_sweep(self, job):
+        spec = job.spec
+        files = spec.get("files") or PRICE_FILES
+        sort_by = spec.get("sort_by", "total_return")
+        # Batches grouped by feature key, so workers compute different signals
+        run = STRATEGIES[spec["strategy"]]
+        param_sets = sorted(self._param_sets(spec), key=lambda params: repr(run.split(params)[0]))
+        tasks = [
+            (_sweep_batch, spec["strategy"], files, param_sets[i : i + SETS_PER_BATCH], sort_by)
+            for i in range(0, len(param_sets), SETS_PER_BATCH)
+        ]
+        table = RankedTable(sort_by)
+        dates = []
+
+        def reduce(batch):
+            if batch is not None:
+                rows, skipped, date_range = batch
+                for params, row in rows:
+                    table.add(params, row)
+                table.skipped += skipped
+                dates.append(date_range)
+                return {"evaluated": len(table), "skipped": table.skipped, "top": table.top(5)}
+            best = table.best()
+            if best is None:
+                raise ValueError("No valid parameter set")
+            params, row = best
+            start, end = dates[0]
+            summary = _summary(row, row["total_return"], None, start, end)
+            return {"best": {"params": params, "metrics": row}, "top": table.top(spec.get("top", 20)),
+                    "skipped": table.skipped}, summary
+
+        return tasks, reduce
+
+    def _plan_walk_forward(self, job):
+        spec = job.spec
+        task = (
+            _walk_forward_task,
+            spec["strategy"],
+            spec.get("files") or PRICE_FILES,
+            self._param_sets(spec),
+            spec.get("start"),
+            spec.get("end"),
+            spec.get("train_days", 365),
+            spec.get("test_days", 90),
+            spec.get("min_trades", 1),
+        )
+        done = []
+
+        def reduce(batch):
+            if batch is not None:
+                done.append(batch)
+                return None
+            report, (start, end) = done[0]
+            oos = report["out_of_sample"]
+            return report, _summary(oos, oos["total_return"], None, start, end)
+
+        return [task], reduce
+
+    def _plan_portfolio(self, job):
+        spec = job.spec
+        task = (_portfolio_task, spec["strategy"], spec.get("params") or {}, dict(spec.get("options") or {}))
+        done = []
+
+        def reduce(batch):
+            if batch is not None:
+                done.append(batch)
+                return batch["portfolio"]
+            report = done[0]
+            p = report["portfolio"]
+            return report, _summary(p, report["pnl"], p["max_drawdown"], report["start"], report["end"])
+
+        return [task], reduce
+
+
+backtest_jobs = JobManager()
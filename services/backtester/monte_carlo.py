@@ -0,0 +1,182 @@
+# services/backtester/monte_carlo.py
+#
+# Monte Carlo risk analysis of a backtest's trade list (or any return
+# series): many resampled equity paths instead of the single historical one,
+# giving distributions of the final return and maximum drawdown and the
+# probability of ruin.
+#
+# Paths are generated a chunk at a time as (paths x trades) arrays: one
+# draw of indices, one cumprod/cumsum for the equity curves and one
+# running maximum for the drawdowns, with no Python loop over paths.
+# The chunk size keeps each working array under MONTE_CARLO_CHUNK_BYTES.
+#
+# Resampling methods:
+#   * shuffle   - the same trades in random order (only the sequencing risk);
+#   * bootstrap - trades drawn with replacement;
+#   * block     - circular block bootstrap, runs of ``block`` consecutive
+#                 returns, for series with autocorrelation (daily returns).
+# Any method can also scale each trade by a random position size,
+# uniform in [1 - size_jitter, 1 + size_jitter].
+#
+#     python -m services.backtester.monte_carlo fibonacci_breakout \
+#         --csv "data/processed/NIFTY IT/TCS.NS_historical.csv" \
+#         --param lookback=20 --param stop_loss_pct=0.02 --paths 100000 --method block
+
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+
+CHUNK_BYTES = int(os.getenv("MONTE_CARLO_CHUNK_BYTES", str(32 << 20)))
+METHODS = ("shuffle", "bootstrap", "block")
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+
+def _indices(rng, method, paths, n, block):
+    if method == "bootstrap":
+        return rng.integers(0, n, size=(paths, n))
+    # block: circular runs starting at random positions
+    blocks = -(-n // block)
+    starts = rng.integers(0, n, size=(paths, blocks, 1))
+    return ((starts + np.arange(block)) % n).reshape(paths, blocks * block)[:, :n]
+
+
+def _sample(rng, returns, method, paths, block):
+    n = len(returns)
+    if method == "shuffle":
+        return rng.permuted(np.broadcast_to(returns, (paths, n)), axis=1)
+    return returns[_indices(rng, method, paths, n, block)]
+
+
+class MonteCarloResult:
+    """Per-path statistics: final return, max drawdown (<= 0), min equity."""
+
+    def __init__(self, final_return, max_drawdown, min_equity, method, trades, ruin_equity):
+        self.final_return = final_return
+        self.max_drawdown = max_drawdown
+        self.min_equity = min_equity
+        self.method = method
+        self.trades = trades
+        self.ruin_equity = ruin_equity
+
+    def __len__(self):
+        return len(self.final_return)
+
+    def ruin_probability(self, ruin_equity=None):
+        """Share of paths whose equity touched ``ruin_equity`` x the starting capital."""
+        level = self.ruin_equity if ruin_equity is None else ruin_equity
+        return float((self.min_equity <= level).mean())
+
+    def drawdown_probability(self, drawdown):
+        """Share of paths with a max drawdown at least ``drawdown`` deep (e.g. 0.2)."""
+        return float((self.max_drawdown <= -abs(drawdown)).mean())
+
+    def summary(self, percentiles=PERCENTILES) -> dict:
+        def spread(values):
+            return {f"p{p}": float(v) for p, v in zip(percentiles, np.percentile(values, percentiles))}
+
+        return {
+            "paths": len(self),
+            "trades": self.trades,
+            "method": self.method,
+            "final_return": spread(self.final_return),
+            "max_drawdown": spread(self.max_drawdown),
+            "mean_return": float(self.final_return.mean()),
+            "loss_probability": float((self.final_return < 0).mean()),
+            "ruin_equity": self.ruin_equity,
+            "ruin_probability": self.ruin_probability(),
+        }
+
+
+def simulate(
+    returns,
+    paths=10_000,
+    method="shuffle",
+    block=10,
+    size_jitter=0.0,
+    compound=True,
+    ruin_equity=0.5,
+    seed=None,
+    chunk_bytes=CHUNK_BYTES,
+) -> MonteCarloResult:
+    """Resample ``returns`` into ``paths`` equity paths starting at 1.
+
+    ``returns`` are per-trade (or per-period) fractions of equity when
+    ``compound``; otherwise fractions of the starting capital, added up (a
+    fixed position size: pass P&L / initial capital). Results depend only on
+    the seed and the chunk size.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method: {method}")
+    returns = np.asarray(returns, dtype=np.float64)
+    n = len(returns)
+    if n == 0:
+        raise ValueError("No returns to resample")
+    block = max(1, min(int(block), n))
+    rng = np.random.default_rng(seed)
+    chunk = max(1, chunk_bytes // (8 * n))
+
+    final_return = np.empty(paths)
+    max_drawdown = np.empty(paths)
+    min_equity = np.empty(paths)
+    for lo in range(0, paths, chunk):
+        hi = min(lo + chunk, paths)
+        sample = _sample(rng, returns, method, hi - lo, block)
+        if size_jitter:
+            sample = sample * rng.uniform(1 - size_jitter, 1 + size_jitter, size=sample.shape)
+        if compound:
+            equity = np.cumprod(1.0 + sample, axis=1)
+        else:
+            equity = np.cumsum(sample, axis=1)
+            equity += 1.0
+        # Drawdowns are measured from the starting capital too
+        peak = np.maximum.accumulate(equity, axis=1)
+        np.maximum(peak, 1.0, out=peak)
+        final_return[lo:hi] = equity[:, -1] - 1.0
+        min_equity[lo:hi] = np.minimum(equity.min(axis=1), 1.0)
+        np.divide(equity, peak, out=equity)
+        max_drawdown[lo:hi] = equity.min(axis=1) - 1.0
+    np.minimum(max_drawdown, 0.0, out=max_drawdown)
+    return MonteCarloResult(final_return, max_drawdown, min_equity, method, n, ruin_equity)
+
+
+if __name__ == "__main__":
+    from services.backtester.result_cache import cached_backtest
+    from services.backtester.sweep import STRATEGIES, _number, trade_returns
+
+    parser = argparse.ArgumentParser(description="Monte Carlo analysis of a backtest's trades")
+    parser.add_argument("strategy", choices=sorted(STRATEGIES))
+    parser.add_argument("--csv", required=True, help="price CSV to backtest")
+    parser.add_argument("--param", action="append", help="name=value strategy parameter")
+    parser.add_argument("--paths", type=int, default=100_000)
+    parser.add_argument("--method", choices=METHODS, default="shuffle")
+    parser.add_argument("--block", type=int, default=10)
+    parser.add_argument("--size-jitter", type=float, default=0.0)
+    parser.add_argument("--ruin", type=float, default=0.5, help="ruin at this fraction of the starting capital")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    params = {}
+    for item in args.param or ():
+        name, _, value = item.partition("=")
+        params[name] = _number(value)
+    _, result = cached_backtest(args.csv, args.strategy, params)
+    returns = trade_returns(result)  # fully invested in each trade
+
+    start = time.perf_counter()
+    mc = simulate(
+        returns, args.paths, args.method, args.block, args.size_jitter, ruin_equity=args.ruin, seed=args.seed
+    )
+    elapsed = time.perf_counter() - start
+    summary = mc.summary()
+    print(f"{summary['paths']} paths x {summary['trades']} trades ({args.method}) in {elapsed:.2f} s\n")
+    for name in ("final_return", "max_drawdown"):
+        print(f"{name:>14}: " + "  ".join(f"{p} {v:+.2%}" for p, v in summary[name].items()))
+    print(f"\n   mean return: {summary['mean_return']:+.2%}")
+    print(f"  P(loss)     : {summary['loss_probability']:.2%}")
+    print(f"  P(ruin)     : {summary['ruin_probability']:.2%} (equity <= {args.ruin:.0%})")
+    for level in (0.1, 0.2, 0.3, 0.5):
+        print(f"  P(DD >= {level:.0%}): {mc.drawdown_probability(level):.2%}")
@@ -0,0 +1,390 @@
+# services/backtester/portfolio.py
+#
+# Portfolio backtest over every sector folder under data/processed and
+# data/sectoral. Symbols are aligned on the union of their trading days as
+# time x symbol arrays (NaN where a symbol has no bar); a symbol listed in
+# several sectors (HDFCBANK in Bank, Private Bank and Financial Services)
+# is loaded once and belongs to all of them.
+#
+# Three steps:
+#   * per symbol, in a process pool over shared memory: the sweep
+#     strategy's signals and, for every entry signal, where its trade
+#     would exit (vectorized, one resolution per candidate);
+#   * one pass over the candidates in time order that applies the shared
+#     cash, the maximum number of open positions and the per-sector limit
+#     (one Python iteration per candidate trade);
+#   * per-symbol P&L curves from difference arrays, reduced to sectors with
+#     one matrix product, so sector and aggregate metrics come together.
+#
+#     python -m services.backtester.portfolio fibonacci_breakout \
+#         --param lookback=20 --param stop_loss_pct=0.02 --cooldown 1 \
+#         --max-positions 10 --max-per-sector 3
+
+import argparse
+import glob
+import heapq
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from services.backtester import vectorized
+from services.backtester.strategies import load_price_csv
+from services.backtester.sweep import STRATEGIES, SharedPrices, _init_worker, _number, _worker
+
+logger = logging.getLogger("portfolio_backtest")
+
+PORTFOLIO_ROOTS = tuple(
+    os.getenv("BACKTEST_PORTFOLIO_ROOTS", "data/processed,data/sectoral").split(",")
+)
+TRADING_DAYS = 252
+
+
+class Universe:
+    """Symbols of several sector folders on one calendar.
+
+    ``close``/``high``/``low`` are (days, symbols) arrays; ``membership`` is
+    a (symbols, sectors) boolean matrix.
+    """
+
+    def __init__(self, frames: dict, sectors: dict):
+        self.symbols = sorted(frames)
+        self.sectors = sorted(sectors)
+        self.dates = np.unique(np.concatenate([frames[s].index.to_numpy() for s in self.symbols]))
+        self.positions = {}  # symbol -> row of each of its bars
+        shape = (len(self.dates), len(self.symbols))
+        self.close, self.high, self.low = np.full(shape, np.nan), np.full(shape, np.nan), np.full(shape, np.nan)
+        for j, symbol in enumerate(self.symbols):
+            df = frames[symbol]
+            rows = np.searchsorted(self.dates, df.index.to_numpy())
+            self.positions[symbol] = rows
+            self.close[rows, j] = df["Close"].to_numpy()
+            self.high[rows, j] = df["High"].to_numpy()
+            self.low[rows, j] = df["Low"].to_numpy()
+        self.membership = np.zeros((len(self.symbols), len(self.sectors)), dtype=bool)
+        for k, sector in enumerate(self.sectors):
+            for symbol in sectors[sector]:
+                self.membership[self.symbols.index(symbol), k] = True
+
+    def columns(self, symbol) -> dict:
+        """{column: array} over the symbol's own bars, as the sweep strategies take."""
+        j = self.symbols.index(symbol)
+        rows = self.positions[symbol]
+        return {"close": self.close[rows, j], "high": self.high[rows, j], "low": self.low[rows, j]}
+
+
+def load_universe(roots=PORTFOLIO_ROOTS) -> Universe:
+    """Every ``<root>/<sector>/<symbol>.csv``; the first root a symbol is found in wins."""
+    frames, sectors = {}, {}
+    for root in roots:
+        for path in sorted(glob.glob(os.path.join(root, "*", "*.csv"))):
+            symbol = Path(path).stem.replace("_historical", "")
+            sector = Path(path).parent.name
+            if symbol not in frames:
+                frames[symbol] = load_price_csv(path)[["Close", "High", "Low"]].dropna()
+            sectors.setdefault(sector, set()).add(symbol)
+    logger.info(f"📂 {len(frames)} symbols in {len(sectors)} sectors from {', '.join(roots)}")
+    return Universe(frames, sectors)
+
+
+# --- per-symbol candidates ------------------------------------------------------
+
+
+def symbol_candidates(strategy, columns, params):
+    """Every entry signal of one symbol with where its trade would exit:
+    (entry, exit, reason, entry_price, exit_price) over the symbol's bars."""
+    run = STRATEGIES[strategy]
+    key, rest = run.split(params)
+    result = run.trade(columns, run.features(columns, **dict(key)), overlap=True, **rest)
+    return result.entry_index, result.exit_index, result.reason, result.entry_price, result.exit_price
+
+
+def _candidate_batch(strategy, params, symbols):
+    return [(symbol, symbol_candidates(strategy, _worker["prices"][symbol], params)) for symbol in symbols]
+
+
+def _candidates(strategy, universe, params, processes, start_method):
+    prices = {symbol: universe.columns(symbol) for symbol in universe.symbols}
+    if processes == 0:
+        return {symbol: symbol_candidates(strategy, prices[symbol], params) for symbol in universe.symbols}
+    batches = [universe.symbols[i :: processes * 4] for i in range(processes * 4)]
+    found = {}
+    with SharedPrices(prices) as shared:
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker,
+            initargs=(shared.spec,),
+        ) as pool:
+            futures = [pool.submit(_candidate_batch, strategy, params, batch) for batch in batches if batch]
+            for future in futures:
+                found.update(future.result())
+    return found
+
+
+# --- allocation -----------------------------------------------------------------
+
+
+class PortfolioResult:
+    """Taken trades as parallel arrays (calendar rows, symbol columns) plus
+    per-symbol P&L curves."""
+
+    def __init__(self, universe, trades, symbol_pnl, initial_capital, rejected):
+        self.universe = universe
+        self.trades = trades
+        self.symbol_pnl = symbol_pnl
+        self.initial_capital = initial_capital
+        self.rejected = rejected
+        self.equity = initial_capital + symbol_pnl.sum(axis=1)
+        self.sector_pnl = symbol_pnl @ universe.membership
+
+    def records(self):
+        dates, symbols = self.universe.dates, self.universe.symbols
+        t = self.trades
+        return [
+            {
+                "symbol": symbols[j],
+                "entry": dates[entry],
+                "exit": dates[exit] if reason != vectorized.EXIT_OPEN else None,
+                "quantity": quantity,
+                "entry_price": entry_price,
+                "exit_price": exit_price if reason != vectorized.EXIT_OPEN else None,
+                "pnl": pnl,
+                "outcome": vectorized.EXIT_REASONS[reason],
+            }
+            for j, entry, exit, reason, quantity, entry_price, exit_price, pnl in zip(
+                t["symbol"].tolist(),
+                t["entry"].tolist(),
+                t["exit"].tolist(),
+                t["reason"].tolist(),
+                t["quantity"].tolist(),
+                t["entry_price"].tolist(),
+                t["exit_price"].tolist(),
+                t["pnl"].tolist(),
+            )
+        ]
+
+    def summary(self):
+        """{"portfolio": metrics, "sectors": {sector: metrics}}."""
+        t = self.trades
+        closed = t["reason"] != vectorized.EXIT_OPEN
+        won = closed & (t["pnl"] > 0)
+        in_sector = self.universe.membership[t["symbol"]].astype(np.float64)  # (trades, sectors)
+        trades = closed @ in_sector
+        wins = won @ in_sector
+        realized = np.where(closed, t["pnl"], 0.0) @ in_sector
+
+        sector_drawdown = (self.sector_pnl - np.maximum.accumulate(self.sector_pnl, axis=0)).min(axis=0)
+        sectors = {
+            sector: {
+                "trades": int(trades[k]),
+                "win_ratio": float(wins[k] / trades[k]) if trades[k] else 0.0,
+                "realized_pnl": float(realized[k]),
+                "total_pnl": float(self.sector_pnl[-1, k]),
+                "max_drawdown": float(sector_drawdown[k]),
+            }
+            for k, sector in enumerate(self.universe.sectors)
+        }
+
+        equity = self.equity
+        running_max = np.maximum.accumulate(equity)
+        daily = np.diff(equity) / equity[:-1]
+        years = len(equity) / TRADING_DAYS
+        total = int(closed.sum())
+        portfolio = {
+            "trades": total,
+            "open_positions": int((~closed).sum()),
+            "win_ratio": float(won.sum() / total) if total else 0.0,
+            "final_equity": float(equity[-1]),
+            "total_return": float(equity[-1] / self.initial_capital - 1),
+            "cagr": float((equity[-1] / self.initial_capital) ** (1 / years) - 1) if years else 0.0,
+            "max_drawdown": float(((equity - running_max) / running_max).min()),
+            "sharpe": float(daily.mean() / daily.std() * np.sqrt(TRADING_DAYS)) if daily.std() else 0.0,
+            **{f"rejected_{name}": count for name, count in self.rejected.items()},
+        }
+        return {"portfolio": portfolio, "sectors": sectors}
+
+
+def _allocate(universe, candidates, initial_capital, max_positions, max_per_sector, position_pct,
+              fee_pct, cooldown):
+    """Walk the candidates in time order and take those the limits allow.
+
+    Exits on a bar free their cash and slots before entries on that bar are
+    considered; same-bar entries go in symbol order.
+    """
+    rows = []
+    for j, symbol in enumerate(universe.symbols):
+        entry, exit, reason, entry_price, exit_price = candidates[symbol]
+        calendar = universe.positions[symbol]
+        rows.append((np.full(len(entry), j), calendar[entry], calendar[exit], reason, entry_price, exit_price))
+    symbol, entry, exit, reason, entry_price, exit_price = (np.concatenate(c) for c in zip(*rows))
+    order = np.lexsort((symbol, entry))
+    symbol, entry, exit, reason, entry_price, exit_price = (
+        a[order] for a in (symbol, entry, exit, reason, entry_price, exit_price)
+    )
+
+    sectors_of = [np.flatnonzero(row).tolist() for row in universe.membership]
+    sector_open = [0] * len(universe.sectors)
+    free_from = [0] * len(universe.symbols)
+    cash, invested, open_count = float(initial_capital), 0.0, 0
+    exiting = []  # heap of (exit row, trade number, cost, proceeds, symbol)
+    taken, quantity = [], []
+    rejected = {"positions": 0, "sector": 0, "cash": 0}
+    is_open = reason == vectorized.EXIT_OPEN
+
+    for i, (j, t, t_exit, price, open_, exit_value) in enumerate(
+        zip(symbol.tolist(), entry.tolist(), exit.tolist(), entry_price.tolist(), is_open.tolist(),
+            exit_price.tolist())
+    ):
+        if t < free_from[j]:
+            continue  # the symbol is already held
+        while exiting and exiting[0][0] <= t:
+            _, _, cost, proceeds, k = heapq.heappop(exiting)
+            cash += proceeds
+            invested -= cost
+            open_count -= 1
+            for s in sectors_of[k]:
+                sector_open[s] -= 1
+        if max_positions and open_count >= max_positions:
+            rejected["positions"] += 1
+            continue
+        if max_per_sector and any(sector_open[s] >= max_per_sector for s in sectors_of[j]):
+            rejected["sector"] += 1
+            continue
+        size = int(min(cash, position_pct * (cash + invested)) // (price * (1 + fee_pct)))
+        if size < 1:
+            rejected["cash"] += 1
+            continue
+
+        cost = size * price * (1 + fee_pct)
+        cash -= cost
+        invested += cost
+        open_count += 1
+        for s in sectors_of[j]:
+            sector_open[s] += 1
+        taken.append(i)
+        quantity.append(size)
+        if open_:
+            free_from[j] = len(universe.dates)
+        else:
+            free_from[j] = t_exit + 1 + cooldown
+            heapq.heappush(exiting, (t_exit, i, cost, size * exit_value * (1 - fee_pct), j))
+
+    taken = np.asarray(taken, dtype=np.int64)
+    trades = {
+        "symbol": symbol[taken],
+        "entry": entry[taken],
+        "exit": exit[taken],
+        "reason": reason[taken],
+        "quantity": np.asarray(quantity, dtype=np.float64),
+        "entry_price": entry_price[taken],
+        "exit_price": exit_price[taken],
+    }
+    return trades, rejected
+
+
+def _symbol_pnl(universe, trades, fee_pct):
+    """(days, symbols) P&L: realized at exits plus open positions marked to
+    the last known close. Fills the trades' ``pnl``."""
+    days, count = universe.close.shape
+    closed = trades["reason"] != vectorized.EXIT_OPEN
+    quantity, symbol = trades["quantity"], trades["symbol"]
+    cost = quantity * trades["entry_price"] * (1 + fee_pct)
+    proceeds = quantity * trades["exit_price"] * (1 - fee_pct)
+
+    held = np.zeros((days + 1, count))
+    basis = np.zeros((days + 1, count))
+    realized = np.zeros((days + 1, count))
+    np.add.at(held, (trades["entry"], symbol), quantity)
+    np.add.at(basis, (trades["entry"], symbol), cost)
+    np.add.at(held, (trades["exit"][closed], symbol[closed]), -quantity[closed])
+    np.add.at(basis, (trades["exit"][closed], symbol[closed]), -cost[closed])
+    np.add.at(realized, (trades["exit"][closed], symbol[closed]), (proceeds - cost)[closed])
+
+    marks = pd.DataFrame(universe.close).ffill().fillna(0.0).to_numpy()
+    pnl = np.cumsum(realized[:days], axis=0) + np.cumsum(held[:days], axis=0) * marks - np.cumsum(
+        basis[:days], axis=0
+    )
+    trades["pnl"] = np.where(closed, proceeds - cost, quantity * marks[-1, symbol] - cost)
+    return pnl
+
+
+def run_portfolio(
+    strategy,
+    params: dict,
+    universe: Universe,
+    initial_capital=1000000,
+    max_positions=10,
+    max_per_sector=None,
+    position_pct=None,
+    fee_pct=0.0,
+    cooldown=0,
+    processes=None,
+    start_method=None,
+):
+    """Backtest ``strategy`` with ``params`` over the whole universe on shared capital.
+
+    Each position gets ``position_pct`` of the current capital at cost
+    (default 1 / max_positions), capped by the free cash, in whole shares.
+    One position per symbol at a time; a symbol can re-enter ``cooldown``
+    bars after its exit. ``fee_pct`` is charged on both sides.
+    ``processes=0`` generates the signals in this process.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    if position_pct is None:
+        position_pct = 1 / max_positions if max_positions else 0.1
+    processes = os.cpu_count() if processes is None else processes
+    candidates = _candidates(strategy, universe, params, processes, start_method)
+    trades, rejected = _allocate(
+        universe, candidates, initial_capital, max_positions, max_per_sector, position_pct, fee_pct, cooldown
+    )
+    symbol_pnl = _symbol_pnl(universe, trades, fee_pct)
+    return PortfolioResult(universe, trades, symbol_pnl, initial_capital, rejected)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-sector portfolio backtest")
+    parser.add_argument("strategy", choices=sorted(STRATEGIES))
+    parser.add_argument("--root", action="append", help="folder of sector folders (repeatable)")
+    parser.add_argument("--param", action="append", help="name=value strategy parameter")
+    parser.add_argument("--capital", type=float, default=1000000)
+    parser.add_argument("--max-positions", type=int, default=10)
+    parser.add_argument("--max-per-sector", type=int)
+    parser.add_argument("--position-pct", type=float)
+    parser.add_argument("--fee-pct", type=float, default=0.0)
+    parser.add_argument("--cooldown", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--trades", help="write the taken trades to this CSV")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    params = {}
+    for item in args.param or ():
+        name, _, value = item.partition("=")
+        params[name] = _number(value)
+    universe = load_universe(args.root or PORTFOLIO_ROOTS)
+    result = run_portfolio(
+        args.strategy,
+        params,
+        universe,
+        initial_capital=args.capital,
+        max_positions=args.max_positions,
+        max_per_sector=args.max_per_sector,
+        position_pct=args.position_pct,
+        fee_pct=args.fee_pct,
+        cooldown=args.cooldown,
+        processes=args.processes,
+    )
+    summary = result.summary()
+    print("\nPortfolio:")
+    for name, value in summary["portfolio"].items():
+        print(f"  {name:>18}: {value:.4f}" if isinstance(value, float) else f"  {name:>18}: {value}")
+    print("\nSectors:")
+    print(pd.DataFrame(summary["sectors"]).T.to_string(float_format=lambda v: f"{v:.2f}"))
+    if args.trades:
+        pd.DataFrame(result.records()).to_csv(args.trades, index=False)
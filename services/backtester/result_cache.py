@@ -0,0 +1,355 @@
+# services/backtester/result_cache.py
+#
+# Content-addressed cache for backtest results and intermediate arrays.
+#
+# A key is the hash of everything a result depends on: a fingerprint of the
+# input data (file checksums, array contents or tick-archive ranges), the
+# version of the backtest code (a hash of its source files) and the
+# parameters. Change any of them and the key changes, so entries never go
+# stale; they only age out.
+#
+# Entries live under BACKTEST_CACHE_DIR, one file each: a JSON header with
+# the metadata and array layout, then the raw array bytes, read back with
+# np.frombuffer (no pickle). A hit touches the file's mtime; when the
+# directory grows past BACKTEST_CACHE_MAX_BYTES the least recently used
+# files are removed. Recently used entries are also kept decoded in memory.
+#
+#     python -m services.backtester.result_cache stats
+#     python -m services.backtester.result_cache clear
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger("result_cache")
+
+CACHE_DIR = os.getenv("BACKTEST_CACHE_DIR", "data/backtest_cache")
+CACHE_MAX_BYTES = int(os.getenv("BACKTEST_CACHE_MAX_BYTES", str(1 << 30)))
+MEMORY_ITEMS = int(os.getenv("BACKTEST_CACHE_MEMORY_ITEMS", "512"))
+
+# Modules whose source is part of every key by default
+BACKTEST_MODULES = (
+    "services.backtester.vectorized",
+    "services.backtester.strategies",
+    "services.backtester.sweep",
+    "strategies.indicators",
+    "strategies.fibonacci_levels",
+)
+
+HEADER = struct.Struct("<Q")
+
+
+# --- fingerprints -----------------------------------------------------------------
+
+_file_hashes = {}  # path -> ((size, mtime_ns), digest)
+_code_versions = {}
+
+
+def _digest(*parts) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def file_fingerprint(*paths) -> str:
+    """Checksum of the files' contents; unchanged files are not re-read."""
+    digests = []
+    for path in sorted(str(p) for p in paths):
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        cached = _file_hashes.get(path)
+        if cached is None or cached[0] != signature:
+            with open(path, "rb") as f:
+                cached = (signature, hashlib.sha256(f.read()).hexdigest())
+            _file_hashes[path] = cached
+        digests.append(cached[1])
+    return _digest(*digests)
+
+
+def array_fingerprint(arrays) -> str:
+    """Checksum of an array, a {name: array} dict or a nested dict of them."""
+    h = hashlib.sha256()
+
+    def feed(value):
+        if isinstance(value, dict):
+            for name in sorted(value, key=str):
+                h.update(str(name).encode() + b"\0")
+                feed(value[name])
+        else:
+            value = np.ascontiguousarray(value)
+            h.update(f"{value.dtype.str}{value.shape}".encode())
+            h.update(value.reshape(-1).view(np.uint8).data)
+
+    feed(arrays)
+    return h.hexdigest()
+
+
+def tick_fingerprint(instrument_key, start, end, archive=None) -> str:
+    """Fingerprint of the ticks ``archive.get_ticks`` would return for a range.
+
+    Compacted days are identified by the instrument's archive metadata
+    (chunk ranges and sizes); days still in the journal by the names, sizes
+    and mtimes of their files, which only grow.
+    """
+    from services.market_data.tick_archive import _days, _to_ms, tick_archive
+
+    archive = archive or tick_archive
+    start_ms, end_ms = _to_ms(start), _to_ms(end)
+    parts = [instrument_key, start_ms, end_ms]
+    for day in _days(start_ms, end_ms):
+        if archive.has_day(day):
+            name = archive._index(day).get(instrument_key)
+            meta = archive.root / day / name / "meta.json" if name else None
+            parts.append(f"{day}:archive:" + (meta.read_text() if meta else "-"))
+        else:
+            day_dir = Path(archive.journal_root) / day
+            files = sorted(day_dir.iterdir()) if day_dir.exists() else []
+            stats = [(f.name, f.stat().st_size, f.stat().st_mtime_ns) for f in files]
+            parts.append(f"{day}:journal:{stats}")
+    return _digest(*parts)
+
+
+def code_version(modules=BACKTEST_MODULES) -> str:
+    """Hash of the modules' source files, computed once per process."""
+    modules = tuple(modules)
+    version = _code_versions.get(modules)
+    if version is None:
+        sources = []
+        for name in modules:
+            origin = importlib.util.find_spec(name).origin
+            with open(origin, "rb") as f:
+                sources.append(f.read())
+        version = _code_versions[modules] = _digest(*sources)
+    return version
+
+
+# --- cache ------------------------------------------------------------------------
+
+
+class ResultCache:
+    """Disk cache of (metadata dict, {name: array}) entries with LRU eviction."""
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, memory_items=MEMORY_ITEMS):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.memory = OrderedDict()  # key -> (meta, arrays)
+        self.lock = threading.Lock()
+        self.size = None  # bytes on disk, scanned on first write
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Key for JSON-able parts (parameters, fingerprints, names)."""
+        return _digest(json.dumps(parts, sort_keys=True, default=str))
+
+    def _path(self, key):
+        return self.root / key[:2] / key
+
+    def _remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        """(meta, arrays) or None. Arrays are read-only views of the entry."""
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+        path = self._path(key)
+        if entry is not None:
+            try:
+                os.utime(path)  # keep it recent for eviction
+            except FileNotFoundError:
+                pass
+            return entry
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return None
+        (length,) = HEADER.unpack_from(data)
+        header = json.loads(data[HEADER.size : HEADER.size + length])
+        body = memoryview(data)[HEADER.size + length :]
+        arrays = {}
+        for name, (dtype, shape, offset) in header["arrays"].items():
+            count = int(np.prod(shape)) if shape else 1
+            arrays[name] = np.frombuffer(body, dtype=dtype, count=count, offset=offset).reshape(shape)
+        entry = (header["meta"], arrays)
+        with self.lock:
+            self._remember(key, entry)
+            self.hits += 1
+        return entry
+
+    def put(self, key, meta=None, arrays=None):
+        """Store an entry; ``meta`` must be JSON-able."""
+        # Copied, so the caller changing its arrays can't reach the memory layer
+        arrays = {name: np.array(values, order="C") for name, values in (arrays or {}).items()}
+        layout, offset = {}, 0
+        for name, values in arrays.items():
+            layout[name] = (values.dtype.str, list(values.shape), offset)
+            offset += -(-values.nbytes // 8) * 8  # keep every array 8-byte aligned
+        header = json.dumps({"meta": meta or {}, "arrays": layout}).encode()
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(len(header)))
+            f.write(header)
+            for values in arrays.values():
+                f.write(values.tobytes())
+                f.write(b"\0" * (-values.nbytes % 8))
+            written = f.tell()
+        os.replace(tmp, path)
+
+        readonly = {}
+        for name, values in arrays.items():
+            view = values.view()
+            view.flags.writeable = False
+            readonly[name] = view
+        with self.lock:
+            self._remember(key, (meta or {}, readonly))
+            if self.size is not None:
+                self.size += written
+        if self._disk_size() > self.max_bytes:
+            self.evict()
+
+    def get_or_compute(self, key, compute):
+        """Cached entry for ``key``, or ``compute()`` -> (meta, arrays) stored first."""
+        entry = self.get(key)
+        if entry is None:
+            meta, arrays = compute()
+            self.put(key, meta, arrays)
+            entry = self.get(key)
+        return entry
+
+    def _files(self):
+        if not self.root.exists():
+            return []
+        return [
+            entry
+            for directory in os.scandir(self.root)
+            if directory.is_dir()
+            for entry in os.scandir(directory.path)
+            if not entry.name.endswith(".tmp")
+        ]
+
+    def _disk_size(self):
+        if self.size is None:
+            self.size = sum(entry.stat().st_size for entry in self._files())
+        return self.size
+
+    def evict(self, max_bytes=None):
+        """Remove least recently used entries until the cache fits ``max_bytes``."""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        files = sorted(self._files(), key=lambda entry: entry.stat().st_mtime_ns)
+        total = sum(entry.stat().st_size for entry in files)
+        removed = 0
+        for entry in files:
+            if total <= limit:
+                break
+            total -= entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+            with self.lock:
+                self.memory.pop(entry.name, None)
+            removed += 1
+        self.size = total
+        if removed:
+            logger.info(f"🧹 Evicted {removed} backtest cache entries")
+        return removed
+
+    def clear(self):
+        self.evict(0)
+        with self.lock:
+            self.memory.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self._files()),
+            "bytes": self._disk_size(),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+result_cache = ResultCache()
+
+
+# --- backtest results -------------------------------------------------------------
+
+
+def result_arrays(result) -> dict:
+    """A vectorized.BacktestResult as cacheable arrays."""
+    return {
+        "entry_index": result.entry_index,
+        "exit_index": result.exit_index,
+        "reason": result.reason,
+        "entry_price": result.entry_price,
+        "exit_price": result.exit_price,
+        "quantity": np.asarray(result.quantity, dtype=np.float64),
+        "pnl": result.pnl,
+        "equity": result.equity,
+        "initial_capital": np.float64(result.initial_capital),
+    }
+
+
+def result_from_arrays(arrays):
+    from services.backtester.vectorized import BacktestResult
+
+    return BacktestResult(**arrays)
+
+
+def cached_backtest(path, strategy, params: dict, cache=None):
+    """Single-symbol sweep strategy backtest of the CSV at ``path``:
+    (sweep metrics, BacktestResult), from the cache when the file, the
+    backtest code and the parameters are unchanged."""
+    from services.backtester.strategies import load_price_csv
+    from services.backtester.sweep import STRATEGIES, metrics, trade_returns
+
+    cache = cache or result_cache
+    key = cache.key("backtest", file_fingerprint(path), code_version(), strategy, params)
+
+    def compute():
+        df = load_price_csv(path).dropna()
+        columns = {name: df[name.capitalize()].to_numpy() for name in ("close", "high", "low")}
+        result = STRATEGIES[strategy](columns, **params)
+        return metrics(trade_returns(result), 1), result_arrays(result)
+
+    summary, arrays = cache.get_or_compute(key, compute)
+    return summary, result_from_arrays(arrays)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest result cache")
+    parser.add_argument("command", choices=["stats", "clear", "evict"])
+    parser.add_argument("--max-bytes", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "clear":
+        result_cache.clear()
+    elif args.command == "evict":
+        result_cache.evict(args.max_bytes)
+    print(json.dumps(result_cache.stats(), indent=2))
@@ -0,0 +1,240 @@
+# services/backtester/strategies.py
+#
+# The repo's backtest scripts expressed as signals for the vectorized core.
+# Each function returns what the script it replaces computed with its
+# per-row loop.
+
+import numpy as np
+import pandas as pd
+
+from services.backtester import vectorized
+from strategies.fibonacci_levels import rolling_max, rolling_min
+from strategies.indicators import ema
+
+
+def load_price_csv(path) -> pd.DataFrame:
+    """OHLCV CSV from data/processed or data/sectoral, indexed by Date.
+
+    Handles both the plain ``Date,Close,...`` header and the three-line
+    header yfinance writes (``Price,...`` / ``Ticker,...`` / ``Date,...``).
+    """
+    with open(path, encoding="utf-8") as f:
+        first = f.readline()
+    if first.startswith("Price"):
+        df = pd.read_csv(path, skiprows=[1, 2]).rename(columns={"Price": "Date"})
+    else:
+        df = pd.read_csv(path)
+    df["Date"] = pd.to_datetime(df["Date"])
+    return df.set_index("Date").astype("float64")
+
+
+def breakout_entries(price, lookback):
+    """Closes above the previous bar's 50% level of the rolling range.
+
+    Returns (entries, rolling high, rolling low).
+    """
+    n = len(price)
+    high = rolling_max(price, lookback)
+    low = rolling_min(price, lookback)
+    fib_50 = low + (high - low) * 0.5
+    entries = np.zeros(n, dtype=bool)
+    if n > lookback:
+        entries[lookback:] = price[lookback:] > fib_50[lookback - 1 : -1]
+    return entries, high, low
+
+
+def retracement_entries(underlying, fib_lookback=50, zone=5, hold_candles=6):
+    """Underlying within ``zone`` of the 0.618 retracement of the previous
+    ``fib_lookback`` candles, in an uptrend (price > SMA21 > SMA55)."""
+    n = len(underlying)
+    series = pd.Series(underlying)
+    ema21 = series.rolling(window=21).mean().to_numpy()
+    ema55 = series.rolling(window=55).mean().to_numpy()
+
+    # Swing high/low of the candles before each row
+    recent_high = np.full(n, np.nan)
+    recent_low = np.full(n, np.nan)
+    recent_high[1:] = rolling_max(underlying, fib_lookback)[:-1]
+    recent_low[1:] = rolling_min(underlying, fib_lookback)[:-1]
+    entry_zone = recent_high - 0.618 * (recent_high - recent_low)
+
+    entries = (
+        (underlying <= entry_zone + zone)
+        & (underlying >= entry_zone - zone)
+        & (underlying > ema21)
+        & (ema21 > ema55)
+    )
+    entries[:fib_lookback] = False
+    entries[max(n - hold_candles, 0) :] = False
+    return entries
+
+
+def crossovers(close, short_period=9, long_period=21):
+    """(up, down) crosses of the short EMA over the long one; also returns both EMAs."""
+    short = ema(close, short_period)
+    long = ema(close, long_period)
+    up = np.zeros(len(close), dtype=bool)
+    down = np.zeros(len(close), dtype=bool)
+    up[1:] = (short[1:] > long[1:]) & (short[:-1] <= long[:-1])
+    down[1:] = (short[1:] < long[1:]) & (short[:-1] >= long[:-1])
+    return up, down, short, long
+
+
+def fibonacci_breakout(prices: pd.Series, lookback=20, stop_loss_pct=0.02, target_pct=0.05):
+    """Signals frame of tests/backtest2.py::fibonacci_strategy.
+
+    Long when the price closes above the previous bar's 50% level, out on
+    a close at or through the stop or target set at entry; one position at
+    a time and one flat bar after each exit.
+    """
+    price = prices.to_numpy(dtype=np.float64)
+    n = len(price)
+    entries, high, low = breakout_entries(price, lookback)
+    result = vectorized.run(
+        price,
+        entries,
+        stop_pct=stop_loss_pct,
+        target_pct=target_pct,
+        cooldown=1,
+        fill_at_level=False,
+    )
+
+    # +1 at entry, -1 at exit; cumsum gives 1 while held, then mark exits -1
+    held = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(held, result.entry_index, 1)
+    np.add.at(held, result.exit_index[result.closed], -1)
+    signal = np.cumsum(held[:n])
+    signal[result.exit_index[result.closed]] = -1
+
+    stop_loss = np.full(n, np.nan)
+    target = np.full(n, np.nan)
+    stop_loss[result.entry_index] = price[result.entry_index] * (1 - stop_loss_pct)
+    target[result.entry_index] = price[result.entry_index] * (1 + target_pct)
+
+    positions = np.full(n, np.nan)
+    positions[1:] = np.diff(signal)
+
+    return pd.DataFrame(
+        {
+            "price": price,
+            "high": high,
+            "low": low,
+            "fib_382": low + (high - low) * 0.382,
+            "fib_50": low + (high - low) * 0.5,
+            "fib_618": low + (high - low) * 0.618,
+            "signal": signal,
+            "stop_loss": stop_loss,
+            "target": target,
+            "positions": positions,
+        },
+        index=prices.index,
+    )
+
+
+def fibonacci_option_trades(
+    df: pd.DataFrame,
+    fib_lookback=50,
+    stop_loss_pct=0.15,
+    target_pct=0.25,
+    hold_candles=6,
+    lot_size=50,
+    position_size=1,
+    initial_capital=1000000,
+    zone=5,
+):
+    """Trades of tests/fibonacci_backtest.py.
+
+    ``df`` has the underlying in ``UnderlyingPrice`` and the option premium
+    in Close/High/Low. Entries: underlying within ``zone`` of the 0.618
+    retracement of the previous ``fib_lookback`` candles, in an uptrend
+    (price > SMA21 > SMA55). Trades may overlap.
+    Returns (trades, capital, wins, losses).
+    """
+    underlying = df["UnderlyingPrice"].to_numpy(dtype=np.float64)
+    entries = retracement_entries(underlying, fib_lookback, zone, hold_candles)
+
+    quantity = lot_size * position_size
+    result = vectorized.run(
+        df["Close"].to_numpy(dtype=np.float64),
+        entries,
+        low=df["Low"].to_numpy(dtype=np.float64),
+        high=df["High"].to_numpy(dtype=np.float64),
+        stop_pct=stop_loss_pct,
+        target_pct=target_pct,
+        hold_bars=hold_candles,
+        quantity=quantity,
+        overlap=True,
+    )
+
+    reason = result.reason
+    win = (reason == vectorized.EXIT_TARGET) | ((reason == vectorized.EXIT_TIME) & (result.pnl > 0))
+    capital = np.cumsum(np.concatenate([[float(initial_capital)], result.pnl]))[1:]
+    candle = result.exit_index - result.entry_index
+    stop_loss = result.entry_price * (1 - stop_loss_pct)
+    target = result.entry_price * (1 + target_pct)
+
+    trades = []
+    for i, entry in enumerate(result.entry_index.tolist()):
+        if reason[i] == vectorized.EXIT_STOP:
+            outcome = f"SL Hit (Candle {candle[i]})"
+        elif reason[i] == vectorized.EXIT_TARGET:
+            outcome = f"Target Hit (Candle {candle[i]})"
+        else:
+            outcome = "Exit Green (No Hit)" if win[i] else "Exit Red (No Hit)"
+        trades.append({
+            "Timestamp": df["Timestamp"].iloc[entry] if "Timestamp" in df else df.index[entry],
+            "Underlying": round(underlying[entry], 2),
+            "Buy Premium": round(result.entry_price[i], 2),
+            "Target": round(target[i], 2),
+            "Stop Loss": round(stop_loss[i], 2),
+            "Outcome": outcome,
+            "Capital After Trade": round(capital[i], 2),
+        })
+
+    final_capital = capital[-1] if len(capital) else float(initial_capital)
+    wins = int(win.sum())
+    return trades, final_capital, wins, len(trades) - wins
+
+
+def ema_crossover(df: pd.DataFrame, short_period=9, long_period=21):
+    """Trades of strategies/strategy.run_ema_strategy.
+
+    Buys on every upward cross of the short EMA over the long one and sells
+    on a downward cross while holding; a second upward cross before the
+    sell moves the entry price to it.
+    """
+    close = df["close"].to_numpy(dtype=np.float64)
+    up, down, short, long = crossovers(close, short_period, long_period)
+    df["EMA_Short"] = short
+    df["EMA_Long"] = long
+
+    result = vectorized.run(close, up, exits=down)
+    ups = np.flatnonzero(up)
+    closed = result.closed
+    sells = result.exit_index[closed]
+    buys_at_sell = ups[np.searchsorted(ups, sells) - 1]
+
+    timestamps = df["timestamp"]
+    events = [
+        (i, 0, {"type": "BUY", "price": close[i], "timestamp": timestamp})
+        for i, timestamp in zip(ups.tolist(), timestamps.iloc[ups].tolist())
+    ]
+    events += [
+        (
+            i,
+            1,
+            {
+                "type": "SELL",
+                "price": close[i],
+                "timestamp": timestamp,
+                "pnl": close[i] - close[entry],
+            },
+        )
+        for i, entry, timestamp in zip(
+            sells.tolist(), buys_at_sell.tolist(), timestamps.iloc[sells].tolist()
+        )
+    ]
+    trades = [event for _, _, event in sorted(events, key=lambda e: (e[0], e[1]))]
+
+    total_pnl = sum([t.get("pnl", 0) for t in trades if t["type"] == "SELL"])
+    return trades, {"total_pnl": total_pnl, "total_trades": len(trades)}
@@ -0,0 +1,589 @@
+# services/backtester/sweep.py
+#
+# Parameter sweeps over the vectorized backtests, spread across a process
+# pool. Prices are copied once into a multiprocessing.shared_memory block;
+# workers map NumPy views onto it instead of receiving pickled arrays, so
+# a task is just a strategy name and a batch of parameter sets. Entry/exit
+# signals are computed once per distinct feature key, by the workers (a
+# task per feature key and symbol chunk), and shared the same way.
+#
+#     python -m services.backtester.sweep fibonacci_breakout \
+#         --grid lookback=10,20,30,50 --grid stop_loss_pct=0.01,0.02,0.03 \
+#         --grid target_pct=0.03,0.05,0.08 --processes 32
+#
+#     python -m services.backtester.sweep ema_crossover --random 500 \
+#         --space short_period=3:20 --space long_period=15:80
+
+import argparse
+import glob
+import itertools
+import logging
+import multiprocessing
+import os
+import random
+import time
+from bisect import insort
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+
+import numpy as np
+
+from services.backtester import vectorized
+from services.backtester.result_cache import array_fingerprint, code_version, result_cache
+from services.backtester.strategies import (
+    breakout_entries,
+    crossovers,
+    load_price_csv,
+    retracement_entries,
+)
+
+logger = logging.getLogger("backtest_sweep")
+
+PRICE_FILES = os.getenv("BACKTEST_PRICE_FILES", "data/processed/*/*.csv")
+PRICE_COLUMNS = ("close", "high", "low")
+
+
+# --- strategies -------------------------------------------------------------
+# A strategy runs in two steps. ``features`` turns one symbol's prices and
+# the parameters named in ``feature_params`` into signal arrays; they only
+# look backwards, so they can be computed once over the full history and
+# sliced for any window. ``trade`` runs the backtest from them with the
+# remaining parameters (``overlap=True`` resolves every entry signal, for
+# callers that take positions themselves). Invalid combinations raise
+# ValueError and are skipped.
+
+
+class Strategy:
+    def __init__(self, features, trade, feature_params):
+        self.features = features
+        self.trade = trade
+        self.feature_params = tuple(feature_params)
+
+    def split(self, params):
+        """(feature key, trade params); the key is hashable and picklable."""
+        key = tuple(sorted((k, v) for k, v in params.items() if k in self.feature_params))
+        rest = {k: v for k, v in params.items() if k not in self.feature_params}
+        return key, rest
+
+    def __call__(self, prices, **params):
+        key, rest = self.split(params)
+        return self.trade(prices, self.features(prices, **dict(key)), **rest)
+
+
+def _breakout_features(prices, lookback=20):
+    entries, _, _ = breakout_entries(prices["close"], int(lookback))
+    return {"entries": entries}
+
+
+def _breakout_trade(prices, features, stop_loss_pct=0.02, target_pct=0.05, overlap=False):
+    return vectorized.run(
+        prices["close"],
+        features["entries"],
+        stop_pct=stop_loss_pct,
+        target_pct=target_pct,
+        overlap=overlap,
+        cooldown=1,
+        fill_at_level=False,
+    )
+
+
+def _retracement_features(prices, fib_lookback=50, zone=5):
+    return {"entries": retracement_entries(prices["close"], int(fib_lookback), zone, 0)}
+
+
+def _retracement_trade(
+    prices, features, stop_loss_pct=0.15, target_pct=0.25, hold_candles=6, overlap=True
+):
+    entries = features["entries"].copy()
+    entries[max(len(entries) - int(hold_candles), 0) :] = False
+    return vectorized.run(
+        prices["close"],
+        entries,
+        low=prices["low"],
+        high=prices["high"],
+        stop_pct=stop_loss_pct,
+        target_pct=target_pct,
+        hold_bars=int(hold_candles),
+        overlap=overlap,
+    )
+
+
+def _crossover_features(prices, short_period=9, long_period=21):
+    if short_period >= long_period:
+        raise ValueError("short_period must be below long_period")
+    up, down, _, _ = crossovers(prices["close"], short_period, long_period)
+    return {"entries": up, "exits": down}
+
+
+def _crossover_trade(prices, features, stop_loss_pct=None, target_pct=None, overlap=False):
+    return vectorized.run(
+        prices["close"],
+        features["entries"],
+        exits=features["exits"],
+        low=prices["low"],
+        high=prices["high"],
+        stop_pct=stop_loss_pct,
+        target_pct=target_pct,
+        overlap=overlap,
+    )
+
+
+fibonacci_breakout = Strategy(_breakout_features, _breakout_trade, ["lookback"])
+fibonacci_retracement = Strategy(
+    _retracement_features, _retracement_trade, ["fib_lookback", "zone"]
+)
+ema_crossover = Strategy(_crossover_features, _crossover_trade, ["short_period", "long_period"])
+
+STRATEGIES = {
+    "fibonacci_breakout": fibonacci_breakout,
+    "fibonacci_retracement": fibonacci_retracement,
+    "ema_crossover": ema_crossover,
+}
+
+
+def precompute(strategy, prices: dict, param_sets, cache=None, pool=None, processes=1) -> dict:
+    """{(symbol, feature key): {name: array}} for every feature key used in
+    ``param_sets``, over each symbol's full history. Keys the strategy
+    rejects are left out. With a ResultCache, signals are stored per
+    (symbol data, strategy, feature key) and reused across runs. With a
+    ``pool`` of :func:`_init_worker` workers (``processes`` of them), the
+    signals not in the cache are computed there, split by feature key and
+    symbol chunk."""
+    run = STRATEGIES[strategy]
+    keys = list(dict.fromkeys(run.split(params)[0] for params in param_sets))
+    fingerprints, version = {}, None
+    if cache is not None:
+        fingerprints = {symbol: array_fingerprint(columns) for symbol, columns in prices.items()}
+        version = code_version()
+
+    def entry_key(symbol, key):
+        return cache.key("features", strategy, key, fingerprints[symbol], version)
+
+    features, missing = {}, {}  # missing: feature key -> [symbol]
+    for key in keys:
+        for symbol in prices:
+            entry = cache.get(entry_key(symbol, key)) if cache is not None else None
+            if entry is None:
+                missing.setdefault(key, []).append(symbol)
+            else:
+                features[(symbol, key)] = entry[1]
+
+    if pool is None:
+        results = [(key, _features(strategy, prices, key, symbols)) for key, symbols in missing.items()]
+    else:
+        chunks = max(1, -(-processes * 2 // max(len(missing), 1)))
+        futures = []
+        for key, symbols in missing.items():
+            size = -(-len(symbols) // chunks)
+            for i in range(0, len(symbols), size):
+                futures.append((key, pool.submit(_features_batch, strategy, key, symbols[i : i + size])))
+        results = [(key, future.result()) for key, future in futures]
+
+    rejected = set()
+    for key, computed in results:
+        if computed is None:
+            rejected.add(key)
+            continue
+        for symbol, arrays in computed.items():
+            features[(symbol, key)] = arrays
+            if cache is not None:
+                cache.put(entry_key(symbol, key), {}, arrays)
+    return {pair: arrays for pair, arrays in features.items() if pair[1] not in rejected}
+
+
+def _features(strategy, prices, key, symbols):
+    """{symbol: signals} for one feature key, or None if the strategy rejects it."""
+    run = STRATEGIES[strategy]
+    try:
+        return {symbol: run.features(prices[symbol], **dict(key)) for symbol in symbols}
+    except ValueError:
+        return None
+
+
+# --- metrics --------------------------------------------------------------
+
+
+def trade_returns(result, include_open=False) -> np.ndarray:
+    """Per-trade returns relative to the entry price, so symbols at different
+    price levels weigh the same. Open trades count marked to the last close
+    with ``include_open``."""
+    taken = slice(None) if include_open else result.closed
+    return result.pnl[taken] / (result.entry_price[taken] * result.quantity)
+
+
+def metrics(returns, symbols) -> dict:
+    """Summary of pooled trade returns over ``symbols`` symbols."""
+    gains = returns[returns > 0].sum()
+    losses = -returns[returns < 0].sum()
+    trades = len(returns)
+    return {
+        "trades": trades,
+        "win_ratio": float((returns > 0).mean()) if trades else 0.0,
+        "avg_return": float(returns.mean()) if trades else 0.0,
+        "total_return": float(returns.sum() / max(symbols, 1)),
+        "profit_factor": float(gains / losses) if losses else float("inf") if gains else 0.0,
+        "sharpe": float(returns.mean() / returns.std() * np.sqrt(trades))
+        if trades > 1 and returns.std()
+        else 0.0,
+    }
+
+
+def evaluate(strategy, prices: dict, params: dict, features=None) -> dict:
+    """Run one parameter set over every symbol and pool the trade returns.
+
+    ``features`` is an optional :func:`precompute` result to take the
+    signals from instead of recomputing them.
+    """
+    run = STRATEGIES[strategy]
+    key, rest = run.split(params)
+    returns = []
+    for symbol, columns in prices.items():
+        if features is None:
+            result = run(columns, **params)
+        elif (symbol, key) in features:
+            result = run.trade(columns, features[(symbol, key)], **rest)
+        else:
+            raise ValueError(f"No features for {key}")
+        returns.append(trade_returns(result))
+    returns = np.concatenate(returns) if returns else np.empty(0)
+    return metrics(returns, len(prices))
+
+
+# --- parameter spaces -------------------------------------------------------
+
+
+def grid(space: dict):
+    """Every combination of the listed values: {"lookback": [10, 20], ...}."""
+    names = list(space)
+    for values in itertools.product(*(space[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def random_search(space: dict, samples: int, seed=None):
+    """``samples`` random parameter sets.
+
+    A list gives choices; a (low, high) tuple a range, integer if both ends
+    are ints (inclusive), uniform float otherwise.
+    """
+    rng = random.Random(seed)
+    for _ in range(samples):
+        params = {}
+        for name, spec in space.items():
+            if isinstance(spec, tuple):
+                low, high = spec
+                if isinstance(low, int) and isinstance(high, int):
+                    params[name] = rng.randint(low, high)
+                else:
+                    params[name] = rng.uniform(low, high)
+            else:
+                params[name] = rng.choice(list(spec))
+        yield params
+
+
+# --- shared prices ------------------------------------------------------------
+
+
+class SharedPrices:
+    """{key: {column: array}} packed into one shared memory block.
+
+    Used for prices ({symbol: {column: ...}}) and precomputed features
+    ({(symbol, feature key): {name: ...}}); arrays keep their dtype.
+    """
+
+    def __init__(self, prices: dict):
+        layout, offset = {}, 0
+        for symbol, columns in prices.items():
+            layout[symbol] = {}
+            for column, values in columns.items():
+                values = np.asarray(values)
+                layout[symbol][column] = (offset, len(values), values.dtype.str)
+                offset += -(-values.nbytes // 8) * 8  # keep every array 8-byte aligned
+        self.shm = SharedMemory(create=True, size=max(offset, 1))
+        self.spec = (self.shm.name, layout)
+        views = self._views(self.shm, layout, writeable=True)
+        for symbol, columns in prices.items():
+            for column, values in columns.items():
+                views[symbol][column][:] = values
+        del views
+
+    @staticmethod
+    def attach(spec):
+        """(SharedMemory, {key: {column: view}}) from another process; keep the
+        SharedMemory referenced for as long as the views are used."""
+        name, layout = spec
+        shm = SharedMemory(name=name)
+        return shm, SharedPrices._views(shm, layout)
+
+    @staticmethod
+    def _views(shm, layout, writeable=False):
+        views = {}
+        for symbol, columns in layout.items():
+            views[symbol] = {}
+            for column, (offset, length, dtype) in columns.items():
+                view = np.ndarray((length,), dtype=dtype, buffer=shm.buf, offset=offset)
+                view.flags.writeable = writeable
+                views[symbol][column] = view
+        return views
+
+    def arrays(self):
+        return self._views(self.shm, self.spec[1])
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_prices(pattern=PRICE_FILES, columns=PRICE_COLUMNS) -> dict:
+    """{symbol: {column: array}} from the CSVs matching ``pattern``, plus the
+    bar dates as datetime64[ns] under "date"."""
+    prices = {}
+    for path in sorted(glob.glob(pattern)):
+        symbol = Path(path).stem.replace("_historical", "")
+        df = load_price_csv(path).dropna()
+        prices[symbol] = {column: df[column.capitalize()].to_numpy() for column in columns}
+        prices[symbol]["date"] = df.index.to_numpy().astype("datetime64[ns]")
+    return prices
+
+
+# --- runner ---------------------------------------------------------------------
+
+_worker = {}
+
+
+def _init_worker(spec, features_spec=None):
+    _worker["shm"], _worker["prices"] = SharedPrices.attach(spec)
+    if features_spec is not None:
+        _attach_features(features_spec)
+
+
+def _attach_features(spec):
+    """The worker's features: those of ``spec`` once they have been published
+    (attached on first use), else whatever ``_worker`` already holds."""
+    if spec is not None and _worker.get("features_name") != spec[0]:
+        _worker["features_shm"], _worker["features"] = SharedPrices.attach(spec)
+        _worker["features_name"] = spec[0]
+    return _worker.get("features")
+
+
+def _features_batch(strategy, key, symbols):
+    return _features(strategy, _worker["prices"], key, symbols)
+
+
+def _run_batch(strategy, batch, features_spec=None):
+    features = _attach_features(features_spec)
+    rows = []
+    for params in batch:
+        try:
+            metrics = evaluate(strategy, _worker["prices"], params, features)
+            rows.append((params, metrics))
+        except ValueError:
+            rows.append((params, None))
+    return rows
+
+
+class RankedTable:
+    """Sweep results kept sorted by one metric, best first, as they arrive."""
+
+    def __init__(self, sort_by="total_return"):
+        self.sort_by = sort_by
+        self.rows = []  # (-score, seq, params, metrics)
+        self.skipped = 0
+        self.seq = itertools.count()
+
+    def add(self, params, metrics):
+        if metrics is None:
+            self.skipped += 1
+            return
+        score = metrics[self.sort_by]
+        insort(self.rows, (-score, next(self.seq), params, metrics))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def best(self):
+        """(params, metrics) of the leader, or None while empty."""
+        if not self.rows:
+            return None
+        _, _, params, metrics = self.rows[0]
+        return params, metrics
+
+    def top(self, n=10):
+        return [{**params, **metrics} for _, _, params, metrics in self.rows[:n]]
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame(self.top(len(self.rows)))
+
+    def format(self, n=10):
+        rows = self.top(n)
+        if not rows:
+            return "(no results)"
+        names = list(rows[0])
+        cells = [[_cell(row[name]) for name in names] for row in rows]
+        widths = [max(len(name), *(len(c[i]) for c in cells)) for i, name in enumerate(names)]
+        lines = ["  ".join(name.rjust(w) for name, w in zip(names, widths))]
+        lines += ["  ".join(c.rjust(w) for c, w in zip(cell, widths)) for cell in cells]
+        return "\n".join(lines)
+
+
+def _cell(value):
+    if isinstance(value, float):
+        return f"{value:.4f}"
+    return str(value)
+
+
+def run_sweep(
+    strategy,
+    param_sets,
+    prices: dict,
+    processes=None,
+    sort_by="total_return",
+    batch_size=None,
+    on_result=None,
+    start_method=None,
+    cache=None,
+):
+    """Evaluate every parameter set; returns a RankedTable.
+
+    ``processes=0`` runs in this process. ``on_result(table)`` is called
+    after each finished batch, so callers can show the table as it fills.
+    ``start_method`` ("fork", "spawn", ...) defaults to the platform's.
+    Signals are computed once per feature key (see :class:`Strategy`) and
+    shared with the workers alongside the prices. With a ResultCache
+    (see result_cache), parameter sets already run on the same prices and
+    code are not evaluated again.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    param_sets = list(param_sets)
+    table = RankedTable(sort_by)
+
+    def record(params, metrics, store=True):
+        table.add(params, metrics)
+        if cache is not None and store:
+            cache.put(cache.key("sweep", strategy, params, data, version), {"metrics": metrics})
+
+    if cache is not None:
+        data, version = array_fingerprint(prices), code_version()
+        pending = []
+        for params in param_sets:
+            entry = cache.get(cache.key("sweep", strategy, params, data, version))
+            if entry is None:
+                pending.append(params)
+            else:
+                record(params, entry[0]["metrics"], store=False)
+        if len(pending) < len(param_sets):
+            logger.info(f"♻️ {len(param_sets) - len(pending)} parameter sets from the cache")
+        param_sets = pending
+        if on_result and len(table):
+            on_result(table)
+    if not param_sets:
+        return table
+
+    processes = os.cpu_count() if processes is None else processes
+    batch_size = batch_size or max(1, len(param_sets) // (max(processes, 1) * 8))
+    batches = [param_sets[i : i + batch_size] for i in range(0, len(param_sets), batch_size)]
+    if processes == 0:
+        _worker["prices"] = prices
+        _worker["features"] = precompute(strategy, prices, param_sets, cache)
+        try:
+            for batch in batches:
+                for params, metrics in _run_batch(strategy, batch):
+                    record(params, metrics)
+                if on_result:
+                    on_result(table)
+        finally:
+            _worker.clear()
+        return table
+
+    with SharedPrices(prices) as shared:
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker,
+            initargs=(shared.spec,),
+        ) as pool:
+            # Signals are computed by the workers too, then published to all of them
+            features = precompute(strategy, prices, param_sets, cache, pool, processes)
+            with SharedPrices(features) as shared_features:
+                futures = [pool.submit(_run_batch, strategy, batch, shared_features.spec) for batch in batches]
+                for future in as_completed(futures):
+                    for params, metrics in future.result():
+                        record(params, metrics)
+                    if on_result:
+                        on_result(table)
+    return table
+
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _parse_space(items, ranges):
+    space = {}
+    for item in items or ():
+        name, _, values = item.partition("=")
+        if ranges and ":" in values:
+            low, high = values.split(":")
+            space[name] = (_number(low), _number(high))
+        else:
+            space[name] = [_number(v) for v in values.split(",")]
+    return space
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel backtest parameter sweep")
+    parser.add_argument("strategy", choices=sorted(STRATEGIES))
+    parser.add_argument("--files", default=PRICE_FILES, help="glob of price CSVs")
+    parser.add_argument("--grid", action="append", help="name=v1,v2,... (all combinations)")
+    parser.add_argument("--space", action="append", help="name=low:high or name=v1,v2 (random)")
+    parser.add_argument("--random", type=int, help="random samples from --space")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--sort-by", default="total_return")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", help="write the full ranked table to this CSV")
+    parser.add_argument("--no-cache", action="store_true", help="ignore the result cache")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.random:
+        param_sets = list(random_search(_parse_space(args.space, True), args.random, args.seed))
+    else:
+        param_sets = list(grid(_parse_space(args.grid, False)))
+    prices = load_prices(args.files)
+    logger.info(f"📊 {len(param_sets)} parameter sets x {len(prices)} symbols")
+
+    started = time.monotonic()
+    last_print = [0.0]
+
+    def show(table):
+        if time.monotonic() - last_print[0] >= 2:
+            last_print[0] = time.monotonic()
+            print(f"\n{len(table)}/{len(param_sets)} done\n{table.format(5)}")
+
+    table = run_sweep(
+        args.strategy,
+        param_sets,
+        prices,
+        args.processes,
+        args.sort_by,
+        on_result=show,
+        cache=None if args.no_cache else result_cache,
+    )
+    elapsed = time.monotonic() - started
+    print(f"\n✅ {len(table)} results ({table.skipped} skipped) in {elapsed:.1f}s\n")
+    print(table.format(args.top))
+    if args.out:
+        table.to_frame().to_csv(args.out, index=False)
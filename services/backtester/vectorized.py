@@ -0,0 +1,303 @@
+# services/backtester/vectorized.py
+#
+# Backtest core over NumPy arrays. Strategies hand in entry (and optionally
+# exit) signals plus stop / target / hold-bars rules; fills, exits and the
+# equity curve are resolved with array operations instead of a Python loop
+# per bar. The only Python loop is one iteration per trade when positions
+# may not overlap.
+#
+# Rules, matching the scripts this replaced:
+#   * a trade enters at the close of its entry bar and is watched from the
+#     next bar on;
+#   * on each bar the stop is checked (low <= stop) before the target
+#     (high >= target), so a bar touching both counts as a stop;
+#   * stop/target exits fill at the level (or at the close with
+#     ``fill_at_level=False``); hold-bars and exit-signal exits fill at the
+#     close of that bar;
+#   * a trade still open on the last bar stays open (reason OPEN).
+
+import numpy as np
+
+EXIT_UNRESOLVED = -1
+EXIT_OPEN = 0
+EXIT_STOP = 1
+EXIT_TARGET = 2
+EXIT_TIME = 3
+EXIT_SIGNAL = 4
+EXIT_REASONS = {
+    EXIT_OPEN: "Open",
+    EXIT_STOP: "Stop-Loss Hit",
+    EXIT_TARGET: "Target Hit",
+    EXIT_TIME: "Time Exit",
+    EXIT_SIGNAL: "Signal Exit",
+}
+
+# First forward window searched per entry; unresolved entries double it.
+FIRST_WINDOW = 64
+
+
+def _per_entry(value, count):
+    if value is None:
+        return np.full(count, np.nan)
+    return np.broadcast_to(np.asarray(value, dtype=np.float64), (count,))
+
+
+def next_true(mask) -> np.ndarray:
+    """For every bar, the index of the first True at or after it (len(mask) if none)."""
+    mask = np.asarray(mask, dtype=bool)
+    n = len(mask)
+    index = np.where(mask, np.arange(n), n)
+    return np.minimum.accumulate(index[::-1])[::-1]
+
+
+def first_touch(low, high, entries, stop=None, target=None, hold_bars=None, exit_at=None, limit=None):
+    """Exit bar and reason for each entry.
+
+    ``stop``/``target`` are price levels per entry (NaN or None: no level).
+    ``exit_at`` optionally gives, per entry, a bar at which it exits on a
+    signal unless a level is touched first. Searching is done over forward
+    windows of FIRST_WINDOW bars, doubled for the entries still unresolved,
+    so the work is about the bars each trade actually stays open. With
+    ``limit``, entries not decided within that many bars come back as
+    (-1, EXIT_UNRESOLVED).
+    """
+    low = np.asarray(low, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    entries = np.asarray(entries, dtype=np.int64)
+    n, count = len(low), len(entries)
+    stop = _per_entry(stop, count)
+    target = _per_entry(target, count)
+
+    # Last bar each entry may be watched on, and what happens if nothing hits there
+    last = np.full(count, n - 1, dtype=np.int64)
+    fallback = np.full(count, EXIT_OPEN, dtype=np.int8)
+    if hold_bars is not None:
+        timed = entries + hold_bars <= n - 1
+        last = np.where(timed, entries + hold_bars, last)
+        fallback[timed] = EXIT_TIME
+    if exit_at is not None:
+        exit_at = np.asarray(exit_at, dtype=np.int64)
+        signalled = exit_at <= last
+        last = np.where(signalled, exit_at, last)
+        fallback[signalled] = EXIT_SIGNAL
+
+    exit_index = last.copy()
+    reason = fallback.copy()
+    if limit is not None:
+        beyond = last > entries + limit
+        last = np.where(beyond, entries + limit, last)
+        exit_index[beyond] = -1
+        reason[beyond] = EXIT_UNRESOLVED
+    levels = ~(np.isnan(stop) & np.isnan(target))
+    pending = np.flatnonzero((last > entries) & levels)
+    offset, width = 1, FIRST_WINDOW
+    while len(pending):
+        bars = entries[pending, None] + np.arange(offset, offset + width)
+        inside = bars <= last[pending, None]
+        bars = np.minimum(bars, n - 1)
+        hit_stop = (low[bars] <= stop[pending, None]) & inside
+        hit_target = (high[bars] >= target[pending, None]) & inside
+        hit = hit_stop | hit_target
+        found = hit.any(axis=1)
+
+        rows = np.flatnonzero(found)
+        first = hit[rows].argmax(axis=1)
+        resolved = pending[rows]
+        exit_index[resolved] = entries[resolved] + offset + first
+        reason[resolved] = np.where(hit_stop[rows, first], EXIT_STOP, EXIT_TARGET)
+
+        pending = pending[~found]
+        offset += width
+        width *= 2
+        pending = pending[entries[pending] + offset <= last[pending]]
+    return exit_index, reason
+
+
+class BacktestResult:
+    """Trades as parallel arrays plus the per-bar equity curve."""
+
+    def __init__(
+        self, entry_index, exit_index, reason, entry_price, exit_price, quantity, pnl, equity, initial_capital=0.0
+    ):
+        self.entry_index = entry_index
+        self.exit_index = exit_index
+        self.reason = reason
+        self.entry_price = entry_price
+        self.exit_price = exit_price
+        self.quantity = quantity
+        self.pnl = pnl
+        self.equity = equity
+        self.initial_capital = float(initial_capital)
+
+    def __len__(self):
+        return len(self.entry_index)
+
+    @property
+    def closed(self):
+        return self.reason != EXIT_OPEN
+
+    def records(self, index=None):
+        """Trades as dicts; ``index`` maps bar numbers to timestamps."""
+        label = (lambda i: index[i]) if index is not None else int
+        return [
+            {
+                "entry": label(entry),
+                "exit": label(exit) if reason != EXIT_OPEN else None,
+                "entry_price": float(entry_price),
+                "exit_price": float(exit_price) if reason != EXIT_OPEN else None,
+                "quantity": float(quantity),
+                "pnl": float(pnl),
+                "outcome": EXIT_REASONS[reason],
+            }
+            for entry, exit, reason, entry_price, exit_price, quantity, pnl in zip(
+                self.entry_index.tolist(),
+                self.exit_index.tolist(),
+                self.reason.tolist(),
+                self.entry_price,
+                self.exit_price,
+                np.broadcast_to(self.quantity, self.entry_index.shape),
+                self.pnl,
+            )
+        ]
+
+    def summary(self):
+        closed = self.pnl[self.closed]
+        wins = int((closed > 0).sum())
+        running_max = np.maximum.accumulate(self.equity)
+        drawdown = self.equity - running_max
+        summary = {
+            "total_trades": int(len(closed)),
+            "wins": wins,
+            "losses": int(len(closed) - wins),
+            "win_ratio": wins / len(closed) if len(closed) else 0,
+            "total_pnl": float(closed.sum()),
+            "final_equity": float(self.equity[-1]) if len(self.equity) else 0.0,
+            "max_drawdown_abs": float(drawdown.min()) if len(drawdown) else 0.0,
+            "max_drawdown_pct": None,
+        }
+        # Without initial capital the equity is just the P&L, with no peak to
+        # take a fraction of
+        if self.initial_capital > 0:
+            summary["max_drawdown_pct"] = float((drawdown / running_max).min()) if len(drawdown) else 0.0
+        return summary
+
+
+def _chain(entries, exit_for, cooldown):
+    """Take entries one position at a time: the next entry comes after the last exit."""
+    taken, exits, reasons = [], [], []
+    i = 0
+    while i < len(entries):
+        entry = int(entries[i])
+        exit_index, reason = exit_for(entry)
+        taken.append(entry)
+        exits.append(exit_index)
+        reasons.append(reason)
+        if reason == EXIT_OPEN:
+            break
+        i = int(np.searchsorted(entries, exit_index + 1 + cooldown))
+    return (
+        np.asarray(taken, dtype=np.int64),
+        np.asarray(exits, dtype=np.int64),
+        np.asarray(reasons, dtype=np.int8),
+    )
+
+
+def run(
+    close,
+    entries,
+    exits=None,
+    low=None,
+    high=None,
+    stop_pct=None,
+    target_pct=None,
+    stop=None,
+    target=None,
+    hold_bars=None,
+    quantity=1.0,
+    fee=0.0,
+    initial_capital=0.0,
+    overlap=False,
+    cooldown=0,
+    fill_at_level=True,
+):
+    """Resolve a long-only backtest.
+
+    ``entries``/``exits`` are boolean arrays over the bars. Levels come from
+    ``stop_pct``/``target_pct`` of the entry close, or as absolute ``stop``/
+    ``target`` arrays over the bars (read at the entry bar). ``low``/``high``
+    default to the close. With ``overlap`` every entry signal opens a trade;
+    otherwise one position at a time, and an entry needs ``cooldown`` flat
+    bars after the previous exit. ``fee`` is charged per round trip.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    low = close if low is None else np.asarray(low, dtype=np.float64)
+    high = close if high is None else np.asarray(high, dtype=np.float64)
+    n = len(close)
+    candidates = np.flatnonzero(np.asarray(entries, dtype=bool))
+
+    def levels(at):
+        price = close[at]
+        stops = np.asarray(stop, dtype=np.float64)[at] if stop is not None else (
+            price * (1 - stop_pct) if stop_pct is not None else np.full(len(at), np.nan)
+        )
+        targets = np.asarray(target, dtype=np.float64)[at] if target is not None else (
+            price * (1 + target_pct) if target_pct is not None else np.full(len(at), np.nan)
+        )
+        return stops, targets
+
+    following_exit = next_true(exits) if exits is not None else None
+
+    def resolve(at, limit=None):
+        stops, targets = levels(at)
+        exit_at = None
+        if following_exit is not None:
+            exit_at = np.where(at + 1 < n, following_exit[np.minimum(at + 1, n - 1)], n)
+        return first_touch(low, high, at, stops, targets, hold_bars, exit_at, limit)
+
+    if overlap:
+        taken = candidates
+        exit_index, reason = resolve(taken)
+    else:
+        # Most trades are decided within a short window: settle all candidates
+        # at once and search further only for the ones actually taken.
+        quick_exit, quick_reason = resolve(candidates, FIRST_WINDOW)
+        position = {int(entry): i for i, entry in enumerate(candidates)}
+
+        def exit_for(entry):
+            i = position[entry]
+            if quick_reason[i] != EXIT_UNRESOLVED:
+                return int(quick_exit[i]), int(quick_reason[i])
+            exit_index, reason = resolve(np.array([entry]))
+            return int(exit_index[0]), int(reason[0])
+
+        taken, exit_index, reason = _chain(candidates, exit_for, cooldown)
+
+    stops, targets = levels(taken)
+    entry_price = close[taken]
+    exit_price = close[exit_index].copy()
+    if fill_at_level:
+        exit_price = np.where(reason == EXIT_STOP, stops, exit_price)
+        exit_price = np.where(reason == EXIT_TARGET, targets, exit_price)
+    pnl = (exit_price - entry_price) * quantity - np.where(reason == EXIT_OPEN, 0.0, fee)
+
+    equity = _equity(close, taken, exit_index, reason, entry_price, quantity, pnl, initial_capital)
+    return BacktestResult(taken, exit_index, reason, entry_price, exit_price, quantity, pnl, equity, initial_capital)
+
+
+def _equity(close, entry_index, exit_index, reason, entry_price, quantity, pnl, initial_capital):
+    """Realized P&L at exits plus open trades marked to the close."""
+    n = len(close)
+    closed = reason != EXIT_OPEN
+    size = np.broadcast_to(np.asarray(quantity, dtype=np.float64), entry_index.shape)
+
+    held = np.zeros(n + 1)
+    basis = np.zeros(n + 1)
+    np.add.at(held, entry_index, size)
+    np.add.at(basis, entry_index, size * entry_price)
+    np.add.at(held, exit_index[closed], -size[closed])
+    np.add.at(basis, exit_index[closed], -(size * entry_price)[closed])
+
+    realized = np.zeros(n)
+    np.add.at(realized, exit_index[closed], pnl[closed])
+    open_value = np.cumsum(held[:n]) * close - np.cumsum(basis[:n])
+    return initial_capital + np.cumsum(realized) + open_value
@@ -0,0 +1,316 @@
+# services/backtester/walk_forward.py
+#
+# Walk-forward optimization: for each rolling window, sweep the parameter
+# sets over the training period and evaluate the winner on the test period
+# that follows, so every reported result is out of sample.
+#
+# Signals only look backwards (see sweep.Strategy), so they are computed
+# once per feature key over each symbol's full history and sliced for every
+# window; overlapping training windows never recompute indicators, and the
+# first bars of a window are already warmed up. Training runs for all
+# windows are spread over one process pool, sharing prices and signals
+# through shared memory as the sweep does.
+#
+#     python -m services.backtester.walk_forward fibonacci_breakout \
+#         --grid lookback=10,20,30,50 --grid stop_loss_pct=0.01,0.02,0.03 \
+#         --grid target_pct=0.03,0.05,0.08 --from 2023-01-01 --test-days 90
+
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from services.backtester.result_cache import (
+    BACKTEST_MODULES,
+    array_fingerprint,
+    code_version,
+    result_cache,
+)
+from services.backtester.sweep import (
+    PRICE_FILES,
+    STRATEGIES,
+    RankedTable,
+    SharedPrices,
+    _attach_features,
+    _init_worker,
+    _parse_space,
+    _worker,
+    grid,
+    load_prices,
+    metrics,
+    precompute,
+    random_search,
+    trade_returns,
+)
+
+logger = logging.getLogger("walk_forward")
+
+DAY = np.timedelta64(1, "D")
+
+
+def make_windows(start, end, train_days=365, test_days=90, step_days=None):
+    """[(train_start, test_start, test_end)] with test periods stepping from
+    ``start`` through ``end`` (exclusive), each trained on the ``train_days``
+    before it. The last test period may be shorter."""
+    start = np.datetime64(start, "ns")
+    end = np.datetime64(end, "ns")
+    step = (step_days or test_days) * DAY
+    windows = []
+    test_start = start
+    while test_start < end:
+        windows.append((test_start - train_days * DAY, test_start, min(test_start + test_days * DAY, end)))
+        test_start += step
+    return windows
+
+
+def window_returns(strategy, prices, features, params, start, stop, include_open=False):
+    """Trade returns of one parameter set over the bars dated [start, stop),
+    and the number of symbols that have bars there.
+
+    ``features`` is a :func:`sweep.precompute` result over the full history.
+    Trades still open at ``stop`` count marked to the last close with
+    ``include_open``.
+    """
+    run = STRATEGIES[strategy]
+    key, rest = run.split(params)
+    returns, symbols = [], 0
+    for symbol, columns in prices.items():
+        lo, hi = np.searchsorted(columns["date"], [start, stop])
+        if hi - lo < 2:
+            continue
+        signals = features.get((symbol, key))
+        if signals is None:
+            raise ValueError(f"No features for {key}")
+        result = run.trade(
+            {column: values[lo:hi] for column, values in columns.items()},
+            {name: values[lo:hi] for name, values in signals.items()},
+            **rest,
+        )
+        returns.append(trade_returns(result, include_open))
+        symbols += 1
+    return (np.concatenate(returns) if returns else np.empty(0)), symbols
+
+
+def _train_batch(strategy, window, batch, min_trades, features_spec=None):
+    train_start, test_start, _ = window
+    features = _attach_features(features_spec)
+    rows = []
+    for params in batch:
+        try:
+            returns, symbols = window_returns(
+                strategy, _worker["prices"], features, params, train_start, test_start
+            )
+        except ValueError:
+            rows.append((params, None))
+            continue
+        rows.append((params, metrics(returns, symbols) if len(returns) >= min_trades else None))
+    return rows
+
+
+def walk_forward(
+    strategy,
+    param_sets,
+    prices: dict,
+    windows,
+    processes=None,
+    sort_by="total_return",
+    min_trades=1,
+    batch_size=None,
+    start_method=None,
+    cache=None,
+):
+    """Optimize on every training period and test the winner on the next.
+
+    ``windows`` come from :func:`make_windows`; parameter sets with fewer
+    than ``min_trades`` training trades are not eligible. ``processes=0``
+    runs in this process. Returns {"windows": [row per window],
+    "out_of_sample": metrics of the stitched test trades, "efficiency":
+    test return per day over training return per day}. With a ResultCache
+    the signals and the whole report are reused when nothing changed.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    param_sets = list(param_sets)
+    if cache is None:
+        return _walk_forward(
+            strategy, param_sets, prices, windows, processes, sort_by, min_trades, batch_size, start_method
+        )
+    key = cache.key(
+        "walk_forward",
+        strategy,
+        param_sets,
+        [[str(np.datetime64(value, "ns")) for value in window] for window in windows],
+        sort_by,
+        min_trades,
+        array_fingerprint(prices),
+        code_version(BACKTEST_MODULES + (__name__,)),
+    )
+
+    def compute():
+        report = _walk_forward(
+            strategy, param_sets, prices, windows, processes, sort_by, min_trades, batch_size,
+            start_method, cache,
+        )
+        return report, None
+
+    report, _ = cache.get_or_compute(key, compute)
+    return report
+
+
+def _walk_forward(
+    strategy, param_sets, prices, windows, processes, sort_by, min_trades, batch_size, start_method,
+    cache=None,
+):
+    tables = [RankedTable(sort_by) for _ in windows]
+    processes = os.cpu_count() if processes is None else processes
+    batch_size = batch_size or max(
+        1, len(param_sets) * len(windows) // (max(processes, 1) * 8)
+    )
+    tasks = [
+        (i, param_sets[j : j + batch_size])
+        for i in range(len(windows))
+        for j in range(0, len(param_sets), batch_size)
+    ]
+
+    if processes == 0:
+        features = precompute(strategy, prices, param_sets, cache)
+        _worker["prices"] = prices
+        _worker["features"] = features
+        try:
+            for i, batch in tasks:
+                for params, result in _train_batch(strategy, windows[i], batch, min_trades):
+                    tables[i].add(params, result)
+        finally:
+            _worker.clear()
+    else:
+        with SharedPrices(prices) as shared:
+            with ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context(start_method),
+                initializer=_init_worker,
+                initargs=(shared.spec,),
+            ) as pool:
+                features = precompute(strategy, prices, param_sets, cache, pool, processes)
+                with SharedPrices(features) as shared_features:
+                    futures = {
+                        pool.submit(
+                            _train_batch, strategy, windows[i], batch, min_trades, shared_features.spec
+                        ): i
+                        for i, batch in tasks
+                    }
+                    for future in as_completed(futures):
+                        for params, result in future.result():
+                            tables[futures[future]].add(params, result)
+
+    return _report(strategy, prices, features, windows, tables)
+
+
+def _day(value):
+    return str(np.datetime64(value, "D"))
+
+
+def _report(strategy, prices, features, windows, tables):
+    rows, stitched = [], []
+    train_total = test_total = train_days = test_days = 0.0
+    for (train_start, test_start, test_end), table in zip(windows, tables):
+        row = {"train_start": _day(train_start), "test_start": _day(test_start), "test_end": _day(test_end)}
+        best = table.best()
+        if best is None:
+            logger.warning(f"⚠️ No eligible parameters for the window starting {row['test_start']}")
+            rows.append({**row, "params": None})
+            continue
+        params, train = best
+        returns, symbols = window_returns(
+            strategy, prices, features, params, test_start, test_end, include_open=True
+        )
+        test = metrics(returns, symbols)
+        stitched.append(returns)
+        rows.append({
+            **row,
+            "params": params,
+            **{f"train_{name}": value for name, value in train.items()},
+            **{f"test_{name}": value for name, value in test.items()},
+        })
+        train_total += train["total_return"]
+        test_total += test["total_return"]
+        train_days += (test_start - train_start) / DAY
+        test_days += (test_end - test_start) / DAY
+
+    out_of_sample = metrics(np.concatenate(stitched) if stitched else np.empty(0), 1)
+    # Window totals are already averaged over their symbols
+    out_of_sample["total_return"] = test_total
+    efficiency = None
+    if train_total > 0 and test_days:
+        efficiency = (test_total / test_days) / (train_total / train_days)
+    return {"windows": rows, "out_of_sample": out_of_sample, "efficiency": efficiency}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward parameter optimization")
+    parser.add_argument("strategy", choices=sorted(STRATEGIES))
+    parser.add_argument("--files", default=PRICE_FILES, help="glob of price CSVs")
+    parser.add_argument("--grid", action="append", help="name=v1,v2,... (all combinations)")
+    parser.add_argument("--space", action="append", help="name=low:high or name=v1,v2 (random)")
+    parser.add_argument("--random", type=int, help="random samples from --space")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--train-days", type=int, default=365)
+    parser.add_argument("--test-days", type=int, default=90)
+    parser.add_argument("--step-days", type=int)
+    parser.add_argument("--from", dest="start", help="first test date (default: one training period in)")
+    parser.add_argument("--to", dest="end", help="end of the last test period (default: last bar)")
+    parser.add_argument("--min-trades", type=int, default=1)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--sort-by", default="total_return")
+    parser.add_argument("--out", help="write the per-window table to this CSV")
+    parser.add_argument("--no-cache", action="store_true", help="ignore the result cache")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.random:
+        param_sets = list(random_search(_parse_space(args.space, True), args.random, args.seed))
+    else:
+        param_sets = list(grid(_parse_space(args.grid, False)))
+    prices = load_prices(args.files)
+    first = min(columns["date"][0] for columns in prices.values())
+    last = max(columns["date"][-1] for columns in prices.values())
+    windows = make_windows(
+        args.start or first + args.train_days * DAY,
+        args.end or last + DAY,
+        args.train_days,
+        args.test_days,
+        args.step_days,
+    )
+    logger.info(
+        f"📊 {len(param_sets)} parameter sets x {len(prices)} symbols x {len(windows)} windows"
+    )
+
+    import pandas as pd
+
+    started = time.monotonic()
+    report = walk_forward(
+        args.strategy,
+        param_sets,
+        prices,
+        windows,
+        args.processes,
+        args.sort_by,
+        args.min_trades,
+        cache=None if args.no_cache else result_cache,
+    )
+    elapsed = time.monotonic() - started
+
+    table = pd.DataFrame(report["windows"])
+    columns = ["test_start", "test_end", "params", "train_total_return", "test_trades", "test_total_return"]
+    print(f"\n✅ {len(windows)} windows in {elapsed:.1f}s\n")
+    print(table[[c for c in columns if c in table]].to_string(index=False))
+    print("\nOut of sample:")
+    for name, value in report["out_of_sample"].items():
+        print(f"  {name:>14}: {value:.4f}" if isinstance(value, float) else f"  {name:>14}: {value}")
+    efficiency = report["efficiency"]
+    print(f"  {'efficiency':>14}: {efficiency:.4f}" if efficiency is not None else f"  {'efficiency':>14}: n/a")
+    if args.out:
+        table.to_csv(args.out, index=False)
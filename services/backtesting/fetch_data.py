@@ -1,20 +1,31 @@
+from urllib.parse import quote
+
 import requests
-import pandas as pd
-from datetime import datetime
 
-def fetch_ohlcv_data(symbol, exchange, from_date, to_date):
+from services.market_data.candle_cache import (
+    UPSTOX_HISTORY_URL,
+    candle_cache,
+    candles_to_columns,
+    columns_to_frame,
+)
+
+# One pooled session: repeated fetches reuse the TLS connection
+session = requests.Session()
+
+
+def _fetch_daily(instrument_key, first, last):
     # 🔁 Call Upstox historical endpoint (replace with actual token handling)
-    url = "https://api.upstox.com/v2/historical-candle"
-    headers = {"Authorization": f"Bearer YOUR_UPSTOX_ACCESS_TOKEN"}
-    params = {
-        "instrument_key": f"{exchange}_EQ|{symbol}",
-        "interval": "1day",
-        "from": from_date,
-        "to": to_date
-    }
-    response = requests.get(url, headers=headers, params=params)
-    candles = response.json().get("data", {}).get("candles", [])
+    url = f"{UPSTOX_HISTORY_URL}/{quote(instrument_key, safe='')}/day/{last}/{first}"
+    headers = {"Accept": "application/json", "Authorization": f"Bearer YOUR_UPSTOX_ACCESS_TOKEN"}
+    response = session.get(url, headers=headers, timeout=30)
+    response.raise_for_status()
+    return candles_to_columns(response.json().get("data", {}).get("candles", []))
+
 
-    df = pd.DataFrame(candles, columns=["timestamp", "open", "high", "low", "close", "volume"])
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    return df
+def fetch_ohlcv_data(symbol, exchange, from_date, to_date):
+    """Daily candles from Upstox; days already in the candle cache are not refetched."""
+    instrument_key = f"{exchange}_EQ|{symbol}"
+    columns = candle_cache.get(
+        instrument_key, "day", from_date, to_date, lambda first, last: _fetch_daily(instrument_key, first, last)
+    )
+    return columns_to_frame(columns)
@@ -1,29 +1,56 @@
+from datetime import datetime
+
 from sqlalchemy.orm import Session
 from database.models import HistoricalData
 from services.dhan_client import get_dhan_client
+from services.market_data.candle_cache import IST, candle_cache, candles_to_columns
 
 def fetch_and_store_historical_data(user_id: int, symbol: str, from_date: str, to_date: str, db: Session):
-    """Fetch historical market data from Dhan API and store in DB."""
+    """Fetch historical market data from Dhan API and store in DB.
+
+    Days already fetched for this user are served by the candle cache, so
+    only the missing ranges reach Dhan and get stored. Today's candle is
+    still forming and is only stored once the day is over.
+    """
+    client = None
+    stored = 0
+
+    def fetch(first, last):
+        nonlocal client, stored
+        client = client or get_dhan_client(user_id, db)
+        response = client.get_historical_data(
+            symbol=symbol, exchange="NSE", from_date=first.isoformat(), to_date=last.isoformat()
+        )
+        # dhanhq reports failures as {"status": "failure", ...} instead of raising;
+        # raise so the range is not cached as covered
+        rows = response.get("data")
+        if response.get("status") != "success" or not isinstance(rows, list):
+            raise ValueError(response.get("remarks") or response.get("data") or "Dhan request failed")
+        if last < datetime.now(IST).date():
+            for data in rows:
+                historical_entry = HistoricalData(
+                    user_id=user_id,
+                    symbol=symbol,
+                    exchange="NSE",
+                    date=data["date"],
+                    open=data["open"],
+                    high=data["high"],
+                    low=data["low"],
+                    close=data["close"],
+                    volume=data["volume"]
+                )
+                db.add(historical_entry)
+            # Committed before the cache records the range as covered
+            db.commit()
+            stored += len(rows)
+        return candles_to_columns(
+            [[data["date"], data["open"], data["high"], data["low"], data["close"], data["volume"]] for data in rows]
+        )
+
     try:
-        client = get_dhan_client(user_id, db)
-        response = client.get_historical_data(symbol=symbol, exchange="NSE", from_date=from_date, to_date=to_date)
-        
-        for data in response.get("data", []):
-            historical_entry = HistoricalData(
-                user_id=user_id,
-                symbol=symbol,
-                exchange="NSE",
-                date=data["date"],
-                open=data["open"],
-                high=data["high"],
-                low=data["low"],
-                close=data["close"],
-                volume=data["volume"]
-            )
-            db.add(historical_entry)
-        
-        db.commit()
-        return {"message": f"✅ Historical data for {symbol} stored successfully"}
-    
+        candle_cache.get(f"dhan|{user_id}|NSE|{symbol}", "day", from_date, to_date, fetch)
+        return {"message": f"✅ Historical data for {symbol} stored successfully ({stored} new rows)"}
+
     except Exception as e:
+        db.rollback()
         return {"error": f"Failed to fetch historical data: {e}"}
@@ -1,9 +1,11 @@
 import asyncio
+import math
 import websockets
 import json
 from sqlalchemy.orm import Session
 from database.models import TradePerformance
 from services.dhan_client import get_dhan_client
+from services.market_data.tick_store import tick_store
 
 async def send_profit_updates(user_id: int, db: Session):
     """Send real-time profit/loss updates over WebSockets."""
@@ -13,9 +15,14 @@ async def send_profit_updates(user_id: int, db: Session):
                 TradePerformance.user_id == user_id, TradePerformance.status == "OPEN"
             ).all()
 
+            # One bulk read from the streamed feed; REST only for symbols it doesn't have
+            live_prices = tick_store.get_ltp([trade.symbol for trade in trades])
+
             profit_updates = []
-            for trade in trades:
-                live_price = get_dhan_client(user_id, db).get_market_data(trade.symbol, exchange="NSE")["ltp"]
+            for trade, live_price in zip(trades, live_prices):
+                if math.isnan(live_price):  # no fresh tick for this symbol
+                    live_price = get_dhan_client(user_id, db).get_market_data(trade.symbol, exchange="NSE")["ltp"]
+                live_price = float(live_price)
                 profit_loss = (live_price - trade.entry_price) if trade.trade_type == "BUY" else (trade.entry_price - live_price)
                 
                 profit_updates.append({
@@ -1,10 +1,12 @@
 import asyncio
+import math
 from database.connection import SessionLocal
 import websockets
 import json
 from sqlalchemy.orm import Session
 from database.models import TradePerformance
 from services.dhan_client import get_dhan_client
+from services.market_data.tick_store import tick_store
 
 async def send_live_trade_updates(user_id: int):
     """Send live trade updates over WebSockets."""
@@ -14,9 +16,14 @@ async def send_live_trade_updates(user_id: int):
             trades = db.query(TradePerformance).filter(TradePerformance.user_id == user_id, TradePerformance.status == "OPEN").all()
             db.close()
 
+            # One bulk read from the streamed feed; REST only for symbols it doesn't have
+            live_prices = tick_store.get_ltp([trade.symbol for trade in trades])
+
             trade_updates = []
-            for trade in trades:
-                live_price = get_dhan_client(user_id, db).get_market_data(trade.symbol, exchange="NSE")["ltp"]
+            for trade, live_price in zip(trades, live_prices):
+                if math.isnan(live_price):  # no fresh tick for this symbol
+                    live_price = get_dhan_client(user_id, db).get_market_data(trade.symbol, exchange="NSE")["ltp"]
+                live_price = float(live_price)
                 trade_updates.append({
                     "symbol": trade.symbol,
                     "trade_type": trade.trade_type,
@@ -0,0 +1,357 @@
+import asyncio
+import inspect
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from services.market_data.tick_store import tick_store
+
+logger = logging.getLogger("bar_builder")
+
+# Timeframe -> bar length in ms. 30m is kept for the intraday candles endpoint.
+TIMEFRAMES = {
+    "1s": 1_000,
+    "1m": 60_000,
+    "5m": 300_000,
+    "15m": 900_000,
+    "30m": 1_800_000,
+}
+BAR_HISTORY = int(os.getenv("BAR_HISTORY", "500"))
+# Rings start this small and double up to BAR_HISTORY as bars close, so a
+# quiet instrument or a long timeframe never holds a full ring
+INITIAL_BARS = 16
+# A tick up to this much older than the newest one seen for the instrument
+# may still amend the bar before the current one; anything later is dropped.
+LATE_TICK_GRACE_MS = int(os.getenv("BAR_LATE_TICK_GRACE_MS", "2000"))
+# Bars of quiet instruments are closed by the clock this long after they end
+CLOSE_DELAY_MS = 1_000
+
+BAR_FIELDS = ("start", "open", "high", "low", "close", "volume", "ticks")
+
+
+class BarEvent:
+    """A closed (or amended) bar handed to subscribers."""
+
+    __slots__ = ("instrument_key", "timeframe") + BAR_FIELDS + ("amended",)
+
+    def __init__(
+        self,
+        instrument_key,
+        timeframe,
+        start,
+        open,
+        high,
+        low,
+        close,
+        volume,
+        ticks,
+        amended=False,
+    ):
+        self.instrument_key = instrument_key
+        self.timeframe = timeframe
+        self.start = start
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.ticks = ticks
+        self.amended = amended
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class BarSeries:
+    """Closed bars of one instrument and timeframe in a NumPy ring, plus the open bar.
+
+    The open bar lives in plain attributes so a tick costs a few compares;
+    it is copied into the ring once, when it closes. The ring grows up to
+    ``capacity`` bars as they close.
+    """
+
+    __slots__ = ("length", "capacity", "size", "columns", "head", "count") + BAR_FIELDS
+
+    def __init__(self, length, capacity=BAR_HISTORY):
+        self.length = length
+        self.capacity = capacity
+        self.size = min(INITIAL_BARS, capacity)
+        self.columns = {
+            "start": np.zeros(self.size, dtype=np.int64),
+            "open": np.zeros(self.size),
+            "high": np.zeros(self.size),
+            "low": np.zeros(self.size),
+            "close": np.zeros(self.size),
+            "volume": np.zeros(self.size, dtype=np.int64),
+            "ticks": np.zeros(self.size, dtype=np.int64),
+        }
+        self.head = 0
+        self.count = 0
+        self.start = None  # open bar start, ms
+
+    def add(self, start, price, volume):
+        if start == self.start:
+            if price > self.high:
+                self.high = price
+            elif price < self.low:
+                self.low = price
+            self.close = price
+            self.volume += volume
+            self.ticks += 1
+            return
+        self.start = start
+        self.open = self.high = self.low = self.close = price
+        self.volume = volume
+        self.ticks = 1
+
+    def open_bar(self):
+        return (self.start, self.open, self.high, self.low, self.close, self.volume, self.ticks)
+
+    def _grow(self):
+        # Only called while full and not yet wrapped: head is 0, oldest bar first
+        size = min(self.size * 2, self.capacity)
+        for name, column in self.columns.items():
+            grown = np.zeros(size, dtype=column.dtype)
+            grown[: self.size] = column
+            self.columns[name] = grown
+        self.head = self.size
+        self.size = size
+
+    def close_bar(self):
+        """Move the open bar into the ring; returns its values."""
+        values = self.open_bar()
+        if self.count == self.size < self.capacity:
+            self._grow()
+        head = self.head
+        for name, value in zip(BAR_FIELDS, values):
+            self.columns[name][head] = value
+        self.head = (head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        self.start = None
+        return values
+
+    def amend_last(self, start, price, volume):
+        """Fold a late tick into the most recent closed bar; False if it isn't that bar."""
+        if not self.count:
+            return False
+        last = (self.head - 1) % self.size
+        cols = self.columns
+        if cols["start"][last] != start:
+            return False
+        cols["high"][last] = max(cols["high"][last], price)
+        cols["low"][last] = min(cols["low"][last], price)
+        cols["volume"][last] += volume
+        cols["ticks"][last] += 1
+        return True
+
+    def last_closed(self):
+        last = (self.head - 1) % self.size
+        return tuple(self.columns[name][last].item() for name in BAR_FIELDS)
+
+    def bars(self, n, include_open=False) -> dict:
+        """Last n bars oldest first, as {field: array}."""
+        n = min(n, self.count)
+        order = (np.arange(self.head - n, self.head)) % self.size
+        result = {name: column[order] for name, column in self.columns.items()}
+        if include_open and self.start is not None:
+            result = {
+                name: np.append(result[name], value)
+                for name, value in zip(BAR_FIELDS, self.open_bar())
+            }
+        return result
+
+
+class InstrumentBars:
+    __slots__ = ("series", "last_vtt", "latest_ts")
+
+    def __init__(self, capacity):
+        self.series = {tf: BarSeries(length, capacity) for tf, length in TIMEFRAMES.items()}
+        self.last_vtt = None
+        self.latest_ts = 0
+
+
+class BarBuilder:
+    """Incremental OHLCV bars for every instrument on the live feed.
+
+    Bars are keyed on the exchange trade time (ltt). Volume is the increase
+    in the day's traded volume (vtt), falling back to ltq. Empty intervals
+    produce no bar. Out-of-order ticks:
+
+    * a tick for the open bar, or a newer one, is applied normally;
+    * a late tick no more than LATE_TICK_GRACE_MS behind the newest tick of
+      that instrument amends, per timeframe, the open bar or the bar just
+      closed if it falls in one of them: high, low, volume and tick count
+      change, open and close are kept, closed bars are re-emitted with
+      ``amended=True``. Timeframes where it is older than that are skipped;
+    * anything later than the grace period is dropped (``late_dropped``).
+    """
+
+    def __init__(self, capacity=BAR_HISTORY, late_grace_ms=LATE_TICK_GRACE_MS):
+        self.capacity = capacity
+        self.late_grace_ms = late_grace_ms
+        self.instruments = {}  # instrument_key -> InstrumentBars
+        self.subscribers = []  # (callback, timeframes, instrument_keys)
+        self.lock = threading.Lock()
+        self.clock_task = None
+
+        self.ticks_in = 0
+        self.late_amended = 0
+        self.late_dropped = 0
+
+    def subscribe(self, callback, timeframes=None, instrument_keys=None):
+        """Call ``callback(BarEvent)`` on bar close; async callbacks are scheduled."""
+        unknown = set(timeframes or ()) - set(TIMEFRAMES)
+        if unknown:
+            raise ValueError(f"Unknown timeframes: {sorted(unknown)}")
+        entry = (
+            callback,
+            frozenset(timeframes) if timeframes else None,
+            frozenset(instrument_keys) if instrument_keys else None,
+        )
+        self.subscribers.append(entry)
+        return entry
+
+    def unsubscribe(self, entry):
+        if entry in self.subscribers:
+            self.subscribers.remove(entry)
+
+    def _emit(self, events):
+        for event in events:
+            for callback, timeframes, keys in self.subscribers:
+                if timeframes is not None and event.timeframe not in timeframes:
+                    continue
+                if keys is not None and event.instrument_key not in keys:
+                    continue
+                try:
+                    result = callback(event)
+                    if inspect.isawaitable(result):
+                        asyncio.ensure_future(result)
+                except Exception as e:
+                    logger.error(f"❌ Bar subscriber failed: {e}")
+
+    def update(self, tick, events):
+        if tick.ltp is None:
+            return
+        bars = self.instruments.get(tick.instrument_key)
+        if bars is None:
+            bars = InstrumentBars(self.capacity)
+            self.instruments[tick.instrument_key] = bars
+
+        ts = tick.ltt or int(time.time() * 1000)
+        if tick.vtt is not None and bars.last_vtt is not None:
+            volume = max(tick.vtt - bars.last_vtt, 0)
+        else:
+            volume = tick.ltq or 0
+        if tick.vtt is not None:
+            bars.last_vtt = max(tick.vtt, bars.last_vtt or 0)
+        self.ticks_in += 1
+
+        if ts < bars.latest_ts:
+            self._late(tick.instrument_key, bars, ts, tick.ltp, volume, events)
+            return
+        bars.latest_ts = ts
+
+        key, price = tick.instrument_key, tick.ltp
+        for timeframe, series in bars.series.items():
+            start = ts - ts % series.length
+            if series.start is None:
+                # The clock already closed this bar: treat the tick as late
+                if series.amend_last(start, price, volume):
+                    events.append(BarEvent(key, timeframe, *series.last_closed(), amended=True))
+                    continue
+            elif start > series.start:
+                events.append(BarEvent(key, timeframe, *series.close_bar()))
+            series.add(start, price, volume)
+
+    def _late(self, key, bars, ts, price, volume, events):
+        if bars.latest_ts - ts > self.late_grace_ms:
+            self.late_dropped += 1
+            return
+        applied = False
+        for timeframe, series in bars.series.items():
+            start = ts - ts % series.length
+            if start == series.start:
+                # Still the open bar: counts, but must not move the close
+                series.high = max(series.high, price)
+                series.low = min(series.low, price)
+                series.volume += volume
+                series.ticks += 1
+                applied = True
+            elif series.amend_last(start, price, volume):
+                events.append(BarEvent(key, timeframe, *series.last_closed(), amended=True))
+                applied = True
+            # else: older than this timeframe's last closed bar, skip it here
+        if applied:
+            self.late_amended += 1
+        else:
+            self.late_dropped += 1
+
+    def update_many(self, ticks):
+        events = []
+        with self.lock:
+            for tick in ticks:
+                self.update(tick, events)
+        if events and self.subscribers:
+            self._emit(events)
+        if self.clock_task is None:
+            self._start_clock()
+
+    def close_due(self, now_ms=None):
+        """Close open bars whose interval has ended (quiet instruments)."""
+        now_ms = now_ms or int(time.time() * 1000)
+        events = []
+        with self.lock:
+            for key, bars in self.instruments.items():
+                for timeframe, series in bars.series.items():
+                    if series.start is None:
+                        continue
+                    if series.start + series.length + CLOSE_DELAY_MS <= now_ms:
+                        events.append(BarEvent(key, timeframe, *series.close_bar()))
+        if events and self.subscribers:
+            self._emit(events)
+        return events
+
+    async def _run_clock(self):
+        while True:
+            await asyncio.sleep(1)
+            try:
+                self.close_due()
+            except Exception as e:
+                logger.error(f"❌ Bar clock failed: {e}")
+
+    def _start_clock(self):
+        try:
+            self.clock_task = asyncio.get_running_loop().create_task(self._run_clock())
+        except RuntimeError:
+            pass  # no loop (tests, scripts); call close_due() directly
+
+    def evict(self, instrument_keys):
+        """Drop the bars of instruments no longer on the feed."""
+        with self.lock:
+            for key in instrument_keys:
+                self.instruments.pop(key, None)
+
+    def bars(self, symbol_or_key, timeframe="1m", n=100, include_open=False):
+        """Last n closed bars oldest first as {field: array}, or None if never ticked."""
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unknown timeframe: {timeframe}")
+        bars = self.instruments.get(tick_store.resolve(symbol_or_key))
+        if bars is None:
+            return None
+        with self.lock:
+            return bars.series[timeframe].bars(n, include_open)
+
+    def stats(self):
+        return {
+            "instruments": len(self.instruments),
+            "ticks_in": self.ticks_in,
+            "late_amended": self.late_amended,
+            "late_dropped": self.late_dropped,
+            "subscribers": len(self.subscribers),
+        }
+
+
+bar_builder = BarBuilder()
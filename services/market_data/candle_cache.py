@@ -0,0 +1,334 @@
+# services/market_data/candle_cache.py
+#
+# On-disk cache of broker candle history, keyed by (instrument_key,
+# interval). Each fetch is stored as one columnar segment (an .npz of ts,
+# open, high, low, close, volume, oi arrays) named after the IST days it
+# covers, so the covered ranges are known from the file names alone and a
+# request only goes to the broker for the days no segment covers. Days
+# without candles (holidays) are covered by the segment too. Today is never
+# cached: its candles are still forming, so it is fetched on every call.
+# When a key has more than CANDLE_CACHE_MAX_SEGMENTS segments, touching
+# ones are merged.
+#
+#     python -m services.market_data.candle_cache "NSE_EQ|INE002A01018" day
+#
+# Upstox requests share the pooled client of services.upstox.feed_auth.
+
+import argparse
+import asyncio
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+from services.upstox.tick_journal import IST
+
+logger = logging.getLogger("candle_cache")
+
+CACHE_DIR = os.getenv("CANDLE_CACHE_DIR", "data/candle_cache")
+MAX_SEGMENTS = int(os.getenv("CANDLE_CACHE_MAX_SEGMENTS", "16"))
+UPSTOX_HISTORY_URL = "https://api.upstox.com/v2/historical-candle"
+UPSTOX_INTERVALS = ("1minute", "30minute", "day", "week", "month")
+
+CANDLE_COLUMNS = {
+    "ts": np.int64,  # candle start, epoch ms
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.int64,
+    "oi": np.float64,
+}
+ONE_DAY = timedelta(days=1)
+
+
+def _day(value) -> date:
+    if isinstance(value, datetime):
+        return (value if value.tzinfo is None else value.astimezone(IST)).date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _day_ms(day) -> int:
+    return int(datetime(day.year, day.month, day.day, tzinfo=IST).timestamp() * 1000)
+
+
+def _today() -> date:
+    return datetime.now(IST).date()
+
+
+def _to_ms(value) -> int:
+    if isinstance(value, str):
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=IST)
+        return int(parsed.timestamp() * 1000)
+    if isinstance(value, datetime):
+        return int((value if value.tzinfo else value.replace(tzinfo=IST)).timestamp() * 1000)
+    value = int(value)
+    return value if value > 10**11 else value * 1000  # epoch seconds
+
+
+# --- candle formats ---------------------------------------------------------------
+
+
+def empty_columns() -> dict:
+    return {name: np.empty(0, dtype=dtype) for name, dtype in CANDLE_COLUMNS.items()}
+
+
+def candles_to_columns(candles) -> dict:
+    """Columns, oldest first, from [ts, open, high, low, close, volume(, oi)] rows
+    in any order; ts may be an ISO string (naive = IST) or epoch s/ms."""
+    if not len(candles):
+        return empty_columns()
+    rows = list(zip(*candles))
+    columns = {"ts": np.array([_to_ms(ts) for ts in rows[0]], dtype=np.int64)}
+    for i, name in enumerate(("open", "high", "low", "close", "volume", "oi"), start=1):
+        values = rows[i] if i < len(rows) else [0] * len(candles)
+        columns[name] = np.asarray(values, dtype=np.float64).astype(CANDLE_COLUMNS[name])
+    order = np.argsort(columns["ts"], kind="stable")
+    return {name: values[order] for name, values in columns.items()}
+
+
+def columns_to_candles(columns) -> list:
+    """Upstox-style candles [ts, open, high, low, close, volume, oi], newest first."""
+    candles = [
+        [datetime.fromtimestamp(ts / 1000, IST).isoformat(), o, h, l, c, v, oi]
+        for ts, o, h, l, c, v, oi in zip(*(columns[name].tolist() for name in CANDLE_COLUMNS))
+    ]
+    candles.reverse()
+    return candles
+
+
+def columns_to_frame(columns):
+    """DataFrame with an IST ``timestamp`` column and open/high/low/close/volume."""
+    import pandas as pd
+
+    df = pd.DataFrame({name: columns[name] for name in ("open", "high", "low", "close", "volume")})
+    df.insert(0, "timestamp", pd.to_datetime(columns["ts"], unit="ms", utc=True).tz_convert(IST))
+    return df
+
+
+def _clip(columns, first, last):
+    ts = columns["ts"]
+    keep = (ts >= _day_ms(first)) & (ts < _day_ms(last + ONE_DAY))
+    return {name: values[keep] for name, values in columns.items()}
+
+
+def _concat(parts):
+    parts = [part for part in parts if len(part["ts"])]
+    if not parts:
+        return empty_columns()
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in CANDLE_COLUMNS}
+    # Later parts win on duplicate candles
+    ts = columns["ts"][::-1]
+    _, last = np.unique(ts, return_index=True)
+    keep = len(ts) - 1 - last
+    return {name: values[keep] for name, values in columns.items()}
+
+
+def _save(path, columns):
+    # Written under a name the segment glob skips, then renamed into place
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, **columns)
+    os.replace(tmp, path)
+
+
+# --- cache ------------------------------------------------------------------------
+
+
+class CandleCache:
+    """Candle segments per (instrument_key, interval) under ``root``.
+
+    ``get``/``aget`` take a ``fetch(first_day, last_day)`` callback (async
+    for ``aget``) returning columns (see :func:`candles_to_columns`) for the
+    inclusive IST day range, called only for the days not cached yet.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_segments=MAX_SEGMENTS):
+        self.root = Path(root)
+        self.max_segments = max_segments
+        self.lock = threading.Lock()
+        self.key_locks = {}  # (key, interval) -> threading.Lock
+        self.async_locks = {}  # (key, interval) -> asyncio.Lock
+        self.fetches = 0  # day ranges fetched from the broker
+        self.requests = 0
+
+    def _dir(self, key, interval):
+        return self.root / quote(interval, safe="") / quote(key, safe="")
+
+    def _segments(self, key, interval):
+        """[(first_day, last_day, path)] sorted by first day."""
+        directory = self._dir(key, interval)
+        if not directory.exists():
+            return []
+        segments = []
+        for path in directory.glob("*.npz"):
+            first, _, last = path.stem.partition("_")
+            segments.append((date.fromisoformat(first), date.fromisoformat(last), path))
+        return sorted(segments)
+
+    def coverage(self, key, interval):
+        """Covered day runs [(first, last)], merged, oldest first."""
+        runs = []
+        for first, last, _ in self._segments(key, interval):
+            if runs and first <= runs[-1][1] + ONE_DAY:
+                runs[-1] = (runs[-1][0], max(runs[-1][1], last))
+            else:
+                runs.append((first, last))
+        return runs
+
+    def missing(self, key, interval, first, last):
+        """Day runs [(first, last)] of [first, last] no segment covers."""
+        first, last = _day(first), _day(last)
+        gaps, cursor = [], first
+        for start, end in self.coverage(key, interval):
+            if end < cursor:
+                continue
+            if start > last:
+                break
+            if start > cursor:
+                gaps.append((cursor, start - ONE_DAY))
+            cursor = max(cursor, end + ONE_DAY)
+        if cursor <= last:
+            gaps.append((cursor, last))
+        return gaps
+
+    def read(self, key, interval, first, last) -> dict:
+        """Cached candles of the IST days [first, last], oldest first."""
+        first, last = _day(first), _day(last)
+        parts = []
+        segments = [s for s in self._segments(key, interval) if s[1] >= first and s[0] <= last]
+        for _, _, path in sorted(segments, key=lambda s: s[2].stat().st_mtime_ns):
+            with np.load(path) as data:
+                parts.append({name: data[name] for name in CANDLE_COLUMNS})
+        return _clip(_concat(parts), first, last)
+
+    def write(self, key, interval, first, last, columns):
+        """Store candles as covering the IST days [first, last]."""
+        first, last = _day(first), _day(last)
+        columns = _clip(
+            {name: np.asarray(columns[name], dtype=dtype) for name, dtype in CANDLE_COLUMNS.items()}, first, last
+        )
+        directory = self._dir(key, interval)
+        directory.mkdir(parents=True, exist_ok=True)
+        _save(directory / f"{first.isoformat()}_{last.isoformat()}.npz", columns)
+        if len(self._segments(key, interval)) > self.max_segments:
+            self.compact(key, interval)
+
+    def compact(self, key, interval):
+        """Merge the segments of every covered run into one."""
+        segments = self._segments(key, interval)
+        for first, last in self.coverage(key, interval):
+            paths = [p for start, end, p in segments if start >= first and end <= last]
+            if len(paths) < 2:
+                continue
+            merged = self.read(key, interval, first, last)
+            target = self._dir(key, interval) / f"{first.isoformat()}_{last.isoformat()}.npz"
+            _save(target, merged)
+            for path in paths:
+                if path != target:
+                    path.unlink(missing_ok=True)
+            logger.info(f"🗜️ Compacted {len(paths)} candle segments of {key} {interval} into {target.name}")
+
+    def _plan(self, first, last):
+        """(cacheable last day or None, live day range or None) of a request."""
+        first, last = _day(first), _day(last)
+        final = min(last, _today() - ONE_DAY)
+        live_first = max(first, final + ONE_DAY)
+        return first, (final if first <= final else None), ((live_first, last) if live_first <= last else None)
+
+    def get(self, key, interval, first, last, fetch) -> dict:
+        first, final, live = self._plan(first, last)
+        self.requests += 1
+        parts = []
+        if final is not None:
+            with self.lock:
+                lock = self.key_locks.setdefault((key, interval), threading.Lock())
+            with lock:  # one fetch per gap even with concurrent callers
+                for a, b in self.missing(key, interval, first, final):
+                    self.write(key, interval, a, b, fetch(a, b))
+                    self.fetches += 1
+                parts.append(self.read(key, interval, first, final))
+        if live is not None:
+            parts.append(_clip(fetch(*live), *live))
+        return _concat(parts)
+
+    async def aget(self, key, interval, first, last, fetch) -> dict:
+        first, final, live = self._plan(first, last)
+        self.requests += 1
+        parts = []
+        if final is not None:
+            lock = self.async_locks.setdefault((key, interval), asyncio.Lock())
+            async with lock:
+                gaps = await asyncio.to_thread(self.missing, key, interval, first, final)
+                fetched = await asyncio.gather(*(fetch(a, b) for a, b in gaps))
+                for (a, b), columns in zip(gaps, fetched):
+                    await asyncio.to_thread(self.write, key, interval, a, b, columns)
+                    self.fetches += 1
+                parts.append(await asyncio.to_thread(self.read, key, interval, first, final))
+        if live is not None:
+            parts.append(_clip(await fetch(*live), *live))
+        return _concat(parts)
+
+    def keys(self):
+        """[(instrument_key, interval)] with cached candles."""
+        if not self.root.exists():
+            return []
+        return [
+            (unquote(directory.name), unquote(interval_dir.name))
+            for interval_dir in sorted(self.root.iterdir())
+            if interval_dir.is_dir()
+            for directory in sorted(interval_dir.iterdir())
+        ]
+
+    def stats(self):
+        return {"keys": len(self.keys()), "requests": self.requests, "fetches": self.fetches}
+
+
+candle_cache = CandleCache()
+
+
+# --- Upstox -----------------------------------------------------------------------
+
+
+async def fetch_upstox_candles(instrument_key, interval, first, last, access_token) -> dict:
+    """Upstox v2 candles for the IST days [first, last] as columns; today's
+    come from the intraday endpoint. Raises httpx.HTTPError on failure."""
+    from services.upstox.feed_auth import get_http_client
+
+    client = get_http_client()
+    headers = {"Accept": "application/json", "Authorization": f"Bearer {access_token}"}
+    key = quote(instrument_key, safe="")
+    first, last = _day(first), _day(last)
+    today = _today()
+    urls = []
+    if first < today:
+        urls.append(f"{UPSTOX_HISTORY_URL}/{key}/{interval}/{min(last, today - ONE_DAY)}/{first}")
+    if last >= today:
+        urls.append(f"{UPSTOX_HISTORY_URL}/intraday/{key}/{interval}")
+    parts = []
+    for url in urls:
+        res = await client.get(url, headers=headers)
+        res.raise_for_status()
+        parts.append(candles_to_columns(res.json().get("data", {}).get("candles", [])))
+    return _concat(parts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Candle cache coverage")
+    parser.add_argument("key", nargs="?", help="instrument key (all keys if omitted)")
+    parser.add_argument("interval", nargs="?", default="day")
+    args = parser.parse_args()
+
+    entries = [(args.key, args.interval)] if args.key else candle_cache.keys()
+    for key, interval in entries:
+        runs = candle_cache.coverage(key, interval)
+        days = ", ".join(f"{a}..{b}" for a, b in runs) or "nothing cached"
+        print(f"{key} {interval}: {days}")
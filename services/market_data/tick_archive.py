@@ -0,0 +1,385 @@
+# services/market_data/tick_archive.py
+#
+# Long-term tick storage: one directory per day, one sub-directory per
+# instrument, one compressed file per column. Compact a journal day with
+#
+#     python -m services.market_data.tick_archive compact 2025-01-02
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import zlib
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from services.upstox.tick_decoder import decode_frame
+from services.upstox.tick_journal import (
+    IST,
+    JOURNAL_DIR,
+    KIND_TICKS,
+    TICK_RECORD,
+    JournalReader,
+    tick_records,
+)
+
+try:
+    import zstandard
+except ImportError:  # archives still work with zlib, just larger and slower
+    zstandard = None
+
+logger = logging.getLogger("tick_archive")
+
+ARCHIVE_DIR = os.getenv("TICK_ARCHIVE_DIR", "data/tick_archive")
+CHUNK_ROWS = 65536
+ZSTD_LEVEL = 9
+
+# Archived columns; the journal's instrument id is replaced by the directory
+FIELDS = tuple(name for name in TICK_RECORD.names if name != "instrument")
+# Prices are stored as integer paise when that is lossless
+PRICE_FIELDS = ("ltp", "bid_p", "ask_p")
+PRICE_SCALE = 100
+INT_DTYPES = (np.int8, np.int16, np.int32, np.int64)
+SESSION_OPEN = time(9, 15)
+SESSION_CLOSE = time(15, 30)
+
+
+def _compress(data: bytes):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+
+def _decompress(codec, data) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this archive")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _smallest_int(values):
+    if not len(values):
+        return np.int8
+    lo, hi = values.min(), values.max()
+    for dtype in INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return dtype
+    return np.int64
+
+
+def encode_column(name, values: np.ndarray):
+    """(meta, payload) for one chunk of a column.
+
+    Integer columns and exactly-representable prices are delta encoded and
+    stored in the narrowest integer type; anything else is kept raw.
+    """
+    meta = {"encoding": "raw", "dtype": values.dtype.str}
+    if name in PRICE_FIELDS:
+        scaled = np.round(values * PRICE_SCALE)
+        if np.isfinite(values).all() and (scaled / PRICE_SCALE == values).all():
+            values = scaled.astype(np.int64)
+            meta = {"encoding": "scaled_delta", "scale": PRICE_SCALE}
+    elif values.dtype.kind == "i":
+        meta = {"encoding": "delta"}
+
+    if meta["encoding"] != "raw":
+        deltas = np.diff(values)
+        dtype = _smallest_int(deltas)
+        meta["first"] = int(values[0]) if len(values) else 0
+        meta["dtype"] = np.dtype(dtype).str
+        payload = deltas.astype(dtype).tobytes()
+    else:
+        payload = values.tobytes()
+
+    meta["codec"], payload = _compress(payload)
+    return meta, payload
+
+
+def decode_column(meta, payload, rows, dtype) -> np.ndarray:
+    raw = np.frombuffer(_decompress(meta["codec"], payload), dtype=meta["dtype"])
+    if meta["encoding"] == "raw":
+        return raw.astype(dtype, copy=False)
+
+    values = np.empty(rows, dtype=np.int64)
+    if rows:
+        values[0] = meta["first"]
+        np.cumsum(raw, dtype=np.int64, out=values[1:])
+        values[1:] += meta["first"]
+    if meta["encoding"] == "scaled_delta":
+        return values / meta["scale"]
+    return values.astype(dtype, copy=False)
+
+
+def write_instrument(directory: Path, records: np.ndarray):
+    """Write one instrument's ticks (sorted by ts) as chunked column files."""
+    directory.mkdir(parents=True, exist_ok=True)
+    chunks = []
+    columns = {name: [] for name in FIELDS}
+    files = {name: open(directory / f"{name}.col", "wb") for name in FIELDS}
+    try:
+        for start in range(0, len(records), CHUNK_ROWS):
+            chunk = records[start : start + CHUNK_ROWS]
+            chunks.append(
+                {
+                    "rows": len(chunk),
+                    "ts_first": int(chunk["ts"][0]),
+                    "ts_last": int(chunk["ts"][-1]),
+                }
+            )
+            for name in FIELDS:
+                meta, payload = encode_column(name, np.ascontiguousarray(chunk[name]))
+                meta["offset"] = files[name].tell()
+                meta["length"] = len(payload)
+                files[name].write(payload)
+                columns[name].append(meta)
+    finally:
+        for f in files.values():
+            f.close()
+
+    meta = {"rows": len(records), "chunks": chunks, "columns": columns}
+    (directory / "meta.json").write_text(json.dumps(meta))
+    return meta
+
+
+def _journal_records(day, journal_root) -> tuple:
+    """All ticks of a journal day as (records, {instrument_id: key})."""
+    reader = JournalReader(day, journal_root)
+    records = reader.ticks()
+    if not len(records):
+        # Frames-only journal: decode the frames once here
+        parts = []
+        instruments = dict(reader.instruments)
+        for ts_ms, raw in reader.frames():
+            ticks = decode_frame(raw).ticks
+            if not ticks:
+                continue
+            ids = [instruments.setdefault(t.instrument_key, len(instruments)) for t in ticks]
+            parts.append(tick_records(ts_ms, ticks, ids))
+        records = np.concatenate(parts) if parts else np.empty(0, dtype=TICK_RECORD)
+        reader.instruments = instruments
+    return records, {i: key for key, i in reader.instruments.items()}
+
+
+def _frame_records(reader, instrument_key, start_ms, end_ms) -> np.ndarray:
+    """One instrument's ticks from a frames-only journal, decoded here."""
+    # Frames are only filtered by instrument when the journal indexed it
+    key = instrument_key if instrument_key in reader.instruments else None
+    parts = []
+    for ts_ms, raw in reader.frames(start_ms, end_ms, key):
+        ticks = [t for t in decode_frame(raw).ticks if t.instrument_key == instrument_key]
+        if ticks:
+            parts.append(tick_records(ts_ms, ticks, [0] * len(ticks)))
+    return np.concatenate(parts) if parts else np.empty(0, dtype=TICK_RECORD)
+
+
+def compact_day(day, journal_root=JOURNAL_DIR, archive_root=ARCHIVE_DIR) -> dict:
+    """Convert one journal day into per-instrument compressed column files."""
+    records, keys = _journal_records(day, journal_root)
+    day_dir = Path(archive_root) / day
+    index = {}
+    if len(records):
+        order = np.lexsort((records["ts"], records["instrument"]))
+        records = records[order]
+        ids, starts = np.unique(records["instrument"], return_index=True)
+        bounds = np.append(starts, len(records))
+        for n, instrument_id in enumerate(ids):
+            key = keys[int(instrument_id)]
+            name = f"{n:05d}"
+            write_instrument(day_dir / name, records[bounds[n] : bounds[n + 1]])
+            index[key] = name
+
+    day_dir.mkdir(parents=True, exist_ok=True)
+    (day_dir / "index.json").write_text(json.dumps(index))
+    logger.info(f"🗜️ Archived {len(records)} ticks for {len(index)} instruments ({day})")
+    return {"day": day, "ticks": int(len(records)), "instruments": len(index)}
+
+
+def _to_ms(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=IST)
+        return int(value.timestamp() * 1000)
+    if isinstance(value, date):
+        return int(datetime(value.year, value.month, value.day, tzinfo=IST).timestamp() * 1000)
+    raise ValueError(f"Unsupported time value: {value!r}")
+
+
+def _days(start_ms, end_ms):
+    first = datetime.fromtimestamp(start_ms / 1000, IST).date()
+    last = datetime.fromtimestamp((end_ms - 1) / 1000, IST).date()
+    while first <= last:
+        yield first.isoformat()
+        first += timedelta(days=1)
+
+
+class TickArchive:
+    """Read side of the archive: only the needed days, columns and chunks."""
+
+    def __init__(self, root=ARCHIVE_DIR, journal_root=JOURNAL_DIR):
+        self.root = Path(root)
+        self.journal_root = journal_root
+        self.indexes = {}
+
+    def _index(self, day):
+        index = self.indexes.get(day)
+        if index is None:
+            path = self.root / day / "index.json"
+            index = json.loads(path.read_text()) if path.exists() else None
+            if index is not None:
+                self.indexes[day] = index
+        return index
+
+    def has_day(self, day):
+        return self._index(day) is not None
+
+    def _read_day(self, day, instrument_key, start_ms, end_ms, fields):
+        name = (self._index(day) or {}).get(instrument_key)
+        if name is None:
+            return None
+        directory = self.root / day / name
+        meta = json.loads((directory / "meta.json").read_text())
+        wanted = [
+            i
+            for i, chunk in enumerate(meta["chunks"])
+            if chunk["ts_last"] >= start_ms and chunk["ts_first"] < end_ms
+        ]
+        if not wanted:
+            return None
+
+        columns = list(dict.fromkeys(["ts", *fields]))
+        result = {}
+        for field in columns:
+            dtype = TICK_RECORD.fields[field][0]
+            with open(directory / f"{field}.col", "rb") as f, mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_READ
+            ) as data:
+                parts = []
+                for i in wanted:
+                    column = meta["columns"][field][i]
+                    payload = data[column["offset"] : column["offset"] + column["length"]]
+                    parts.append(decode_column(column, payload, meta["chunks"][i]["rows"], dtype))
+            result[field] = np.concatenate(parts)
+
+        ts = result["ts"]
+        lo, hi = np.searchsorted(ts, start_ms, "left"), np.searchsorted(ts, end_ms, "left")
+        return {field: values[lo:hi] for field, values in result.items()}
+
+    def _read_journal(self, day, instrument_key, start_ms, end_ms, fields):
+        if not (Path(self.journal_root) / day).exists():
+            return None
+        reader = JournalReader(day, self.journal_root)
+        if any(reader.day_dir.glob(f"{KIND_TICKS}-*.seg")):
+            records = reader.ticks(instrument_key, start_ms, end_ms)
+        else:
+            records = _frame_records(reader, instrument_key, start_ms, end_ms)
+        if not len(records):
+            return None
+        return {field: records[field] for field in dict.fromkeys(["ts", *fields])}
+
+    def get_ticks(self, instrument_key, start, end, fields=("ltp",), include_journal=True):
+        """Ticks of one instrument in [start, end) as {field: array}, ts always included.
+
+        ``start``/``end`` take datetimes (naive = IST), dates, ISO strings or
+        epoch milliseconds. Days not compacted yet are read from the journal.
+        """
+        unknown = [f for f in fields if f not in FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown tick fields: {unknown}")
+        start_ms, end_ms = _to_ms(start), _to_ms(end)
+
+        parts = []
+        for day in _days(start_ms, end_ms):
+            if self.has_day(day):
+                part = self._read_day(day, instrument_key, start_ms, end_ms, fields)
+            elif include_journal:
+                part = self._read_journal(day, instrument_key, start_ms, end_ms, fields)
+            else:
+                part = None
+            if part is not None:
+                parts.append(part)
+
+        columns = list(dict.fromkeys(["ts", *fields]))
+        if not parts:
+            return {f: np.empty(0, dtype=TICK_RECORD.fields[f][0]) for f in columns}
+        return {f: np.concatenate([p[f] for p in parts]) for f in columns}
+
+
+def ticks_to_candles(ticks, interval_minutes):
+    """Upstox-style candles [ts, open, high, low, close, volume, oi], newest first.
+
+    ``ticks`` is a get_ticks() result with at least ltp, ltq and vtt.
+    """
+    ts = ticks["ts"]
+    if not len(ts):
+        return []
+    ltp, vtt, ltq = ticks["ltp"], ticks["vtt"], ticks["ltq"]
+    oi = ticks.get("oi", np.zeros(len(ts)))
+    bucket_ms = interval_minutes * 60_000
+    buckets = ts // bucket_ms * bucket_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+
+    highs = np.maximum.reduceat(ltp, starts)
+    lows = np.minimum.reduceat(ltp, starts)
+    # vtt is cumulative for the day; a candle's volume is its increase
+    opening_vtt = vtt[0] - ltq[0]
+    volumes = np.diff(np.r_[opening_vtt, vtt[ends]])
+
+    candles = [
+        [
+            datetime.fromtimestamp(buckets[s] / 1000, IST).isoformat(),
+            float(ltp[s]),
+            float(highs[i]),
+            float(lows[i]),
+            float(ltp[e]),
+            int(max(volumes[i], 0)),
+            float(oi[e]),
+        ]
+        for i, (s, e) in enumerate(zip(starts, ends))
+    ]
+    candles.reverse()
+    return candles
+
+
+def covers_session(times_ms, day, interval_minutes, now=None) -> bool:
+    """Whether bar starts or tick times (epoch ms, ascending) cover the whole
+    session of ``day``: from the interval holding the open to within one
+    interval of the close (of ``now`` while the session runs), no gap
+    longer than an interval in between."""
+    step = interval_minutes * 60_000
+    day = date.fromisoformat(day) if isinstance(day, str) else day
+    open_ms = _to_ms(datetime.combine(day, SESSION_OPEN, IST))
+    first_ms = open_ms // step * step  # 30 minute bars start at 9:00
+    close_ms = _to_ms(datetime.combine(day, SESSION_CLOSE, IST))
+    end_ms = min(close_ms, _to_ms(now)) if now is not None else close_ms
+    times = np.asarray(times_ms)
+    times = times[(times >= first_ms) & (times < close_ms)]
+    if not len(times) or times[0] >= first_ms + step or end_ms - times[-1] > step:
+        return False
+    return len(times) < 2 or np.diff(times).max() <= step
+
+
+tick_archive = TickArchive()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tick archive maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    compact = sub.add_parser("compact", help="compact a journal day into the archive")
+    compact.add_argument("day", help="YYYY-MM-DD")
+    compact.add_argument("--journal", default=JOURNAL_DIR)
+    compact.add_argument("--archive", default=ARCHIVE_DIR)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(compact_day(args.day, args.journal, args.archive))
@@ -0,0 +1,117 @@
+import logging
+import os
+import threading
+
+import numpy as np
+
+from services.market_data.tick_store import tick_store
+
+logger = logging.getLogger("tick_history")
+
+DEFAULT_CAPACITY = int(os.getenv("TICK_HISTORY_CAPACITY", "256"))
+
+HISTORY_FIELDS = {
+    "ltp": np.float64,
+    "ltq": np.int64,
+    "ltt": np.int64,  # exchange last trade time, epoch ms
+    "vtt": np.int64,
+    "oi": np.float64,
+}
+
+MODE_VIEWS = "views"
+MODE_COPY = "copy"
+
+
+class TickRingBuffer:
+    """Fixed-capacity ring of recent ticks for one instrument.
+
+    Arrays are preallocated once; appends overwrite the oldest slot.
+    """
+
+    __slots__ = ("capacity", "columns", "head", "count")
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.columns = {
+            name: np.zeros(capacity, dtype=dtype) for name, dtype in HISTORY_FIELDS.items()
+        }
+        self.head = 0  # next slot to write
+        self.count = 0
+
+    def append(self, tick):
+        head = self.head
+        cols = self.columns
+        cols["ltp"][head] = tick.ltp
+        cols["ltq"][head] = tick.ltq or 0
+        cols["ltt"][head] = tick.ltt or 0
+        cols["vtt"][head] = tick.vtt or 0
+        cols["oi"][head] = tick.oi or 0.0
+        self.head = (head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def last_views(self, n, field="ltp"):
+        """Zero-copy (older, newer) slices covering the last n values.
+
+        ``older`` is empty unless the window wraps around the ring end.
+        """
+        n = min(n, self.count)
+        column = self.columns[field]
+        start = self.head - n
+        if start >= 0:
+            return column[start:start], column[start : self.head]
+        return column[start:], column[: self.head]
+
+    def last(self, n, field="ltp", mode=MODE_COPY):
+        older, newer = self.last_views(n, field)
+        if mode == MODE_VIEWS:
+            return older, newer
+        if not len(older):
+            return newer.copy()
+        return np.concatenate((older, newer))
+
+    def __len__(self):
+        return self.count
+
+
+class TickHistory:
+    """Ring buffers per subscribed instrument, filled by the feed hub."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.buffers = {}  # instrument_key -> TickRingBuffer
+        self.lock = threading.Lock()
+
+    def update_many(self, ticks):
+        buffers = self.buffers
+        with self.lock:
+            for tick in ticks:
+                if tick.ltp is None:
+                    continue
+                buffer = buffers.get(tick.instrument_key)
+                if buffer is None:
+                    buffer = TickRingBuffer(self.capacity)
+                    buffers[tick.instrument_key] = buffer
+                buffer.append(tick)
+
+    def buffer(self, symbol_or_key):
+        return self.buffers.get(tick_store.resolve(symbol_or_key))
+
+    def last(self, symbol_or_key, n, field="ltp", mode=MODE_COPY):
+        """Last n values of ``field`` (oldest first), or None if never ticked.
+
+        mode="copy" returns one contiguous array, mode="views" returns the
+        zero-copy (older, newer) slice pair.
+        """
+        buffer = self.buffer(symbol_or_key)
+        if buffer is None:
+            return None
+        with self.lock:
+            return buffer.last(n, field, mode)
+
+    def count(self, symbol_or_key):
+        buffer = self.buffer(symbol_or_key)
+        return len(buffer) if buffer else 0
+
+
+tick_history = TickHistory()
@@ -0,0 +1,231 @@
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger("tick_store")
+
+DEPTH_LEVELS = 5
+INITIAL_CAPACITY = 4096
+# Prices older than this are treated as missing so callers fall back to REST
+STALE_AFTER_SECONDS = 60
+
+SCALAR_FIELDS = {
+    "ltp": np.float64,
+    "ltq": np.int64,
+    "cp": np.float64,
+    "ltt": np.int64,
+    "atp": np.float64,
+    "vtt": np.int64,
+    "oi": np.float64,
+    "iv": np.float64,
+    "tbq": np.float64,
+    "tsq": np.float64,
+    "updated_at": np.float64,  # wall clock seconds when the row was written
+}
+DEPTH_FIELDS = {
+    "bid_q": np.int64,
+    "bid_p": np.float64,
+    "ask_q": np.int64,
+    "ask_p": np.float64,
+}
+
+
+def _empty(dtype, shape):
+    if np.issubdtype(dtype, np.floating):
+        return np.full(shape, np.nan, dtype=dtype)
+    return np.zeros(shape, dtype=dtype)
+
+
+class LatestTickStore:
+    """Process-wide latest value per instrument, stored column by column.
+
+    Each instrument key owns a row index; every field is a NumPy column so
+    the feed writes a tick in O(1) and readers pull whole columns for many
+    instruments at once with fancy indexing.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.lock = threading.Lock()
+        self.index = {}  # instrument_key -> row
+        self.keys = []
+        self.aliases = None  # trading symbol -> instrument_key, loaded lazily
+        self.capacity = 0
+        self.columns = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        columns = {}
+        for name, dtype in SCALAR_FIELDS.items():
+            columns[name] = _empty(dtype, capacity)
+        for name, dtype in DEPTH_FIELDS.items():
+            columns[name] = _empty(dtype, (capacity, DEPTH_LEVELS))
+
+        for name, old in self.columns.items():
+            columns[name][: self.capacity] = old
+        self.columns = columns
+        self.capacity = capacity
+
+    def row_for(self, instrument_key) -> int:
+        row = self.index.get(instrument_key)
+        if row is None:
+            row = len(self.keys)
+            if row >= self.capacity:
+                self._allocate(self.capacity * 2)
+            self.index[instrument_key] = row
+            self.keys.append(instrument_key)
+        return row
+
+    def _write(self, tick, now):
+        row = self.row_for(tick.instrument_key)
+        cols = self.columns
+        cols["ltp"][row] = tick.ltp
+        cols["ltq"][row] = tick.ltq or 0
+        cols["ltt"][row] = tick.ltt or 0
+        if tick.cp is not None:
+            cols["cp"][row] = tick.cp
+        # ltpc-only ticks leave the full-mode columns as they were
+        if tick.atp is not None:
+            cols["atp"][row] = tick.atp
+            cols["oi"][row] = tick.oi
+            cols["iv"][row] = tick.iv
+            cols["tbq"][row] = tick.tbq
+            cols["tsq"][row] = tick.tsq
+        if tick.vtt is not None:
+            cols["vtt"][row] = tick.vtt
+        if tick.bid_ask:
+            for level, (bid_q, bid_p, ask_q, ask_p) in enumerate(
+                tick.bid_ask[:DEPTH_LEVELS]
+            ):
+                cols["bid_q"][row, level] = bid_q
+                cols["bid_p"][row, level] = bid_p
+                cols["ask_q"][row, level] = ask_q
+                cols["ask_p"][row, level] = ask_p
+        cols["updated_at"][row] = now
+
+    def update(self, tick):
+        with self.lock:
+            self._write(tick, time.time())
+
+    def update_many(self, ticks):
+        now = time.time()
+        with self.lock:
+            for tick in ticks:
+                if tick.ltp is not None:
+                    self._write(tick, now)
+
+    def resolve(self, symbol_or_key):
+        """Instrument key for an Upstox key or a plain trading symbol."""
+        if "|" in symbol_or_key:
+            return symbol_or_key
+        if self.aliases is None:
+            self.aliases = load_symbol_aliases()
+        return self.aliases.get(symbol_or_key.upper(), symbol_or_key)
+
+    def rows(self, symbols_or_keys) -> np.ndarray:
+        """Row index per key, -1 where the instrument has never ticked."""
+        index = self.index
+        return np.fromiter(
+            (index.get(self.resolve(k), -1) for k in symbols_or_keys),
+            dtype=np.int64,
+            count=len(symbols_or_keys),
+        )
+
+    def get(self, symbols_or_keys, fields=("ltp",), max_age=None) -> dict:
+        """Vectorized bulk read: {field: array aligned with symbols_or_keys}.
+
+        Unknown or stale instruments read as NaN (float columns) or 0.
+        """
+        rows = self.rows(symbols_or_keys)
+        missing = rows < 0
+        safe_rows = np.where(missing, 0, rows)
+
+        with self.lock:
+            if max_age is not None:
+                age = time.time() - self.columns["updated_at"][safe_rows]
+                missing = missing | ~(age <= max_age)
+            result = {}
+            for field in fields:
+                column = self.columns[field]
+                values = column[safe_rows]
+                if missing.any():
+                    values = values.astype(np.float64) if values.dtype.kind == "i" else values
+                    values[missing] = np.nan
+                result[field] = values
+        return result
+
+    def get_ltp(self, symbols_or_keys, max_age=STALE_AFTER_SECONDS) -> np.ndarray:
+        return self.get(symbols_or_keys, ("ltp",), max_age=max_age)["ltp"]
+
+    def ltp(self, symbol_or_key, max_age=STALE_AFTER_SECONDS):
+        """Single latest price, or None when unknown or stale."""
+        row = self.index.get(self.resolve(symbol_or_key))
+        if row is None:
+            return None
+        cols = self.columns
+        if max_age is not None and time.time() - cols["updated_at"][row] > max_age:
+            return None
+        value = cols["ltp"][row]
+        return None if np.isnan(value) else float(value)
+
+    def quotes(self, symbols_or_keys, fields=None, max_age=None) -> dict:
+        """JSON-ready {key: {field: value}} for the REST endpoint."""
+        fields = list(fields or SCALAR_FIELDS)
+        unknown = [f for f in fields if f not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown quote fields: {unknown}")
+
+        columns = list(dict.fromkeys(fields + ["updated_at"]))
+        data = self.get(symbols_or_keys, columns, max_age=max_age)
+        found = ~np.isnan(data["updated_at"])
+        quotes = {}
+        for i, key in enumerate(symbols_or_keys):
+            if not found[i]:
+                quotes[key] = None
+                continue
+            quote = {}
+            for field in fields:
+                value = data[field][i]
+                if self.columns[field].dtype.kind == "i":
+                    value = value.astype(np.int64)
+                quote[field] = value.tolist() if value.ndim else value.item()
+            quotes[key] = quote
+        return quotes
+
+
+def load_symbol_aliases(path="data/upstox_instruments.json") -> dict:
+    """Map NSE/BSE equity trading symbols to Upstox instrument keys."""
+    file_path = Path(path)
+    if not file_path.exists():
+        return {}
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            instruments = json.load(f)
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to load instrument aliases: {e}")
+        return {}
+
+    aliases = {}
+    for instr in instruments:
+        key = instr.get("instrument_key")
+        symbol = (instr.get("trading_symbol") or "").upper()
+        if not key or not symbol or instr.get("instrument_type") != "EQ":
+            continue
+        # Prefer NSE when a symbol is listed on both exchanges
+        if symbol not in aliases or key.startswith("NSE_EQ"):
+            aliases[symbol] = key
+    return aliases
+
+
+def get_live_price(symbol, fallback=None, max_age=STALE_AFTER_SECONDS):
+    """Latest streamed price for ``symbol``; calls ``fallback()`` if missing."""
+    price = tick_store.ltp(symbol, max_age=max_age)
+    if price is None and fallback is not None:
+        price = fallback()
+    return price
+
+
+tick_store = LatestTickStore()
@@ -7,6 +7,8 @@ import yfinance as yf
 import joblib
 from sklearn.ensemble import RandomForestClassifier
 
+from strategies import indicators
+
 logger = logging.getLogger(__name__)
 
 class StrategyService:
@@ -63,11 +65,7 @@ class StrategyService:
 
     def _calculate_rsi(self, prices: pd.Series, period: int = 14) -> pd.Series:
         """Calculate RSI technical indicator"""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        return 100 - (100 / (1 + rs))
+        return pd.Series(indicators.rsi(prices.to_numpy(), period), index=prices.index)
 
     def _generate_signals(self, data: pd.DataFrame) -> str:
         """Generate trading signals based on technical analysis"""
@@ -1,10 +1,18 @@
 import joblib
 import pandas as pd
 
+from strategies.fibonacci_levels import fibonacci_levels
+from strategies.indicators import ema, rolling_std, rolling_zscore
+
 model = joblib.load("models/fib_ai_model.pkl")
 
 
-def detect_fib_trade_with_ai(df):
+def detect_fib_trade_with_ai(df, lookback=None):
+    """AI-filtered breakouts above the 0.382 retracement.
+
+    Without ``lookback`` the levels span the whole frame; with it each row is
+    judged against the swing high/low of the ``lookback`` bars before it.
+    """
     high = df["High"].max()
     low = df["Low"].min()
     diff = high - low
@@ -18,28 +26,34 @@ def detect_fib_trade_with_ai(df):
         "1.0": low,
     }
 
-    df["ema_20"] = df["Close"].ewm(span=20).mean()
-    df["rsi_14"] = (
-        df["Close"].rolling(14).apply(lambda x: (x[-1] - x.mean()) / x.std() * 100)
-    )
-    df["volatility"] = df["Close"].rolling(10).std()
+    close = df["Close"].to_numpy()
+    df["ema_20"] = ema(close, 20)
+    df["rsi_14"] = rolling_zscore(close, 14)
+    df["volatility"] = rolling_std(close, 10)
+    if lookback:
+        rolling = fibonacci_levels(df["High"].to_numpy(), df["Low"].to_numpy(), lookback)
+        df["fib_382"] = pd.Series(rolling["0.382"], index=df.index).shift(1)
+        rolling["0.0"], rolling["1.0"] = rolling["high"], rolling["low"]
+        levels = {name: float(rolling[name][-1]) for name in levels}
+    else:
+        df["fib_382"] = levels["0.382"]
     df.dropna(inplace=True)
 
-    signals = []
-
-    for _, row in df.iterrows():
-        close = row["Close"]
-        if close > levels["0.382"]:  # In breakout zone
-            features = [[row["Close"], row["ema_20"], row["rsi_14"], row["volatility"]]]
-            prediction = model.predict(features)
-            if prediction[0] == 1:
-                signals.append(
-                    {
-                        "timestamp": row["timestamp"],
-                        "price": close,
-                        "type": "BUY",
-                        "signal": "FIB_AI_APPROVED",
-                    }
-                )
+    # In breakout zone; the model only sees those rows, in one call
+    candidates = df[df["Close"] > df["fib_382"]]
+    if candidates.empty:
+        return [], levels
+    features = candidates[["Close", "ema_20", "rsi_14", "volatility"]].to_numpy()
+    approved = candidates[model.predict(features) == 1]
+
+    signals = [
+        {
+            "timestamp": timestamp,
+            "price": price,
+            "type": "BUY",
+            "signal": "FIB_AI_APPROVED",
+        }
+        for timestamp, price in zip(approved["timestamp"], approved["Close"])
+    ]
 
     return signals, levels
@@ -1,5 +1,4 @@
 import numpy as np
-import pandas as pd
 from sqlalchemy.orm import Session
 from database.models import HistoricalData, TradeSignal
 from sklearn.preprocessing import MinMaxScaler
@@ -17,19 +16,12 @@ def detect_trade_signal(user_id: int, symbol: str, db: Session):
     if len(historical_data) < 60:  # Minimum required data
         return {"error": "Not enough historical data for AI analysis."}
 
-    df = pd.DataFrame([{
-        "date": entry.date, 
-        "close": entry.close,
-        "open": entry.open,
-        "high": entry.high,
-        "low": entry.low
-    } for entry in historical_data])
-
-    df.set_index("date", inplace=True)
+    # Daily closes, as the model was trained on, oldest first (the query is newest first)
+    closes = np.array([entry.close for entry in reversed(historical_data)], dtype=float)
 
     # Normalize the data
     scaler = MinMaxScaler(feature_range=(0,1))
-    scaled_data = scaler.fit_transform(df["close"].values.reshape(-1,1))
+    scaled_data = scaler.fit_transform(closes.reshape(-1,1))
 
     X_test = np.array([scaled_data[-60:]])  # Last 60 price points
     X_test = np.reshape(X_test, (X_test.shape[0], X_test.shape[1], 1))
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from database.models import UserCapital
 from services.dhan_client import get_dhan_client
+from services.market_data.tick_store import get_live_price
 
 def calculate_trade_size(user_id: int, symbol: str, db: Session):
     """AI determines trade size based on user capital & risk level."""
@@ -10,8 +11,11 @@ def calculate_trade_size(user_id: int, symbol: str, db: Session):
     if not user_capital:
         return {"error": "User capital not found"}
 
-    # Get live stock price
-    live_price = get_dhan_client(user_id, db).get_market_data(symbol, exchange="NSE")["ltp"]
+    # Get live stock price (streamed feed first, Dhan REST if we have no fresh tick)
+    live_price = get_live_price(
+        symbol,
+        fallback=lambda: get_dhan_client(user_id, db).get_market_data(symbol, exchange="NSE")["ltp"],
+    )
 
     # Calculate trade size
     risk_per_trade = (user_capital.total_capital * user_capital.risk_percentage) / 100
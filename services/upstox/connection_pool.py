@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import math
+import os
+import time
+
+from services.upstox.subscription_manager import (
+    MODE_FULL,
+    MODE_FULL_D30,
+    MODE_LTPC,
+    MODE_OPTION_GREEKS,
+)
+from services.upstox.ws_client import UpstoxWebSocketClient
+
+logger = logging.getLogger("connection_pool")
+
+# Broker limits per connection, by subscription mode (Upstox V3 feed)
+KEY_LIMITS = {
+    MODE_LTPC: int(os.getenv("UPSTOX_LTPC_KEYS_PER_CONNECTION", "5000")),
+    MODE_OPTION_GREEKS: int(os.getenv("UPSTOX_GREEKS_KEYS_PER_CONNECTION", "3000")),
+    MODE_FULL: int(os.getenv("UPSTOX_FULL_KEYS_PER_CONNECTION", "2000")),
+    MODE_FULL_D30: int(os.getenv("UPSTOX_FULL_D30_KEYS_PER_CONNECTION", "50")),
+}
+MAX_CONNECTIONS = int(os.getenv("UPSTOX_MAX_CONNECTIONS", "5"))
+# Connections are filled up to this share of capacity to leave room for adds
+TARGET_FILL = 0.9
+
+
+def key_weight(mode) -> float:
+    """Share of one connection's capacity a key in ``mode`` uses."""
+    return 1.0 / KEY_LIMITS[mode]
+
+
+def plan_connections(wanted, current=None, max_connections=MAX_CONNECTIONS):
+    """Assign keys to connections.
+
+    ``wanted`` is {instrument_key: mode}; ``current`` the previous plan as a
+    list of {instrument_key: mode} per connection. Keys stay where they are
+    when possible so a rebalance only moves what it has to; new keys go to
+    the least loaded connection, heaviest modes first, and full-mode keys are
+    evened out across connections.
+
+    Returns (plan, dropped_keys).
+    """
+    current = current or []
+    total = sum(key_weight(mode) for mode in wanted.values())
+    needed = max(1, math.ceil(total / TARGET_FILL)) if wanted else 0
+    count = min(needed, max_connections)
+
+    plan = [dict() for _ in range(count)]
+    load = [0.0] * count
+    placed = set()
+
+    # Keep existing placements that still fit
+    for index, assigned in enumerate(current[:count]):
+        for key in assigned:
+            mode = wanted.get(key)
+            if mode is None:
+                continue
+            weight = key_weight(mode)
+            if load[index] + weight > 1.0:
+                continue
+            plan[index][key] = mode
+            load[index] += weight
+            placed.add(key)
+
+    # Even out full-mode keys so no socket carries most of the depth traffic
+    if count > 1:
+        heavy = [[k for k, m in p.items() if m != MODE_LTPC] for p in plan]
+        target = math.ceil(sum(len(h) for h in heavy) / count)
+        for index in range(count):
+            while len(heavy[index]) > target:
+                key = heavy[index].pop()
+                mode = plan[index].pop(key)
+                load[index] -= key_weight(mode)
+                placed.discard(key)
+
+    # Place the rest, heaviest first, on the least loaded connection
+    dropped = []
+    pending = sorted(
+        (k for k in wanted if k not in placed), key=lambda k: -key_weight(wanted[k])
+    )
+    for key in pending:
+        mode = wanted[key]
+        weight = key_weight(mode)
+        index = min(range(count), key=load.__getitem__) if count else None
+        if index is None or load[index] + weight > 1.0:
+            dropped.append(key)
+            continue
+        plan[index][key] = mode
+        load[index] += weight
+
+    return plan, dropped
+
+
+class PooledConnection:
+    """One upstream socket of the pool plus its traffic counters."""
+
+    def __init__(self, index, client):
+        self.index = index
+        self.client = client
+        self.keys = {}  # instrument_key -> mode
+        self.task = None
+        self.started_at = time.monotonic()
+        self.messages = 0
+        self.ticks = 0
+        self.last_sample = (self.started_at, 0)
+
+    def record(self, data: dict):
+        self.messages += 1
+        if data.get("type") == "live_feed":
+            self.ticks += len(data.get("data") or ())
+
+    def stats(self):
+        now = time.monotonic()
+        sampled_at, sampled_messages = self.last_sample
+        self.last_sample = (now, self.messages)
+        elapsed = max(now - sampled_at, 1e-9)
+        uptime = max(now - self.started_at, 1e-9)
+        full_keys = sum(1 for mode in self.keys.values() if mode != MODE_LTPC)
+        return {
+            "connection": self.index,
+            "keys": len(self.keys),
+            "full_keys": full_keys,
+            "load": round(sum(key_weight(m) for m in self.keys.values()), 3),
+            "messages": self.messages,
+            "ticks": self.ticks,
+            "msg_rate": round((self.messages - sampled_messages) / elapsed, 2),
+            "avg_msg_rate": round(self.messages / uptime, 2),
+        }
+
+
+class FeedConnectionPool:
+    """Upstream connections sized to the subscription set.
+
+    ``set_keys`` can be called at any time; the pool opens or closes sockets
+    as the set grows or shrinks and moves keys between them through each
+    client's subscription manager, so only the deltas go upstream.
+    """
+
+    def __init__(
+        self,
+        access_token,
+        callback,
+        on_auth_error=None,
+        decoder="tick",
+        max_connections=MAX_CONNECTIONS,
+    ):
+        self.access_token = access_token
+        self.callback = callback
+        self.on_auth_error = on_auth_error
+        self.decoder = decoder
+        self.max_connections = max_connections
+        self.connections = []
+        self.dropped = []
+        self.stopped = False
+
+    async def _auth_error(self):
+        # Sockets of a stopped pool may still be winding down; stay quiet
+        if self.stopped or not self.on_auth_error:
+            return
+        await self.on_auth_error()
+
+    def _open(self, index):
+        connection = None
+
+        async def dispatch(data):
+            connection.record(data)
+            await self.callback(data)
+
+        client = UpstoxWebSocketClient(
+            access_token=self.access_token,
+            instrument_keys=[],
+            callback=dispatch,
+            stop_callback=lambda: logger.info(f"🛑 Upstream connection {index} stopped."),
+            on_auth_error=self._auth_error,
+            decoder=self.decoder,
+        )
+        connection = PooledConnection(index, client)
+        return connection
+
+    def set_keys(self, wanted):
+        """Apply a new subscription set: list of keys (full mode) or {key: mode}."""
+        if not isinstance(wanted, dict):
+            wanted = dict.fromkeys(wanted, MODE_FULL)
+
+        plan, self.dropped = plan_connections(
+            wanted, [c.keys for c in self.connections], self.max_connections
+        )
+        if self.dropped:
+            logger.warning(
+                f"⚠️ {len(self.dropped)} key(s) exceed {self.max_connections} "
+                f"connection(s) and are not streamed"
+            )
+
+        while len(self.connections) < len(plan):
+            self.connections.append(self._open(len(self.connections)))
+
+        for connection, assigned in zip(self.connections, plan):
+            self._apply(connection, assigned)
+
+        for connection in self.connections[len(plan):]:
+            connection.client.stop()
+        del self.connections[len(plan):]
+
+        for connection in self.connections:
+            if connection.task is None:
+                connection.task = asyncio.create_task(connection.client.connect_and_stream())
+
+        logger.info(
+            f"📡 Pool: {len(wanted) - len(self.dropped)} key(s) over "
+            f"{len(self.connections)} connection(s)"
+        )
+
+    def _apply(self, connection, assigned):
+        client, old = connection.client, connection.keys
+        removed = {}
+        for key, mode in old.items():
+            if assigned.get(key) != mode:
+                removed.setdefault(mode, []).append(key)
+        added = {}
+        for key, mode in assigned.items():
+            if old.get(key) != mode:
+                added.setdefault(mode, []).append(key)
+
+        for mode, keys in added.items():
+            client.subscribe(keys, mode)
+        for mode, keys in removed.items():
+            client.unsubscribe(keys, mode)
+        connection.keys = dict(assigned)
+
+    def stop(self):
+        self.stopped = True
+        for connection in self.connections:
+            connection.client.stop()
+        self.connections = []
+
+    def stats(self):
+        return {
+            "connections": [c.stats() for c in self.connections],
+            "dropped": len(self.dropped),
+        }
@@ -0,0 +1,155 @@
+import logging
+
+from services.upstox.tick_decoder import Tick, parse_live_feed
+
+try:
+    import msgpack
+except ImportError:  # compact encoding is opt-in, JSON keeps working without it
+    msgpack = None
+
+logger = logging.getLogger("downstream_codec")
+
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+
+# Field order of the compact protocol; clients receive it in the handshake and
+# deltas refer to fields by their index in this tuple.
+FIELDS = (
+    "ltp",
+    "ltq",
+    "cp",
+    "last_trade_time",
+    "atp",
+    "vtt",
+    "oi",
+    "iv",
+    "tbq",
+    "tsq",
+    "bid_ask",  # flat [bidQ, bidP, askQ, askP, ...] per depth level
+    "greeks",  # [delta, theta, gamma, vega, rho]
+    "ohlc",  # [[interval, open, high, low, close, vol, ts], ...]
+)
+
+
+def negotiate_encoding(requested) -> str:
+    """Pick the downstream encoding from the client's ?encoding= request."""
+    requested = (requested or ENCODING_JSON).lower()
+    if requested == ENCODING_MSGPACK:
+        if msgpack is None:
+            logger.warning("⚠️ msgpack not installed, falling back to JSON")
+            return ENCODING_JSON
+        return ENCODING_MSGPACK
+    return ENCODING_JSON
+
+
+def _tick_values(tick: Tick):
+    return (
+        tick.ltp,
+        tick.ltq,
+        tick.cp,
+        tick.ltt,
+        tick.atp,
+        tick.vtt,
+        tick.oi,
+        tick.iv,
+        tick.tbq,
+        tick.tsq,
+        [v for q in tick.bid_ask for v in q] if tick.bid_ask else None,
+        list(tick.greeks) if tick.greeks else None,
+        [list(o) for o in tick.ohlc] if tick.ohlc else None,
+    )
+
+
+def _parsed_values(parsed: dict):
+    """Same as _tick_values for a parse_live_feed() result (legacy decoder)."""
+    bid_ask = parsed.get("bid_ask") or []
+    greeks = parsed.get("greeks") or {}
+    ohlc = parsed.get("ohlc") or []
+    return (
+        parsed.get("ltp"),
+        parsed.get("ltq"),
+        parsed.get("cp"),
+        parsed.get("last_trade_time"),
+        parsed.get("atp"),
+        parsed.get("vtt"),
+        parsed.get("oi"),
+        parsed.get("iv"),
+        parsed.get("tbq"),
+        parsed.get("tsq"),
+        [q.get(k) for q in bid_ask for k in ("bidQ", "bidP", "askQ", "askP")] or None,
+        [greeks.get(k) for k in ("delta", "theta", "gamma", "vega", "rho")] if greeks else None,
+        [
+            [o.get(k) for k in ("interval", "open", "high", "low", "close", "vol", "ts")]
+            for o in ohlc
+        ]
+        or None,
+    )
+
+
+class DownstreamEncoder:
+    """Per-connection compact encoder with integer ids and field deltas.
+
+    The handshake assigns an integer id to every instrument of the universe.
+    Each live_feed message then carries, per instrument, only the fields that
+    changed since the last message sent to this client.
+    """
+
+    def __init__(self, instrument_keys, encoding=ENCODING_MSGPACK):
+        self.encoding = encoding
+        self.ids = {key: i for i, key in enumerate(instrument_keys)}
+        self.last_sent = {}  # id -> list of last values sent
+
+    def handshake(self) -> dict:
+        return {
+            "type": "handshake",
+            "encoding": self.encoding,
+            "fields": list(FIELDS),
+            "instruments": self.ids,
+        }
+
+    def _instrument_id(self, key, new_ids):
+        instrument_id = self.ids.get(key)
+        if instrument_id is None:
+            instrument_id = len(self.ids)
+            self.ids[key] = instrument_id
+            new_ids[key] = instrument_id
+        return instrument_id
+
+    def encode_live_feed(self, batch: dict, market_open: bool) -> bytes:
+        """Encode {instrument_key: Tick | MessageToDict feed} as a delta message.
+
+        Wire format (msgpack map):
+            t: "f"
+            m: market open flag
+            n: {instrument_key: id} for instruments not in the handshake
+            d: [[id, field_index, value, field_index, value, ...], ...]
+        """
+        new_ids = {}
+        deltas = []
+        for key, item in batch.items():
+            if isinstance(item, Tick):
+                values = _tick_values(item)
+            else:
+                values = _parsed_values(parse_live_feed({key: item}).get(key, {}))
+            instrument_id = self._instrument_id(key, new_ids)
+            previous = self.last_sent.get(instrument_id)
+
+            if previous is None:
+                previous = [None] * len(FIELDS)
+                self.last_sent[instrument_id] = previous
+
+            changed = [instrument_id]
+            for index, value in enumerate(values):
+                if value is None or value == previous[index]:
+                    continue
+                previous[index] = value
+                changed.append(index)
+                changed.append(value)
+
+            if len(changed) > 1:
+                deltas.append(changed)
+
+        message = {"t": "f", "m": market_open, "d": deltas}
+        if new_ids:
+            message["n"] = new_ids
+        return msgpack.packb(message, use_bin_type=True)
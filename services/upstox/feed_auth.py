@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import time
+
+import httpx
+
+logger = logging.getLogger("feed_auth")
+
+# Point at services/upstox/simulator.py to run the feed path offline
+AUTHORIZE_URL = os.getenv(
+    "UPSTOX_FEED_AUTHORIZE_URL",
+    "https://api.upstox.com/v3/feed/market-data-feed/authorize",
+)
+AUTHORIZE_TIMEOUT = float(os.getenv("UPSTOX_AUTHORIZE_TIMEOUT", "10"))
+# A prefetched URL older than this is thrown away and fetched again
+PREFETCH_TTL_SECONDS = float(os.getenv("UPSTOX_PREFETCH_TTL", "30"))
+
+_http_client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide pooled client so reconnects reuse TLS connections."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=AUTHORIZE_TIMEOUT,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+
+
+class FeedAuthorizer:
+    """Async market-feed authorization with single-flight and prefetch.
+
+    Concurrent authorize calls for the same (access token, consumer) share
+    one HTTP request. Authorized URLs are meant for one socket, so different
+    consumers (upstream connections) each get their own; a consumer that
+    expects to reconnect can ``prefetch`` its next URL ahead of time.
+    """
+
+    def __init__(self):
+        self.inflight = {}  # (access_token, consumer) -> Task
+        self.prefetching = {}  # (access_token, consumer) -> Task not yet claimed
+        self.prefetched = {}  # (access_token, consumer) -> (result, fetched_at)
+        self.token_lookups = {}  # user_email -> Task
+
+    async def _fetch(self, access_token) -> dict:
+        response = await get_http_client().get(
+            AUTHORIZE_URL,
+            headers={"Authorization": f"Bearer {access_token}", "Accept": "application/json"},
+        )
+        try:
+            return response.json()
+        except ValueError:
+            return {"status": "error", "http_status": response.status_code}
+
+    def _start(self, key, access_token):
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(access_token))
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        return task
+
+    async def authorize(self, access_token, consumer=None) -> dict:
+        """Raw authorize response ({"status": ..., "data": {...}})."""
+        key = (access_token, consumer)
+        prefetched = self.prefetched.pop(key, None)
+        if prefetched:
+            result, fetched_at = prefetched
+            if time.monotonic() - fetched_at <= PREFETCH_TTL_SECONDS:
+                return result
+
+        # Claim a prefetch still in flight so it isn't stored for reuse
+        task = self.prefetching.pop(key, None) or self._start(key, access_token)
+        return await asyncio.shield(task)
+
+    async def authorized_url(self, access_token, consumer=None) -> str:
+        result = await self.authorize(access_token, consumer)
+        if result.get("status") != "success":
+            raise PermissionError(f"Feed authorization failed: {result}")
+        return result["data"]["authorized_redirect_uri"]
+
+    def prefetch(self, access_token, consumer=None):
+        """Fetch the next authorized URL in the background."""
+        key = (access_token, consumer)
+        if key in self.prefetched or key in self.prefetching or key in self.inflight:
+            return
+        task = self._start(key, access_token)
+        self.prefetching[key] = task
+
+        def store(done):
+            if self.prefetching.get(key) is not done:
+                return  # already handed to an authorize() caller
+            del self.prefetching[key]
+            if done.cancelled() or done.exception() is not None:
+                return
+            result = done.result()
+            if result.get("status") == "success":
+                self.prefetched[key] = (result, time.monotonic())
+
+        task.add_done_callback(store)
+
+    async def access_token(self, user_email, lookup):
+        """Run the blocking DB lookup/refresh ``lookup(user_email)`` off the loop.
+
+        Concurrent callers for the same user share one lookup, so a burst of
+        reconnects refreshes an expired token only once.
+        """
+        task = self.token_lookups.get(user_email)
+        if task is None:
+            task = asyncio.create_task(asyncio.to_thread(lookup, user_email))
+            self.token_lookups[user_email] = task
+            task.add_done_callback(lambda _: self.token_lookups.pop(user_email, None))
+        return await asyncio.shield(task)
+
+    def forget(self, consumer):
+        """Drop prefetched URLs for a consumer that is shutting down."""
+        for key in [k for k in self.prefetched if k[1] == consumer]:
+            del self.prefetched[key]
+        for key in [k for k in self.prefetching if k[1] == consumer]:
+            del self.prefetching[key]
+
+
+feed_authorizer = FeedAuthorizer()
@@ -0,0 +1,163 @@
+import functools
+import hashlib
+import logging
+
+from services.market_data.bar_builder import bar_builder
+from services.market_data.tick_history import tick_history
+from services.market_data.tick_store import tick_store
+from services.upstox.connection_pool import FeedConnectionPool
+
+logger = logging.getLogger("feed_hub")
+
+
+def universe_id(instrument_keys) -> str:
+    """Stable id for an instrument universe, independent of key order."""
+    digest = hashlib.sha1("\n".join(sorted(set(instrument_keys))).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class FeedHub:
+    """One upstream connection set per instrument universe.
+
+    Every frame is decoded once by the upstream clients and fanned out to all
+    subscribed viewers. Subscribers are reference counted; the upstream
+    sockets are stopped when the last one leaves.
+    """
+
+    def __init__(self, hub_id, instrument_keys, decoder="tick"):
+        self.hub_id = hub_id
+        self.instrument_keys = list(instrument_keys)
+        self.decoder = decoder
+        self.subscribers = {}  # token -> callback(data)
+        self.access_tokens = {}  # token -> upstox access token
+        self.auth_error_handlers = {}  # token -> callable
+        self.upstream = None  # FeedConnectionPool while streaming
+        self.upstream_owner = None
+        self.market_status = None
+
+    @property
+    def refcount(self):
+        return len(self.subscribers)
+
+    def add_subscriber(self, token, access_token, callback, on_auth_error=None):
+        self.subscribers[token] = callback
+        self.access_tokens[token] = access_token
+        if on_auth_error:
+            self.auth_error_handlers[token] = on_auth_error
+
+        if not self.upstream:
+            self._start_upstream(token)
+        elif self.market_status:
+            # Late joiners get the last known market status straight away
+            callback({"type": "market_info", "status": self.market_status})
+
+        logger.info(f"👥 Hub {self.hub_id}: {self.refcount} viewer(s)")
+
+    def remove_subscriber(self, token):
+        self.subscribers.pop(token, None)
+        self.access_tokens.pop(token, None)
+        self.auth_error_handlers.pop(token, None)
+
+        if not self.subscribers:
+            self.stop()
+        elif token == self.upstream_owner:
+            # Keep streaming on another viewer's token
+            self.stop()
+            self._start_upstream(next(iter(self.subscribers)))
+
+        logger.info(f"👥 Hub {self.hub_id}: {self.refcount} viewer(s)")
+
+    def _start_upstream(self, owner_token):
+        self.upstream_owner = owner_token
+        access_token = self.access_tokens[owner_token]
+
+        pool = FeedConnectionPool(access_token=access_token, callback=self._dispatch, decoder=self.decoder)
+        # Bound to this pool and owner: a stopped pool must not blame the next owner
+        pool.on_auth_error = functools.partial(self._handle_auth_error, owner_token, pool)
+        self.upstream = pool
+        pool.set_keys(self.instrument_keys)
+
+        logger.info(
+            f"📡 Hub {self.hub_id}: started {len(self.upstream.connections)} upstream "
+            f"connection(s) for {len(self.instrument_keys)} keys"
+        )
+
+    def stats(self):
+        return {
+            "hub": self.hub_id,
+            "viewers": self.refcount,
+            "keys": len(self.instrument_keys),
+            "upstream": self.upstream.stats() if self.upstream else None,
+        }
+
+    async def _dispatch(self, data: dict):
+        if data.get("type") == "market_info":
+            self.market_status = data.get("status")
+        elif data.get("type") == "live_feed" and isinstance(data.get("data"), list):
+            tick_store.update_many(data["data"])
+            tick_history.update_many(data["data"])
+            bar_builder.update_many(data["data"])
+
+        for token, callback in list(self.subscribers.items()):
+            try:
+                callback(data)
+            except Exception as e:
+                logger.error(f"❌ Hub {self.hub_id}: dispatch to {token} failed: {e}")
+
+    async def _handle_auth_error(self, owner, pool):
+        if pool is not self.upstream or owner != self.upstream_owner:
+            logger.info(f"🔐 Hub {self.hub_id}: ignoring auth error from a replaced upstream ({owner})")
+            return
+        handler = self.auth_error_handlers.get(owner)
+        logger.warning(f"🔐 Hub {self.hub_id}: upstream auth failed for {owner}")
+        if handler:
+            await handler()
+        # The owner's cleanup normally releases it; make sure we move on anyway
+        if owner in self.subscribers:
+            if hub_by_token.get(owner) == self.hub_id:
+                release_feed_hub(owner)
+            else:
+                self.remove_subscriber(owner)
+
+    def stop(self):
+        if self.upstream:
+            self.upstream.stop()
+        self.upstream = None
+        self.upstream_owner = None
+
+
+hubs = {}  # hub_id -> FeedHub
+hub_by_token = {}  # viewer token -> hub_id
+
+
+def acquire_feed_hub(
+    token, instrument_keys, access_token, callback, on_auth_error=None, decoder="tick"
+) -> FeedHub:
+    """Attach a viewer to the shared hub for this instrument universe."""
+    release_feed_hub(token)
+
+    hub_id = universe_id(instrument_keys)
+    hub = hubs.get(hub_id)
+    if hub is None:
+        hub = FeedHub(hub_id, instrument_keys, decoder=decoder)
+        hubs[hub_id] = hub
+
+    hub_by_token[token] = hub_id
+    hub.add_subscriber(token, access_token, callback, on_auth_error)
+    return hub
+
+
+def release_feed_hub(token):
+    """Detach a viewer; the hub shuts its upstream down at refcount zero."""
+    hub_id = hub_by_token.pop(token, None)
+    hub = hubs.get(hub_id)
+    if not hub:
+        return
+
+    hub.remove_subscriber(token)
+    if hub.refcount == 0:
+        hubs.pop(hub_id, None)
+        # Bars of keys no other hub streams would only go stale
+        streamed = {key for other in hubs.values() for key in other.instrument_keys}
+        bar_builder.evict([key for key in hub.instrument_keys if key not in streamed])
+        logger.info(f"🧹 Hub {hub_id} closed (no viewers left)")
@@ -5,16 +5,19 @@ import json
 import ssl
 import logging
 import websockets
-import requests
 
 from google.protobuf.json_format import MessageToDict
 from services.upstox.MarketDataFeed_pb2 import FeedResponse
+from services.upstox.feed_auth import feed_authorizer
+from services.upstox.tick_decoder import DEFAULT_DECODER, decode_frame, parse_live_feed
+from services.upstox.tick_journal import tick_journal
 
 logger = logging.getLogger(__name__)
 
 
 class UpstoxFeedManager:
-    def __init__(self):
+    def __init__(self, decoder=None):
+        self.decoder = (decoder or DEFAULT_DECODER).lower()
         self.websocket = None
         self.access_token = None
         self.clients = []
@@ -29,18 +32,26 @@ class UpstoxFeedManager:
 
     async def _connect_websocket(self):
         try:
-            ws_url = self._get_authorized_ws_url()
+            ws_url = await self._get_authorized_ws_url()
 
             ssl_context = ssl.create_default_context()
             ssl_context.check_hostname = False
             ssl_context.verify_mode = ssl.CERT_NONE
 
-            async with websockets.connect(ws_url, ssl=ssl_context) as ws:
+            async with websockets.connect(
+                ws_url, ssl=ssl_context if ws_url.startswith("wss") else None
+            ) as ws:
                 self.websocket = ws
                 self.connected = True
                 logger.info("✅ Connected to Upstox WebSocket")
 
                 async for message in ws:
+                    if self.decoder == "tick":
+                        frame = decode_frame(message)
+                        tick_journal.record(message, frame.ticks)
+                        await self._handle_tick_frame(frame)
+                        continue
+
                     decoded = self._decode_protobuf(message)
 
                     if decoded.get("type") == "market_info":
@@ -81,19 +92,23 @@ class UpstoxFeedManager:
         for ws in disconnected:
             self.clients.remove(ws)
 
+    async def _handle_tick_frame(self, frame):
+        if frame.type == "market_info":
+            await self._broadcast(
+                {"type": "market_info", "status": frame.segment_status or {}}
+            )
+        elif frame.type == "live_feed":
+            await self._broadcast(
+                {"type": "live_feed", "data": parse_live_feed(frame.ticks)}
+            )
+
     def _decode_protobuf(self, message):
         feed = FeedResponse()
         feed.ParseFromString(message)
         return MessageToDict(feed)
 
-    def _get_authorized_ws_url(self):
-        url = "https://api.upstox.com/v3/feed/market-data-feed/authorize"
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Accept": "application/json",
-        }
-        res = requests.get(url, headers=headers)
-        return res.json()["data"]["authorized_redirect_uri"]
+    async def _get_authorized_ws_url(self):
+        return await feed_authorizer.authorized_url(self.access_token, consumer=self)
 
 
 upstox_feed_manager = UpstoxFeedManager()
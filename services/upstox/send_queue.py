@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+logger = logging.getLogger("send_queue")
+
+# Max distinct instruments waiting for a slow client before the oldest are dropped
+DEFAULT_QUEUE_DEPTH = int(os.getenv("MARKET_WS_QUEUE_DEPTH", "5000"))
+# Max control messages (market_info, errors) waiting for a slow client
+CONTROL_QUEUE_DEPTH = 100
+
+
+class ClientSendQueue:
+    """Bounded, conflating outbound queue for one browser connection.
+
+    Upstream frames are offered without awaiting. Ticks are keyed by
+    instrument so a client that falls behind only ever receives the latest
+    value per instrument; the number of pending instruments is capped at
+    ``max_depth``. A single sender task drains the queue, so a slow socket
+    never spawns extra tasks or holds up other clients.
+    """
+
+    def __init__(self, name, send, max_depth=DEFAULT_QUEUE_DEPTH):
+        self.name = name
+        self.send = send  # async callable(message: dict)
+        self.max_depth = max_depth
+        self.control = deque()
+        self.pending = {}  # instrument_key -> latest tick (insertion ordered)
+        self.enqueued_at = {}  # instrument_key -> monotonic time of first pending tick
+        self.wakeup = asyncio.Event()
+        self.closed = False
+        self.task = None
+
+        self.ticks_in = 0
+        self.ticks_sent = 0
+        self.conflated = 0
+        self.dropped = 0
+        self.control_dropped = 0
+        self.messages_sent = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    def offer(self, data: dict):
+        """Queue an upstream message; never blocks."""
+        if self.closed:
+            return
+
+        if data.get("type") != "live_feed":
+            if len(self.control) >= CONTROL_QUEUE_DEPTH:
+                self.control.popleft()
+                self.control_dropped += 1
+            self.control.append(data)
+            self.wakeup.set()
+            return
+
+        payload = data.get("data") or {}
+        items = (
+            payload.items()
+            if isinstance(payload, dict)
+            else ((tick.instrument_key, tick) for tick in payload)
+        )
+
+        now = time.monotonic()
+        pending = self.pending
+        for key, tick in items:
+            self.ticks_in += 1
+            if key in pending:
+                self.conflated += 1
+            else:
+                if len(pending) >= self.max_depth:
+                    oldest = next(iter(pending))
+                    del pending[oldest]
+                    self.enqueued_at.pop(oldest, None)
+                    self.dropped += 1
+                self.enqueued_at[key] = now
+            pending[key] = tick
+
+        self.wakeup.set()
+
+    def take_ticks(self):
+        """Swap out everything pending and record how long it waited."""
+        batch, self.pending = self.pending, {}
+        enqueued_at, self.enqueued_at = self.enqueued_at, {}
+        if enqueued_at:
+            lag_ms = (time.monotonic() - min(enqueued_at.values())) * 1000
+            self.last_lag_ms = lag_ms
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        return batch
+
+    async def run(self):
+        while not self.closed:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+
+            # Only what is queued now, so a chatty upstream can't starve ticks
+            for _ in range(len(self.control)):
+                if self.closed:
+                    break
+                await self.send(self.control.popleft())
+                self.messages_sent += 1
+
+            if self.pending and not self.closed:
+                batch = self.take_ticks()
+                await self.send({"type": "live_feed", "data": batch})
+                self.messages_sent += 1
+                self.ticks_sent += len(batch)
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+        return self.task
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+        if self.task and self.task is not asyncio.current_task():
+            self.task.cancel()
+        self.pending.clear()
+        self.control.clear()
+
+    def stats(self):
+        return {
+            "client": self.name,
+            "pending": len(self.pending),
+            "max_depth": self.max_depth,
+            "ticks_in": self.ticks_in,
+            "ticks_sent": self.ticks_sent,
+            "conflated": self.conflated,
+            "dropped": self.dropped,
+            "control_dropped": self.control_dropped,
+            "messages_sent": self.messages_sent,
+            "last_lag_ms": round(self.last_lag_ms, 2),
+            "max_lag_ms": round(self.max_lag_ms, 2),
+        }
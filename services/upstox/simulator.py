@@ -0,0 +1,327 @@
+# services/upstox/simulator.py
+#
+# Local stand-in for the Upstox market data feed: the authorize endpoint and
+# the protobuf WebSocket on one port. Point the clients at it with
+#
+#     UPSTOX_FEED_AUTHORIZE_URL=http://127.0.0.1:8765/v3/feed/market-data-feed/authorize
+#
+# and run it from the repo root:
+#
+#     python -m services.upstox.simulator --rate 10000
+#     python -m services.upstox.simulator --replay data/tick_journal/2025-01-02/frames-0000.seg --speed 5
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+from http import HTTPStatus
+from urllib.parse import urlparse
+
+from websockets.asyncio.server import serve
+from websockets.datastructures import Headers
+from websockets.http11 import Response
+
+import services.upstox.MarketDataFeed_pb2 as pb
+from services.upstox.tick_journal import read_frames
+
+logger = logging.getLogger("feed_simulator")
+
+AUTHORIZE_PATH = "/v3/feed/market-data-feed/authorize"
+FEED_PATH = "/v3/feed/market-data-feed"
+
+REQUEST_MODES = {
+    "ltpc": pb.ltpc,
+    "full": pb.full_d5,
+    "option_greeks": pb.option_greeks,
+    "full_d30": pb.full_d30,
+}
+
+
+def market_info_frame(status="NORMAL_OPEN") -> bytes:
+    msg = pb.FeedResponse()
+    msg.type = pb.market_info
+    msg.currentTs = int(time.time() * 1000)
+    for segment in ("NSE_EQ", "NSE_FO", "BSE_EQ", "NSE_INDEX"):
+        msg.marketInfo.segmentStatus[segment] = pb.MarketStatus.Value(status)
+    return msg.SerializeToString()
+
+
+class SyntheticMarket:
+    """Random-walk prices for any instrument key, shared by all connections."""
+
+    def __init__(self, seed=7):
+        self.rng = random.Random(seed)
+        self.prices = {}
+        self.volumes = {}
+
+    def _step(self, key):
+        price = self.prices.get(key)
+        if price is None:
+            price = self.rng.uniform(50, 5000)
+            self.volumes[key] = 0
+        price = round(max(0.05, price * (1 + self.rng.gauss(0, 0.0005))), 2)
+        self.prices[key] = price
+        return price
+
+    def add_feed(self, msg, key, mode, now_ms):
+        rng = self.rng
+        price = self._step(key)
+        ltq = rng.randint(1, 500)
+        self.volumes[key] += ltq
+        feed = msg.feeds[key]
+        feed.requestMode = REQUEST_MODES.get(mode, pb.full_d5)
+
+        if mode == "ltpc":
+            ltpc = feed.ltpc
+        elif mode == "option_greeks":
+            flg = feed.firstLevelWithGreeks
+            ltpc = flg.ltpc
+            flg.firstDepth.bidQ = rng.randint(1, 5000)
+            flg.firstDepth.bidP = price - 0.05
+            flg.firstDepth.askQ = rng.randint(1, 5000)
+            flg.firstDepth.askP = price + 0.05
+            flg.optionGreeks.delta = rng.random()
+            flg.vtt = self.volumes[key]
+            flg.iv = rng.random()
+        else:
+            ff = feed.fullFeed.marketFF
+            ltpc = ff.ltpc
+            for level in range(30 if mode == "full_d30" else 5):
+                quote = ff.marketLevel.bidAskQuote.add()
+                quote.bidQ = rng.randint(1, 5000)
+                quote.bidP = price - 0.05 * (level + 1)
+                quote.askQ = rng.randint(1, 5000)
+                quote.askP = price + 0.05 * (level + 1)
+            ohlc = ff.marketOHLC.ohlc.add()
+            ohlc.interval = "1d"
+            ohlc.open, ohlc.high, ohlc.low, ohlc.close = price, price * 1.01, price * 0.99, price
+            ohlc.vol = self.volumes[key]
+            ohlc.ts = now_ms
+            ff.atp = price
+            ff.vtt = self.volumes[key]
+            ff.tbq = rng.randint(0, 100000)
+            ff.tsq = rng.randint(0, 100000)
+
+        ltpc.ltp = price
+        ltpc.ltt = now_ms
+        ltpc.ltq = ltq
+        ltpc.cp = price * 0.99
+
+    def frame(self, subscriptions: dict, keys, now_ms) -> bytes:
+        msg = pb.FeedResponse()
+        msg.type = pb.live_feed
+        msg.currentTs = now_ms
+        for key in keys:
+            self.add_feed(msg, key, subscriptions[key], now_ms)
+        return msg.SerializeToString()
+
+
+class FeedSimulator:
+    """Authorize + WebSocket server speaking the Upstox V3 feed protocol.
+
+    Synthetic mode streams ``rate`` ticks/sec per connection, spread round
+    robin over that connection's subscribed keys, every ``frame_interval``
+    seconds. Replay mode sends the frames of a capture file with their
+    recorded spacing. ``speed`` scales both.
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=8765,
+        rate=10000,
+        speed=1.0,
+        frame_interval=0.1,
+        replay=None,
+        loop_replay=False,
+        seed=7,
+    ):
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.speed = speed
+        self.frame_interval = frame_interval
+        self.replay = replay
+        self.loop_replay = loop_replay
+        self.market = SyntheticMarket(seed)
+        self.codes = itertools.count(1)
+        self.issued = set()
+        self.server = None
+
+        self.connections = 0
+        self.frames_sent = 0
+        self.ticks_sent = 0
+
+    @property
+    def authorize_url(self):
+        return f"http://{self.host}:{self.port}{AUTHORIZE_PATH}"
+
+    def process_request(self, connection, request):
+        path = urlparse(request.path)
+        if path.path == AUTHORIZE_PATH:
+            if not request.headers.get("Authorization", "").startswith("Bearer "):
+                return self._json(HTTPStatus.UNAUTHORIZED, {"status": "error"})
+            code = next(self.codes)
+            self.issued.add(str(code))
+            url = f"ws://{self.host}:{self.port}{FEED_PATH}?code={code}"
+            return self._json(
+                HTTPStatus.OK,
+                {
+                    "status": "success",
+                    "data": {"authorizedRedirectUri": url, "authorized_redirect_uri": url},
+                },
+            )
+        if path.path == FEED_PATH:
+            code = dict(p.split("=", 1) for p in path.query.split("&") if "=" in p).get("code")
+            if code not in self.issued:
+                return connection.respond(HTTPStatus.FORBIDDEN, "Unknown or reused code\n")
+            self.issued.discard(code)  # authorized URLs are single use
+            return None
+        return connection.respond(HTTPStatus.NOT_FOUND, "Not found\n")
+
+    @staticmethod
+    def _json(status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        headers = Headers(
+            [("Content-Type", "application/json"), ("Content-Length", str(len(body)))]
+        )
+        return Response(status.value, status.phrase, headers, body)
+
+    async def handler(self, websocket):
+        self.connections += 1
+        subscriptions = {}  # instrument_key -> mode
+        sender = asyncio.create_task(self._stream(websocket, subscriptions))
+        try:
+            async for message in websocket:
+                self._apply_request(message, subscriptions)
+        except Exception as e:
+            logger.debug(f"Connection closed: {e}")
+        finally:
+            sender.cancel()
+            self.connections -= 1
+
+    @staticmethod
+    def _apply_request(message, subscriptions):
+        try:
+            request = json.loads(message)
+        except ValueError:
+            return
+        method = request.get("method")
+        data = request.get("data") or {}
+        keys = data.get("instrumentKeys") or []
+        if method in ("sub", "change_mode"):
+            mode = data.get("mode", "full")
+            for key in keys:
+                subscriptions[key] = mode
+        elif method == "unsub":
+            for key in keys:
+                subscriptions.pop(key, None)
+
+    async def _stream(self, websocket, subscriptions):
+        await websocket.send(market_info_frame())
+        if self.replay:
+            await self._stream_replay(websocket)
+        else:
+            await self._stream_synthetic(websocket, subscriptions)
+
+    async def _stream_synthetic(self, websocket, subscriptions):
+        cursor = 0
+        deadline = time.monotonic()
+        sim_start_ms = int(time.time() * 1000)
+        wall_start = time.monotonic()
+        while True:
+            keys = list(subscriptions)
+            if not keys:
+                await asyncio.sleep(self.frame_interval)
+                deadline = time.monotonic()
+                continue
+
+            rate = self.rate * self.speed
+            per_frame = max(1, min(len(keys), round(rate * self.frame_interval)))
+            batch = [keys[(cursor + i) % len(keys)] for i in range(per_frame)]
+            cursor = (cursor + per_frame) % len(keys)
+
+            now_ms = sim_start_ms + int((time.monotonic() - wall_start) * 1000 * self.speed)
+            await websocket.send(self.market.frame(subscriptions, batch, now_ms))
+            self.frames_sent += 1
+            self.ticks_sent += per_frame
+
+            deadline += per_frame / rate
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                await asyncio.sleep(0)  # let the socket drain and requests arrive
+
+    async def _stream_replay(self, websocket):
+        while True:
+            first_ts = None
+            started = time.monotonic()
+            for ts_ms, raw in read_frames(self.replay):
+                first_ts = ts_ms if first_ts is None else first_ts
+                delay = started + (ts_ms - first_ts) / 1000 / self.speed - time.monotonic()
+                await asyncio.sleep(max(delay, 0))
+                await websocket.send(raw)
+                self.frames_sent += 1
+            if not self.loop_replay:
+                return
+
+    async def start(self):
+        self.server = await serve(
+            self.handler,
+            self.host,
+            self.port,
+            process_request=self.process_request,
+            max_size=None,
+        )
+        if self.port == 0:
+            self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"🧪 Feed simulator listening, authorize at {self.authorize_url}")
+        return self
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    def stats(self):
+        return {
+            "connections": self.connections,
+            "frames_sent": self.frames_sent,
+            "ticks_sent": self.ticks_sent,
+        }
+
+
+async def _main(args):
+    simulator = await FeedSimulator(
+        host=args.host,
+        port=args.port,
+        rate=args.rate,
+        speed=args.speed,
+        frame_interval=args.frame_interval,
+        replay=args.replay,
+        loop_replay=args.loop,
+    ).start()
+    print(f"UPSTOX_FEED_AUTHORIZE_URL={simulator.authorize_url}")
+    while True:
+        await asyncio.sleep(5)
+        logger.info(f"📊 {simulator.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Upstox market feed simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=int, default=10000, help="ticks/sec per connection")
+    parser.add_argument("--speed", type=float, default=1.0, help="time multiplier")
+    parser.add_argument("--frame-interval", type=float, default=0.1)
+    parser.add_argument("--replay", help="capture file or journal frames-*.seg segment")
+    parser.add_argument("--loop", action="store_true", help="restart replay at the end")
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
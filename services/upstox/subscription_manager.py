@@ -0,0 +1,175 @@
+import asyncio
+import json
+import logging
+from collections import Counter
+
+logger = logging.getLogger("subscription_manager")
+
+MODE_LTPC = "ltpc"
+MODE_OPTION_GREEKS = "option_greeks"
+MODE_FULL = "full"
+MODE_FULL_D30 = "full_d30"
+
+# When several viewers ask for different modes the richest one wins
+MODE_RANK = {MODE_LTPC: 0, MODE_OPTION_GREEKS: 1, MODE_FULL: 2, MODE_FULL_D30: 3}
+
+# Changes arriving within this window go upstream as one message per method/mode
+BATCH_WINDOW_SECONDS = 0.05
+MAX_KEYS_PER_MESSAGE = 1500
+
+
+class SubscriptionManager:
+    """Reference-counted upstream subscriptions for one feed connection.
+
+    Callers acquire and release instrument keys with a mode; the manager
+    keeps a count per key and mode, diffs the wanted state against what the
+    upstream socket currently has, and sends only ``sub``, ``unsub`` and
+    ``change_mode`` deltas. Changes made within ``window`` seconds are
+    coalesced, so a key added and dropped inside one window never goes out.
+    """
+
+    def __init__(self, guid="market_feed", window=BATCH_WINDOW_SECONDS):
+        self.guid = guid
+        self.window = window
+        self.refs = {}  # instrument_key -> Counter(mode -> refcount)
+        self.active = {}  # instrument_key -> mode subscribed upstream
+        self.dirty = set()
+        self.send = None  # async callable(bytes) of the attached socket
+        self.flush_task = None
+
+        self.messages_sent = 0
+        self.keys_sent = 0
+
+    def __contains__(self, instrument_key):
+        return instrument_key in self.refs
+
+    def keys(self):
+        return list(self.refs)
+
+    def refcount(self, instrument_key) -> int:
+        counts = self.refs.get(instrument_key)
+        return sum(counts.values()) if counts else 0
+
+    def mode_for(self, instrument_key):
+        counts = self.refs.get(instrument_key)
+        if not counts:
+            return None
+        return max(counts, key=MODE_RANK.__getitem__)
+
+    def acquire(self, instrument_keys, mode=MODE_FULL):
+        if mode not in MODE_RANK:
+            raise ValueError(f"Unknown feed mode: {mode}")
+        for key in instrument_keys:
+            self.refs.setdefault(key, Counter())[mode] += 1
+            self.dirty.add(key)
+        self._schedule_flush()
+
+    def release(self, instrument_keys, mode=MODE_FULL):
+        for key in instrument_keys:
+            counts = self.refs.get(key)
+            if not counts or counts[mode] <= 0:
+                continue
+            counts[mode] -= 1
+            if counts[mode] == 0:
+                del counts[mode]
+            if not counts:
+                del self.refs[key]
+            self.dirty.add(key)
+        self._schedule_flush()
+
+    def change_mode(self, instrument_keys, mode, previous_mode=MODE_FULL):
+        """Move one holder of each key from ``previous_mode`` to ``mode``."""
+        self.acquire(instrument_keys, mode)
+        self.release(instrument_keys, previous_mode)
+
+    def diff(self):
+        """Pending deltas as {"sub"|"unsub"|"change_mode": {mode: [keys]}}."""
+        deltas = {"sub": {}, "change_mode": {}, "unsub": {}}
+        for key in self.dirty:
+            wanted = self.mode_for(key)
+            current = self.active.get(key)
+            if wanted == current:
+                continue
+            if current is None:
+                deltas["sub"].setdefault(wanted, []).append(key)
+            elif wanted is None:
+                deltas["unsub"].setdefault(current, []).append(key)
+            else:
+                deltas["change_mode"].setdefault(wanted, []).append(key)
+        return deltas
+
+    def _payload(self, method, mode, keys):
+        data = {"instrumentKeys": keys}
+        if method != "unsub":
+            data["mode"] = mode
+        return json.dumps({"guid": self.guid, "method": method, "data": data}).encode(
+            "utf-8"
+        )
+
+    async def flush(self):
+        """Send everything that changed since the last flush."""
+        if self.send is None or not self.dirty:
+            return
+        deltas = self.diff()
+        pending, self.dirty = self.dirty, set()
+
+        for method, by_mode in deltas.items():
+            for mode, keys in by_mode.items():
+                for i in range(0, len(keys), MAX_KEYS_PER_MESSAGE):
+                    chunk = keys[i : i + MAX_KEYS_PER_MESSAGE]
+                    try:
+                        await self.send(self._payload(method, mode, chunk))
+                    except BaseException:
+                        # Keys already sent are active and net out on the next diff
+                        self.dirty |= pending
+                        raise
+                    self.messages_sent += 1
+                    self.keys_sent += len(chunk)
+                    for key in chunk:
+                        if method == "unsub":
+                            self.active.pop(key, None)
+                        else:
+                            self.active[key] = mode
+                logger.info(f"📨 {method} {mode}: {len(keys)} key(s)")
+
+    async def _flush_later(self):
+        try:
+            # Keys changed while a send was in flight are flushed in the next round
+            while self.dirty and self.send is not None:
+                await asyncio.sleep(self.window)
+                await self.flush()
+        except Exception as e:
+            logger.error(f"❌ Subscription flush failed: {e}")
+        finally:
+            self.flush_task = None
+
+    def _schedule_flush(self):
+        if self.send is None or self.flush_task is not None or not self.dirty:
+            return
+        try:
+            self.flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+        except RuntimeError:
+            pass  # no loop yet; attach() sends the full state on connect
+
+    async def attach(self, send):
+        """Bind a freshly connected socket and subscribe everything wanted."""
+        self.send = send
+        self.active = {}
+        self.dirty = set(self.refs)
+        await self.flush()
+
+    def detach(self):
+        self.send = None
+        self.active = {}
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+
+    def stats(self):
+        return {
+            "keys": len(self.refs),
+            "active": len(self.active),
+            "pending": len(self.dirty),
+            "messages_sent": self.messages_sent,
+            "keys_sent": self.keys_sent,
+        }
@@ -0,0 +1,249 @@
+import logging
+import os
+
+from google.protobuf.json_format import MessageToDict
+import services.upstox.MarketDataFeed_pb2 as pb
+
+logger = logging.getLogger("tick_decoder")
+
+# "dict" keeps the old ParseFromString + MessageToDict path, "tick" reads the
+# protobuf fields straight into slotted Tick records.
+DEFAULT_DECODER = os.getenv("UPSTOX_FEED_DECODER", "dict").lower()
+
+_TYPE_NAMES = {v: k for k, v in pb.Type.items()}
+_STATUS_NAMES = {v: k for k, v in pb.MarketStatus.items()}
+_MODE_NAMES = {v: k for k, v in pb.RequestMode.items()}
+
+
+class Tick:
+    """Compact record for one instrument update in a FeedResponse."""
+
+    __slots__ = (
+        "instrument_key",
+        "mode",
+        "ltp",
+        "ltt",
+        "ltq",
+        "cp",
+        "atp",
+        "vtt",
+        "oi",
+        "iv",
+        "tbq",
+        "tsq",
+        "bid_ask",
+        "greeks",
+        "ohlc",
+    )
+
+    def __init__(self, instrument_key, mode="ltpc"):
+        self.instrument_key = instrument_key
+        self.mode = mode
+        self.ltp = None
+        self.ltt = None
+        self.ltq = None
+        self.cp = None
+        self.atp = None
+        self.vtt = None
+        self.oi = None
+        self.iv = None
+        self.tbq = None
+        self.tsq = None
+        self.bid_ask = ()  # ((bidQ, bidP, askQ, askP), ...)
+        self.greeks = None  # (delta, theta, gamma, vega, rho)
+        self.ohlc = ()  # ((interval, open, high, low, close, vol, ts), ...)
+
+    def as_feed_dict(self):
+        """Same shape as parse_live_feed() output, built only when sending."""
+        greeks = self.greeks
+        return {
+            "ltp": self.ltp,
+            "ltq": self.ltq,
+            "cp": self.cp,
+            "last_trade_time": self.ltt,
+            "bid_ask": [
+                {"bidQ": q[0], "bidP": q[1], "askQ": q[2], "askP": q[3]}
+                for q in self.bid_ask
+            ],
+            "greeks": (
+                {
+                    "delta": greeks[0],
+                    "theta": greeks[1],
+                    "gamma": greeks[2],
+                    "vega": greeks[3],
+                    "rho": greeks[4],
+                }
+                if greeks
+                else {}
+            ),
+            "ohlc": [
+                {
+                    "interval": o[0],
+                    "open": o[1],
+                    "high": o[2],
+                    "low": o[3],
+                    "close": o[4],
+                    "vol": o[5],
+                    "ts": o[6],
+                }
+                for o in self.ohlc
+            ],
+            "atp": self.atp,
+            "oi": self.oi,
+            "iv": self.iv,
+            "tbq": self.tbq,
+            "tsq": self.tsq,
+        }
+
+    def __repr__(self):
+        return f"Tick({self.instrument_key!r}, ltp={self.ltp}, ltt={self.ltt})"
+
+
+class FeedFrame:
+    """Decoded FeedResponse: message type, ticks and segment statuses."""
+
+    __slots__ = ("type", "current_ts", "ticks", "segment_status")
+
+    def __init__(self, msg_type, current_ts, ticks, segment_status):
+        self.type = msg_type
+        self.current_ts = current_ts
+        self.ticks = ticks
+        self.segment_status = segment_status
+
+
+def _read_ltpc(tick, ltpc):
+    tick.ltp = ltpc.ltp
+    tick.ltt = ltpc.ltt
+    tick.ltq = ltpc.ltq
+    tick.cp = ltpc.cp
+
+
+def _read_greeks(greeks):
+    return (greeks.delta, greeks.theta, greeks.gamma, greeks.vega, greeks.rho)
+
+
+def _read_ohlc(market_ohlc):
+    return tuple(
+        (o.interval, o.open, o.high, o.low, o.close, o.vol, o.ts)
+        for o in market_ohlc.ohlc
+    )
+
+
+def decode_feed(key, feed):
+    """Build a Tick from a single pb.Feed without going through dicts."""
+    tick = Tick(key, _MODE_NAMES.get(feed.requestMode, "ltpc"))
+    kind = feed.WhichOneof("FeedUnion")
+
+    if kind == "ltpc":
+        _read_ltpc(tick, feed.ltpc)
+
+    elif kind == "fullFeed":
+        full = feed.fullFeed
+        if full.WhichOneof("FullFeedUnion") == "indexFF":
+            index_ff = full.indexFF
+            _read_ltpc(tick, index_ff.ltpc)
+            tick.ohlc = _read_ohlc(index_ff.marketOHLC)
+        else:
+            market_ff = full.marketFF
+            _read_ltpc(tick, market_ff.ltpc)
+            tick.bid_ask = tuple(
+                (q.bidQ, q.bidP, q.askQ, q.askP)
+                for q in market_ff.marketLevel.bidAskQuote
+            )
+            if market_ff.HasField("optionGreeks"):
+                tick.greeks = _read_greeks(market_ff.optionGreeks)
+            tick.ohlc = _read_ohlc(market_ff.marketOHLC)
+            tick.atp = market_ff.atp
+            tick.vtt = market_ff.vtt
+            tick.oi = market_ff.oi
+            tick.iv = market_ff.iv
+            tick.tbq = market_ff.tbq
+            tick.tsq = market_ff.tsq
+
+    elif kind == "firstLevelWithGreeks":
+        first = feed.firstLevelWithGreeks
+        _read_ltpc(tick, first.ltpc)
+        if first.HasField("firstDepth"):
+            q = first.firstDepth
+            tick.bid_ask = ((q.bidQ, q.bidP, q.askQ, q.askP),)
+        if first.HasField("optionGreeks"):
+            tick.greeks = _read_greeks(first.optionGreeks)
+        tick.vtt = first.vtt
+        tick.oi = first.oi
+        tick.iv = first.iv
+
+    return tick
+
+
+def decode_frame(raw) -> FeedFrame:
+    """Parse raw protobuf bytes into a FeedFrame of Tick records."""
+    msg = pb.FeedResponse()
+    msg.ParseFromString(raw)
+
+    segment_status = None
+    if msg.HasField("marketInfo"):
+        segment_status = {
+            segment: _STATUS_NAMES.get(status, str(status))
+            for segment, status in msg.marketInfo.segmentStatus.items()
+        }
+
+    ticks = [decode_feed(key, feed) for key, feed in msg.feeds.items()]
+    return FeedFrame(
+        _TYPE_NAMES.get(msg.type, "initial_feed"), msg.currentTs, ticks, segment_status
+    )
+
+
+def decode_frame_dict(raw) -> dict:
+    """Legacy decoder: the MessageToDict form every client used to build."""
+    msg = pb.FeedResponse()
+    msg.ParseFromString(raw)
+    return MessageToDict(msg)
+
+
+DECODERS = {
+    "dict": decode_frame_dict,
+    "tick": decode_frame,
+}
+
+
+def get_decoder(name=None):
+    name = (name or DEFAULT_DECODER).lower()
+    if name not in DECODERS:
+        raise ValueError(f"Unknown feed decoder '{name}', expected one of {list(DECODERS)}")
+    return DECODERS[name]
+
+
+def parse_live_feed(raw_data):
+    """Flatten a live feed into {instrument_key: tick fields}.
+
+    Accepts the MessageToDict ``feeds`` mapping, a list of Tick records from
+    decode_frame(), or a {instrument_key: Tick} mapping.
+    """
+    if isinstance(raw_data, (list, tuple)):
+        return {tick.instrument_key: tick.as_feed_dict() for tick in raw_data}
+
+    parsed = {}
+    for instrument_key, details in raw_data.items():
+        if isinstance(details, Tick):
+            parsed[instrument_key] = details.as_feed_dict()
+            continue
+        try:
+            feed = details.get("fullFeed", {}).get("marketFF", {})
+            ltpc = feed.get("ltpc", {})
+            parsed[instrument_key] = {
+                "ltp": ltpc.get("ltp"),
+                "ltq": ltpc.get("ltq"),
+                "cp": ltpc.get("cp"),
+                "last_trade_time": ltpc.get("ltt"),
+                "bid_ask": feed.get("marketLevel", {}).get("bidAskQuote", []),
+                "greeks": feed.get("optionGreeks", {}),
+                "ohlc": feed.get("marketOHLC", {}).get("ohlc", []),
+                "atp": feed.get("atp"),
+                "oi": feed.get("oi"),
+                "iv": feed.get("iv"),
+                "tbq": feed.get("tbq"),
+                "tsq": feed.get("tsq"),
+            }
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to parse tick for {instrument_key}: {e}")
+    return parsed
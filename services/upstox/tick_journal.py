@@ -0,0 +1,432 @@
+import json
+import logging
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger("tick_journal")
+
+JOURNAL_DIR = os.getenv("TICK_JOURNAL_DIR", "data/tick_journal")
+# off | frames | ticks | both
+JOURNAL_MODE = os.getenv("TICK_JOURNAL_MODE", "off").lower()
+SEGMENT_BYTES = int(os.getenv("TICK_JOURNAL_SEGMENT_MB", "256")) * 1024 * 1024
+# Frames waiting for the writer thread; beyond this new frames are dropped
+QUEUE_DEPTH = int(os.getenv("TICK_JOURNAL_QUEUE_DEPTH", "10000"))
+FLUSH_INTERVAL_SECONDS = 1.0
+WRITE_BATCH = 1000
+# Tick segments keep one time index entry per this many records
+TIME_INDEX_STRIDE = 1024
+# Journal days follow the exchange calendar
+IST = timezone(timedelta(hours=5, minutes=30))
+
+KIND_FRAMES = "frames"
+KIND_TICKS = "ticks"
+
+# Frame records: [recv time ms (int64)][length (uint32)][raw protobuf frame]
+FRAME_HEADER = struct.Struct("<qI")
+
+TICK_RECORD = np.dtype(
+    [
+        ("ts", "<i8"),  # receive time, epoch ms
+        ("instrument", "<u4"),  # id from the day's instruments.json
+        ("ltp", "<f8"),
+        ("ltq", "<i8"),
+        ("ltt", "<i8"),
+        ("vtt", "<i8"),
+        ("oi", "<f8"),
+        ("bid_p", "<f8"),
+        ("bid_q", "<i8"),
+        ("ask_p", "<f8"),
+        ("ask_q", "<i8"),
+    ]
+)
+
+
+def write_frame(fileobj, raw: bytes, ts_ms: int = None):
+    """Append one raw feed frame to a plain capture file."""
+    if ts_ms is None:
+        ts_ms = int(time.time() * 1000)
+    fileobj.write(FRAME_HEADER.pack(ts_ms, len(raw)))
+    fileobj.write(raw)
+
+
+def read_frames(path):
+    """Yield (recv time ms, raw frame) from a capture or frame segment file."""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+            ts_ms, length = FRAME_HEADER.unpack(header)
+            if length == 0:
+                return  # zeroed tail of a segment that was not closed cleanly
+            yield ts_ms, f.read(length)
+
+
+def tick_records(ts_ms, ticks, instrument_ids) -> np.ndarray:
+    """Fixed-width TICK_RECORD rows for the decoded ticks of one frame."""
+    records = np.zeros(len(ticks), dtype=TICK_RECORD)
+    records["ts"] = ts_ms
+    records["instrument"] = instrument_ids
+    records["ltp"] = [np.nan if t.ltp is None else t.ltp for t in ticks]
+    records["ltq"] = [t.ltq or 0 for t in ticks]
+    records["ltt"] = [t.ltt or 0 for t in ticks]
+    records["vtt"] = [t.vtt or 0 for t in ticks]
+    records["oi"] = [t.oi or 0.0 for t in ticks]
+    top = [t.bid_ask[0] if t.bid_ask else (0, 0.0, 0, 0.0) for t in ticks]
+    records["bid_q"], records["bid_p"], records["ask_q"], records["ask_p"] = zip(*top)
+    return records
+
+
+def _csr(instrument_ids, rows):
+    """Group ``rows`` by instrument: (ids, starts, rows) with starts[-1] == len(rows)."""
+    instrument_ids = np.asarray(instrument_ids, dtype=np.uint32)
+    rows = np.asarray(rows, dtype=np.int64)
+    order = np.argsort(instrument_ids, kind="stable")
+    ids, starts = np.unique(instrument_ids[order], return_index=True)
+    return ids, np.append(starts, len(rows)).astype(np.int64), rows[order]
+
+
+class Segment:
+    """One preallocated, memory-mapped journal file."""
+
+    def __init__(self, path: Path, kind, size):
+        self.path = path
+        self.kind = kind
+        self.size = size
+        self.offset = 0
+        self.file = open(path, "w+b")
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        # Frame segments: one entry per frame plus (instrument, frame) pairs
+        self.frame_ts = []
+        self.frame_offsets = []
+        self.pair_instruments = []
+        self.pair_frames = []
+
+    def fits(self, length):
+        return self.offset + length <= self.size
+
+    def write(self, data):
+        start = self.offset
+        self.map[start : start + len(data)] = data
+        self.offset = start + len(data)
+        return start
+
+    def append_frame(self, ts_ms, raw, instrument_ids):
+        frame_no = len(self.frame_ts)
+        self.frame_ts.append(ts_ms)
+        self.frame_offsets.append(self.write(FRAME_HEADER.pack(ts_ms, len(raw))))
+        self.write(raw)
+        self.pair_instruments.extend(instrument_ids)
+        self.pair_frames.extend([frame_no] * len(instrument_ids))
+
+    def flush(self):
+        if self.offset:
+            self.map.flush()
+
+    def _index(self):
+        if self.kind == KIND_FRAMES:
+            ids, starts, rows = _csr(self.pair_instruments, self.pair_frames)
+            return {
+                "ts": np.asarray(self.frame_ts, dtype=np.int64),
+                "offsets": np.asarray(self.frame_offsets, dtype=np.int64),
+                "ids": ids,
+                "starts": starts,
+                "rows": rows,
+            }
+        records = np.frombuffer(
+            self.map, dtype=TICK_RECORD, count=self.offset // TICK_RECORD.itemsize
+        )
+        ids, starts, rows = _csr(records["instrument"], np.arange(len(records)))
+        return {
+            "ts": records["ts"][::TIME_INDEX_STRIDE].copy(),
+            "ids": ids,
+            "starts": starts,
+            "rows": rows,
+        }
+
+    def close(self):
+        index = self._index()
+        self.map.flush()
+        self.map.close()
+        self.file.truncate(self.offset)
+        self.file.close()
+        np.savez(self.path.with_suffix(".idx.npz"), **index)
+
+
+class TickJournal:
+    """Daily append-only journal of feed frames and/or decoded ticks.
+
+    ``record`` is called from the event loop and only enqueues; a writer
+    thread copies batches into memory-mapped segment files, flushes them
+    about once a second and writes a time + instrument index when a
+    segment is rolled. When the queue is full frames are dropped and
+    counted rather than blocking the feed.
+    """
+
+    def __init__(
+        self,
+        root=JOURNAL_DIR,
+        mode=JOURNAL_MODE,
+        segment_bytes=SEGMENT_BYTES,
+        queue_depth=QUEUE_DEPTH,
+    ):
+        self.root = Path(root)
+        self.mode = mode
+        self.segment_bytes = segment_bytes
+        self.queue = queue.Queue(maxsize=queue_depth)
+        self.thread = None
+        self.start_lock = threading.Lock()
+
+        self.day = None
+        self.day_dir = None
+        self.instruments = {}  # instrument_key -> id, per day
+        self.instruments_dirty = False
+        self.segments = {}  # kind -> Segment
+        self.sequence = {}  # kind -> next segment number
+
+        self.frames_in = 0
+        self.frames_written = 0
+        self.ticks_written = 0
+        self.dropped = 0
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def record(self, raw: bytes, ticks=None, ts_ms=None):
+        """Queue a frame (and its decoded ticks, if any) for the journal."""
+        if not self.enabled:
+            return
+        if self.thread is None:
+            self.start()
+        self.frames_in += 1
+        try:
+            self.queue.put_nowait((ts_ms or int(time.time() * 1000), raw, ticks))
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        with self.start_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self._run, name="tick-journal", daemon=True
+                )
+                self.thread.start()
+                logger.info(f"📝 Tick journal ({self.mode}) writing to {self.root}")
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+    # --- writer thread -------------------------------------------------
+
+    def _run(self):
+        last_flush = time.monotonic()
+        running = True
+        while running:
+            try:
+                item = self.queue.get(timeout=FLUSH_INTERVAL_SECONDS)
+            except queue.Empty:
+                item = ()
+
+            batch = [item] if item else []
+            running = item is not None
+            while running and len(batch) < WRITE_BATCH:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+
+            try:
+                self._write_batch(batch)
+                if not running or time.monotonic() - last_flush >= FLUSH_INTERVAL_SECONDS:
+                    self._flush()
+                    last_flush = time.monotonic()
+            except Exception as e:
+                logger.error(f"❌ Tick journal write failed: {e}")
+
+        self._close_day()
+
+    def _write_batch(self, batch):
+        for ts_ms, raw, ticks in batch:
+            day = datetime.fromtimestamp(ts_ms / 1000, IST).strftime("%Y-%m-%d")
+            if day != self.day:
+                self._open_day(day)
+
+            instrument_ids = (
+                [self._instrument_id(t.instrument_key) for t in ticks] if ticks else []
+            )
+            if self.mode in (KIND_FRAMES, "both"):
+                segment = self._segment(KIND_FRAMES, FRAME_HEADER.size + len(raw))
+                segment.append_frame(ts_ms, raw, instrument_ids)
+            if ticks and self.mode in (KIND_TICKS, "both"):
+                records = tick_records(ts_ms, ticks, instrument_ids)
+                segment = self._segment(KIND_TICKS, records.nbytes)
+                segment.write(records.tobytes())
+                self.ticks_written += len(records)
+            self.frames_written += 1
+
+    def _instrument_id(self, key):
+        instrument_id = self.instruments.get(key)
+        if instrument_id is None:
+            instrument_id = len(self.instruments)
+            self.instruments[key] = instrument_id
+            self.instruments_dirty = True
+        return instrument_id
+
+    def _segment(self, kind, length) -> Segment:
+        segment = self.segments.get(kind)
+        if segment is not None and segment.fits(length):
+            return segment
+        if segment is not None:
+            segment.close()
+        number = self.sequence.get(kind, 0)
+        self.sequence[kind] = number + 1
+        path = self.day_dir / f"{kind}-{number:04d}.seg"
+        segment = Segment(path, kind, max(self.segment_bytes, length))
+        self.segments[kind] = segment
+        return segment
+
+    def _open_day(self, day):
+        self._close_day()
+        self.day = day
+        self.day_dir = self.root / day
+        self.day_dir.mkdir(parents=True, exist_ok=True)
+        instruments_path = self.day_dir / "instruments.json"
+        self.instruments = (
+            json.loads(instruments_path.read_text()) if instruments_path.exists() else {}
+        )
+        # Continue after segments left by an earlier run of the same day
+        for kind in (KIND_FRAMES, KIND_TICKS):
+            existing = sorted(self.day_dir.glob(f"{kind}-*.seg"))
+            self.sequence[kind] = int(existing[-1].stem.split("-")[1]) + 1 if existing else 0
+
+    def _flush(self):
+        for segment in self.segments.values():
+            segment.flush()
+        if self.instruments_dirty and self.day_dir is not None:
+            tmp = self.day_dir / "instruments.json.tmp"
+            tmp.write_text(json.dumps(self.instruments))
+            tmp.replace(self.day_dir / "instruments.json")
+            self.instruments_dirty = False
+
+    def _close_day(self):
+        self._flush()
+        for segment in self.segments.values():
+            segment.close()
+        self.segments = {}
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "queued": self.queue.qsize(),
+            "frames_in": self.frames_in,
+            "frames_written": self.frames_written,
+            "ticks_written": self.ticks_written,
+            "dropped": self.dropped,
+        }
+
+
+class JournalReader:
+    """Reads one day of the journal back using the segment indexes."""
+
+    def __init__(self, day, root=JOURNAL_DIR):
+        self.day_dir = Path(root) / day
+        path = self.day_dir / "instruments.json"
+        self.instruments = json.loads(path.read_text()) if path.exists() else {}
+
+    def _segments(self, kind):
+        return sorted(self.day_dir.glob(f"{kind}-*.seg"))
+
+    @staticmethod
+    def _rows_for(index, instrument_id):
+        position = np.searchsorted(index["ids"], instrument_id)
+        if position >= len(index["ids"]) or index["ids"][position] != instrument_id:
+            return np.empty(0, dtype=np.int64)
+        return index["rows"][index["starts"][position] : index["starts"][position + 1]]
+
+    def frames(self, start_ms=None, end_ms=None, instrument_key=None):
+        """Yield (recv time ms, raw frame), optionally for one instrument."""
+        instrument_id = self.instruments.get(instrument_key) if instrument_key else None
+        if instrument_key and instrument_id is None:
+            return
+        for path in self._segments(KIND_FRAMES):
+            index_path = path.with_suffix(".idx.npz")
+            if not index_path.exists():
+                # Segment still being written (or not closed): plain scan, no
+                # instrument filter available without decoding
+                for ts_ms, raw in read_frames(path):
+                    if (start_ms is None or ts_ms >= start_ms) and (
+                        end_ms is None or ts_ms < end_ms
+                    ):
+                        yield ts_ms, raw
+                continue
+
+            index = np.load(index_path)
+            ts, offsets = index["ts"], index["offsets"]
+            lo = 0 if start_ms is None else np.searchsorted(ts, start_ms, "left")
+            hi = len(ts) if end_ms is None else np.searchsorted(ts, end_ms, "left")
+            frame_nos = np.arange(lo, hi)
+            if instrument_id is not None:
+                rows = self._rows_for(index, instrument_id)
+                frame_nos = rows[(rows >= lo) & (rows < hi)]
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for frame_no in frame_nos:
+                    offset = int(offsets[frame_no])
+                    ts_ms, length = FRAME_HEADER.unpack_from(data, offset)
+                    start = offset + FRAME_HEADER.size
+                    yield ts_ms, bytes(data[start : start + length])
+
+    def ticks(self, instrument_key=None, start_ms=None, end_ms=None) -> np.ndarray:
+        """Decoded tick records (TICK_RECORD dtype) in arrival order."""
+        instrument_id = self.instruments.get(instrument_key) if instrument_key else None
+        if instrument_key and instrument_id is None:
+            return np.empty(0, dtype=TICK_RECORD)
+
+        parts = []
+        for path in self._segments(KIND_TICKS):
+            records = np.fromfile(path, dtype=TICK_RECORD)
+            index_path = path.with_suffix(".idx.npz")
+            lo, hi = 0, len(records)
+            if index_path.exists():
+                index = np.load(index_path)
+                block_ts = index["ts"]
+                if start_ms is not None:
+                    lo = max(0, (np.searchsorted(block_ts, start_ms, "left") - 1) * TIME_INDEX_STRIDE)
+                if end_ms is not None:
+                    hi = min(hi, np.searchsorted(block_ts, end_ms, "left") * TIME_INDEX_STRIDE)
+                if instrument_id is not None:
+                    rows = self._rows_for(index, instrument_id)
+                    selected = records[rows[(rows >= lo) & (rows < hi)]]
+                else:
+                    selected = records[lo:hi]
+            else:
+                selected = records[records["ts"] > 0]
+                if instrument_id is not None:
+                    selected = selected[selected["instrument"] == instrument_id]
+            if start_ms is not None:
+                selected = selected[selected["ts"] >= start_ms]
+            if end_ms is not None:
+                selected = selected[selected["ts"] < end_ms]
+            parts.append(selected)
+
+        return np.concatenate(parts) if parts else np.empty(0, dtype=TICK_RECORD)
+
+
+tick_journal = TickJournal()
@@ -1,20 +1,17 @@
-import asyncio, json, ssl, logging, functools, inspect, requests, websockets
+import asyncio, json, ssl, logging, inspect, websockets
 from websockets.exceptions import InvalidStatus
 from google.protobuf.json_format import MessageToDict
 import services.upstox.MarketDataFeed_pb2 as pb
+from services.upstox.feed_auth import feed_authorizer
+from services.upstox.subscription_manager import MODE_FULL, SubscriptionManager
+from services.upstox.tick_decoder import DEFAULT_DECODER, decode_frame
+from services.upstox.tick_journal import tick_journal
 
 logger = logging.getLogger("ws_client")
 
 received_ltp = False  # ✅ Flag to track if LTP was received
 
 
-def sync_fetch_feed_url(access_token: str):
-    url = "https://api.upstox.com/v3/feed/market-data-feed/authorize"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(url, headers=headers)
-    return response.json()
-
-
 class UpstoxWebSocketClient:
     def __init__(
         self,
@@ -24,6 +21,7 @@ class UpstoxWebSocketClient:
         stop_callback=None,
         on_auth_error=None,
         max_retries=5,
+        decoder=None,
     ):
         self.access_token = access_token
         self.instrument_keys = instrument_keys
@@ -31,6 +29,7 @@ class UpstoxWebSocketClient:
         self.stop_callback = stop_callback
         self.on_auth_error = on_auth_error
         self.websocket = None
+        self.reader = None  # task running connect_and_stream
         self.should_run = True
         self.retry_count = 0
         self.max_retries = max_retries
@@ -38,17 +37,15 @@ class UpstoxWebSocketClient:
         self.last_ws_url = None
         self.market_closed = False  # ✅ Flag if market is closed
         self.received_ltp = False  # ✅ Flag if LTP was received
+        self.decoder = (decoder or DEFAULT_DECODER).lower()
+        self.subscriptions = SubscriptionManager(guid="algo-dashboard")
+        self.subscriptions.acquire(instrument_keys)
 
     async def get_feed_authorized_url(self):
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None, functools.partial(sync_fetch_feed_url, self.access_token)
-        )
+        result = await feed_authorizer.authorize(self.access_token, consumer=self)
         logger.info(f"🔐 Feed Auth Response: {result}")
         if result.get("status") != "success":
-            if self.on_auth_error and not self.auth_error_sent:
-                await self.on_auth_error()
-                self.auth_error_sent = True
+            await self._report_auth_error()
             raise PermissionError("Access token expired")
 
         new_url = result["data"]["authorized_redirect_uri"]
@@ -59,124 +56,162 @@ class UpstoxWebSocketClient:
         return new_url
 
     async def connect_and_stream(self):
-        while self.should_run and self.retry_count <= self.max_retries:
-            try:
-                ws_url = await self.get_feed_authorized_url()
-                ssl_context = ssl.create_default_context()
-                ssl_context.check_hostname = False
-                ssl_context.verify_mode = ssl.CERT_NONE
-
-                async with websockets.connect(ws_url, ssl=ssl_context) as conn:
-                    self.websocket = conn
-                    self.retry_count = 0
-                    self.auth_error_sent = False
-                    self.market_closed = False
-                    self.received_ltp = False
-
-                    logger.info("✅ WebSocket connected.")
-                    await self._send_subscription()
-
-                    while self.should_run:
-                        raw = await conn.recv()
-                        msg = pb.FeedResponse()
-                        msg.ParseFromString(raw)
-                        parsed = MessageToDict(msg)
-
-                        msg_type = parsed.get("type")
-                        logger.debug(f"📥 Tick Received: {parsed}")
-
-                        if msg_type == "market_info":
-                            status = (
-                                parsed.get("marketInfo", {})
-                                .get("segmentStatus", {})
-                                .get("NSE_EQ", "")
-                            )
-                            logger.info(f"📊 Market status: {status}")
-                            await self.callback(
-                                {"type": "market_info", "status": status}
-                            )
-                            if (
-                                status in ["NORMAL_CLOSE", "CLOSING_END"]
-                                and self.received_ltp
-                            ):
-                                logger.info(
-                                    "📴 Market is closed and LTP received. Stopping."
-                                )
-                                self.market_closed = True
-
-                        elif msg_type == "ltpc":
-                            symbol = parsed.get("symbol") or parsed.get("ltpc", {}).get(
-                                "symbol"
-                            )
-                            if not symbol:
-                                logger.warning("⚠️ Missing symbol in tick")
+        self.reader = asyncio.current_task()
+        try:
+            while self.should_run and self.retry_count <= self.max_retries:
+                try:
+                    ws_url = await self.get_feed_authorized_url()
+                    ssl_context = ssl.create_default_context()
+                    ssl_context.check_hostname = False
+                    ssl_context.verify_mode = ssl.CERT_NONE
+
+                    async with websockets.connect(
+                        ws_url, ssl=ssl_context if ws_url.startswith("wss") else None
+                    ) as conn:
+                        self.websocket = conn
+                        self.retry_count = 0
+                        self.auth_error_sent = False
+                        self.market_closed = False
+                        self.received_ltp = False
+
+                        logger.info("✅ WebSocket connected.")
+                        await self._send_subscription()
+
+                        while self.should_run:
+                            raw = await conn.recv()
+                            if self.decoder == "tick":
+                                frame = decode_frame(raw)
+                                tick_journal.record(raw, frame.ticks)
+                                await self._handle_tick_frame(frame)
                                 continue
 
-                            self.received_ltp = True
-                            logger.info(f"✅ Calling callback for symbol {symbol}")
-                            await self.callback(
-                                {"type": "live_feed", "data": {symbol: parsed}}
-                            )
+                            tick_journal.record(raw)
 
-                            if self.market_closed:
-                                logger.info(
-                                    "📴 Market is closed & LTP received. Stopping."
+                            msg = pb.FeedResponse()
+                            msg.ParseFromString(raw)
+                            parsed = MessageToDict(msg)
+
+                            msg_type = parsed.get("type")
+                            logger.debug(f"📥 Tick Received: {parsed}")
+
+                            if msg_type == "market_info":
+                                status = (
+                                    parsed.get("marketInfo", {})
+                                    .get("segmentStatus", {})
+                                    .get("NSE_EQ", "")
                                 )
-                                self.should_run = False
-                        elif "feeds" in parsed:
-                            feeds = parsed.get("feeds", {})
-                            if not feeds:
-                                logger.warning(
-                                    "⚠️ Received 'feeds' payload but it's empty."
+                                logger.info(f"📊 Market status: {status}")
+                                await self.callback(
+                                    {"type": "market_info", "status": status}
                                 )
-                                continue
-                            self.received_ltp = True
-                            logger.info(
-                                f"✅ Calling callback for {len(feeds)} batched LTPs."
-                            )
-                            await self.callback({"type": "live_feed", "data": feeds})
-                            if self.market_closed:
+                                if (
+                                    status in ["NORMAL_CLOSE", "CLOSING_END"]
+                                    and self.received_ltp
+                                ):
+                                    logger.info(
+                                        "📴 Market is closed and LTP received. Stopping."
+                                    )
+                                    self.market_closed = True
+
+                            elif msg_type == "ltpc":
+                                symbol = parsed.get("symbol") or parsed.get("ltpc", {}).get(
+                                    "symbol"
+                                )
+                                if not symbol:
+                                    logger.warning("⚠️ Missing symbol in tick")
+                                    continue
+
+                                self.received_ltp = True
+                                logger.info(f"✅ Calling callback for symbol {symbol}")
+                                await self.callback(
+                                    {"type": "live_feed", "data": {symbol: parsed}}
+                                )
+
+                                if self.market_closed:
+                                    logger.info(
+                                        "📴 Market is closed & LTP received. Stopping."
+                                    )
+                                    self.should_run = False
+                            elif "feeds" in parsed:
+                                feeds = parsed.get("feeds", {})
+                                if not feeds:
+                                    logger.warning(
+                                        "⚠️ Received 'feeds' payload but it's empty."
+                                    )
+                                    continue
+                                self.received_ltp = True
                                 logger.info(
-                                    "📴 Market is closed & batched LTP received. Stopping."
+                                    f"✅ Calling callback for {len(feeds)} batched LTPs."
                                 )
-                                self.should_run = False
-                        else:
-                            logger.warning(f"⚠️ Unknown message type: {msg_type}")
-
-            except PermissionError:
-                await self.callback({"type": "error", "reason": "token_expired"})
-                self.should_run = False
-                break
-
-            except InvalidStatus as e:
-                logger.error(f"❌ WebSocket rejected: {e}")
-                if getattr(e, "status", None) == 403:
-                    if self.on_auth_error and not self.auth_error_sent:
-                        await self.on_auth_error()
-                        self.auth_error_sent = True
-                break
-
-            except Exception as e:
-                logger.error(f"🔥 Unexpected error: {e}")
-                self.retry_count += 1
-                await asyncio.sleep(3)
-
-        await self._trigger_stop_callback()
+                                await self.callback({"type": "live_feed", "data": feeds})
+                                if self.market_closed:
+                                    logger.info(
+                                        "📴 Market is closed & batched LTP received. Stopping."
+                                    )
+                                    self.should_run = False
+                            else:
+                                logger.warning(f"⚠️ Unknown message type: {msg_type}")
+
+                except PermissionError:
+                    await self.callback({"type": "error", "reason": "token_expired"})
+                    self.should_run = False
+                    break
+
+                except InvalidStatus as e:
+                    logger.error(f"❌ WebSocket rejected: {e}")
+                    if getattr(e, "status", None) == 403:
+                        await self._report_auth_error()
+                    break
+
+                except Exception as e:
+                    logger.error(f"🔥 Unexpected error: {e}")
+                    self.retry_count += 1
+                    # Have the next URL ready by the time the backoff is over
+                    if self.should_run:
+                        feed_authorizer.prefetch(self.access_token, consumer=self)
+                    await asyncio.sleep(3)
+        finally:
+            self.websocket = None
+            await self._trigger_stop_callback()
+
+    async def _report_auth_error(self):
+        # A stopped client's token is no longer anyone's concern
+        if self.on_auth_error and not self.auth_error_sent and self.should_run:
+            self.auth_error_sent = True
+            await self.on_auth_error()
+
+    async def _handle_tick_frame(self, frame):
+        if frame.type == "market_info":
+            status = (frame.segment_status or {}).get("NSE_EQ", "")
+            logger.info(f"📊 Market status: {status}")
+            await self.callback({"type": "market_info", "status": status})
+            if status in ["NORMAL_CLOSE", "CLOSING_END"] and self.received_ltp:
+                logger.info("📴 Market is closed and LTP received. Stopping.")
+                self.market_closed = True
+            return
+
+        if not frame.ticks:
+            return
+
+        self.received_ltp = True
+        await self.callback({"type": "live_feed", "data": frame.ticks})
+        if self.market_closed:
+            logger.info("📴 Market is closed & batched LTP received. Stopping.")
+            self.should_run = False
 
     async def _send_subscription(self):
         if not self.websocket:
             return
-        payload = {
-            "guid": "algo-dashboard",
-            "method": "sub",
-            "data": {
-                "mode": "full",
-                "instrumentKeys": self.instrument_keys[:1500],
-            },
-        }
-        await self.websocket.send(json.dumps(payload).encode("utf-8"))
+        # Fresh socket: the manager resubscribes every wanted key
+        await self.subscriptions.attach(self.websocket.send)
         logger.info("📩 Subscription payload sent.")
 
+    def subscribe(self, instrument_keys, mode=MODE_FULL):
+        self.subscriptions.acquire(instrument_keys, mode)
+
+    def unsubscribe(self, instrument_keys, mode=MODE_FULL):
+        self.subscriptions.release(instrument_keys, mode)
+
     async def _trigger_stop_callback(self):
         if self.stop_callback:
             if inspect.iscoroutinefunction(self.stop_callback):
@@ -187,3 +222,16 @@ class UpstoxWebSocketClient:
     def stop(self):
         logger.info("🛑 WebSocket manually stopped.")
         self.should_run = False
+        self.subscriptions.detach()
+        feed_authorizer.forget(self)
+
+        # Close the socket now rather than on the next frame, so a stopped
+        # client stops reading (and reporting errors) straight away
+        try:
+            current = asyncio.current_task()
+        except RuntimeError:  # no running loop
+            return
+        if self.websocket is not None:
+            asyncio.create_task(self.websocket.close())
+        if self.reader is not None and self.reader is not current and not self.reader.done():
+            self.reader.cancel()
@@ -1,7 +1,6 @@
 import asyncio
 import json
 import ssl
-import requests
 import websockets
 import logging
 from datetime import datetime, timedelta
@@ -9,6 +8,10 @@ from typing import List, Optional
 
 from google.protobuf.json_format import MessageToDict
 from services.upstox import MarketDataFeed_pb2 as pb
+from services.upstox.feed_auth import feed_authorizer
+from services.upstox.subscription_manager import MODE_FULL, SubscriptionManager
+from services.upstox.tick_decoder import DEFAULT_DECODER, decode_frame
+from services.upstox.tick_journal import tick_journal
 from services.upstox.ws_manager import UpstoxWebSocketManager
 from database.connection import get_db
 from database.models import User
@@ -18,13 +21,19 @@ logger = logging.getLogger(__name__)
 
 
 class UpstoxWebSocketClient:
-    def __init__(self, ws_manager: UpstoxWebSocketManager):
+    def __init__(self, ws_manager: UpstoxWebSocketManager, decoder: Optional[str] = None):
         self.ws_manager = ws_manager
+        self.decoder = (decoder or DEFAULT_DECODER).lower()
         self.access_token: Optional[str] = None
-        self.instrument_keys: List[str] = []
+        self.subscriptions = SubscriptionManager(guid="algo-terminal")
         self.user_email: Optional[str] = None
         self.websocket = None
         self.is_connected = False
+        self.market_closed_sent = False
+
+    @property
+    def instrument_keys(self) -> List[str]:
+        return self.subscriptions.keys()
 
     def get_access_token(self, user_email: str) -> str:
         db = next(get_db())
@@ -58,23 +67,24 @@ class UpstoxWebSocketClient:
     async def start(self, user_email: str, instrument_keys: List[str]):
         self.stop_flag = False
         self.user_email = user_email
-        self.instrument_keys = instrument_keys
-        self.access_token = self.get_access_token(user_email)
+        self.subscriptions.acquire(
+            [k for k in instrument_keys if k not in self.subscriptions]
+        )
+        self.access_token = await feed_authorizer.access_token(
+            user_email, self.get_access_token
+        )
 
         try:
-            response = requests.get(
-                url="https://api.upstox.com/v3/feed/market-data-feed/authorize",
-                headers={"Authorization": f"Bearer {self.access_token}"},
-            )
-            response.raise_for_status()
-            ws_url = response.json()["data"]["authorized_redirect_uri"]
+            ws_url = await feed_authorizer.authorized_url(self.access_token, consumer=self)
             logger.info(f"🔗 Authorized WebSocket URL: {ws_url}")
 
             ssl_context = ssl.create_default_context()
             ssl_context.check_hostname = False
             ssl_context.verify_mode = ssl.CERT_NONE
 
-            async with websockets.connect(ws_url, ssl=ssl_context) as websocket:
+            async with websockets.connect(
+                ws_url, ssl=ssl_context if ws_url.startswith("wss") else None
+            ) as websocket:
                 logger.info("✅ Upstox WebSocket connected")
                 self.websocket = websocket
 
@@ -83,6 +93,13 @@ class UpstoxWebSocketClient:
                 while not self.stop_flag:
                     try:
                         raw_msg = await asyncio.wait_for(websocket.recv(), timeout=30)
+                        if self.decoder == "tick":
+                            frame = decode_frame(raw_msg)
+                            tick_journal.record(raw_msg, frame.ticks)
+                            if not await self._handle_tick_frame(frame):
+                                break
+                            continue
+
                         decoded_msg = self.decode_protobuf(raw_msg)
                         parsed = MessageToDict(decoded_msg)
 
@@ -182,30 +199,81 @@ class UpstoxWebSocketClient:
         except Exception as e:
             logger.error(f"❌ Failed to connect to Upstox WebSocket: {str(e)}")
 
+        self.subscriptions.detach()
         logger.info("🔌 Upstox WebSocket closed")
 
+    async def _handle_tick_frame(self, frame) -> bool:
+        """Tick-decoder variant of the receive loop body. Returns False to disconnect."""
+        if frame.type == "market_info":
+            segment_status = frame.segment_status or {}
+            logger.info(f"📶 Market Info: {segment_status}")
+            if not self.market_closed_sent and all(
+                v in ["NORMAL_CLOSE", "CLOSING_END"] for v in segment_status.values()
+            ):
+                await self.ws_manager.broadcast_feed(
+                    self.user_email,
+                    json.dumps(
+                        {"event": "market_closed", "message": "Market is closed."}
+                    ).encode(),
+                )
+                self.market_closed_sent = True
+                logger.warning("🔒 Market closed. Stopping feed.")
+                return False
+            return True
+
+        for tick in frame.ticks:
+            try:
+                timestamp = datetime.fromtimestamp(tick.ltt / 1000.0).isoformat()
+            except Exception:
+                timestamp = tick.ltt
+
+            self.snapshot_sent = True
+
+            await self.ws_manager.broadcast_feed(
+                self.user_email,
+                json.dumps(
+                    {
+                        "instrument_key": tick.instrument_key,
+                        "data": {
+                            "ltp": tick.ltp,
+                            "avg_price": tick.atp,
+                            "timestamp": timestamp,
+                            "volume": tick.vtt,
+                            "depth": [
+                                {"bidQ": q[0], "bidP": q[1], "askQ": q[2], "askP": q[3]}
+                                for q in tick.bid_ask
+                            ],
+                            "market_closed": not any(any(q) for q in tick.bid_ask),
+                        },
+                    }
+                ).encode(),
+            )
+        return True
+
     async def send_subscription(self, websocket):
-        payload = {
-            "guid": "algo-terminal",
-            "method": "sub",
-            "data": {"mode": "full", "instrumentKeys": self.instrument_keys},
-        }
-        await websocket.send(json.dumps(payload).encode("utf-8"))
+        await self.subscriptions.attach(websocket.send)
         logger.info(f"📨 Subscribed to: {self.instrument_keys}")
 
-    async def subscribe_to_new_instruments(self, new_keys: List[str]):
+    async def subscribe_to_new_instruments(self, new_keys: List[str], mode: str = MODE_FULL):
         if not self.websocket:
             logger.warning("⚠️ WebSocket not connected. Cannot subscribe.")
             return
 
-        new_unique_keys = list(set(self.instrument_keys + new_keys))
-        if set(new_unique_keys) == set(self.instrument_keys):
+        added = [k for k in dict.fromkeys(new_keys) if k not in self.subscriptions]
+        if not added:
             logger.info("🟡 No new keys to subscribe.")
             return
 
-        self.instrument_keys = new_unique_keys
-        await self.send_subscription(self.websocket)
-        logger.info(f"🆕 Subscribed to additional instruments: {new_keys}")
+        self.subscriptions.acquire(added, mode)
+        logger.info(f"🆕 Subscribed to additional instruments: {added}")
+
+    def unsubscribe_instruments(self, keys: List[str], mode: str = MODE_FULL):
+        self.subscriptions.release([k for k in keys if k in self.subscriptions], mode)
+        logger.info(f"➖ Unsubscribed instruments: {keys}")
+
+    def change_mode(self, keys: List[str], mode: str, previous_mode: str = MODE_FULL):
+        self.subscriptions.change_mode(keys, mode, previous_mode)
 
     def stop(self):
         self.stop_flag = True
+        feed_authorizer.forget(self)
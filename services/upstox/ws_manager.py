@@ -4,13 +4,15 @@ import ssl
 import websockets
 from google.protobuf.json_format import MessageToDict
 import proto.market_data_pb2 as pb
+from services.upstox.tick_decoder import DEFAULT_DECODER, decode_frame, parse_live_feed
 import logging
 
 logger = logging.getLogger("stock_logger")
 
 
 class UpstoxWebSocketClient:
-    def __init__(self):
+    def __init__(self, decoder=None):
+        self.decoder = (decoder or DEFAULT_DECODER).lower()
         self.running = False
         self.access_token = None
         self.ws = None
@@ -54,6 +56,17 @@ class UpstoxWebSocketClient:
 
                 while True:
                     message = await websocket.recv()
+                    if self.decoder == "tick":
+                        frame = decode_frame(message)
+                        await self.broadcast(
+                            {
+                                "type": frame.type,
+                                "currentTs": frame.current_ts,
+                                "feeds": parse_live_feed(frame.ticks),
+                            }
+                        )
+                        continue
+
                     decoded = pb.FeedResponse()
                     decoded.ParseFromString(message)
                     data = MessageToDict(decoded)
@@ -0,0 +1,184 @@
+# strategies/fibonacci_levels.py
+#
+# Rolling swing high/low and Fibonacci retracement levels.
+#
+# Levels follow the retracement convention of detect_fib_trade_with_ai:
+# level r sits at ``high - r * (high - low)``, so "0.618" is the deep
+# pullback and "0.236" the shallow one.  (backtest2's ``low + r * diff`` is
+# the same grid read from the other end: its fib_382 is our "0.618".)
+#
+# Windows include the current bar.  Strategies that compare a price with
+# the range of the bars *before* it read the levels before updating
+# (streaming) or shift the arrays by one (batch).
+
+import threading
+from collections import deque
+
+import numpy as np
+
+FIB_RATIOS = (0.236, 0.382, 0.5, 0.618)
+
+
+def _rolling_extreme(values, window, ufunc, fill):
+    """O(n) rolling max/min (van Herk / Gil-Werman): per-block prefix and suffix scans."""
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    out = np.full(n, np.nan)
+    if window < 1 or n < window:
+        return out
+    blocks = -(-n // window)
+    padded = np.full(blocks * window, fill)
+    padded[:n] = x
+    padded = padded.reshape(blocks, window)
+    prefix = ufunc.accumulate(padded, axis=1).ravel()
+    suffix = ufunc.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()
+    end = np.arange(window - 1, n)
+    out[window - 1 :] = ufunc(suffix[end - window + 1], prefix[end])
+    return out
+
+
+def rolling_max(values, window) -> np.ndarray:
+    """Like ``Series.rolling(window).max()``."""
+    return _rolling_extreme(values, window, np.maximum, -np.inf)
+
+
+def rolling_min(values, window) -> np.ndarray:
+    """Like ``Series.rolling(window).min()``."""
+    return _rolling_extreme(values, window, np.minimum, np.inf)
+
+
+def fibonacci_levels(high, low=None, lookback=50, ratios=FIB_RATIOS) -> dict:
+    """Rolling swing high/low and retracement levels as {name: array}.
+
+    ``low`` defaults to ``high`` for close-only series.
+    """
+    swing_high = rolling_max(high, lookback)
+    swing_low = rolling_min(high if low is None else low, lookback)
+    diff = swing_high - swing_low
+    levels = {"high": swing_high, "low": swing_low}
+    for ratio in ratios:
+        levels[str(ratio)] = swing_high - ratio * diff
+    return levels
+
+
+class MonotonicWindow:
+    """Sliding max (or min) over the last ``window`` values, amortized O(1) per push."""
+
+    __slots__ = ("window", "is_max", "entries", "count")
+
+    def __init__(self, window, is_max=True):
+        self.window = window
+        self.is_max = is_max
+        self.entries = deque()  # (index, value), values monotonic from the front
+        self.count = 0
+
+    def _dominates(self, new, old):
+        return new >= old if self.is_max else new <= old
+
+    def push(self, value):
+        entries = self.entries
+        while entries and self._dominates(value, entries[-1][1]):
+            entries.pop()
+        entries.append((self.count, value))
+        self.count += 1
+        if entries[0][0] <= self.count - 1 - self.window:
+            entries.popleft()
+
+    def amend_last(self, value):
+        """Replace the newest value with a more extreme one (a late tick)."""
+        entries = self.entries
+        if not entries or not self._dominates(value, entries[-1][1]):
+            return
+        index = self.count - 1
+        while entries and self._dominates(value, entries[-1][1]):
+            entries.pop()
+        entries.append((index, value))
+
+    @property
+    def ready(self):
+        return self.count >= self.window
+
+    @property
+    def value(self):
+        return self.entries[0][1] if self.entries else float("nan")
+
+
+class FibonacciLevels:
+    """Streaming counterpart of :func:`fibonacci_levels` for one instrument."""
+
+    __slots__ = ("lookback", "ratios", "highs", "lows")
+
+    def __init__(self, lookback=50, ratios=FIB_RATIOS):
+        self.lookback = lookback
+        self.ratios = ratios
+        self.highs = MonotonicWindow(lookback, is_max=True)
+        self.lows = MonotonicWindow(lookback, is_max=False)
+
+    def update(self, high, low=None):
+        self.highs.push(high)
+        self.lows.push(high if low is None else low)
+        return self.levels()
+
+    def amend(self, high, low=None):
+        self.highs.amend_last(high)
+        self.lows.amend_last(high if low is None else low)
+
+    @property
+    def ready(self):
+        return self.highs.ready
+
+    def levels(self):
+        """{name: price}, or None until a full lookback has been seen."""
+        if not self.ready:
+            return None
+        swing_high, swing_low = self.highs.value, self.lows.value
+        diff = swing_high - swing_low
+        levels = {"high": swing_high, "low": swing_low}
+        for ratio in self.ratios:
+            levels[str(ratio)] = swing_high - ratio * diff
+        return levels
+
+
+class FibonacciTracker:
+    """Fibonacci levels for every instrument on the live bar feed.
+
+    Fed by bar closes from the bar builder, so each closed bar costs one
+    deque push per side regardless of the lookback.
+    """
+
+    def __init__(self, lookback=50, timeframe="5m", ratios=FIB_RATIOS):
+        self.lookback = lookback
+        self.timeframe = timeframe
+        self.ratios = ratios
+        self.instruments = {}  # instrument_key -> FibonacciLevels
+        self.lock = threading.Lock()
+        self.subscription = None
+
+    def on_bar(self, event):
+        with self.lock:
+            levels = self.instruments.get(event.instrument_key)
+            if levels is None:
+                levels = FibonacciLevels(self.lookback, self.ratios)
+                self.instruments[event.instrument_key] = levels
+            if event.amended:
+                levels.amend(event.high, event.low)
+            else:
+                levels.update(event.high, event.low)
+
+    def attach(self, builder=None, instrument_keys=None):
+        if builder is None:
+            from services.market_data.bar_builder import bar_builder as builder
+        self.subscription = builder.subscribe(self.on_bar, [self.timeframe], instrument_keys)
+        return self
+
+    def detach(self, builder=None):
+        if builder is None:
+            from services.market_data.bar_builder import bar_builder as builder
+        if self.subscription:
+            builder.unsubscribe(self.subscription)
+            self.subscription = None
+
+    def levels(self, instrument_key):
+        with self.lock:
+            levels = self.instruments.get(instrument_key)
+            return levels.levels() if levels else None
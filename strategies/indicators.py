@@ -0,0 +1,324 @@
+# strategies/indicators.py
+#
+# One implementation of the technical indicators used across the models and
+# strategies, in two forms that give the same numbers:
+#
+#   * batch functions over NumPy arrays (backtests, training), and
+#   * streaming classes with an O(1) ``update(value)`` (live bars/ticks).
+#
+# Semantics follow the pandas code they replace: rolling windows need a full
+# window (NaN before that), std uses ddof=1, and the RSI is the simple
+# rolling-mean variant used by the models (first price change counted as 0).
+
+import math
+from collections import deque
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+# Streaming rolling sums are recomputed from the window this often to stop
+# floating point drift from building up on long-running feeds.
+RESYNC_EVERY = 1024
+
+
+def _as_array(values) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+def _rolling(values, window, reducer):
+    x = _as_array(values)
+    out = np.full(len(x), np.nan)
+    if len(x) >= window:
+        out[window - 1 :] = reducer(sliding_window_view(x, window), axis=1)
+    return out
+
+
+# --- batch ---------------------------------------------------------------
+
+
+def sma(values, window) -> np.ndarray:
+    """Rolling mean, like ``Series.rolling(window).mean()``."""
+    return _rolling(values, window, np.mean)
+
+
+def rolling_std(values, window) -> np.ndarray:
+    """Rolling sample standard deviation, like ``rolling(window).std()``."""
+    return _rolling(values, window, lambda w, axis: np.std(w, axis=axis, ddof=1))
+
+
+def ema(values, span, adjust=True) -> np.ndarray:
+    """Exponential moving average, like ``Series.ewm(span=span, adjust=adjust).mean()``.
+
+    Leading NaNs are skipped; the rest of the input must be NaN free.
+    """
+    x = _as_array(values)
+    out = np.full(len(x), np.nan)
+    valid = np.flatnonzero(~np.isnan(x))
+    if not len(valid):
+        return out
+    first = valid[0]
+    x = x[first:]
+    alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+    if adjust:
+        numerator = lfilter([1.0], [1.0, -decay], x)
+        denominator = (1.0 - decay ** np.arange(1, len(x) + 1)) / alpha
+        out[first:] = numerator / denominator
+    else:
+        out[first:] = lfilter([alpha], [1.0, -decay], x, zi=[decay * x[0]])[0]
+    return out
+
+
+def pct_change(values) -> np.ndarray:
+    x = _as_array(values)
+    out = np.full(len(x), np.nan)
+    out[1:] = x[1:] / x[:-1] - 1.0
+    return out
+
+
+def rsi(values, period=14) -> np.ndarray:
+    """Rolling-mean RSI as computed by the models' ``_calculate_rsi``."""
+    x = _as_array(values)
+    delta = np.zeros(len(x))
+    delta[1:] = np.diff(x)
+    gain = sma(np.where(delta > 0, delta, 0.0), period)
+    loss = sma(np.where(delta < 0, -delta, 0.0), period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100.0 - 100.0 / (1.0 + gain / loss)
+
+
+def macd(values, fast=12, slow=26, signal=9):
+    """(macd, signal line) from non-adjusted EMAs."""
+    line = ema(values, fast, adjust=False) - ema(values, slow, adjust=False)
+    return line, ema(line, signal, adjust=False)
+
+
+def bollinger_position(values, window=20, k=2.0) -> np.ndarray:
+    """Where the price sits between the lower (0) and upper (1) band."""
+    x = _as_array(values)
+    mean, std = sma(x, window), rolling_std(x, window)
+    lower = mean - k * std
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (x - lower) / (2 * k * std)
+
+
+def volatility(values, window=20) -> np.ndarray:
+    """Rolling std of simple returns."""
+    return rolling_std(pct_change(values), window)
+
+
+def rolling_zscore(values, window=14, scale=100.0) -> np.ndarray:
+    """(last - mean) / std over the window, times ``scale``."""
+    x = _as_array(values)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (x - sma(x, window)) / rolling_std(x, window) * scale
+
+
+# --- streaming -------------------------------------------------------------
+
+
+class EMA:
+    """Streaming ``ewm(span, adjust).mean()``."""
+
+    __slots__ = ("alpha", "decay", "adjust", "numerator", "denominator", "value")
+
+    def __init__(self, span, adjust=True):
+        self.alpha = 2.0 / (span + 1.0)
+        self.decay = 1.0 - self.alpha
+        self.adjust = adjust
+        self.numerator = 0.0
+        self.denominator = 0.0
+        self.value = math.nan
+
+    def update(self, x):
+        if math.isnan(x):
+            return self.value
+        if self.adjust:
+            self.numerator = x + self.decay * self.numerator
+            self.denominator = 1.0 + self.decay * self.denominator
+            self.value = self.numerator / self.denominator
+        elif math.isnan(self.value):
+            self.value = x
+        else:
+            self.value = self.alpha * x + self.decay * self.value
+        return self.value
+
+
+class RollingWindow:
+    """Fixed window with O(1) mean and sample std.
+
+    Sums are kept relative to the first value seen, which keeps the
+    variance accurate for prices far from zero.
+    """
+
+    __slots__ = ("window", "values", "shift", "total", "total_sq", "nans", "updates")
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.shift = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.nans = 0
+        self.updates = 0
+
+    def push(self, x):
+        if self.shift is None and not math.isnan(x):
+            self.shift = x
+        self._add(x, 1)
+        self.values.append(x)
+        if len(self.values) > self.window:
+            self._add(self.values.popleft(), -1)
+        self.updates += 1
+        if self.updates % RESYNC_EVERY == 0:
+            self._resync()
+
+    def _add(self, x, sign):
+        if math.isnan(x):
+            self.nans += sign
+            return
+        d = x - self.shift
+        self.total += sign * d
+        self.total_sq += sign * d * d
+
+    def _resync(self):
+        finite = [v - self.shift for v in self.values if not math.isnan(v)]
+        self.total = math.fsum(finite)
+        self.total_sq = math.fsum(d * d for d in finite)
+
+    @property
+    def ready(self):
+        return len(self.values) == self.window and not self.nans
+
+    def mean(self):
+        if not self.ready:
+            return math.nan
+        return self.shift + self.total / self.window
+
+    def std(self):
+        if not self.ready:
+            return math.nan
+        n = self.window
+        variance = (self.total_sq - self.total * self.total / n) / (n - 1)
+        return math.sqrt(max(variance, 0.0))
+
+
+class SMA:
+    __slots__ = ("window", "value")
+
+    def __init__(self, window):
+        self.window = RollingWindow(window)
+        self.value = math.nan
+
+    def update(self, x):
+        self.window.push(x)
+        self.value = self.window.mean()
+        return self.value
+
+
+class RollingStd:
+    __slots__ = ("window", "value")
+
+    def __init__(self, window):
+        self.window = RollingWindow(window)
+        self.value = math.nan
+
+    def update(self, x):
+        self.window.push(x)
+        self.value = self.window.std()
+        return self.value
+
+
+class RSI:
+    """Streaming counterpart of :func:`rsi`."""
+
+    __slots__ = ("gains", "losses", "previous", "value")
+
+    def __init__(self, period=14):
+        self.gains = RollingWindow(period)
+        self.losses = RollingWindow(period)
+        self.previous = None
+        self.value = math.nan
+
+    def update(self, x):
+        delta = 0.0 if self.previous is None else x - self.previous
+        self.previous = x
+        # A NaN change counts as 0, as with Series.where(delta > 0, 0)
+        self.gains.push(delta if delta > 0 else 0.0)
+        self.losses.push(-delta if delta < 0 else 0.0)
+        gain, loss = self.gains.mean(), self.losses.mean()
+        if math.isnan(gain) or (gain == 0 and loss == 0):
+            self.value = math.nan
+        elif loss == 0:
+            self.value = 100.0
+        else:
+            self.value = 100.0 - 100.0 / (1.0 + gain / loss)
+        return self.value
+
+
+class MACD:
+    __slots__ = ("fast", "slow", "signal_ema", "value", "signal")
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(fast, adjust=False)
+        self.slow = EMA(slow, adjust=False)
+        self.signal_ema = EMA(signal, adjust=False)
+        self.value = math.nan
+        self.signal = math.nan
+
+    def update(self, x):
+        self.value = self.fast.update(x) - self.slow.update(x)
+        self.signal = self.signal_ema.update(self.value)
+        return self.value, self.signal
+
+
+class BollingerPosition:
+    __slots__ = ("window", "k", "value")
+
+    def __init__(self, window=20, k=2.0):
+        self.window = RollingWindow(window)
+        self.k = k
+        self.value = math.nan
+
+    def update(self, x):
+        self.window.push(x)
+        mean, std = self.window.mean(), self.window.std()
+        if math.isnan(std) or std == 0:
+            self.value = math.nan
+        else:
+            self.value = (x - (mean - self.k * std)) / (2 * self.k * std)
+        return self.value
+
+
+class Volatility:
+    __slots__ = ("previous", "std", "value")
+
+    def __init__(self, window=20):
+        self.previous = None
+        self.std = RollingStd(window)
+        self.value = math.nan
+
+    def update(self, x):
+        change = math.nan if self.previous is None else x / self.previous - 1.0
+        self.previous = x
+        self.value = self.std.update(change)
+        return self.value
+
+
+class RollingZScore:
+    __slots__ = ("window", "scale", "value")
+
+    def __init__(self, window=14, scale=100.0):
+        self.window = RollingWindow(window)
+        self.scale = scale
+        self.value = math.nan
+
+    def update(self, x):
+        self.window.push(x)
+        std = self.window.std()
+        if math.isnan(std) or std == 0:
+            self.value = math.nan
+        else:
+            self.value = (x - self.window.mean()) / std * self.scale
+        return self.value
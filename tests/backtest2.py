@@ -4,9 +4,11 @@ import matplotlib.pyplot as plt
 import logging
 import yaml
 
+from services.backtester.strategies import fibonacci_breakout
+
 # Configuration (normally in config.yaml)
 CONFIG = {
-    "data": {"csv_path": "C:\Work\P\app\tradingapp-main\tradingapp-main\data\processed\NIFTY IT\TCS.NS_historical.csv"},
+    "data": {"csv_path": r"C:\Work\P\app\tradingapp-main\tradingapp-main\data\processed\NIFTY IT\TCS.NS_historical.csv"},
     "strategy": {"type": "fibonacci", "lookback": 20, "stop_loss_pct": 0.02, "target_pct": 0.05},
     "capital": {"initial": 100000},
     "trading": {"shares_per_trade": 100, "broker_fee": 20}
@@ -22,33 +24,7 @@ def load_csv_data(csv_path):
 
 # Fibonacci Strategy
 def fibonacci_strategy(prices, lookback=20, stop_loss_pct=0.02, target_pct=0.05):
-    signals = pd.DataFrame(index=prices.index)
-    signals['price'] = prices
-    signals['high'] = prices.rolling(window=lookback).max()
-    signals['low'] = prices.rolling(window=lookback).min()
-    signals['fib_382'] = signals['low'] + (signals['high'] - signals['low']) * 0.382
-    signals['fib_50'] = signals['low'] + (signals['high'] - signals['low']) * 0.5
-    signals['fib_618'] = signals['low'] + (signals['high'] - signals['low']) * 0.618
-    
-    signals['signal'] = 0
-    signals['stop_loss'] = np.nan
-    signals['target'] = np.nan
-    
-    for i in range(lookback, len(signals)):
-        if signals['price'].iloc[i] > signals['fib_50'].iloc[i-1] and signals['signal'].iloc[i-1] == 0:
-            signals['signal'].iloc[i] = 1
-            signals['stop_loss'].iloc[i] = signals['price'].iloc[i] * (1 - stop_loss_pct)
-            signals['target'].iloc[i] = signals['price'].iloc[i] * (1 + target_pct)
-        elif signals['signal'].iloc[i-1] == 1:
-            if signals['price'].iloc[i] <= signals['stop_loss'].iloc[i-1]:
-                signals['signal'].iloc[i] = -1
-            elif signals['price'].iloc[i] >= signals['target'].iloc[i-1]:
-                signals['signal'].iloc[i] = -1
-            else:
-                signals['signal'].iloc[i] = 1
-    
-    signals['positions'] = signals['signal'].diff()
-    return signals
+    return fibonacci_breakout(prices, lookback, stop_loss_pct, target_pct)
 
 # Advanced Metrics Calculation
 def calculate_metrics(portfolio, trades):
@@ -0,0 +1,51 @@
+# tests/benchmark_event_replay.py
+#
+# Replays a synthetic full session (09:15-15:30) of random-walk ticks through
+# the event-driven backtester and prints throughput and per-event latency.
+# Run from the repo root:
+#
+#     python -m tests.benchmark_event_replay --instruments 50 --ticks-per-second 1
+
+import argparse
+import json
+
+import numpy as np
+
+from services.backtester.event_driven import EMACrossPredictor, Simulation
+from services.risk_management_service import RiskManagement
+
+SESSION_START = 1_735_789_500_000  # 2025-01-02 09:15:00 IST
+SESSION_SECONDS = 6 * 3600 + 15 * 60
+
+
+def session_ticks(instruments, ticks_per_second, seed=0):
+    rng = np.random.default_rng(seed)
+    count = int(SESSION_SECONDS * ticks_per_second)
+    ticks = {}
+    for i in range(instruments):
+        ts = SESSION_START + np.sort(rng.integers(0, SESSION_SECONDS * 1000, count))
+        ltp = np.round(1000 * np.exp(np.cumsum(rng.normal(0, 2e-4, count))), 2)
+        ltq = rng.integers(1, 100, count)
+        ticks[f"NSE_EQ|SIM{i:04d}"] = {"ts": ts, "ltp": ltp, "ltq": ltq, "ltt": ts, "vtt": np.cumsum(ltq)}
+    return ticks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Event-driven replay benchmark")
+    parser.add_argument("--instruments", type=int, default=50)
+    parser.add_argument("--ticks-per-second", type=float, default=1.0)
+    parser.add_argument("--timeframe", default="1m")
+    args = parser.parse_args()
+
+    ticks = session_ticks(args.instruments, args.ticks_per_second)
+    simulation = Simulation(EMACrossPredictor(), timeframe=args.timeframe, risk_manager=RiskManagement())
+    simulation.replay_ticks(ticks)
+    report = simulation.report()
+    print(f"{report['events']} ticks, {args.instruments} instruments, {report['bars']} bars")
+    print(
+        f"{report['wall_seconds']:.2f} s for {report['virtual_seconds'] / 3600:.2f} h of session: "
+        f"{report['events_per_second']:,.0f} ticks/s, {report['speedup']:,.0f}x real time"
+    )
+    for name in ("latency_us", "decision_latency_us"):
+        print(f"{name:>20}: " + "  ".join(f"{k} {v:.1f}" for k, v in report[name].items()))
+    print(json.dumps(report["trading"], indent=2, default=float))
@@ -0,0 +1,68 @@
+# tests/benchmark_feed_simulator.py
+#
+# End-to-end load test of the /ws/market feed path against the local feed
+# simulator: authorize, upstream sockets, tick decoding, the shared hub and
+# each viewer's send queue. Run from the repo root:
+#
+#     python -m tests.benchmark_feed_simulator --instruments 5000 --rate 10000 --viewers 20
+
+import argparse
+import asyncio
+import time
+
+import services.upstox.feed_auth as feed_auth
+from services.upstox.feed_hub import acquire_feed_hub, release_feed_hub
+from services.upstox.send_queue import ClientSendQueue
+from services.upstox.simulator import FeedSimulator
+
+
+async def run(instruments, rate, viewers, seconds):
+    simulator = await FeedSimulator(port=0, rate=rate).start()
+    feed_auth.AUTHORIZE_URL = simulator.authorize_url
+
+    keys = [f"NSE_FO|{100000 + i}" for i in range(instruments)]
+    delivered = [0] * viewers
+
+    def sender(index):
+        async def send(message):
+            if message.get("type") == "live_feed":
+                delivered[index] += len(message["data"])
+
+        return send
+
+    queues = []
+    for index in range(viewers):
+        queue = ClientSendQueue(f"viewer-{index}", sender(index))
+        queue.start()
+        queues.append(queue)
+        acquire_feed_hub(f"viewer-{index}", keys, "sim-token", callback=queue.offer)
+
+    await asyncio.sleep(1)  # connect and subscribe
+    start_ticks, start = simulator.ticks_sent, time.perf_counter()
+    start_delivered = sum(delivered)
+    await asyncio.sleep(seconds)
+    elapsed = time.perf_counter() - start
+
+    upstream = (simulator.ticks_sent - start_ticks) / elapsed
+    downstream = (sum(delivered) - start_delivered) / elapsed
+    max_lag = max(q.max_lag_ms for q in queues)
+    print(f"instruments={instruments} viewers={viewers} target={rate} ticks/s per connection")
+    print(f"upstream   {upstream:12,.0f} ticks/s")
+    print(f"downstream {downstream:12,.0f} ticks/s across viewers (after conflation)")
+    print(f"max queue lag {max_lag:.1f} ms, dropped {sum(q.dropped for q in queues)}")
+
+    for index, queue in enumerate(queues):
+        release_feed_hub(f"viewer-{index}")
+        queue.close()
+    await asyncio.sleep(0.2)
+    await simulator.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--instruments", type=int, default=5000)
+    parser.add_argument("--rate", type=int, default=10000)
+    parser.add_argument("--viewers", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.instruments, args.rate, args.viewers, args.seconds))
@@ -0,0 +1,65 @@
+# tests/benchmark_fibonacci_levels.py
+#
+# Cost of Fibonacci swing levels for every stock in data/top_stocks.json:
+# the per-row iloc max/min of the backtests against the batch and streaming
+# engines.  Run from the repo root:
+#
+#     python -m tests.benchmark_fibonacci_levels --bars 2000 --lookback 50
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from strategies.fibonacci_levels import FibonacciLevels, fibonacci_levels
+
+
+def iloc_levels(prices: pd.Series, lookback):
+    highs, lows = [], []
+    for i in range(lookback, len(prices)):
+        highs.append(prices.iloc[i - lookback : i].max())
+        lows.append(prices.iloc[i - lookback : i].min())
+    return highs, lows
+
+
+def bench(label, fn, universe, bars):
+    start = time.perf_counter()
+    for series in universe:
+        fn(series)
+    elapsed = time.perf_counter() - start
+    per_bar = elapsed / (len(universe) * bars) * 1e6
+    print(f"{label:<34} {elapsed:8.3f} s  {per_bar:8.3f} µs/bar")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fibonacci level engine benchmark")
+    parser.add_argument("--bars", type=int, default=2000)
+    parser.add_argument("--lookback", type=int, default=50)
+    parser.add_argument("--iloc-stocks", type=int, default=5, help="stocks timed on the iloc path")
+    args = parser.parse_args()
+
+    with open("data/top_stocks.json") as f:
+        stocks = json.load(f)["securities"]
+    rng = np.random.default_rng(1)
+    universe = [
+        pd.Series(1000 * np.exp(np.cumsum(rng.normal(0, 0.01, args.bars)))) for _ in stocks
+    ]
+    print(f"{len(universe)} stocks x {args.bars} bars, lookback {args.lookback}\n")
+
+    lookback = args.lookback
+    sample = universe[: args.iloc_stocks]
+    baseline = bench("iloc max/min per row", lambda s: iloc_levels(s, lookback), sample, args.bars)
+    baseline *= len(universe) / len(sample)
+    batch = bench("fibonacci_levels (batch)", lambda s: fibonacci_levels(s.to_numpy(), None, lookback), universe, args.bars)
+
+    def stream(series):
+        engine = FibonacciLevels(lookback)
+        for price in series.to_numpy().tolist():
+            engine.update(price)
+
+    streaming = bench("FibonacciLevels.update (stream)", stream, universe, args.bars)
+    print(f"\nSpeed-up (batch):     {baseline / batch:.0f}x")
+    print(f"Speed-up (streaming): {baseline / streaming:.0f}x")
@@ -0,0 +1,45 @@
+# tests/benchmark_sweep.py
+#
+# Sweep throughput against the number of worker processes, to check that it
+# scales with cores. Run from the repo root:
+#
+#     python -m tests.benchmark_sweep --sets 256 --max-processes 32
+
+import argparse
+import os
+import time
+
+from services.backtester.sweep import load_prices, random_search, run_sweep
+
+SPACE = {"lookback": (10, 80), "stop_loss_pct": (0.01, 0.05), "target_pct": (0.02, 0.1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parameter sweep scaling benchmark")
+    parser.add_argument("--sets", type=int, default=256)
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    prices = load_prices()
+    param_sets = list(random_search(SPACE, args.sets, seed=1))
+    print(f"{len(param_sets)} parameter sets x {len(prices)} symbols, {os.cpu_count()} cores\n")
+
+    counts, processes = [], 1
+    while processes <= args.max_processes:
+        counts.append(processes)
+        processes *= 2
+    if counts[-1] != args.max_processes:
+        counts.append(args.max_processes)
+
+    start = time.perf_counter()
+    run_sweep("fibonacci_breakout", param_sets, prices, processes=0)
+    serial = time.perf_counter() - start
+    print(f"{'in-process':>12} {serial:8.2f} s  {len(param_sets) / serial:8.1f} sets/s")
+    for processes in counts:
+        start = time.perf_counter()
+        run_sweep("fibonacci_breakout", param_sets, prices, processes=processes)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{processes:>3} processes {elapsed:8.2f} s  {len(param_sets) / elapsed:8.1f} sets/s"
+            f"  speed-up {serial / elapsed:5.1f}x  efficiency {serial / elapsed / processes:4.0%}"
+        )
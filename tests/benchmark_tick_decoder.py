@@ -0,0 +1,97 @@
+# tests/benchmark_tick_decoder.py
+#
+# Throughput of the MessageToDict + parse_live_feed path against the
+# dict-free Tick decoder.  Run from the repo root:
+#
+#     python -m tests.benchmark_tick_decoder --instruments 3000 --frames 50
+
+import argparse
+import random
+import time
+
+import services.upstox.MarketDataFeed_pb2 as pb
+from services.upstox.tick_decoder import decode_frame, decode_frame_dict, parse_live_feed
+
+
+def build_full_frame(instrument_count: int, seed: int = 7) -> bytes:
+    """Synthetic 'full' mode live_feed frame with 5-level depth and greeks."""
+    rng = random.Random(seed)
+    msg = pb.FeedResponse()
+    msg.type = pb.live_feed
+    msg.currentTs = int(time.time() * 1000)
+
+    for i in range(instrument_count):
+        price = rng.uniform(50, 5000)
+        feed = msg.feeds[f"NSE_FO|{100000 + i}"]
+        feed.requestMode = pb.full_d5
+        ff = feed.fullFeed.marketFF
+        ff.ltpc.ltp = price
+        ff.ltpc.ltt = msg.currentTs
+        ff.ltpc.ltq = rng.randint(1, 500)
+        ff.ltpc.cp = price * 0.99
+        for level in range(5):
+            quote = ff.marketLevel.bidAskQuote.add()
+            quote.bidQ = rng.randint(1, 5000)
+            quote.bidP = price - 0.05 * (level + 1)
+            quote.askQ = rng.randint(1, 5000)
+            quote.askP = price + 0.05 * (level + 1)
+        ff.optionGreeks.delta = rng.random()
+        ff.optionGreeks.theta = -rng.random()
+        ff.optionGreeks.gamma = rng.random() / 100
+        ff.optionGreeks.vega = rng.random()
+        ff.optionGreeks.rho = rng.random() / 10
+        for interval in ("1d", "I1"):
+            ohlc = ff.marketOHLC.ohlc.add()
+            ohlc.interval = interval
+            ohlc.open, ohlc.high, ohlc.low, ohlc.close = price, price * 1.01, price * 0.99, price
+            ohlc.vol = rng.randint(1000, 100000)
+            ohlc.ts = msg.currentTs
+        ff.atp = price
+        ff.vtt = rng.randint(1000, 1000000)
+        ff.oi = rng.randint(0, 100000)
+        ff.iv = rng.random()
+        ff.tbq = rng.randint(0, 100000)
+        ff.tsq = rng.randint(0, 100000)
+
+    return msg.SerializeToString()
+
+
+def run_dict_path(raw: bytes):
+    parsed = decode_frame_dict(raw)
+    return parse_live_feed(parsed.get("feeds", {}))
+
+
+def run_tick_path(raw: bytes):
+    return decode_frame(raw).ticks
+
+
+def run_tick_path_with_json_shape(raw: bytes):
+    return parse_live_feed(decode_frame(raw).ticks)
+
+
+def bench(label, fn, raw, frames, instruments):
+    fn(raw)  # warm-up
+    start = time.perf_counter()
+    for _ in range(frames):
+        fn(raw)
+    elapsed = time.perf_counter() - start
+    ticks_per_sec = frames * instruments / elapsed
+    print(f"{label:<38} {elapsed / frames * 1000:8.2f} ms/frame  {ticks_per_sec:12,.0f} ticks/s")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Feed decoder throughput benchmark")
+    parser.add_argument("--instruments", type=int, default=3000)
+    parser.add_argument("--frames", type=int, default=50)
+    args = parser.parse_args()
+
+    raw = build_full_frame(args.instruments)
+    print(f"Frame size: {len(raw) / 1024:.1f} KiB, {args.instruments} instruments, {args.frames} frames\n")
+
+    baseline = bench("MessageToDict + parse_live_feed", run_dict_path, raw, args.frames, args.instruments)
+    ticks = bench("decode_frame (Tick records)", run_tick_path, raw, args.frames, args.instruments)
+    shaped = bench("decode_frame + as_feed_dict", run_tick_path_with_json_shape, raw, args.frames, args.instruments)
+
+    print(f"\nSpeed-up (Tick records):       {baseline / ticks:.1f}x")
+    print(f"Speed-up (Tick + JSON shaping): {baseline / shaped:.1f}x")
@@ -0,0 +1,96 @@
+# tests/benchmark_vectorized_backtest.py
+#
+# The per-row pandas loops of the backtest scripts against the vectorized
+# core, over the bundled data/processed CSVs.  Run from the repo root:
+#
+#     python -m tests.benchmark_vectorized_backtest --files 10
+
+import argparse
+import glob
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.backtester.strategies import (
+    ema_crossover,
+    fibonacci_breakout,
+    fibonacci_option_trades,
+    load_price_csv,
+)
+from tests.test_vectorized_backtest import option_frame, reference_option_trades
+
+
+def loop_breakout(prices, lookback=20, stop_loss_pct=0.02, target_pct=0.05):
+    """backtest2.fibonacci_strategy as written, with non-chained writes."""
+    signals = pd.DataFrame(index=prices.index)
+    signals['price'] = prices
+    signals['high'] = prices.rolling(window=lookback).max()
+    signals['low'] = prices.rolling(window=lookback).min()
+    signals['fib_50'] = signals['low'] + (signals['high'] - signals['low']) * 0.5
+    signals['signal'] = 0
+    signals['stop_loss'] = np.nan
+    signals['target'] = np.nan
+    col = {name: signals.columns.get_loc(name) for name in ('signal', 'stop_loss', 'target')}
+    for i in range(lookback, len(signals)):
+        if signals['price'].iloc[i] > signals['fib_50'].iloc[i-1] and signals['signal'].iloc[i-1] == 0:
+            signals.iloc[i, col['signal']] = 1
+            signals.iloc[i, col['stop_loss']] = signals['price'].iloc[i] * (1 - stop_loss_pct)
+            signals.iloc[i, col['target']] = signals['price'].iloc[i] * (1 + target_pct)
+        elif signals['signal'].iloc[i-1] == 1:
+            if signals['price'].iloc[i] <= signals['stop_loss'].iloc[i-1]:
+                signals.iloc[i, col['signal']] = -1
+            elif signals['price'].iloc[i] >= signals['target'].iloc[i-1]:
+                signals.iloc[i, col['signal']] = -1
+            else:
+                signals.iloc[i, col['signal']] = 1
+    return signals
+
+
+def loop_ema(df, short_period=9, long_period=21):
+    """run_ema_strategy as written."""
+    df["EMA_Short"] = df["close"].ewm(span=short_period).mean()
+    df["EMA_Long"] = df["close"].ewm(span=long_period).mean()
+    position, trades = 0, []
+    for i in range(1, len(df)):
+        if df["EMA_Short"][i] > df["EMA_Long"][i] and df["EMA_Short"][i-1] <= df["EMA_Long"][i-1]:
+            trades.append({"type": "BUY", "price": df["close"][i], "timestamp": df["timestamp"][i]})
+            position = df["close"][i]
+        elif df["EMA_Short"][i] < df["EMA_Long"][i] and df["EMA_Short"][i-1] >= df["EMA_Long"][i-1] and position:
+            trades.append({"type": "SELL", "price": df["close"][i], "timestamp": df["timestamp"][i],
+                           "pnl": df["close"][i] - position})
+            position = 0
+    return trades
+
+
+def bench(label, loop, vectorized, inputs):
+    start = time.perf_counter()
+    for args in inputs:
+        loop(*args)
+    loop_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for args in inputs:
+        vectorized(*args)
+    fast_time = time.perf_counter() - start
+    print(f"{label:<22} loop {loop_time:8.3f} s   vectorized {fast_time:7.4f} s   {loop_time / fast_time:7.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vectorized backtest benchmark")
+    parser.add_argument("--files", type=int, default=10)
+    args = parser.parse_args()
+
+    frames = [load_price_csv(path) for path in sorted(glob.glob("data/processed/*/*.csv"))[: args.files]]
+    print(f"{len(frames)} files, {sum(map(len, frames))} bars\n")
+
+    closes = [(frame["Close"],) for frame in frames]
+    bench("fibonacci_strategy", loop_breakout, fibonacci_breakout, closes)
+
+    options = [(option_frame(frame, seed),) for seed, frame in enumerate(frames)]
+    bench("fibonacci_backtest", reference_option_trades, fibonacci_option_trades, options)
+
+    emas = [
+        (pd.DataFrame({"timestamp": frame.index, "close": frame["Close"].to_numpy()}),)
+        for frame in frames
+    ]
+    bench("run_ema_strategy", loop_ema, ema_crossover, emas)
@@ -1,6 +1,8 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from services.backtester.strategies import fibonacci_option_trades
+
 # === CONFIG ===
 CSV_PATH = r'C:\Work\P\app\tradingapp-main\tradingapp-main\data\processed\NIFTY IT\TCS.NS_historical.csv'  # Update with your file path
 INITIAL_CAPITAL = 1000000
@@ -19,82 +21,17 @@ df[datetime_col] = pd.to_datetime(df[datetime_col])
 df.rename(columns={datetime_col: 'Timestamp'}, inplace=True)
 df = df.sort_values('Timestamp').reset_index(drop=True)
 
-# Calculate EMAs for trend filtering
-df['EMA21'] = df['UnderlyingPrice'].rolling(window=21).mean()
-df['EMA55'] = df['UnderlyingPrice'].rolling(window=55).mean()
-
-# Fibonacci calculator
-def get_fibonacci_levels(high, low):
-    diff = high - low
-    return {
-        '0.618': high - 0.618 * diff,
-        '0.5': high - 0.5 * diff,
-        '0.382': high - 0.382 * diff
-    }
-
 # === BACKTEST ===
-capital = INITIAL_CAPITAL
-wins, losses = 0, 0
-trades = []
-
-for i in range(FIB_LOOKBACK, len(df) - HOLD_CANDLES):
-    recent_high = df['UnderlyingPrice'].iloc[i - FIB_LOOKBACK:i].max()
-    recent_low = df['UnderlyingPrice'].iloc[i - FIB_LOOKBACK:i].min()
-    fib = get_fibonacci_levels(recent_high, recent_low)
-    entry_zone = fib['0.618']
-
-    current = df.iloc[i]
-    next_candles = df.iloc[i+1:i+HOLD_CANDLES+1]
-
-    # Entry condition
-    if (
-        current['UnderlyingPrice'] <= entry_zone + 5 and
-        current['UnderlyingPrice'] >= entry_zone - 5 and
-        current['UnderlyingPrice'] > current['EMA21'] > current['EMA55']
-    ):
-        entry_premium = current['Close']  # option premium
-        sl = entry_premium * (1 - STOP_LOSS_PCT)
-        target = entry_premium * (1 + TARGET_PCT)
-        outcome = 'No Hit'
-        hit = False
-
-        for j in range(len(next_candles)):
-            row = next_candles.iloc[j]
-            if row['Low'] <= sl:
-                loss = (entry_premium - sl) * LOT_SIZE * POSITION_SIZE
-                capital -= loss
-                losses += 1
-                outcome = f'SL Hit (Candle {j+1})'
-                hit = True
-                break
-            elif row['High'] >= target:
-                profit = (target - entry_premium) * LOT_SIZE * POSITION_SIZE
-                capital += profit
-                wins += 1
-                outcome = f'Target Hit (Candle {j+1})'
-                hit = True
-                break
-
-        if not hit:
-            exit_price = next_candles.iloc[-1]['Close']
-            pnl = (exit_price - entry_premium) * LOT_SIZE * POSITION_SIZE
-            capital += pnl
-            if pnl > 0:
-                wins += 1
-                outcome = 'Exit Green (No Hit)'
-            else:
-                losses += 1
-                outcome = 'Exit Red (No Hit)'
-
-        trades.append({
-            'Timestamp': current['Timestamp'],
-            'Underlying': round(current['UnderlyingPrice'], 2),
-            'Buy Premium': round(entry_premium, 2),
-            'Target': round(target, 2),
-            'Stop Loss': round(sl, 2),
-            'Outcome': outcome,
-            'Capital After Trade': round(capital, 2)
-        })
+trades, capital, wins, losses = fibonacci_option_trades(
+    df,
+    fib_lookback=FIB_LOOKBACK,
+    stop_loss_pct=STOP_LOSS_PCT,
+    target_pct=TARGET_PCT,
+    hold_candles=HOLD_CANDLES,
+    lot_size=LOT_SIZE,
+    position_size=POSITION_SIZE,
+    initial_capital=INITIAL_CAPITAL,
+)
 
 # === RESULTS ===
 total_trades = wins + losses
@@ -0,0 +1,167 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from services.backtester import jobs
+from services.backtester.jobs import JobManager
+from services.backtester.result_cache import result_cache
+from services.backtester.sweep import grid, load_prices, metrics, run_sweep, trade_returns, STRATEGIES
+from services.backtester.walk_forward import DAY, make_windows, walk_forward
+
+FILES = "data/processed/NIFTY IT/*.csv"
+
+
+class TestBacktestJobs(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        # Workers are forked from this process and inherit the patched cache
+        patcher = mock.patch.object(result_cache, "root", Path(tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.saved = []
+        self.manager = JobManager(workers=2, save=lambda job: self.saved.append(job) or 7)
+        self.addCleanup(self.manager.shutdown, wait=True)
+
+    async def events(self, job):
+        queue = self.manager.subscribe(job)
+        events = []
+        while True:
+            event = await asyncio.wait_for(queue.get(), 60)
+            events.append(event)
+            if event["job"]["status"] in jobs.FINISHED:
+                return events
+
+    async def test_backtest_job_streams_progress_and_saves(self):
+        params = {"lookback": 20, "stop_loss_pct": 0.02}
+        with mock.patch.object(jobs, "FILES_PER_BATCH", 3):
+            job = self.manager.submit("backtest", {"strategy": "fibonacci_breakout", "params": params, "files": FILES})
+        events = await self.events(job)
+
+        self.assertEqual(job.status, "completed", job.error)
+        progress = [e["job"]["done"] for e in events if e["type"] == "progress"]
+        self.assertEqual(progress, list(range(1, job.total + 1)))
+        self.assertGreater(job.total, 1)
+        self.assertIsNotNone(events[-2]["job"]["partial"]["trades"])
+
+        prices = load_prices(FILES)
+        returns = np.concatenate([trade_returns(STRATEGIES["fibonacci_breakout"](c, **params)) for c in prices.values()])
+        expected = metrics(returns, len(prices))
+        self.assertEqual(job.result["metrics"]["trades"], expected["trades"])
+        self.assertAlmostEqual(job.result["metrics"]["total_return"], expected["total_return"])
+        self.assertEqual(len(job.result["symbols"]), len(prices))
+        self.assertEqual(self.saved, [job])
+        self.assertEqual(job.backtest_id, 7)
+        self.assertEqual(job.summary["total_trades"], expected["trades"])
+        self.assertTrue(job.summary["start"] < job.summary["end"])
+        self.assertEqual(events[-1]["job"]["result"], job.result)
+
+    async def test_sweep_job_matches_run_sweep(self):
+        space = {"lookback": [10, 20, 30], "stop_loss_pct": [0.01, 0.02, 0.03]}
+        with mock.patch.object(jobs, "SETS_PER_BATCH", 2):
+            job = self.manager.submit("sweep", {"strategy": "fibonacci_breakout", "grid": space, "files": FILES})
+        await self.events(job)
+        self.assertEqual(job.status, "completed", job.error)
+        self.assertEqual(job.total, 5)
+        expected = run_sweep("fibonacci_breakout", grid(space), load_prices(FILES), processes=0)
+        self.assertEqual(job.result["top"], expected.top(20))
+        self.assertEqual(job.summary["total_profit_loss"], expected.best()[1]["total_return"])
+
+    async def test_walk_forward_job_matches_the_cli_windows(self):
+        space = {"lookback": [10, 20]}
+        spec = {"strategy": "fibonacci_breakout", "grid": space, "files": FILES, "train_days": 365, "test_days": 180}
+        job = self.manager.submit("walk_forward", spec)
+        await self.events(job)
+        self.assertEqual(job.status, "completed", job.error)
+
+        prices = load_prices(FILES)
+        first = min(columns["date"][0] for columns in prices.values())
+        last = max(columns["date"][-1] for columns in prices.values())
+        windows = make_windows(first + 365 * DAY, last + DAY, 365, 180)
+        expected = walk_forward("fibonacci_breakout", list(grid(space)), prices, windows, processes=0)
+        self.assertEqual(job.result["windows"][0]["train_start"], str(np.datetime64(first, "D")))
+        self.assertEqual(job.result["out_of_sample"], expected["out_of_sample"])
+        self.assertEqual(job.summary["start"][:10], str(np.datetime64(first + 365 * DAY, "D")))
+
+    async def test_cancel(self):
+        param_sets = [{"lookback": n} for n in range(5, 85)]
+        with mock.patch.object(jobs, "SETS_PER_BATCH", 1):
+            job = self.manager.submit(
+                "sweep", {"strategy": "fibonacci_breakout", "param_sets": param_sets, "files": FILES}
+            )
+        queue = self.manager.subscribe(job)
+        while (await asyncio.wait_for(queue.get(), 60))["type"] != "progress":
+            pass
+        self.assertTrue(self.manager.cancel(job.id))
+        await asyncio.wait_for(job.task, 60)
+        self.assertEqual(job.status, "cancelled")
+        self.assertLess(job.done, job.total)
+        self.assertFalse(self.manager.cancel(job.id))
+        self.assertEqual(self.saved, [])
+
+        queued = self.manager.submit("portfolio", {"strategy": "ema_crossover"})
+        self.assertTrue(self.manager.cancel(queued.id))
+        self.assertEqual(queued.status, "cancelled")
+
+    async def test_invalid_and_failed_jobs(self):
+        with self.assertRaises(ValueError):
+            self.manager.submit("optimize", {"strategy": "fibonacci_breakout"})
+        with self.assertRaises(ValueError):
+            self.manager.submit("backtest", {"strategy": "nope"})
+        with self.assertRaises(ValueError):
+            self.manager.submit("sweep", {"strategy": "ema_crossover", "files": FILES})
+
+        job = self.manager.submit(
+            "sweep",
+            {"strategy": "ema_crossover", "param_sets": [{"short_period": 30, "long_period": 10}], "files": FILES},
+            user_id=3,
+        )
+        await self.events(job)
+        self.assertEqual(job.status, "failed")
+        self.assertIn("No valid parameter set", job.error)
+        self.assertIsNone(self.manager.get(job.id, user_id=4))
+        self.assertEqual(self.manager.list(3), [job])
+
+
+    async def test_param_sets_from_json(self):
+        search = {"samples": 50, "seed": 1}
+        for space in ({"lookback": {"low": 10, "high": 50}}, {"lookback": "10:50"}):
+            sets = self.manager._param_sets({"random": dict(search, space=space)})
+            values = {p["lookback"] for p in sets}
+            self.assertGreater(len(values), 2)
+            self.assertTrue(values <= set(range(10, 51)))
+        sets = self.manager._param_sets({"random": dict(search, space={"stop_loss_pct": "0.01:0.05"})})
+        self.assertTrue(all(0.01 <= p["stop_loss_pct"] <= 0.05 for p in sets))
+        # A list is still a set of choices
+        sets = self.manager._param_sets({"random": dict(search, space={"lookback": [10, 50]})})
+        self.assertEqual({p["lookback"] for p in sets}, {10, 50})
+
+        with mock.patch.object(jobs, "MAX_PARAM_SETS", 100):
+            with self.assertRaises(ValueError):
+                self.manager._param_sets({"random": {"space": {"lookback": "10:50"}, "samples": 10**9}})
+            with self.assertRaises(ValueError):
+                self.manager._param_sets({"grid": {"a": list(range(20)), "b": list(range(20))}})
+            with self.assertRaises(ValueError):
+                self.manager._param_sets({"param_sets": [{}] * 101})
+            self.assertEqual(len(self.manager._param_sets({"grid": {"a": list(range(10)), "b": [1, 2]}})), 20)
+
+
+    async def test_dead_worker_does_not_break_later_jobs(self):
+        job = jobs.Job("backtest", {"strategy": "ema_crossover"})
+        await self.manager._run(job, [(os._exit, 1)], lambda batch: None)
+        self.assertEqual(job.status, "failed")
+        self.assertIn("worker process died", job.error)
+        self.assertIsNone(self.manager.pool)
+
+        job = self.manager.submit("backtest", {"strategy": "ema_crossover", "files": FILES})
+        await self.events(job)
+        self.assertEqual(job.status, "completed")
+
+
+if __name__ == "__main__":
+    unittest.main()
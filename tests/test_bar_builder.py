@@ -0,0 +1,80 @@
+import unittest
+
+from services.market_data.bar_builder import BarBuilder
+from services.upstox.tick_decoder import Tick
+
+KEY = "NSE_EQ|INE002A01018"
+BASE = 1_735_789_500_000  # 2025-01-02 09:15:00 IST, a minute boundary
+
+
+def tick(offset_ms, ltp, vtt):
+    t = Tick(KEY, "full")
+    t.ltp, t.ltt, t.vtt, t.ltq = ltp, BASE + offset_ms, vtt, 1
+    return t
+
+
+class TestBarBuilder(unittest.TestCase):
+    def setUp(self):
+        self.builder = BarBuilder(capacity=10, late_grace_ms=2_000)
+        self.events = []
+        self.builder.subscribe(self.events.append, timeframes=["1m"])
+
+    def test_minute_bars_close_on_next_bucket(self):
+        self.builder.update_many(
+            [tick(0, 100.0, 10), tick(20_000, 103.0, 15), tick(40_000, 99.0, 18)]
+        )
+        self.assertEqual(self.events, [])
+        self.builder.update_many([tick(61_000, 101.0, 25)])
+
+        (event,) = self.events
+        self.assertEqual(
+            (event.start, event.open, event.high, event.low, event.close, event.volume, event.ticks),
+            (BASE, 100.0, 103.0, 99.0, 99.0, 9, 3),
+        )
+        self.assertFalse(event.amended)
+
+        bars = self.builder.bars(KEY, "1m", include_open=True)
+        self.assertEqual(bars["close"].tolist(), [99.0, 101.0])
+        self.assertEqual(bars["volume"].tolist(), [9, 7])
+
+    def test_late_tick_amends_previous_bar(self):
+        self.builder.update_many([tick(0, 100.0, 10), tick(60_500, 101.0, 12)])
+        self.builder.update_many([tick(59_000, 105.0, 11)])  # 1.5s late
+
+        closed, amended = self.events
+        self.assertTrue(amended.amended)
+        self.assertEqual((amended.high, amended.close, amended.ticks), (105.0, closed.close, 2))
+        self.assertEqual(self.builder.late_amended, 1)
+
+    def test_too_late_tick_is_dropped(self):
+        self.builder.update_many([tick(0, 100.0, 10), tick(65_000, 101.0, 12)])
+        self.builder.update_many([tick(30_000, 90.0, 11)])  # 35s behind
+
+        self.assertEqual(len(self.events), 1)
+        self.assertEqual(self.events[0].low, 100.0)
+        self.assertEqual(self.builder.late_dropped, 1)
+
+    def test_rings_grow_as_bars_close(self):
+        builder = BarBuilder(capacity=40)
+        builder.update_many([tick(i * 1_000, 100.0 + i, i) for i in range(60)])
+        series = builder.instruments[KEY].series
+        self.assertEqual((series["1s"].size, series["1s"].count), (40, 40))
+        self.assertEqual(series["1m"].size, 16)  # nothing closed yet
+        self.assertEqual(builder.bars(KEY, "1s", n=40)["close"].tolist(), [100.0 + i for i in range(19, 59)])
+
+        builder.evict([KEY, "NSE_EQ|UNKNOWN"])
+        self.assertIsNone(builder.bars(KEY, "1s"))
+
+    def test_clock_closes_quiet_instruments(self):
+        self.builder.update_many([tick(0, 100.0, 10)])
+        self.builder.close_due(now_ms=BASE + 61_000)
+        self.assertEqual([e.start for e in self.events], [BASE])
+
+        # A straggler for the bar the clock closed amends it instead of reopening it
+        self.builder.update_many([tick(59_900, 100.5, 11)])
+        self.assertTrue(self.events[-1].amended)
+        self.assertEqual(self.builder.bars(KEY, "1m", include_open=True)["start"].tolist(), [BASE])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import asyncio
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from services.market_data.candle_cache import (
+    IST,
+    CandleCache,
+    candles_to_columns,
+    columns_to_candles,
+    columns_to_frame,
+)
+
+ONE_DAY = timedelta(days=1)
+
+
+def daily_candles(first, last):
+    """One candle per weekday, close = day ordinal."""
+    candles, day = [], first
+    while day <= last:
+        if day.weekday() < 5:
+            ts = datetime(day.year, day.month, day.day, tzinfo=IST).isoformat()
+            n = day.toordinal()
+            candles.append([ts, n - 1, n + 1, n - 2, n, 100, 0])
+        day += ONE_DAY
+    return candles[::-1]  # newest first, like Upstox
+
+
+class FakeBroker:
+    def __init__(self):
+        self.calls = []
+
+    def fetch(self, first, last):
+        self.calls.append((first, last))
+        return candles_to_columns(daily_candles(first, last))
+
+    async def afetch(self, first, last):
+        await asyncio.sleep(0.01)
+        return self.fetch(first, last)
+
+
+class TestCandleCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = CandleCache(tmp.name, max_segments=4)
+        self.broker = FakeBroker()
+        self.key = "NSE_EQ|INE002A01018"
+
+    def test_only_gaps_are_fetched(self):
+        get = lambda a, b: self.cache.get(self.key, "day", a, b, self.broker.fetch)
+        first = get(date(2024, 1, 10), date(2024, 1, 20))
+        self.assertEqual(self.broker.calls, [(date(2024, 1, 10), date(2024, 1, 20))])
+
+        # The weekend at the end is covered even though it has no candles
+        again = get("2024-01-10", "2024-01-21")
+        self.assertEqual(self.broker.calls[1:], [(date(2024, 1, 21), date(2024, 1, 21))])
+        for name in first:
+            np.testing.assert_array_equal(first[name], again[name])
+
+        wider = get(date(2024, 1, 1), date(2024, 1, 31))
+        self.assertEqual(
+            self.broker.calls[2:],
+            [(date(2024, 1, 1), date(2024, 1, 9)), (date(2024, 1, 22), date(2024, 1, 31))],
+        )
+        expected = candles_to_columns(daily_candles(date(2024, 1, 1), date(2024, 1, 31)))
+        for name in expected:
+            np.testing.assert_array_equal(wider[name], expected[name])
+
+        calls = len(self.broker.calls)
+        get(date(2024, 1, 5), date(2024, 1, 25))
+        self.assertEqual(len(self.broker.calls), calls)
+        self.assertEqual(self.cache.coverage(self.key, "day"), [(date(2024, 1, 1), date(2024, 1, 31))])
+        self.assertEqual(self.cache.missing(self.key, "day", date(2023, 12, 30), date(2024, 2, 2)),
+                         [(date(2023, 12, 30), date(2023, 12, 31)), (date(2024, 2, 1), date(2024, 2, 2))])
+
+    def test_failed_fetch_is_not_cached(self):
+        def failing(first, last):
+            raise ValueError("Dhan request failed")
+
+        with self.assertRaises(ValueError):
+            self.cache.get(self.key, "day", date(2024, 2, 1), date(2024, 2, 10), failing)
+        self.assertEqual(self.cache.coverage(self.key, "day"), [])
+        self.cache.get(self.key, "day", date(2024, 2, 1), date(2024, 2, 10), self.broker.fetch)
+        self.assertEqual(self.broker.calls, [(date(2024, 2, 1), date(2024, 2, 10))])
+
+    def test_interval_stays_under_the_root(self):
+        directory = self.cache._dir("../../x", "../day")
+        self.assertEqual(directory.parent.parent, self.cache.root)
+        self.cache.get(self.key, "../day", date(2024, 2, 1), date(2024, 2, 2), self.broker.fetch)
+        self.assertEqual(self.cache.keys(), [(self.key, "../day")])
+
+    def test_today_is_never_cached(self):
+        today = datetime.now(IST).date()
+        for _ in range(2):
+            self.cache.get(self.key, "day", today - 3 * ONE_DAY, today, self.broker.fetch)
+        self.assertEqual(
+            self.broker.calls,
+            [(today - 3 * ONE_DAY, today - ONE_DAY), (today, today), (today, today)],
+        )
+        self.assertEqual(self.cache.coverage(self.key, "day"), [(today - 3 * ONE_DAY, today - ONE_DAY)])
+
+    def test_compaction_keeps_the_candles(self):
+        start = date(2024, 3, 1)
+        for i in range(12):
+            day = start + i * ONE_DAY
+            self.cache.get(self.key, "day", day, day, self.broker.fetch)
+        # Another run, separated by a gap, is never merged with the first
+        self.cache.get(self.key, "day", date(2024, 4, 1), date(2024, 4, 2), self.broker.fetch)
+
+        self.assertLessEqual(len(self.cache._segments(self.key, "day")), 4)
+        self.assertEqual(
+            self.cache.coverage(self.key, "day"),
+            [(start, start + 11 * ONE_DAY), (date(2024, 4, 1), date(2024, 4, 2))],
+        )
+        self.cache.compact(self.key, "day")
+        self.assertEqual(len(self.cache._segments(self.key, "day")), 2)
+
+        calls = len(self.broker.calls)
+        cached = self.cache.get(self.key, "day", start, start + 11 * ONE_DAY, self.broker.fetch)
+        self.assertEqual(len(self.broker.calls), calls)
+        expected = candles_to_columns(daily_candles(start, start + 11 * ONE_DAY))
+        for name in expected:
+            np.testing.assert_array_equal(cached[name], expected[name])
+
+    def test_concurrent_async_requests_fetch_once(self):
+        async def main():
+            first, last = date(2024, 5, 1), date(2024, 5, 31)
+            return await asyncio.gather(
+                *(self.cache.aget(self.key, "30minute", first, last, self.broker.afetch) for _ in range(5))
+            )
+
+        results = asyncio.run(main())
+        self.assertEqual(self.broker.calls, [(date(2024, 5, 1), date(2024, 5, 31))])
+        self.assertEqual(self.cache.fetches, 1)
+        self.assertTrue(all(len(r["ts"]) == 23 for r in results))
+        self.assertEqual(self.cache.keys(), [(self.key, "30minute")])
+
+    def test_formats_round_trip(self):
+        candles = daily_candles(date(2024, 1, 1), date(2024, 1, 7))
+        columns = candles_to_columns(candles)
+        self.assertTrue(np.all(np.diff(columns["ts"]) > 0))
+        self.assertEqual(columns_to_candles(columns), [[c[0], *map(float, c[1:5]), 100, 0.0] for c in candles])
+        frame = columns_to_frame(columns)
+        self.assertEqual(list(frame.columns), ["timestamp", "open", "high", "low", "close", "volume"])
+        self.assertEqual(frame["timestamp"].iloc[0].date(), date(2024, 1, 1))
+        # Epoch seconds and milliseconds both parse
+        ts = columns["ts"][0]
+        self.assertEqual(candles_to_columns([[ts // 1000, 1, 1, 1, 1, 1]])["ts"][0], ts)
+        self.assertEqual(len(candles_to_columns([])["ts"]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
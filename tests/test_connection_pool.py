@@ -0,0 +1,100 @@
+import asyncio
+import math
+import unittest
+from unittest import mock
+
+import services.upstox.feed_auth as feed_auth
+from services.upstox.connection_pool import KEY_LIMITS, TARGET_FILL, FeedConnectionPool, plan_connections
+from services.upstox.simulator import FeedSimulator
+from services.upstox.subscription_manager import MODE_FULL, MODE_LTPC
+
+
+def _keys(prefix, count, mode):
+    return {f"NSE_FO|{prefix}{i}": mode for i in range(count)}
+
+
+class TestPlanConnections(unittest.TestCase):
+    def test_sizes_to_the_subscription_set(self):
+        wanted = _keys("F", 6000, MODE_FULL)
+        plan, dropped = plan_connections(wanted, max_connections=10)
+
+        self.assertEqual(dropped, [])
+        self.assertEqual(sum(len(p) for p in plan), 6000)
+        self.assertTrue(all(len(p) <= KEY_LIMITS[MODE_FULL] for p in plan))
+        self.assertEqual(len(plan), math.ceil(6000 / KEY_LIMITS[MODE_FULL] / TARGET_FILL))
+
+    def test_reports_keys_beyond_the_connection_limit(self):
+        wanted = _keys("F", 3 * KEY_LIMITS[MODE_FULL], MODE_FULL)
+        plan, dropped = plan_connections(wanted, max_connections=2)
+
+        self.assertEqual(len(plan), 2)
+        self.assertEqual(len(dropped), KEY_LIMITS[MODE_FULL])
+
+    def test_full_keys_are_spread_evenly(self):
+        wanted = {**_keys("L", 6000, MODE_LTPC), **_keys("F", 900, MODE_FULL)}
+        plan, _ = plan_connections(wanted, max_connections=5)
+
+        full_counts = [sum(1 for m in p.values() if m == MODE_FULL) for p in plan]
+        self.assertLessEqual(max(full_counts) - min(full_counts), 1)
+
+    def test_rebalance_keeps_existing_placements(self):
+        wanted = _keys("F", 2500, MODE_FULL)
+        plan, _ = plan_connections(wanted, max_connections=5)
+
+        grown = {**wanted, **_keys("N", 100, MODE_FULL)}
+        new_plan, _ = plan_connections(grown, plan, max_connections=5)
+
+        moved = sum(
+            1 for old, new in zip(plan, new_plan) for key in old if key not in new
+        )
+        self.assertLessEqual(moved, 100)
+        self.assertEqual(sum(len(p) for p in new_plan), 2600)
+
+
+
+class TestPoolStop(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.simulator = await FeedSimulator(port=0, rate=200).start()
+        patcher = mock.patch.object(feed_auth, "AUTHORIZE_URL", self.simulator.authorize_url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addAsyncCleanup(feed_auth.close_http_client)
+        self.addAsyncCleanup(self.simulator.stop)
+
+    async def test_stop_closes_sockets_and_silences_auth_errors(self):
+        frames, auth_errors = [], []
+
+        async def on_auth_error():
+            auth_errors.append(True)
+
+        async def callback(data):
+            frames.append(data)
+
+        pool = FeedConnectionPool("sim-token", callback, on_auth_error=on_auth_error)
+        pool.set_keys([f"NSE_FO|{i}" for i in range(10)])
+        client, task = pool.connections[0].client, pool.connections[0].task
+        for _ in range(100):
+            if any(f.get("type") == "live_feed" for f in frames):
+                break
+            await asyncio.sleep(0.05)
+        self.assertEqual(self.simulator.connections, 1)
+
+        pool.stop()
+        await asyncio.wait_for(asyncio.gather(task, return_exceptions=True), 2)
+        for _ in range(40):
+            if not self.simulator.connections:
+                break
+            await asyncio.sleep(0.05)
+        self.assertEqual(self.simulator.connections, 0)
+        count = len(frames)
+        await asyncio.sleep(0.2)
+        self.assertEqual(len(frames), count)
+
+        # A late auth error from the stopped connection goes nowhere
+        client.should_run = True
+        await client._report_auth_error()
+        self.assertEqual(auth_errors, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
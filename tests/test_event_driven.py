@@ -0,0 +1,159 @@
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from services.backtester.event_driven import EMACrossPredictor, Simulation, SimulatedBroker, VirtualClock, load_ticks
+from services.market_data.tick_archive import TickArchive
+from services.upstox.tick_decoder import decode_frame
+from services.upstox.tick_journal import IST, TickJournal
+from tests.benchmark_tick_decoder import build_full_frame
+from trading.trade_manager import TradeManager
+
+A = "NSE_EQ|INE002A01018"
+B = "NSE_EQ|INE467B01029"
+BASE = 1_735_789_500_000  # 2025-01-02 09:15:00 IST, a minute boundary
+
+
+class BuyAfter:
+    """BUY once ``bars`` bars have closed, never SELL."""
+
+    def __init__(self, bars=2, signal="BUY"):
+        self.bars = bars
+        self.signal = signal
+        self.calls = []
+
+    def predict_live_trade(self, market_data, options_data=None):
+        self.calls.append(market_data)
+        return self.signal if market_data["bars"] >= self.bars else "HOLD"
+
+
+def ticks(prices, start=BASE, step_ms=1_000):
+    ts = start + np.arange(len(prices), dtype=np.int64) * step_ms
+    return {
+        "ts": ts,
+        "ltp": np.asarray(prices, dtype=np.float64),
+        "ltq": np.ones(len(prices), dtype=np.int64),
+        "ltt": ts,
+        "vtt": np.arange(1, len(prices) + 1, dtype=np.int64),
+    }
+
+
+class TestEventDriven(unittest.TestCase):
+    def test_entry_on_bar_close_and_take_profit_on_poll(self):
+        # Flat at 100 for three minutes, then +0.01 a second
+        prices = np.r_[np.full(180, 100.0), 100.0 + 0.01 * np.arange(1, 901)]
+        predictor = BuyAfter(bars=2)
+        simulation = Simulation(predictor, timeframe="1m").replay_ticks({A: ticks(prices)})
+
+        first = simulation.broker.trades[0]
+        self.assertEqual(first["side"], "BUY")
+        self.assertEqual(first["entry_time"], (BASE + 120_000) / 1000)  # first tick of minute 3
+        self.assertEqual(first["entry_price"], 100.0)
+        # 105 is reached 500s after the rise starts; the next monitor poll closes it
+        self.assertEqual(first["exit_time"], (BASE + 680_000) / 1000)
+        self.assertGreaterEqual(first["exit_price"], 105.0)
+        self.assertEqual(first["pnl"], first["exit_price"] - 100.0)
+        self.assertEqual(simulation.bars, 17)  # 18 minutes, the last still open
+        self.assertEqual(predictor.calls[0]["Close"], 100.0)
+
+        report = simulation.report()
+        self.assertEqual(report["events"], len(prices))
+        self.assertEqual(report["virtual_seconds"], len(prices) - 1)
+        self.assertGreater(report["speedup"], 1)
+        self.assertLessEqual(report["latency_us"]["p50"], report["latency_us"]["max"])
+        self.assertGreater(report["decision_latency_us"]["mean"], 0)
+        self.assertEqual(report["trading"]["open_positions"], 1)  # re-entered after the exit
+
+    def test_quiet_instrument_bars_close_on_the_clock(self):
+        simulation = Simulation(BuyAfter(bars=99), timeframe="1m")
+        simulation.replay_ticks({A: ticks(np.full(150, 100.0)), B: ticks([50.0], start=BASE + 5_000)})
+        self.assertEqual(simulation.broker.state(B).bars, 1)
+        self.assertEqual(simulation.broker.state(B).close, 50.0)
+        self.assertEqual(simulation.broker.state(A).bars, 2)
+
+    def test_risk_manager_and_broker_rejections(self):
+        risk = mock.Mock()
+        risk.validate_trade.return_value = False
+        simulation = Simulation(BuyAfter(bars=1), risk_manager=risk).replay_ticks({A: ticks(np.full(130, 100.0))})
+        self.assertEqual(simulation.broker.fills, [])
+        positions, trade = risk.validate_trade.call_args[0]
+        self.assertEqual((positions, trade["symbol"]), ({}, A))
+        self.assertAlmostEqual(trade["risk"], 2.0)
+
+        broker = SimulatedBroker(VirtualClock())
+        self.assertIsNone(broker.place_order("BUY", 100.0, A))
+        self.assertEqual(broker.rejected, 1)
+
+    def test_risk_is_in_rupees(self):
+        clock = VirtualClock()
+        broker = SimulatedBroker(clock, capital_per_trade=10_000)
+        broker.prices.update({A: 100.0, B: 250.0})
+        risk = mock.Mock()
+        risk.validate_trade.return_value = True
+        manager = TradeManager(broker, BuyAfter(bars=0), risk, clock=clock)
+        manager.consider_entry(A)
+        self.assertEqual(manager.active_trades[A]["quantity"], 100)
+        manager.consider_entry(B)
+        positions, trade = risk.validate_trade.call_args[0]
+        self.assertAlmostEqual(positions[A]["risk"], 100 * 100.0 * 0.02)
+        self.assertAlmostEqual(trade["risk"], 40 * 250.0 * 0.02)
+        self.assertEqual([fill[3] for fill in broker.fills], [100, 40])
+
+    def test_trend_reversal_closes_once(self):
+        clock = VirtualClock(10.0)
+        broker = SimulatedBroker(clock, quantity=5, slippage_bps=10)
+        broker.prices[A] = 100.0
+        manager = TradeManager(broker, BuyAfter(bars=0, signal="SELL"), clock=clock)
+        manager.execute_trade(A, "BUY", 100.0)
+        self.assertEqual(manager.active_trades[A]["entry_time"], 10.0)
+        broker.prices[A] = 110.0  # above take-profit too
+        manager.check_trades()
+        self.assertEqual(manager.active_trades, {})
+        (trade,) = broker.trades
+        self.assertEqual(trade["quantity"], 5)
+        self.assertAlmostEqual(trade["pnl"], (110.0 * 0.999 - 100.0 * 1.001) * 5)
+        self.assertEqual(len(broker.fills), 2)
+
+    def test_bar_replay_rebuilds_the_bars(self):
+        rng = np.random.default_rng(3)
+        close = 100 + np.cumsum(rng.normal(0, 0.5, 60))
+        open_ = np.r_[100.0, close[:-1]]
+        high = np.maximum(open_, close) + 0.3
+        low = np.minimum(open_, close) - 0.3
+        volume = rng.integers(1, 1000, 60)
+        start = BASE + np.arange(60) * 60_000
+        bars = {"start": start, "open": open_, "high": high, "low": low, "close": close, "volume": volume}
+
+        simulation = Simulation(EMACrossPredictor(), timeframe="1m").replay_bars({A: bars})
+        rebuilt = simulation.builder.bars(A, "1m", n=100, include_open=True)
+        np.testing.assert_array_equal(rebuilt["start"], start)
+        for name in ("open", "high", "low", "close", "volume"):
+            np.testing.assert_array_equal(rebuilt[name], bars[name], err_msg=name)
+        self.assertEqual(simulation.bars, 59)
+        self.assertGreater(len(simulation.broker.fills), 0)
+
+    def test_replays_the_tick_journal(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            journal_dir = Path(tmp) / "journal"
+            session = int(datetime(2025, 1, 2, 9, 15, tzinfo=IST).timestamp() * 1000)
+            journal = TickJournal(journal_dir, mode="both")
+            for i in range(120):
+                raw = build_full_frame(20, seed=i)
+                journal.record(raw, decode_frame(raw).ticks, ts_ms=session + i * 30_000)
+            journal.close()
+            keys = [t.instrument_key for t in decode_frame(build_full_frame(20, seed=0)).ticks][:3]
+
+            archive = TickArchive(Path(tmp) / "archive", journal_dir)
+            loaded = load_ticks(keys + ["NSE_EQ|MISSING"], "2025-01-02", "2025-01-03", archive)
+            self.assertEqual(sorted(loaded), sorted(keys))
+            simulation = Simulation(EMACrossPredictor(), timeframe="5m").replay_ticks(loaded)
+            self.assertEqual(simulation.report()["events"], 360)
+            self.assertEqual(simulation.builder.ticks_in, 360)
+
+
+if __name__ == "__main__":
+    unittest.main()
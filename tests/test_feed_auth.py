@@ -0,0 +1,72 @@
+import asyncio
+import unittest
+
+from services.upstox.feed_auth import FeedAuthorizer
+
+
+class CountingAuthorizer(FeedAuthorizer):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def _fetch(self, access_token):
+        self.calls += 1
+        call = self.calls
+        await asyncio.sleep(0.01)
+        return {
+            "status": "success",
+            "data": {"authorized_redirect_uri": f"wss://feed/{access_token}/{call}"},
+        }
+
+
+class TestFeedAuthorizer(unittest.TestCase):
+    def test_concurrent_calls_share_one_request(self):
+        async def scenario():
+            auth = CountingAuthorizer()
+            urls = await asyncio.gather(*(auth.authorized_url("tok", "conn") for _ in range(5)))
+            return auth.calls, set(urls)
+
+        calls, urls = asyncio.run(scenario())
+        self.assertEqual(calls, 1)
+        self.assertEqual(len(urls), 1)
+
+    def test_consumers_get_their_own_url(self):
+        async def scenario():
+            auth = CountingAuthorizer()
+            return await asyncio.gather(
+                auth.authorized_url("tok", "a"), auth.authorized_url("tok", "b")
+            )
+
+        first, second = asyncio.run(scenario())
+        self.assertNotEqual(first, second)
+
+    def test_prefetched_url_is_used_once(self):
+        async def scenario():
+            auth = CountingAuthorizer()
+            auth.prefetch("tok", "conn")
+            await asyncio.sleep(0.05)
+            first = await auth.authorized_url("tok", "conn")
+            second = await auth.authorized_url("tok", "conn")
+            return auth.calls, first, second
+
+        calls, first, second = asyncio.run(scenario())
+        self.assertEqual(calls, 2)
+        self.assertNotEqual(first, second)
+
+    def test_token_lookup_runs_once_per_user(self):
+        lookups = []
+
+        def lookup(email):
+            lookups.append(email)
+            return "token"
+
+        async def scenario():
+            auth = FeedAuthorizer()
+            return await asyncio.gather(*(auth.access_token("u@x", lookup) for _ in range(3)))
+
+        self.assertEqual(asyncio.run(scenario()), ["token"] * 3)
+        self.assertEqual(lookups, ["u@x"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from services.upstox import feed_hub
+from services.market_data.bar_builder import bar_builder
+from services.upstox.feed_hub import acquire_feed_hub, hubs, release_feed_hub
+from services.upstox.tick_decoder import Tick
+
+
+class FakePool:
+    def __init__(self, access_token, callback, on_auth_error=None, decoder="tick"):
+        self.access_token = access_token
+        self.on_auth_error = on_auth_error
+        self.connections = []
+        self.stopped = False
+
+    def set_keys(self, wanted):
+        pass
+
+    def stop(self):
+        self.stopped = True
+
+
+class TestFeedHubAuthErrors(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(feed_hub, "FeedConnectionPool", FakePool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.kicked = []
+        self.keys = ["NSE_EQ|INE002A01018", "NSE_EQ|INE467B01029"]
+
+    def join(self, token):
+        async def on_auth_error():
+            self.kicked.append(token)
+            release_feed_hub(token)
+
+        return acquire_feed_hub(token, self.keys, f"{token}-access", lambda data: None, on_auth_error)
+
+    def test_stale_pool_does_not_kick_the_new_owner(self):
+        hub = self.join("X")
+        self.join("Y")
+        stale = hub.upstream
+        release_feed_hub("X")
+        self.assertTrue(stale.stopped)
+        self.assertEqual((hub.upstream_owner, hub.upstream.access_token), ("Y", "Y-access"))
+
+        asyncio.run(stale.on_auth_error())
+        self.assertEqual(self.kicked, [])
+        self.assertEqual(hub.refcount, 1)
+        self.assertIn(hub.hub_id, hubs)
+
+        asyncio.run(hub.upstream.on_auth_error())
+        self.assertEqual(self.kicked, ["Y"])
+        self.assertEqual(hubs, {})
+
+    def test_owner_without_handler_is_released(self):
+        hub = acquire_feed_hub("X", self.keys, "X-access", lambda data: None)
+        self.join("Y")
+        asyncio.run(hub.upstream.on_auth_error())
+        self.assertEqual(hub.upstream_owner, "Y")
+        self.assertNotIn("X", feed_hub.hub_by_token)
+        release_feed_hub("Y")
+        self.assertEqual(hubs, {})
+
+
+    def test_closed_hub_evicts_its_bars(self):
+        other = "NSE_EQ|INE009A01021"
+        acquire_feed_hub("X", self.keys, "X-access", lambda data: None)
+        acquire_feed_hub("Y", [self.keys[0], other], "Y-access", lambda data: None)
+        ticks = []
+        for key in self.keys + [other]:
+            t = Tick(key, "full")
+            t.ltp, t.ltt, t.ltq = 100.0, 1_735_789_500_000, 1
+            ticks.append(t)
+        bar_builder.update_many(ticks)
+        self.addCleanup(bar_builder.evict, self.keys + [other])
+
+        release_feed_hub("X")
+        self.assertIsNotNone(bar_builder.bars(self.keys[0], "1m", include_open=True))
+        self.assertIsNone(bar_builder.bars(self.keys[1], "1m"))
+        release_feed_hub("Y")
+        self.assertIsNone(bar_builder.bars(other, "1m"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import services.upstox.feed_auth as feed_auth
+from services.upstox.simulator import FeedSimulator
+from services.upstox.ws_client import UpstoxWebSocketClient
+
+
+class TestFeedSimulator(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.simulator = await FeedSimulator(port=0, rate=500).start()
+        patcher = mock.patch.object(feed_auth, "AUTHORIZE_URL", self.simulator.authorize_url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addAsyncCleanup(feed_auth.close_http_client)
+        self.addAsyncCleanup(self.simulator.stop)
+
+    async def test_client_receives_decoded_ticks(self):
+        keys = ["NSE_EQ|INE002A01018", "NSE_FO|100001", "NSE_FO|100002"]
+        ticks = []
+
+        async def callback(data):
+            if data.get("type") == "live_feed":
+                ticks.extend(data["data"])
+
+        client = UpstoxWebSocketClient("sim-token", keys, callback, decoder="tick")
+        task = asyncio.create_task(client.connect_and_stream())
+        for _ in range(100):
+            if {t.instrument_key for t in ticks} == set(keys):
+                break
+            await asyncio.sleep(0.05)
+        client.stop()
+        await asyncio.wait_for(asyncio.gather(task, return_exceptions=True), 2)
+
+        self.assertEqual({t.instrument_key for t in ticks}, set(keys))
+        self.assertTrue(all(t.ltp > 0 and t.ltt > 0 for t in ticks))
+        self.assertGreater(self.simulator.ticks_sent, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
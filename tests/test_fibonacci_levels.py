@@ -0,0 +1,86 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from services.market_data.bar_builder import BarBuilder, BarEvent
+from strategies.fibonacci_levels import (
+    FibonacciLevels,
+    FibonacciTracker,
+    MonotonicWindow,
+    fibonacci_levels,
+    rolling_max,
+    rolling_min,
+)
+
+
+class TestFibonacciLevels(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.01, 1000)))
+        self.high = close * (1 + rng.uniform(0, 0.01, len(close)))
+        self.low = close * (1 - rng.uniform(0, 0.01, len(close)))
+
+    def test_rolling_extremes_match_pandas(self):
+        for window in (1, 7, 20, 50, 999, 1000, 1001):
+            np.testing.assert_array_equal(
+                rolling_max(self.high, window), pd.Series(self.high).rolling(window).max()
+            )
+            np.testing.assert_array_equal(
+                rolling_min(self.low, window), pd.Series(self.low).rolling(window).min()
+            )
+
+    def test_levels_match_the_loop_they_replace(self):
+        lookback = 50
+        levels = fibonacci_levels(self.high, self.low, lookback)
+        for i in range(lookback, len(self.high)):
+            high = self.high[i - lookback : i].max()
+            low = self.low[i - lookback : i].min()
+            self.assertEqual(levels["high"][i - 1], high)
+            self.assertEqual(levels["low"][i - 1], low)
+            self.assertAlmostEqual(levels["0.618"][i - 1], high - 0.618 * (high - low))
+
+    def test_streaming_matches_batch(self):
+        batch = fibonacci_levels(self.high, self.low, 20)
+        engine = FibonacciLevels(20)
+        for i, (high, low) in enumerate(zip(self.high, self.low)):
+            levels = engine.update(high, low)
+            if i < 19:
+                self.assertIsNone(levels)
+                continue
+            for name, value in levels.items():
+                self.assertEqual(value, batch[name][i])
+
+    def test_amend_last_value(self):
+        window = MonotonicWindow(3)
+        for value in (5, 4, 3):
+            window.push(value)
+        window.amend_last(9)
+        self.assertEqual(window.value, 9)
+        window.push(1)
+        window.push(1)
+        self.assertEqual(window.value, 9)
+        window.push(1)
+        self.assertEqual(window.value, 1)
+
+    def test_tracker_follows_bar_closes(self):
+        builder = BarBuilder()
+        tracker = FibonacciTracker(lookback=3, timeframe="1m").attach(builder)
+        bars = [(110, 100), (120, 105), (115, 95), (112, 101)]
+        for i, (high, low) in enumerate(bars):
+            builder._emit([BarEvent("NSE_EQ|X", "1m", i * 60_000, low, high, low, high, 1, 1)])
+        builder._emit([BarEvent("NSE_EQ|X", "5m", 0, 1, 500, 1, 1, 1, 1)])
+        levels = tracker.levels("NSE_EQ|X")
+        self.assertEqual((levels["high"], levels["low"]), (120, 95))
+
+        builder._emit([BarEvent("NSE_EQ|X", "1m", 180_000, 101, 130, 90, 112, 2, 2, amended=True)])
+        levels = tracker.levels("NSE_EQ|X")
+        self.assertEqual((levels["high"], levels["low"]), (130, 90))
+        self.assertAlmostEqual(levels["0.5"], 110)
+
+        tracker.detach(builder)
+        self.assertEqual(builder.subscribers, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
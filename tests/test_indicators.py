@@ -0,0 +1,105 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from strategies import indicators
+
+
+# The pandas formulas the library replaced, kept here as the reference.
+def pandas_rsi(prices: pd.Series, period=14):
+    delta = prices.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    rs = gain / loss
+    return 100 - (100 / (1 + rs))
+
+
+def pandas_macd(prices: pd.Series):
+    macd = prices.ewm(span=12, adjust=False).mean() - prices.ewm(span=26, adjust=False).mean()
+    return macd, macd.ewm(span=9, adjust=False).mean()
+
+
+def pandas_bollinger_position(prices: pd.Series, window=20):
+    sma = prices.rolling(window=window).mean()
+    std = prices.rolling(window=window).std()
+    upper = sma + (std * 2)
+    lower = sma - (std * 2)
+    return (prices - lower) / (upper - lower)
+
+
+def pandas_zscore(prices: pd.Series, window=14):
+    # x is a Series here (raw=False), so std() is the sample std
+    return prices.rolling(window).apply(lambda x: (x.iloc[-1] - x.mean()) / x.std() * 100)
+
+
+def stream(indicator, values):
+    return np.array([indicator.update(float(v)) for v in values])
+
+
+class TestIndicators(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.prices = 2500 * np.exp(np.cumsum(rng.normal(0, 0.01, 600)))
+        self.series = pd.Series(self.prices)
+
+    def assertSame(self, actual, expected, rtol=1e-9):
+        np.testing.assert_allclose(actual, np.asarray(expected, dtype=float), rtol=rtol, atol=1e-9)
+
+    def test_batch_matches_pandas(self):
+        s, x = self.series, self.prices
+        self.assertSame(indicators.sma(x, 20), s.rolling(20).mean())
+        self.assertSame(indicators.rolling_std(x, 20), s.rolling(20).std())
+        for adjust in (True, False):
+            self.assertSame(indicators.ema(x, 21, adjust), s.ewm(span=21, adjust=adjust).mean())
+        self.assertSame(indicators.pct_change(x), s.pct_change())
+        self.assertSame(indicators.volatility(x, 20), s.pct_change().rolling(20).std())
+        self.assertSame(indicators.rsi(x), pandas_rsi(s))
+        macd, signal = indicators.macd(x)
+        expected_macd, expected_signal = pandas_macd(s)
+        self.assertSame(macd, expected_macd)
+        self.assertSame(signal, expected_signal)
+        self.assertSame(indicators.bollinger_position(x), pandas_bollinger_position(s))
+        self.assertSame(indicators.rolling_zscore(x, 14), pandas_zscore(s))
+
+    def test_streaming_matches_batch(self):
+        x = self.prices
+        self.assertSame(stream(indicators.SMA(20), x), indicators.sma(x, 20))
+        self.assertSame(stream(indicators.RollingStd(20), x), indicators.rolling_std(x, 20), 1e-7)
+        for adjust in (True, False):
+            self.assertSame(stream(indicators.EMA(21, adjust), x), indicators.ema(x, 21, adjust))
+        self.assertSame(stream(indicators.RSI(14), x), indicators.rsi(x), 1e-7)
+        self.assertSame(stream(indicators.Volatility(20), x), indicators.volatility(x, 20), 1e-7)
+        self.assertSame(
+            stream(indicators.BollingerPosition(20), x), indicators.bollinger_position(x), 1e-7
+        )
+        self.assertSame(stream(indicators.RollingZScore(14), x), indicators.rolling_zscore(x), 1e-7)
+
+        macd = indicators.MACD()
+        values = np.array([macd.update(float(v)) for v in x])
+        expected_macd, expected_signal = indicators.macd(x)
+        self.assertSame(values[:, 0], expected_macd)
+        self.assertSame(values[:, 1], expected_signal)
+
+    def test_rsi_edge_cases(self):
+        rising = np.arange(1.0, 40.0)
+        flat = np.full(40, 100.0)
+        self.assertSame(indicators.rsi(rising), pandas_rsi(pd.Series(rising)))
+        self.assertSame(stream(indicators.RSI(), rising), indicators.rsi(rising))
+        self.assertTrue(np.isnan(indicators.rsi(flat)).all())
+        self.assertTrue(np.isnan(stream(indicators.RSI(), flat)).all())
+
+    def test_ema_skips_leading_nans(self):
+        x = np.concatenate([[np.nan] * 5, self.prices[:50]])
+        expected = pd.Series(x).ewm(span=9, adjust=False).mean()
+        self.assertSame(indicators.ema(x, 9, adjust=False), expected)
+        self.assertSame(stream(indicators.EMA(9, adjust=False), x), expected)
+
+    def test_streaming_stays_accurate_over_long_runs(self):
+        rng = np.random.default_rng(11)
+        x = 48000 + np.cumsum(rng.normal(0, 5, 20000))
+        self.assertSame(stream(indicators.RollingStd(20), x), indicators.rolling_std(x, 20), 1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
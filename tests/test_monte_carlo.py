@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+
+from services.backtester.monte_carlo import _indices, simulate
+
+
+class TestMonteCarlo(unittest.TestCase):
+    def setUp(self):
+        self.returns = np.random.default_rng(0).normal(0.002, 0.02, 120)
+
+    def test_shuffle_keeps_the_final_return(self):
+        result = simulate(self.returns, 2_000, "shuffle", seed=1, chunk_bytes=8 * 120 * 64)
+        np.testing.assert_allclose(result.final_return, np.prod(1 + self.returns) - 1, rtol=1e-9)
+        self.assertGreater(result.max_drawdown.std(), 0)  # the order matters for drawdowns
+
+        # A block as long as the series is a rotation: the product is unchanged too
+        rotated = simulate(self.returns, 500, "block", block=120, seed=1)
+        np.testing.assert_allclose(rotated.final_return, np.prod(1 + self.returns) - 1, rtol=1e-9)
+
+    def test_paths_match_a_loop(self):
+        returns = np.array([0.1, -0.3, 0.05, -0.4, 0.2])
+        for method, compound in (("bootstrap", False), ("block", True)):
+            result = simulate(returns, 300, method, block=2, compound=compound, seed=2, ruin_equity=0.6)
+            indices = _indices(np.random.default_rng(2), method, 300, len(returns), 2)
+            for k, path in enumerate(returns[indices]):
+                equity, peak, low, drawdown = 1.0, 1.0, 1.0, 0.0
+                for r in path:
+                    equity = equity * (1 + r) if compound else equity + r
+                    peak, low = max(peak, equity), min(low, equity)
+                    drawdown = min(drawdown, equity / peak - 1)
+                self.assertAlmostEqual(result.final_return[k], equity - 1)
+                self.assertAlmostEqual(result.max_drawdown[k], drawdown)
+                self.assertAlmostEqual(result.min_equity[k], low)
+            self.assertAlmostEqual(result.ruin_probability(), (result.min_equity <= 0.6).mean())
+
+    def test_known_drawdown(self):
+        # Any order of +50% and -50%: -50% is the worst drawdown from the start
+        # (down first) or from the peak of 1.5 (up first)
+        result = simulate([0.5, -0.5], 1_000, "shuffle", seed=0, ruin_equity=0.5)
+        np.testing.assert_allclose(result.max_drawdown, -0.5)
+        np.testing.assert_allclose(result.final_return, -0.25)
+        down_first = result.min_equity == 0.5
+        self.assertAlmostEqual(result.ruin_probability(), down_first.mean())
+        self.assertTrue(0.4 < down_first.mean() < 0.6)
+        self.assertEqual(result.drawdown_probability(0.5), 1.0)
+        self.assertEqual(result.drawdown_probability(0.6), 0.0)
+
+    def test_size_jitter_and_summary(self):
+        fixed = simulate(self.returns, 5_000, "shuffle", seed=4)
+        jittered = simulate(self.returns, 5_000, "shuffle", size_jitter=0.5, seed=4)
+        self.assertLess(fixed.final_return.std(), 1e-9)
+        self.assertGreater(jittered.final_return.std(), 0.01)
+
+        summary = jittered.summary()
+        self.assertEqual((summary["paths"], summary["trades"], summary["method"]), (5_000, 120, "shuffle"))
+        spread = list(summary["max_drawdown"].values())
+        self.assertEqual(spread, sorted(spread))
+        again = simulate(self.returns, 100, "block", seed=9).summary()
+        self.assertEqual(simulate(self.returns, 100, "block", seed=9).summary(), again)
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            simulate(self.returns, method="permute")
+        with self.assertRaises(ValueError):
+            simulate([])
+
+
+if __name__ == "__main__":
+    unittest.main()
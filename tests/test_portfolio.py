@@ -0,0 +1,87 @@
+import unittest
+
+import numpy as np
+
+from services.backtester import vectorized
+from services.backtester.portfolio import load_universe, run_portfolio
+from services.backtester.strategies import load_price_csv
+from services.backtester.sweep import STRATEGIES
+
+
+class TestPortfolio(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.universe = load_universe(("data/processed", "data/sectoral"))
+
+    def test_universe(self):
+        u = self.universe
+        self.assertEqual(u.close.shape, (len(u.dates), len(u.symbols)))
+        self.assertEqual(len(u.symbols), len(set(u.symbols)))
+        self.assertIn("NIFTY Realty", u.sectors)
+        hdfc = u.membership[u.symbols.index("HDFCBANK.NS")]
+        self.assertGreater(hdfc.sum(), 1)  # Bank, Private Bank, Financial Services
+
+        tcs = load_price_csv("data/processed/NIFTY IT/TCS.NS_historical.csv").dropna()
+        np.testing.assert_array_equal(u.columns("TCS.NS")["close"], tcs["Close"].to_numpy())
+        rows = u.positions["TCS.NS"]
+        np.testing.assert_array_equal(u.dates[rows], tcs.index.to_numpy())
+        column = u.close[:, u.symbols.index("TCS.NS")]
+        self.assertEqual(np.isnan(column).sum(), len(u.dates) - len(tcs))
+
+    def test_unconstrained_matches_single_symbol_backtests(self):
+        params = {"lookback": 20, "stop_loss_pct": 0.02, "target_pct": 0.05}
+        result = run_portfolio(
+            "fibonacci_breakout", params, self.universe, initial_capital=1e12,
+            max_positions=None, position_pct=1e-4, cooldown=1, processes=0,
+        )
+        u = self.universe
+        for j, symbol in enumerate(u.symbols):
+            single = STRATEGIES["fibonacci_breakout"](u.columns(symbol), **params)
+            mine = result.trades["symbol"] == j
+            np.testing.assert_array_equal(
+                result.trades["entry"][mine], u.positions[symbol][single.entry_index], err_msg=symbol
+            )
+            np.testing.assert_array_equal(result.trades["reason"][mine], single.reason)
+        self.assertEqual(sum(result.rejected.values()), 0)
+
+    def test_limits_and_accounting(self):
+        result = run_portfolio(
+            "ema_crossover", {}, self.universe, initial_capital=1000000,
+            max_positions=5, max_per_sector=2, fee_pct=0.001, processes=0,
+        )
+        t, u = result.trades, self.universe
+        closed = t["reason"] != vectorized.EXIT_OPEN
+        last = len(u.dates)
+        held = np.zeros((last + 1, len(u.symbols)))
+        np.add.at(held, (t["entry"], t["symbol"]), 1)
+        np.add.at(held, (t["exit"][closed], t["symbol"][closed]), -1)
+        held = np.cumsum(held[:last], axis=0)
+        self.assertLessEqual(held.sum(axis=1).max(), 5)
+        self.assertLessEqual((held @ u.membership).max(), 2)
+        self.assertLessEqual(held.max(), 1)
+        self.assertGreater(result.rejected["positions"], 0)
+
+        # Aggregate and sector curves agree with the trades
+        self.assertAlmostEqual(result.equity[-1], 1000000 + t["pnl"].sum(), places=4)
+        np.testing.assert_allclose(
+            result.sector_pnl[-1], t["pnl"] @ u.membership[t["symbol"]], rtol=1e-9
+        )
+        summary = result.summary()
+        self.assertEqual(summary["portfolio"]["trades"], int(closed.sum()))
+        self.assertEqual(set(summary["sectors"]), set(u.sectors))
+        self.assertGreaterEqual(
+            sum(s["trades"] for s in summary["sectors"].values()), summary["portfolio"]["trades"]
+        )
+
+    def test_pool_matches_serial(self):
+        params = {"fib_lookback": 30, "zone": 20}
+        serial = run_portfolio("fibonacci_retracement", params, self.universe, processes=0)
+        pooled = run_portfolio("fibonacci_retracement", params, self.universe, processes=2)
+        for name in serial.trades:
+            np.testing.assert_array_equal(serial.trades[name], pooled.trades[name])
+        np.testing.assert_array_equal(serial.equity, pooled.equity)
+        self.assertGreater(len(serial.trades["entry"]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
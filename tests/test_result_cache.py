@@ -0,0 +1,136 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from services.backtester import sweep
+from services.backtester.result_cache import (
+    ResultCache,
+    array_fingerprint,
+    cached_backtest,
+    code_version,
+    file_fingerprint,
+    tick_fingerprint,
+)
+from services.backtester.sweep import grid, load_prices, run_sweep
+from services.backtester.walk_forward import make_windows, walk_forward
+from services.market_data.tick_archive import TickArchive
+
+CSV = "data/processed/NIFTY IT/TCS.NS_historical.csv"
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(self.tmp.name, max_bytes=1 << 20)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        arrays = {
+            "pnl": np.array([1.5, -2.0]),
+            "taken": np.array([True, False]),
+            "quantity": np.float64(50),
+            "date": np.array(["2024-01-01"], dtype="datetime64[ns]"),
+            "none": np.empty(0, dtype=np.int64),
+        }
+        key = self.cache.key("test", {"lookback": 20})
+        self.cache.put(key, {"pf": float("inf"), "params": {"a": 1}}, arrays)
+        arrays["pnl"][0] = 99  # the cached copy is not affected
+        for fresh in (False, True):
+            if fresh:
+                self.cache = ResultCache(self.tmp.name)
+            meta, loaded = self.cache.get(key)
+            self.assertEqual(meta, {"pf": float("inf"), "params": {"a": 1}})
+            np.testing.assert_array_equal(loaded["pnl"], [1.5, -2.0])
+            self.assertEqual(loaded["quantity"].shape, ())
+            for name in ("taken", "date", "none"):
+                np.testing.assert_array_equal(loaded[name], arrays[name])
+                self.assertEqual(loaded[name].dtype, arrays[name].dtype)
+            self.assertFalse(loaded["pnl"].flags.writeable)
+        self.assertIsNone(self.cache.get(self.cache.key("other")))
+        self.assertEqual(self.cache.key("a", {"x": 1, "y": 2}), self.cache.key("a", {"y": 2, "x": 1}))
+
+    def test_lru_eviction(self):
+        cache = ResultCache(self.tmp.name, max_bytes=5000, memory_items=0)
+        keys = [cache.key(i) for i in range(4)]
+        for key in keys:
+            cache.put(key, {}, {"a": np.zeros(100)})  # ~900 bytes each
+        past = time.time() - 100
+        for n, key in enumerate(keys):
+            os.utime(cache._path(key), (past + n, past + n))
+        cache.get(keys[0])  # now the most recent
+        for i in range(4, 7):
+            cache.put(cache.key(i), {}, {"a": np.zeros(100)})
+        self.assertLessEqual(cache.stats()["bytes"], 5000)
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+
+    def test_fingerprints(self):
+        path = Path(self.tmp.name) / "prices.csv"
+        path.write_text("Date,Close\n2024-01-01,1\n")
+        first = file_fingerprint(path)
+        self.assertEqual(first, file_fingerprint(path))
+        path.write_text("Date,Close\n2024-01-01,2\n")
+        self.assertNotEqual(first, file_fingerprint(path))
+
+        a = {"close": np.arange(3.0), "date": np.arange(3).astype("datetime64[D]")}
+        b = {"close": np.arange(3.0), "date": np.arange(3).astype("datetime64[D]")}
+        self.assertEqual(array_fingerprint(a), array_fingerprint(b))
+        b["close"][2] = 5
+        self.assertNotEqual(array_fingerprint(a), array_fingerprint(b))
+        self.assertEqual(code_version(), code_version())
+
+        journal = Path(self.tmp.name) / "journal"
+        (journal / "2025-01-02").mkdir(parents=True)
+        segment = journal / "2025-01-02" / "ticks-000.bin"
+        segment.write_bytes(b"x" * 10)
+        archive = TickArchive(Path(self.tmp.name) / "archive", journal)
+        before = tick_fingerprint("NSE_EQ|TCS", "2025-01-02", "2025-01-03", archive)
+        self.assertEqual(before, tick_fingerprint("NSE_EQ|TCS", "2025-01-02", "2025-01-03", archive))
+        segment.write_bytes(b"x" * 20)
+        self.assertNotEqual(before, tick_fingerprint("NSE_EQ|TCS", "2025-01-02", "2025-01-03", archive))
+
+    def test_cached_backtest(self):
+        params = {"lookback": 20, "stop_loss_pct": 0.02}
+        summary, result = cached_backtest(CSV, "fibonacci_breakout", params, self.cache)
+        with mock.patch("services.backtester.strategies.load_price_csv", side_effect=AssertionError):
+            again, cached = cached_backtest(CSV, "fibonacci_breakout", params, self.cache)
+        self.assertEqual(summary, again)
+        np.testing.assert_array_equal(result.equity, cached.equity)
+        np.testing.assert_array_equal(result.entry_index, cached.entry_index)
+        self.assertGreater(summary["trades"], 0)
+
+    def test_sweep_reuses_results_and_features(self):
+        prices = load_prices("data/processed/NIFTY IT/*.csv")
+        param_sets = list(grid({"lookback": [10, 20], "stop_loss_pct": [0.01, 0.02]}))
+        first = run_sweep("fibonacci_breakout", param_sets, prices, processes=0, cache=self.cache)
+        with mock.patch.object(sweep, "evaluate", side_effect=AssertionError):
+            again = run_sweep("fibonacci_breakout", param_sets, prices, processes=0, cache=self.cache)
+        self.assertEqual(first.top(10), again.top(10))
+
+        # A new stop level reuses the cached signals for both lookbacks
+        features = sweep.fibonacci_breakout.features
+        with mock.patch.object(sweep.fibonacci_breakout, "features", wraps=features) as computed:
+            more = param_sets + list(grid({"lookback": [10, 20], "stop_loss_pct": [0.03]}))
+            table = run_sweep("fibonacci_breakout", more, prices, processes=0, cache=self.cache)
+        self.assertEqual(computed.call_count, 0)
+        self.assertEqual(len(table), 6)
+        self.assertEqual(table.top(10), run_sweep("fibonacci_breakout", more, prices, processes=0).top(10))
+
+        windows = make_windows("2023-01-01", "2023-07-01", train_days=365, test_days=90)
+        uncached = walk_forward("fibonacci_breakout", param_sets, prices, windows, processes=0)
+        cached = walk_forward("fibonacci_breakout", param_sets, prices, windows, processes=0, cache=self.cache)
+        self.assertEqual(uncached, cached)
+        self.assertEqual(
+            cached, walk_forward("fibonacci_breakout", param_sets, prices, windows, processes=0, cache=self.cache)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import unittest
+
+from services.upstox.subscription_manager import MODE_FULL, MODE_LTPC, SubscriptionManager
+
+
+class TestSubscriptionManager(unittest.TestCase):
+    def setUp(self):
+        self.sent = []
+        self.manager = SubscriptionManager(guid="test", window=0)
+
+    async def _send(self, payload):
+        self.sent.append(json.loads(payload))
+
+    def _run(self, *steps):
+        async def scenario():
+            for step in steps:
+                step()
+                await self.manager.flush()
+
+        asyncio.run(scenario())
+
+    def test_attach_subscribes_wanted_keys_once(self):
+        self.manager.acquire(["NSE_EQ|A", "NSE_EQ|B"])
+        self.manager.acquire(["NSE_EQ|A"])
+        asyncio.run(self.manager.attach(self._send))
+
+        self.assertEqual(len(self.sent), 1)
+        self.assertEqual(self.sent[0]["method"], "sub")
+        self.assertEqual(sorted(self.sent[0]["data"]["instrumentKeys"]), ["NSE_EQ|A", "NSE_EQ|B"])
+
+    def test_only_deltas_are_sent(self):
+        self.manager.acquire(["NSE_EQ|A"])
+        asyncio.run(self.manager.attach(self._send))
+        self.sent.clear()
+
+        self._run(
+            lambda: self.manager.acquire(["NSE_EQ|A", "NSE_EQ|B"]),
+            lambda: self.manager.release(["NSE_EQ|A"]),
+            lambda: self.manager.release(["NSE_EQ|A"]),
+        )
+        self.assertEqual(
+            [(m["method"], m["data"]["instrumentKeys"]) for m in self.sent],
+            [("sub", ["NSE_EQ|B"]), ("unsub", ["NSE_EQ|A"])],
+        )
+
+    def test_changes_within_window_net_out(self):
+        asyncio.run(self.manager.attach(self._send))
+        self.manager.acquire(["NSE_EQ|A"])
+        self.manager.release(["NSE_EQ|A"])
+        asyncio.run(self.manager.flush())
+        self.assertEqual(self.sent, [])
+
+    def test_richest_mode_wins(self):
+        self.manager.acquire(["NSE_EQ|A"], MODE_LTPC)
+        asyncio.run(self.manager.attach(self._send))
+        self._run(
+            lambda: self.manager.acquire(["NSE_EQ|A"], MODE_FULL),
+            lambda: self.manager.release(["NSE_EQ|A"], MODE_FULL),
+        )
+        self.assertEqual(
+            [(m["method"], m["data"]["mode"]) for m in self.sent],
+            [("sub", MODE_LTPC), ("change_mode", MODE_FULL), ("change_mode", MODE_LTPC)],
+        )
+
+    def test_acquire_during_send_is_flushed(self):
+        async def scenario():
+            sending = asyncio.Event()
+            release = asyncio.Event()
+
+            async def slow_send(payload):
+                sending.set()
+                await release.wait()
+                await self._send(payload)
+
+            await self.manager.attach(slow_send)
+            self.manager.acquire(["NSE_EQ|A"])
+            await sending.wait()
+            self.manager.acquire(["NSE_EQ|B"])
+            release.set()
+            for _ in range(20):
+                await asyncio.sleep(0.01)
+
+        asyncio.run(scenario())
+        self.assertEqual(
+            [m["data"]["instrumentKeys"] for m in self.sent], [["NSE_EQ|A"], ["NSE_EQ|B"]]
+        )
+        self.assertEqual(self.manager.stats()["pending"], 0)
+
+    def test_failed_send_keeps_deltas(self):
+        async def broken(payload):
+            raise ConnectionError("socket closed")
+
+        async def scenario():
+            await self.manager.attach(self._send)
+            self.manager.send = broken
+            self.manager.acquire(["NSE_EQ|A"])
+            with self.assertRaises(ConnectionError):
+                await self.manager.flush()
+            self.manager.send = self._send
+            await self.manager.flush()
+
+        asyncio.run(scenario())
+        self.assertEqual([m["data"]["instrumentKeys"] for m in self.sent], [["NSE_EQ|A"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
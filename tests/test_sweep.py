@@ -0,0 +1,94 @@
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from services.backtester.result_cache import ResultCache
+from services.backtester.sweep import (
+    RankedTable,
+    SharedPrices,
+    _init_worker,
+    evaluate,
+    grid,
+    load_prices,
+    precompute,
+    random_search,
+    run_sweep,
+)
+
+
+class TestSweep(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.prices = load_prices("data/processed/NIFTY IT/*.csv")
+
+    def test_spaces(self):
+        sets = list(grid({"lookback": [10, 20], "stop_loss_pct": [0.01, 0.02, 0.03]}))
+        self.assertEqual(len(sets), 6)
+        self.assertIn({"lookback": 20, "stop_loss_pct": 0.03}, sets)
+
+        space = {"short_period": (3, 10), "target_pct": (0.01, 0.05), "hold": [4, 6]}
+        first = list(random_search(space, 50, seed=1))
+        self.assertEqual(first, list(random_search(space, 50, seed=1)))
+        for params in first:
+            self.assertIsInstance(params["short_period"], int)
+            self.assertTrue(3 <= params["short_period"] <= 10)
+            self.assertTrue(0.01 <= params["target_pct"] <= 0.05)
+            self.assertIn(params["hold"], (4, 6))
+
+    def test_shared_prices_round_trip(self):
+        with SharedPrices(self.prices) as shared:
+            shm, views = SharedPrices.attach(shared.spec)
+            for symbol, columns in self.prices.items():
+                for column, values in columns.items():
+                    np.testing.assert_array_equal(views[symbol][column], values)
+            self.assertFalse(views[symbol]["close"].flags.writeable)
+            del views
+            shm.close()
+
+    def test_ranked_table(self):
+        table = RankedTable("score")
+        for score in (0.2, 0.5, 0.1):
+            table.add({"p": score}, {"score": score})
+        table.add({"p": 0}, None)
+        self.assertEqual([row["score"] for row in table.top(3)], [0.5, 0.2, 0.1])
+        self.assertEqual(table.skipped, 1)
+        self.assertIn("score", table.format())
+
+    def test_pool_matches_serial(self):
+        param_sets = list(grid({"short_period": [5, 9, 30], "long_period": [21, 34]}))
+        serial = run_sweep("ema_crossover", param_sets, self.prices, processes=0)
+        pooled = run_sweep("ema_crossover", param_sets, self.prices, processes=2, batch_size=1)
+        self.assertEqual(serial.top(10), pooled.top(10))
+        self.assertEqual(len(pooled), 5)  # short >= long is skipped
+        self.assertEqual(pooled.skipped, 1)
+        returns = [row["total_return"] for row in pooled.top(10)]
+        self.assertEqual(returns, sorted(returns, reverse=True))
+        self.assertEqual(
+            pooled.top(1)[0]["trades"],
+            evaluate("ema_crossover", self.prices, {k: pooled.top(1)[0][k] for k in param_sets[0]})["trades"],
+        )
+
+    def test_precompute_in_the_pool(self):
+        param_sets = list(grid({"short_period": [5, 9, 30], "long_period": [21, 34]}))
+        serial = precompute("ema_crossover", self.prices, param_sets)
+        with tempfile.TemporaryDirectory() as tmp, SharedPrices(self.prices) as shared:
+            cache = ResultCache(tmp)
+            with ProcessPoolExecutor(2, initializer=_init_worker, initargs=(shared.spec,)) as pool:
+                pooled = precompute("ema_crossover", self.prices, param_sets, cache, pool, processes=2)
+            self.assertEqual(cache.stats()["entries"], len(serial))
+            misses = cache.misses
+            cached = precompute("ema_crossover", self.prices, param_sets, cache)
+            self.assertEqual(cache.misses - misses, len(self.prices))  # only the rejected key
+            for features in (pooled, cached):
+                self.assertEqual(sorted(features, key=repr), sorted(serial, key=repr))
+                for pair, arrays in serial.items():
+                    for name, values in arrays.items():
+                        np.testing.assert_array_equal(features[pair][name], values)
+        # short 30 >= long 21 is rejected for every symbol
+        self.assertEqual(len(serial), 5 * len(self.prices))
+
+
+if __name__ == "__main__":
+    unittest.main()
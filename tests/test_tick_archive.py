@@ -0,0 +1,122 @@
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+import services.market_data.tick_archive as archive_module
+from services.market_data.tick_archive import TickArchive, compact_day, covers_session, ticks_to_candles
+from services.upstox.tick_decoder import decode_frame
+from services.upstox.tick_journal import IST, TickJournal
+from tests.benchmark_tick_decoder import build_full_frame
+
+
+class TestTickArchive(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.journal_dir = Path(tmp.name) / "journal"
+        self.archive_dir = Path(tmp.name) / "archive"
+        self.session = datetime(2025, 1, 2, 9, 15, tzinfo=IST)
+        self.base_ms = int(self.session.timestamp() * 1000)
+        self.day = "2025-01-02"
+
+        journal = TickJournal(self.journal_dir, mode="both")
+        self.frames = []
+        for i in range(120):  # one frame every 30s for an hour
+            raw = build_full_frame(20, seed=i)
+            self.frames.append(raw)
+            journal.record(raw, decode_frame(raw).ticks, ts_ms=self.base_ms + i * 30_000)
+        journal.close()
+
+    def _expected(self, key, field):
+        return [
+            getattr(next(t for t in decode_frame(raw).ticks if t.instrument_key == key), field)
+            for raw in self.frames
+        ]
+
+    def test_compacted_day_round_trips(self):
+        summary = compact_day(self.day, self.journal_dir, self.archive_dir)
+        self.assertEqual(summary, {"day": self.day, "ticks": 2400, "instruments": 20})
+
+        archive = TickArchive(self.archive_dir, self.journal_dir)
+        key = "NSE_FO|100007"
+        ticks = archive.get_ticks(
+            key, self.session, self.session + timedelta(hours=2), fields=("ltp", "vtt")
+        )
+        np.testing.assert_allclose(ticks["ltp"], self._expected(key, "ltp"))
+        self.assertEqual(ticks["vtt"].tolist(), self._expected(key, "vtt"))
+        self.assertEqual(len(ticks["ts"]), 120)
+        self.assertEqual(set(ticks), {"ts", "ltp", "vtt"})
+
+        window = archive.get_ticks(key, self.base_ms + 60_000, self.base_ms + 120_000)
+        self.assertEqual(window["ts"].tolist(), [self.base_ms + 60_000, self.base_ms + 90_000])
+
+    def test_reads_journal_for_days_not_compacted(self):
+        archive = TickArchive(self.archive_dir, self.journal_dir)
+        ticks = archive.get_ticks("NSE_FO|100001", self.day, "2025-01-03")
+        self.assertEqual(len(ticks["ltp"]), 120)
+        empty = archive.get_ticks("NSE_FO|100001", self.day, "2025-01-03", include_journal=False)
+        self.assertEqual(len(empty["ltp"]), 0)
+
+    def test_reads_frames_only_journal(self):
+        frames_dir = self.journal_dir.parent / "frames_journal"
+        journal = TickJournal(frames_dir, mode="frames")
+        for i, raw in enumerate(self.frames):
+            journal.record(raw, decode_frame(raw).ticks, ts_ms=self.base_ms + i * 30_000)
+        journal.close()
+
+        archive = TickArchive(self.archive_dir, frames_dir)
+        ticks = archive.get_ticks("NSE_FO|100001", self.day, "2025-01-03", fields=("ltp", "vtt"))
+        self.assertEqual(ticks["ltp"].tolist(), self._expected("NSE_FO|100001", "ltp"))
+        self.assertEqual(ticks["vtt"].tolist(), self._expected("NSE_FO|100001", "vtt"))
+        window = archive.get_ticks("NSE_FO|100001", self.base_ms + 60_000, self.base_ms + 120_000)
+        self.assertEqual(window["ts"].tolist(), [self.base_ms + 60_000, self.base_ms + 90_000])
+
+    def test_zlib_fallback(self):
+        with mock.patch.object(archive_module, "zstandard", None):
+            compact_day(self.day, self.journal_dir, self.archive_dir)
+            ticks = TickArchive(self.archive_dir).get_ticks("NSE_FO|100003", self.day, "2025-01-03")
+        self.assertEqual(len(ticks["ltp"]), 120)
+
+    def test_candles_from_ticks(self):
+        ts = np.array([0, 20_000, 59_000, 61_000, 119_000], dtype=np.int64) + self.base_ms
+        ticks = {
+            "ts": ts,
+            "ltp": np.array([10.0, 12.0, 9.0, 11.0, 11.5]),
+            "ltq": np.array([5, 5, 5, 5, 5]),
+            "vtt": np.array([105, 110, 115, 120, 125]),
+            "oi": np.zeros(5),
+        }
+        candles = ticks_to_candles(ticks, 1)
+        self.assertEqual(candles[-1][1:6], [10.0, 12.0, 9.0, 9.0, 15])
+        self.assertEqual(candles[0][1:6], [11.0, 11.5, 11.0, 11.5, 10])
+        self.assertTrue(candles[-1][0].startswith("2025-01-02T09:15:00"))
+
+    def test_covers_session(self):
+        minute = 60_000
+        bars = self.base_ms + np.arange(375) * minute  # 9:15 to 15:29
+        self.assertTrue(covers_session(bars, self.day, 1))
+        self.assertFalse(covers_session(bars[10:], self.day, 1))  # started late
+        self.assertFalse(covers_session(bars[:300], self.day, 1))  # stopped early
+        self.assertFalse(covers_session(np.delete(bars, np.s_[100:105]), self.day, 1))  # a gap
+        # Yesterday's bars in the ring don't count as seeing today's open
+        yesterday = bars[-30:] - 24 * 60 * minute
+        self.assertFalse(covers_session(np.r_[yesterday, bars[10:]], self.day, 1))
+
+        # A running session only has to reach now
+        now = self.session + timedelta(hours=2)
+        self.assertTrue(covers_session(bars[:120], self.day, 1, now))
+        self.assertFalse(covers_session(bars[:100], self.day, 1, now))
+
+        # 30 minute bars start at 9:00, the bar holding the open
+        halves = self.base_ms - 15 * minute + np.arange(13) * 30 * minute
+        self.assertTrue(covers_session(halves, self.day, 30))
+        self.assertFalse(covers_session(halves[1:], self.day, 30))
+        self.assertFalse(covers_session(np.delete(halves, 5), self.day, 30))
+
+
+if __name__ == "__main__":
+    unittest.main()
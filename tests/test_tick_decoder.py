@@ -0,0 +1,52 @@
+# tests/test_tick_decoder.py
+
+import unittest
+
+import services.upstox.MarketDataFeed_pb2 as pb
+from services.upstox.tick_decoder import decode_frame, decode_frame_dict, get_decoder, parse_live_feed
+from tests.benchmark_tick_decoder import build_full_frame
+
+
+class TestTickDecoder(unittest.TestCase):
+    def test_full_frame_matches_message_to_dict_path(self):
+        raw = build_full_frame(20)
+        legacy = parse_live_feed(decode_frame_dict(raw)["feeds"])
+        frame = decode_frame(raw)
+        fast = parse_live_feed(frame.ticks)
+
+        self.assertEqual(frame.type, "live_feed")
+        self.assertEqual(set(legacy), set(fast))
+        for key, old in legacy.items():
+            new = fast[key]
+            for field in ("ltp", "cp", "atp", "oi", "iv", "tbq", "tsq"):
+                self.assertAlmostEqual(float(old[field]), new[field])
+            # MessageToDict renders int64 as strings
+            self.assertEqual(int(old["ltq"]), new["ltq"])
+            self.assertEqual(int(old["last_trade_time"]), new["last_trade_time"])
+            self.assertEqual(len(old["bid_ask"]), len(new["bid_ask"]))
+            self.assertEqual(int(old["bid_ask"][0]["bidQ"]), new["bid_ask"][0]["bidQ"])
+            self.assertAlmostEqual(old["greeks"]["delta"], new["greeks"]["delta"])
+            self.assertEqual([o["interval"] for o in old["ohlc"]], [o["interval"] for o in new["ohlc"]])
+
+    def test_market_info_and_ltpc_only(self):
+        msg = pb.FeedResponse(type=pb.market_info)
+        msg.marketInfo.segmentStatus["NSE_EQ"] = pb.NORMAL_CLOSE
+        frame = decode_frame(msg.SerializeToString())
+        self.assertEqual(frame.type, "market_info")
+        self.assertEqual(frame.segment_status, {"NSE_EQ": "NORMAL_CLOSE"})
+
+        msg = pb.FeedResponse(type=pb.live_feed)
+        msg.feeds["NSE_INDEX|Nifty 50"].ltpc.ltp = 22000.5
+        tick = decode_frame(msg.SerializeToString()).ticks[0]
+        self.assertEqual(tick.instrument_key, "NSE_INDEX|Nifty 50")
+        self.assertEqual(tick.ltp, 22000.5)
+        self.assertEqual(tick.bid_ask, ())
+
+    def test_unknown_decoder(self):
+        self.assertIs(get_decoder("tick"), decode_frame)
+        with self.assertRaises(ValueError):
+            get_decoder("nope")
+
+
+if __name__ == "__main__":
+    unittest.main()
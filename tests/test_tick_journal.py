@@ -0,0 +1,54 @@
+import tempfile
+import time
+import unittest
+from datetime import datetime
+
+from services.upstox.tick_decoder import decode_frame
+from services.upstox.tick_journal import IST, JournalReader, TickJournal
+from tests.benchmark_tick_decoder import build_full_frame
+
+
+class TestTickJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.base_ms = int(time.time() * 1000)
+        self.day = datetime.fromtimestamp(self.base_ms / 1000, IST).strftime("%Y-%m-%d")
+        self.frames = [build_full_frame(50, seed=s) for s in range(6)]
+
+    def _write(self, segment_bytes):
+        journal = TickJournal(self.tmp.name, mode="both", segment_bytes=segment_bytes)
+        for i, raw in enumerate(self.frames):
+            journal.record(raw, decode_frame(raw).ticks, ts_ms=self.base_ms + i * 1000)
+        journal.close()
+        self.assertEqual(journal.dropped, 0)
+        return JournalReader(self.day, self.tmp.name)
+
+    def test_frames_round_trip_across_segments(self):
+        reader = self._write(segment_bytes=len(self.frames[0]) * 2)
+        frames = list(reader.frames())
+        self.assertEqual([raw for _, raw in frames], self.frames)
+
+        window = list(reader.frames(self.base_ms + 2000, self.base_ms + 4000))
+        self.assertEqual([raw for _, raw in window], self.frames[2:4])
+
+    def test_instrument_and_time_index(self):
+        reader = self._write(segment_bytes=64 * 1024)
+        key = "NSE_FO|100003"
+
+        ticks = reader.ticks(key)
+        self.assertEqual(len(ticks), len(self.frames))
+        expected = [
+            next(t.ltp for t in decode_frame(raw).ticks if t.instrument_key == key)
+            for raw in self.frames
+        ]
+        self.assertEqual(ticks["ltp"].tolist(), expected)
+
+        late = reader.ticks(key, start_ms=self.base_ms + 3000)
+        self.assertEqual(len(late), 3)
+        self.assertEqual(len(list(reader.frames(instrument_key=key))), len(self.frames))
+        self.assertEqual(len(reader.ticks("NSE_FO|missing")), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,214 @@
+import glob
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from services.backtester import vectorized
+from services.backtester.strategies import (
+    ema_crossover,
+    fibonacci_breakout,
+    fibonacci_option_trades,
+    load_price_csv,
+)
+
+CSV_FILES = sorted(glob.glob("data/processed/*/*.csv"))[::7]
+
+
+# --- the per-row loops the engine replaced, run on plain arrays ------------------
+
+
+def reference_breakout(prices: pd.Series, lookback=20, stop_loss_pct=0.02, target_pct=0.05):
+    """backtest2.fibonacci_strategy, with the stop/target carried while in the trade."""
+    price = prices.to_numpy()
+    high = prices.rolling(window=lookback).max().to_numpy()
+    low = prices.rolling(window=lookback).min().to_numpy()
+    fib_50 = low + (high - low) * 0.5
+    signal = np.zeros(len(price), dtype=np.int64)
+    stop_loss = np.full(len(price), np.nan)
+    target = np.full(len(price), np.nan)
+    for i in range(lookback, len(price)):
+        if price[i] > fib_50[i - 1] and signal[i - 1] == 0:
+            signal[i] = 1
+            stop_loss[i] = price[i] * (1 - stop_loss_pct)
+            target[i] = price[i] * (1 + target_pct)
+            stop, tgt = stop_loss[i], target[i]
+        elif signal[i - 1] == 1:
+            if price[i] <= stop or price[i] >= tgt:
+                signal[i] = -1
+            else:
+                signal[i] = 1
+    return signal, stop_loss, target
+
+
+def reference_option_trades(df, fib_lookback=50, sl_pct=0.15, tp_pct=0.25, hold=6, lot=50, size=1,
+                            capital=1000000):
+    """The loop of tests/fibonacci_backtest.py."""
+    df = df.copy()
+    df['EMA21'] = df['UnderlyingPrice'].rolling(window=21).mean()
+    df['EMA55'] = df['UnderlyingPrice'].rolling(window=55).mean()
+    wins, losses, trades = 0, 0, []
+    for i in range(fib_lookback, len(df) - hold):
+        recent_high = df['UnderlyingPrice'].iloc[i - fib_lookback:i].max()
+        recent_low = df['UnderlyingPrice'].iloc[i - fib_lookback:i].min()
+        entry_zone = recent_high - 0.618 * (recent_high - recent_low)
+        current = df.iloc[i]
+        next_candles = df.iloc[i + 1:i + hold + 1]
+        if (
+            current['UnderlyingPrice'] <= entry_zone + 5 and
+            current['UnderlyingPrice'] >= entry_zone - 5 and
+            current['UnderlyingPrice'] > current['EMA21'] > current['EMA55']
+        ):
+            entry = current['Close']
+            sl = entry * (1 - sl_pct)
+            target = entry * (1 + tp_pct)
+            hit = False
+            for j in range(len(next_candles)):
+                row = next_candles.iloc[j]
+                if row['Low'] <= sl:
+                    capital -= (entry - sl) * lot * size
+                    losses += 1
+                    outcome = f'SL Hit (Candle {j+1})'
+                    hit = True
+                    break
+                elif row['High'] >= target:
+                    capital += (target - entry) * lot * size
+                    wins += 1
+                    outcome = f'Target Hit (Candle {j+1})'
+                    hit = True
+                    break
+            if not hit:
+                pnl = (next_candles.iloc[-1]['Close'] - entry) * lot * size
+                capital += pnl
+                if pnl > 0:
+                    wins += 1
+                    outcome = 'Exit Green (No Hit)'
+                else:
+                    losses += 1
+                    outcome = 'Exit Red (No Hit)'
+            trades.append({
+                'Timestamp': current['Timestamp'],
+                'Underlying': round(current['UnderlyingPrice'], 2),
+                'Buy Premium': round(entry, 2),
+                'Target': round(target, 2),
+                'Stop Loss': round(sl, 2),
+                'Outcome': outcome,
+                'Capital After Trade': round(capital, 2),
+            })
+    return trades, capital, wins, losses
+
+
+def reference_ema(df, short_period=9, long_period=21):
+    """strategies/strategy.run_ema_strategy before it was vectorized."""
+    short = df["EMA_Short"].to_numpy()
+    long = df["EMA_Long"].to_numpy()
+    close, timestamps = df["close"], df["timestamp"]
+    position, trades = 0, []
+    for i in range(1, len(df)):
+        if short[i] > long[i] and short[i - 1] <= long[i - 1]:
+            trades.append({"type": "BUY", "price": close[i], "timestamp": timestamps[i]})
+            position = close[i]
+        elif short[i] < long[i] and short[i - 1] >= long[i - 1] and position:
+            trades.append({"type": "SELL", "price": close[i], "timestamp": timestamps[i],
+                           "pnl": close[i] - position})
+            position = 0
+    total_pnl = sum([t.get("pnl", 0) for t in trades if t["type"] == "SELL"])
+    return trades, {"total_pnl": total_pnl, "total_trades": len(trades)}
+
+
+def option_frame(prices: pd.DataFrame, seed):
+    """An option-like frame: the stock as underlying, a noisy premium around 2% of it."""
+    rng = np.random.default_rng(seed)
+    premium = prices["Close"].to_numpy() * 0.02 * np.exp(np.cumsum(rng.normal(0, 0.05, len(prices))))
+    return pd.DataFrame({
+        "Timestamp": prices.index,
+        "UnderlyingPrice": prices["Close"].to_numpy(),
+        "Close": premium,
+        "High": premium * (1 + rng.uniform(0, 0.2, len(prices))),
+        "Low": premium * (1 - rng.uniform(0, 0.2, len(prices))),
+    })
+
+
+class TestFirstTouch(unittest.TestCase):
+    def test_stop_checked_before_target_and_time_exit(self):
+        low = np.array([10, 9, 10, 7, 10, 10, 10, 10.0])
+        high = np.array([10, 11, 10, 13, 10, 10, 10, 10.0])
+        exit_index, reason = vectorized.first_touch(
+            low, high, [0, 2, 4], stop=[8, 8, 8], target=[12, 12, 12], hold_bars=2
+        )
+        np.testing.assert_array_equal(exit_index, [2, 3, 6])
+        np.testing.assert_array_equal(
+            reason, [vectorized.EXIT_TIME, vectorized.EXIT_STOP, vectorized.EXIT_TIME]
+        )
+
+    def test_long_searches_and_open_trades(self):
+        n = 5000
+        price = np.full(n, 100.0)
+        price[4000] = 90
+        exit_index, reason = vectorized.first_touch(price, price, [0, 4500], stop=[95, 95])
+        np.testing.assert_array_equal(exit_index, [4000, n - 1])
+        np.testing.assert_array_equal(reason, [vectorized.EXIT_STOP, vectorized.EXIT_OPEN])
+
+    def test_equity_marks_open_trades(self):
+        close = np.array([100, 101, 103, 102, 104.0])
+        entries = np.array([True, False, False, True, False])
+        exits = np.array([False, False, True, False, False])
+        result = vectorized.run(close, entries, exits=exits, quantity=2, initial_capital=1000)
+        np.testing.assert_array_equal(result.exit_index, [2, 4])
+        np.testing.assert_array_equal(result.reason, [vectorized.EXIT_SIGNAL, vectorized.EXIT_OPEN])
+        np.testing.assert_allclose(result.equity, [1000, 1002, 1006, 1006, 1010])
+        self.assertEqual(result.summary()["total_trades"], 1)
+        self.assertEqual(result.summary()["max_drawdown_pct"], 0.0)
+
+    def test_drawdown_without_capital(self):
+        close = np.array([100, 104, 101, 103.0])
+        entries = np.array([True, False, False, False])
+        exits = np.array([False, False, False, True])
+        with np.errstate(all="raise"):
+            summary = vectorized.run(close, entries, exits=exits).summary()
+        self.assertEqual(summary["total_pnl"], 3.0)
+        self.assertEqual(summary["max_drawdown_abs"], -3.0)
+        self.assertIsNone(summary["max_drawdown_pct"])
+
+        with_capital = vectorized.run(close, entries, exits=exits, initial_capital=1000).summary()
+        self.assertEqual(with_capital["max_drawdown_abs"], -3.0)
+        self.assertAlmostEqual(with_capital["max_drawdown_pct"], -3 / 1004)
+
+
+class TestScriptParity(unittest.TestCase):
+    def test_files_found(self):
+        self.assertGreater(len(CSV_FILES), 5)
+
+    def test_fibonacci_breakout(self):
+        for path in CSV_FILES:
+            prices = load_price_csv(path)["Close"]
+            for lookback in (20, 50):
+                signals = fibonacci_breakout(prices, lookback)
+                signal, stop_loss, target = reference_breakout(prices, lookback)
+                np.testing.assert_array_equal(signals["signal"].to_numpy(), signal, err_msg=path)
+                np.testing.assert_array_equal(signals["stop_loss"].to_numpy(), stop_loss)
+                np.testing.assert_array_equal(signals["target"].to_numpy(), target)
+                np.testing.assert_array_equal(
+                    signals["positions"].to_numpy(), pd.Series(signal).diff().to_numpy()
+                )
+
+    def test_fibonacci_option_trades(self):
+        total = 0
+        for seed, path in enumerate(CSV_FILES):
+            df = option_frame(load_price_csv(path), seed)
+            expected = reference_option_trades(df)
+            self.assertEqual(fibonacci_option_trades(df), expected, path)
+            total += len(expected[0])
+        self.assertGreater(total, 0)
+
+    def test_ema_crossover(self):
+        for path in CSV_FILES:
+            prices = load_price_csv(path)
+            df = pd.DataFrame({"timestamp": prices.index, "close": prices["Close"].to_numpy()})
+            trades, summary = ema_crossover(df)
+            self.assertEqual((trades, summary), reference_ema(df), path)
+            self.assertGreater(len(trades), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
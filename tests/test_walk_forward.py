@@ -0,0 +1,93 @@
+import unittest
+
+import numpy as np
+
+from services.backtester.sweep import STRATEGIES, grid, load_prices, metrics, precompute, trade_returns
+from services.backtester.walk_forward import make_windows, walk_forward, window_returns
+
+PARAMS = {
+    "fibonacci_breakout": list(grid({"lookback": [10, 30], "stop_loss_pct": [0.01, 0.03]})),
+    "fibonacci_retracement": list(grid({"fib_lookback": [20, 50], "zone": [5, 50]})),
+    "ema_crossover": list(grid({"short_period": [5, 30], "long_period": [21, 34]})),
+}
+
+
+class TestWalkForward(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.prices = load_prices("data/processed/NIFTY IT/*.csv")
+        cls.windows = make_windows("2022-07-01", "2023-07-01", train_days=365, test_days=120)
+
+    def test_windows(self):
+        self.assertEqual(len(self.windows), 4)
+        train_start, test_start, test_end = self.windows[0]
+        self.assertEqual(str(np.datetime64(train_start, "D")), "2021-07-01")
+        self.assertEqual(test_end, self.windows[1][1])
+        self.assertEqual(self.windows[-1][2], np.datetime64("2023-07-01", "ns"))  # cut short
+
+    def test_features_do_not_look_ahead(self):
+        for strategy, param_sets in PARAMS.items():
+            run = STRATEGIES[strategy]
+            full = precompute(strategy, self.prices, param_sets)
+            for (symbol, key), signals in full.items():
+                columns = self.prices[symbol]
+                cut = len(columns["close"]) - 200
+                head = run.features({c: v[:cut] for c, v in columns.items()}, **dict(key))
+                for name, values in signals.items():
+                    np.testing.assert_array_equal(values[:cut], head[name], err_msg=f"{strategy} {key}")
+
+    def test_window_returns_match_direct_run(self):
+        features = precompute("fibonacci_breakout", self.prices, PARAMS["fibonacci_breakout"])
+        run = STRATEGIES["fibonacci_breakout"]
+        _, start, stop = self.windows[1]
+        params = {"lookback": 30, "stop_loss_pct": 0.01, "target_pct": 0.05}
+        returns, symbols = window_returns(
+            "fibonacci_breakout", self.prices, features, params, start, stop, include_open=True
+        )
+        expected = []
+        for columns in self.prices.values():
+            lo, hi = np.searchsorted(columns["date"], [start, stop])
+            signals = run.features(columns, lookback=30)
+            result = run.trade(
+                {c: v[lo:hi] for c, v in columns.items()},
+                {"entries": signals["entries"][lo:hi]},
+                stop_loss_pct=0.01,
+                target_pct=0.05,
+            )
+            expected.append(trade_returns(result, include_open=True))
+        np.testing.assert_array_equal(returns, np.concatenate(expected))
+        self.assertEqual(symbols, len(self.prices))
+
+    def test_pool_matches_serial_and_picks_best(self):
+        for strategy, param_sets in PARAMS.items():
+            serial = walk_forward(strategy, param_sets, self.prices, self.windows, processes=0)
+            pooled = walk_forward(strategy, param_sets, self.prices, self.windows, processes=2, batch_size=1)
+            self.assertEqual(serial, pooled, strategy)
+
+        features = precompute("ema_crossover", self.prices, PARAMS["ema_crossover"])
+        row = serial["windows"][2]
+        train_start, test_start, _ = self.windows[2]
+        scores = {}
+        for params in PARAMS["ema_crossover"]:
+            if params["short_period"] < params["long_period"]:
+                returns, symbols = window_returns(
+                    "ema_crossover", self.prices, features, params, train_start, test_start
+                )
+                scores[tuple(params.values())] = metrics(returns, symbols)["total_return"]
+        self.assertEqual(tuple(row["params"].values()), max(scores, key=scores.get))
+        self.assertEqual(row["train_total_return"], max(scores.values()))
+        self.assertEqual(
+            serial["out_of_sample"]["trades"], sum(r["test_trades"] for r in serial["windows"])
+        )
+
+    def test_min_trades(self):
+        report = walk_forward(
+            "ema_crossover", PARAMS["ema_crossover"], self.prices, self.windows, processes=0, min_trades=10**6
+        )
+        self.assertTrue(all(row["params"] is None for row in report["windows"]))
+        self.assertEqual(report["out_of_sample"]["trades"], 0)
+        self.assertIsNone(report["efficiency"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,46 +1,86 @@
 import time
 import logging
 
+STOP_LOSS_PCT = 0.02  # Initial Stop-Loss (2% Down)
+TAKE_PROFIT_PCT = 0.05  # Initial Take-Profit (5% Up)
+POLL_SECONDS = 5
+
 class TradeManager:
-    def __init__(self, broker_api, predictor):
+    def __init__(self, broker_api, predictor, risk_manager=None, clock=time):
+        """``clock`` provides time() and sleep(); the backtester passes a virtual one."""
         self.broker_api = broker_api
         self.predictor = predictor
+        self.risk_manager = risk_manager
+        self.clock = clock
         self.active_trades = {}  # Stores Open Trades
         self.trading_active = False
 
-    def execute_trade(self, symbol, trade_type, entry_price):
+    def order_quantity(self, symbol, price):
+        """Shares the broker will trade for a new position (1 if it can't say)"""
+        quantity = getattr(self.broker_api, "order_quantity", None)
+        return quantity(symbol, price) if quantity else 1
+
+    def execute_trade(self, symbol, trade_type, entry_price, quantity=1):
         """Executes trade & adds it to the active trades list"""
         order_id = self.broker_api.place_order(trade_type, entry_price, symbol)
         if order_id:
             self.active_trades[symbol] = {
                 "trade_type": trade_type,
                 "entry_price": entry_price,
-                "stop_loss": entry_price * 0.98,  # Initial Stop-Loss (2% Down)
-                "take_profit": entry_price * 1.05,  # Initial Take-Profit (5% Up)
+                "quantity": quantity,
+                "stop_loss": entry_price * (1 - STOP_LOSS_PCT),
+                "take_profit": entry_price * (1 + TAKE_PROFIT_PCT),
+                "entry_time": self.clock.time(),
                 "status": "open"
             }
             logging.info(f"Trade Executed: {trade_type} {symbol} @ {entry_price}")
 
+    def consider_entry(self, symbol):
+        """Asks the predictor about a symbol without a trade; buys on BUY if risk allows"""
+        if symbol in self.active_trades:
+            return None
+        signal = self.predictor.predict_live_trade(self.broker_api.get_live_market_data(symbol))
+        if signal != "BUY":
+            return signal
+        price = self.broker_api.get_live_price(symbol)
+        quantity = self.order_quantity(symbol, price)
+        if self.risk_manager is not None:
+            # Rupees at risk down to the stop, as RiskManagement's limits are
+            positions = {
+                s: {"risk": (t["entry_price"] - t["stop_loss"]) * t["quantity"]}
+                for s, t in self.active_trades.items()
+            }
+            new_trade = {"symbol": symbol, "risk": price * STOP_LOSS_PCT * quantity}
+            if not self.risk_manager.validate_trade(positions, new_trade):
+                return "REJECTED"
+        self.execute_trade(symbol, "BUY", price, quantity)
+        return signal
+
+    def check_trades(self):
+        """One monitoring pass over the open trades"""
+        for symbol, trade in list(self.active_trades.items()):
+            live_price = self.broker_api.get_live_price(symbol)
+            prediction = self.predictor.predict_live_trade(self.broker_api.get_live_market_data(symbol))
+
+            # If AI predicted a change in trend → Exit Trade
+            if trade["trade_type"] == "BUY" and prediction == "SELL":
+                self.close_trade(symbol, live_price, reason="Trend Reversal")
+            elif trade["trade_type"] == "SELL" and prediction == "BUY":
+                self.close_trade(symbol, live_price, reason="Trend Reversal")
+            if symbol not in self.active_trades:
+                continue
+
+            # If Take-Profit or Stop-Loss Hits → Exit Trade
+            if live_price >= trade["take_profit"]:
+                self.close_trade(symbol, live_price, reason="Take-Profit Hit")
+            elif live_price <= trade["stop_loss"]:
+                self.close_trade(symbol, live_price, reason="Stop-Loss Hit")
+
     def monitor_trades(self):
         """Continuously monitors open trades & adjusts positions"""
         while self.trading_active:
-            for symbol, trade in list(self.active_trades.items()):
-                live_price = self.broker_api.get_live_price(symbol)
-                prediction = self.predictor.predict_live_trade(self.broker_api.get_live_market_data(symbol))
-
-                # If AI predicted a change in trend → Exit Trade
-                if trade["trade_type"] == "BUY" and prediction == "SELL":
-                    self.close_trade(symbol, live_price, reason="Trend Reversal")
-                elif trade["trade_type"] == "SELL" and prediction == "BUY":
-                    self.close_trade(symbol, live_price, reason="Trend Reversal")
-
-                # If Take-Profit or Stop-Loss Hits → Exit Trade
-                if live_price >= trade["take_profit"]:
-                    self.close_trade(symbol, live_price, reason="Take-Profit Hit")
-                elif live_price <= trade["stop_loss"]:
-                    self.close_trade(symbol, live_price, reason="Stop-Loss Hit")
-
-            time.sleep(5)  # Check every 5 seconds
+            self.check_trades()
+            self.clock.sleep(POLL_SECONDS)  # Check every 5 seconds
 
     def close_trade(self, symbol, exit_price, reason):
         """Closes trade when conditions are met"""
@@ -2,23 +2,32 @@ import asyncio
 import json
 import ssl
 import websockets
-import requests
 import logging
 from google.protobuf.json_format import MessageToDict
 from proto import market_data_pb2 as pb
 from fastapi import WebSocket
+from services.upstox.feed_auth import feed_authorizer
+from services.upstox.subscription_manager import MODE_FULL, SubscriptionManager
+from services.upstox.tick_decoder import DEFAULT_DECODER, decode_frame
+from services.upstox.tick_journal import tick_journal
 
 logger = logging.getLogger(__name__)
 
 
 class UpstoxFeedClient:
-    def __init__(self, access_token: str):
+    def __init__(self, access_token: str, decoder: str = None):
         self.access_token = access_token
+        self.decoder = (decoder or DEFAULT_DECODER).lower()
         self.websocket = None
         self.ssl_context = self._create_ssl_context()
-        self.instrument_keys = set()
+        self.subscriptions = SubscriptionManager(guid="market_feed")
         self.is_connected = False
         self.frontend_clients = {}  # { instrumentKey: set of WebSocket clients }
+        self.client_modes = {}  # { (instrumentKey, WebSocket): mode }
+
+    @property
+    def instrument_keys(self):
+        return set(self.subscriptions.keys())
 
     def _create_ssl_context(self):
         ctx = ssl.create_default_context()
@@ -26,80 +35,89 @@ class UpstoxFeedClient:
         ctx.verify_mode = ssl.CERT_NONE
         return ctx
 
-    def get_authorized_ws_url(self):
-        headers = {"Authorization": f"Bearer {self.access_token}"}
-        response = requests.get(
-            "https://api.upstox.com/v3/feed/market-data-feed/authorize",
-            headers=headers,
-        )
-        response.raise_for_status()
-        return response.json()["data"]["authorized_redirect_uri"]
+    async def get_authorized_ws_url(self):
+        return await feed_authorizer.authorized_url(self.access_token, consumer=self)
 
     async def connect(self):
-        url = self.get_authorized_ws_url()
-        self.websocket = await websockets.connect(url, ssl=self.ssl_context)
+        url = await self.get_authorized_ws_url()
+        self.websocket = await websockets.connect(
+            url, ssl=self.ssl_context if url.startswith("wss") else None
+        )
         self.is_connected = True
         logger.info("✅ Connected to Upstox Market Feed V3")
 
+        await self.subscriptions.attach(self.websocket.send)
         asyncio.create_task(self._receive_loop())
 
     async def _receive_loop(self):
         try:
             while self.is_connected:
                 raw_data = await self.websocket.recv()
+                if self.decoder == "tick":
+                    frame = decode_frame(raw_data)
+                    tick_journal.record(raw_data, frame.ticks)
+                    for tick in frame.ticks:
+                        await self._send_to_clients(
+                            tick.instrument_key, tick.as_feed_dict()
+                        )
+                    continue
+
                 response = pb.FeedResponse()
                 response.ParseFromString(raw_data)
                 message_dict = MessageToDict(response)
 
                 if "ltpc" in message_dict:
                     for tick in message_dict["ltpc"]:
-                        instrument_key = tick["instrumentKey"]
-                        if instrument_key in self.frontend_clients:
-                            for ws in list(self.frontend_clients[instrument_key]):
-                                try:
-                                    await ws.send_json(
-                                        {"instrument_key": instrument_key, "data": tick}
-                                    )
-                                except Exception as e:
-                                    logger.warning(
-                                        f"⚠️ Failed to send LTP to client: {e}"
-                                    )
-                                    self.remove_client(ws)
+                        await self._send_to_clients(tick["instrumentKey"], tick)
         except Exception as e:
             logger.error(f"❌ Upstox receive loop error: {e}")
             self.is_connected = False
 
-    async def subscribe(self, instrument_key: str, websocket: WebSocket):
+    async def _send_to_clients(self, instrument_key: str, data: dict):
+        for ws in list(self.frontend_clients.get(instrument_key, ())):
+            try:
+                await ws.send_json({"instrument_key": instrument_key, "data": data})
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to send LTP to client: {e}")
+                self.remove_client(ws)
+
+    async def subscribe(self, instrument_key: str, websocket: WebSocket, mode: str = MODE_FULL):
         # Track user WebSocket
         if instrument_key not in self.frontend_clients:
             self.frontend_clients[instrument_key] = set()
 
+        previous_mode = self.client_modes.get((instrument_key, websocket))
+        if previous_mode == mode:
+            return
+
         self.frontend_clients[instrument_key].add(websocket)
+        self.client_modes[(instrument_key, websocket)] = mode
+        if previous_mode is None:
+            self.subscriptions.acquire([instrument_key], mode)
+            logger.info(f"📨 Subscribed to {instrument_key}")
+        else:
+            self.subscriptions.change_mode([instrument_key], mode, previous_mode)
+            logger.info(f"🔁 {instrument_key} mode {previous_mode} -> {mode}")
 
-        if instrument_key not in self.instrument_keys:
-            self.instrument_keys.add(instrument_key)
-            if self.is_connected:
-                payload = {
-                    "guid": "market_feed",
-                    "method": "sub",
-                    "data": {
-                        "mode": "full",
-                        "instrumentKeys": list(self.instrument_keys),
-                    },
-                }
-                await self.websocket.send(json.dumps(payload).encode("utf-8"))
-                logger.info(f"📨 Subscribed to {instrument_key}")
+    def unsubscribe(self, instrument_key: str, websocket: WebSocket):
+        clients = self.frontend_clients.get(instrument_key)
+        if not clients or websocket not in clients:
+            return
+        clients.remove(websocket)
+        mode = self.client_modes.pop((instrument_key, websocket), MODE_FULL)
+        self.subscriptions.release([instrument_key], mode)
+        if not clients:
+            del self.frontend_clients[instrument_key]
 
     def remove_client(self, websocket: WebSocket):
         for key in list(self.frontend_clients.keys()):
             if websocket in self.frontend_clients[key]:
-                self.frontend_clients[key].remove(websocket)
+                self.unsubscribe(key, websocket)
                 logger.info(f"🧹 Removed client from {key}")
-                if not self.frontend_clients[key]:
-                    del self.frontend_clients[key]
 
     async def close(self):
         self.is_connected = False
+        self.subscriptions.detach()
         if self.websocket:
             await self.websocket.close()
             logger.info("🔌 Upstox feed WebSocket closed")